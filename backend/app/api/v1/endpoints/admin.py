@@ -0,0 +1,42 @@
+# --- File: backend/app/api/v1/endpoints/admin.py ---
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from typing import Optional
+
+from backend.app.db.models import User
+from backend.app.api.v1.endpoints.users import get_current_admin_user
+from backend.app.services.query_metrics import get_query_metrics
+
+router = APIRouter()
+
+
+class QueryMetricsConfig(BaseModel):
+    explain_slow: Optional[bool] = None
+    slow_ms: Optional[float] = None
+
+
+@router.get("/admin/query-metrics")
+def get_query_metrics_report(admin_user: User = Depends(get_current_admin_user)):
+    """Latencia (histograma, p50/p95), filas y errores por consulta de Supabase."""
+    return get_query_metrics().get_metrics()
+
+
+@router.get("/admin/slow-queries")
+def get_slow_queries(limit: int = 50, admin_user: User = Depends(get_current_admin_user)):
+    """Consultas más lentas que slow_ms (la más reciente primero), con parámetros redactados y plan si se capturó."""
+    return get_query_metrics().get_slow_queries(limit)
+
+
+@router.put("/admin/query-metrics/config")
+def update_query_metrics_config(config: QueryMetricsConfig, admin_user: User = Depends(get_current_admin_user)):
+    """Activa/desactiva la captura de EXPLAIN (ANALYZE, BUFFERS) y ajusta el umbral de consulta lenta."""
+    metrics = get_query_metrics()
+    metrics.configure(explain_slow=config.explain_slow, slow_ms=config.slow_ms)
+    return {"explain_slow": metrics.explain_slow, "slow_ms": metrics.slow_ms}
+
+
+@router.delete("/admin/query-metrics")
+def reset_query_metrics(admin_user: User = Depends(get_current_admin_user)):
+    """Reinicia contadores y slow log."""
+    get_query_metrics().reset()
+    return {"status": "reset"}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
 from backend.app.services.supabase_service import get_supabase_service, SupabaseService
-from backend.app.services.data_service import DataService, get_data_service
+from backend.app.services.data_service import AsyncDataService, get_async_data_service
 from backend.app.core.security import get_current_user
 import traceback
 
@@ -25,7 +25,7 @@ class SharedViewResponse(BaseModel):
 async def create_shared_view(
     config: SharedViewConfig,
     current_user: str = Depends(get_current_user),
-    service: SupabaseService = Depends(get_supabase_service)
+    data_service: AsyncDataService = Depends(get_async_data_service)
 ):
     """
     Create a shareable link for the current analytics view.
@@ -38,7 +38,7 @@ async def create_shared_view(
         if config_dict.get('form_titles'):
             config_dict['form_titles'] = config_dict['form_titles'].split(',')
             
-        token = service.create_shared_view(config_dict, created_by=current_user)
+        token = await data_service.create_shared_view(config_dict, created_by=current_user)
         
         # Construct the full URL (assuming frontend is at root or we return relative)
         url = f"/shared/{token}"
@@ -99,13 +99,13 @@ async def debug_share_link(service: SupabaseService = Depends(get_supabase_servi
 @router.get("/share/{token}", response_model=Dict[str, Any])
 async def get_shared_view(
     token: str,
-    service: SupabaseService = Depends(get_supabase_service)
+    data_service: AsyncDataService = Depends(get_async_data_service)
 ):
     """
     Get the configuration for a shared view token.
     Public endpoint (no auth required).
     """
-    config = service.get_shared_view(token)
+    config = await data_service.get_shared_view(token)
     
     if not config:
         raise HTTPException(status_code=404, detail="Shared view not found or expired")
@@ -118,14 +118,13 @@ async def get_shared_view(
 @router.get("/share/{token}/stats", response_model=Dict[str, Any])
 async def get_shared_view_stats(
     token: str,
-    service: SupabaseService = Depends(get_supabase_service),
-    data_service: DataService = Depends(get_data_service)
+    data_service: AsyncDataService = Depends(get_async_data_service)
 ):
     """
     Get stats for a shared view. Public endpoint (no auth required).
     """
     # First validate the token and get config
-    config = service.get_shared_view(token)
+    config = await data_service.get_shared_view(token)
     if not config:
         raise HTTPException(status_code=404, detail="Shared view not found or expired")
     
@@ -144,14 +143,14 @@ async def get_shared_view_stats(
         
         # Call appropriate stats function based on config
         if campaign_id:
-            return data_service.get_campaign_stats(
+            return await data_service.get_campaign_stats(
                 campaign_id=campaign_id,
                 start_date=start_date,
                 end_date=end_date,
                 form_title_ids=form_title_ids
             )
         else:
-            return data_service.get_source_stats(
+            return await data_service.get_source_stats(
                 source_name=source_id,
                 start_date=start_date,
                 end_date=end_date
@@ -166,14 +165,14 @@ async def get_shared_view_donations(
     token: str,
     page_size: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    service: SupabaseService = Depends(get_supabase_service),
-    data_service: DataService = Depends(get_data_service)
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (paginación por cursor; ignora offset)"),
+    data_service: AsyncDataService = Depends(get_async_data_service)
 ):
     """
     Get donations for a shared view. Public endpoint (no auth required).
     """
     # First validate the token and get config
-    config = service.get_shared_view(token)
+    config = await data_service.get_shared_view(token)
     if not config:
         raise HTTPException(status_code=404, detail="Shared view not found or expired")
     
@@ -187,32 +186,37 @@ async def get_shared_view_donations(
         
         # For single form title, use form title donations endpoint
         if isinstance(form_titles, list) and len(form_titles) == 1:
-            result = data_service.get_donations_for_form_title(
+            result = await data_service.get_donations_for_form_title(
                 form_title_ids=form_titles,
                 start_date=start_date,
                 end_date=end_date,
                 page_size=page_size,
-                offset=offset
+                offset=offset,
+                cursor=cursor
             )
         elif campaign_id:
-            result = data_service.get_campaign_donations(
+            result = await data_service.get_campaign_donations(
                 campaign_id=campaign_id,
                 start_date=start_date,
                 end_date=end_date,
                 page_size=page_size,
-                offset=offset
+                offset=offset,
+                cursor=cursor
             )
         else:
-            result = data_service.get_source_donations(
-                source=source_id,
+            result = await data_service.get_source_donations(
+                source_name=source_id,
                 start_date=start_date,
                 end_date=end_date,
                 page_size=page_size,
-                offset=offset
+                offset=offset,
+                cursor=cursor
             )
         
         return result
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching shared view donations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,10 +2,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Literal, Optional, Union
 from backend.app.core.security import get_current_user
 from backend.app.services.data_service import DataService, get_data_service
-from fastapi_cache.decorator import cache
+from backend.app.services.donation_export import ExportBusyError, donation_export_response
+from backend.app.services.circuit_breaker import CircuitOpenError
 
 
 class DonationDetail(BaseModel):
@@ -18,11 +19,12 @@ class DonationDetail(BaseModel):
 class PaginatedDonationsResponse(BaseModel):
     donations: List[DonationDetail]
     total_count: int
+    total_count_estimated: bool = False  # True si total_count es una estimación del planner
+    next_cursor: Optional[str] = None  # pasar como 'cursor' para pedir la página siguiente
 
 router = APIRouter()
 
 @router.get("/sources", response_model=List[str])
-@cache(expire=900)  # why: lista de fuentes cambia poco
 def get_campaign_sources(
     data_service: DataService = Depends(get_data_service),
     current_user: str = Depends(get_current_user)
@@ -30,7 +32,6 @@ def get_campaign_sources(
     return data_service.get_unique_campaign_sources()
 
 @router.get("", response_model=List[Dict[str, Any]])
-@cache(expire=600)  # why: campañas cambian poco en corto plazo
 def get_campaigns_by_source(
     source: str,
     data_service: DataService = Depends(get_data_service),
@@ -39,7 +40,6 @@ def get_campaigns_by_source(
     return data_service.get_campaigns_by_source(source=source)
 
 @router.get("/source/{source_name}/stats")
-@cache(expire=120)
 def get_source_stats(
     source_name: str,
     start_date: Optional[str] = None,
@@ -90,13 +90,13 @@ def get_donations_for_form_title(
         raise HTTPException(status_code=500, detail=f"Error al obtener las donaciones: {e}")
 
 @router.get("/{campaign_id}/donations", response_model=PaginatedDonationsResponse)
-@cache(expire=60)
 def get_campaign_donations_endpoint(
     campaign_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     page_size: Optional[int] = Query(50, ge=1, le=100),
     offset: Optional[int] = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (paginación por cursor; ignora offset)"),
     data_service: DataService = Depends(get_data_service),
     current_user: str = Depends(get_current_user),
 ) -> PaginatedDonationsResponse:
@@ -109,22 +109,25 @@ def get_campaign_donations_endpoint(
             start_date=start_date,
             end_date=end_date,
             page_size=page_size,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         return donations_result
     except HTTPException as http_exc:
         raise http_exc
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener donaciones de campaña (paginado): {e}")
 
 @router.get("/source/{source_name}/donations", response_model=PaginatedDonationsResponse)
-@cache(expire=60)
 def get_source_donations_endpoint(
     source_name: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     page_size: Optional[int] = Query(50, ge=1, le=100),
     offset: Optional[int] = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (paginación por cursor; ignora offset)"),
     data_service: DataService = Depends(get_data_service),
     current_user: str = Depends(get_current_user),
 ) -> PaginatedDonationsResponse:
@@ -137,10 +140,67 @@ def get_source_donations_endpoint(
             start_date=start_date,
             end_date=end_date,
             page_size=page_size,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         return donations_result
     except HTTPException as http_exc:
         raise http_exc
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener donaciones de source (paginado): {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al obtener donaciones de source (paginado): {e}")
+
+# ==========================================
+# EXPORTS (streaming, sin caché)
+# ==========================================
+
+@router.get("/{campaign_id}/donations/export")
+def export_campaign_donations_endpoint(
+    campaign_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    data_service: DataService = Depends(get_data_service),
+    current_user: str = Depends(get_current_user),
+):
+    """
+    Todas las donaciones de una campaña (CSV o NDJSON), enviadas por lotes desde un
+    cursor del servidor. Requiere Supabase (sin respaldo de Airtable).
+    """
+    try:
+        batches = data_service.iter_donation_export_batches("campaign", campaign_id, start_date, end_date)
+    except CircuitOpenError:
+        raise  # 503 (handler en main.py)
+    except ExportBusyError:
+        raise  # 429 (handler en main.py)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar donaciones de campaña: {e}")
+    return donation_export_response(batches, format, f"campaign_{campaign_id}")
+
+@router.get("/source/{source_name}/donations/export")
+def export_source_donations_endpoint(
+    source_name: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    data_service: DataService = Depends(get_data_service),
+    current_user: str = Depends(get_current_user),
+):
+    """
+    Todas las donaciones de las campañas de un source (CSV o NDJSON), enviadas por lotes.
+    Requiere Supabase (sin respaldo de Airtable).
+    """
+    try:
+        batches = data_service.iter_donation_export_batches("source", source_name, start_date, end_date)
+    except CircuitOpenError:
+        raise  # 503 (handler en main.py)
+    except ExportBusyError:
+        raise  # 429 (handler en main.py)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar donaciones del source: {e}")
+    return donation_export_response(batches, format, f"source_{source_name}")
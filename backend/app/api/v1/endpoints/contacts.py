@@ -3,6 +3,7 @@ from typing import List, Optional
 from fastapi import APIRouter, HTTPException, status
 from backend.app.schemas import ContactCreate, Contact
 from backend.app.services.airtable_service import AirtableService, get_airtable_service, DONORS_FIELDS
+from backend.app.services.email_prefix_index import get_email_prefix_index
 from fastapi import Depends
 from backend.app.core.security import get_current_user
 from fastapi_cache.decorator import cache
@@ -81,6 +82,12 @@ def autocomplete_contact_email(
     current_user: str = Depends(get_current_user)
 ):
     """
-    Provee sugerencias de email para autocompletar, consultando Airtable.
+    Provee sugerencias de email para autocompletar desde el índice en memoria
+    (construido desde la tabla 'emails' sincronizada). Si Supabase no está
+    disponible para construirlo, se consulta Airtable.
     """
-    return airtable.autocomplete_email(q)
\ No newline at end of file
+    try:
+        return get_email_prefix_index().search(q)
+    except Exception as e:
+        print(f"Error en el índice de autocompletado, usando Airtable: {e}")
+        return airtable.autocomplete_email(q)
\ No newline at end of file
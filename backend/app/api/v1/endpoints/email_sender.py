@@ -12,9 +12,12 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional, Union
 import threading
 import queue
+import itertools
 
 
 from backend.app.services.airtable_service import AirtableService
+from backend.app.services.airtable_rate_limiter import PRIORITY_CAMPAIGN
+from backend.app.services.contact_spool import ContactSpool
 from backend.app.services.gmail_service import GmailService
 from backend.app.services.credentials_manager import credentials_manager_instance
 from backend.app.services.email_sender_service import get_email_sender_service
@@ -72,6 +75,9 @@ CAMPAIGN_DATA_DIR = "campaign_data"
 SENT_LOGS_DIR = "sent_logs"
 TARGETS_DIR = "campaign_targets"
 CREDENTIALS_BASE_DIR = "gmail_credentials"
+# Contactos en la cola hacia los workers de Gmail (el productor espera si van atrás).
+# La lista de Airtable no espera: ContactSpool la lee entera aparte.
+CONTACTS_QUEUE_SIZE = 500
 
 os.makedirs(CAMPAIGN_DATA_DIR, exist_ok=True)
 os.makedirs(SENT_LOGS_DIR, exist_ok=True)
@@ -147,7 +153,9 @@ def run_campaign_task(campaign_id: str):
         # Continuamos igualmente, pero el frontend no verá el cambio inmediato
 
     # --- 2. Obtener Lista de Contactos (Email, Nombre) ---
-    contact_data = [] # Lista de diccionarios {'Email': ..., 'Name': ...}
+    contact_data = [] # Lista de diccionarios {'Email': ..., 'Name': ...} (solo CSV)
+    contact_pages = [] # Páginas de contactos: Airtable se lee en streaming, CSV es una sola página
+    has_contacts = False
     source_type = config.get('source_type')
 
     # --- INICIO: NUEVO BLOQUE para cargar Servicios de Gmail ---
@@ -181,41 +189,23 @@ def run_campaign_task(campaign_id: str):
     # --- FIN: NUEVO BLOQUE ---
 
     if source_type == 'airtable':
-        print(f"[{campaign_id}] Fetching contacts from Airtable...")
+        print(f"[{campaign_id}] Streaming contacts from Airtable...")
         try:
-            # Instanciamos AirtableService aquí, dentro de la tarea
-            airtable_service = AirtableService()
-            # Usamos los filtros guardados en la config
-            airtable_contacts_raw = airtable_service.get_campaign_contacts(
+            # Instanciamos AirtableService aquí, dentro de la tarea (prioridad 'campaign' en el governor)
+            airtable_service = AirtableService(priority=PRIORITY_CAMPAIGN)
+            # Usamos los filtros guardados en la config; los contactos llegan página a página
+            airtable_pages = airtable_service.iter_campaign_contacts(
                 region=config.get('region'),
                 is_bounced=config.get('is_bounced', False), # Usa False si no está definido
                 segment=config.get('segment', 'standard')   # ✅ Usa el segmento guardado
             )
-            # Necesitamos adaptar esto si get_campaign_contacts no devuelve nombres
-            # Ahora get_campaign_contacts devuelve {'Email': ..., 'Name': ...}
-            contact_data = [{'Email': c.get('Email'), 'Name': c.get('Name', 'Valued Supporter')}
-                            for c in airtable_contacts_raw if c.get('Email')]
-            print(f"[{campaign_id}] Found {len(contact_data)} contacts in Airtable.")
-            
-            # --- NUEVO: Actualizar target_count con el conteo real al momento de enviar ---
-            config['target_count'] = len(contact_data)
-            config['contacts_fetched_at'] = datetime.now().isoformat()
-            try:
-                with open(campaign_file_path, 'w') as f:
-                    json.dump(config, f, indent=4)
-                print(f"[{campaign_id}] Updated target_count to {len(contact_data)} (fresh from Airtable)")
-            except Exception as e_save:
-                print(f"[{campaign_id}] WARNING: Could not save updated target_count: {e_save}")
-            
-            # --- NUEVO: Regenerar el archivo CSV de targets con los contactos frescos ---
-            try:
-                df_data = [{'Email': contact.get('Email')} for contact in contact_data if contact.get('Email')]
-                pd.DataFrame(df_data).to_csv(target_csv_path, index=False)
-                print(f"[{campaign_id}] Regenerated target CSV with {len(df_data)} contacts")
-            except Exception as e_csv:
-                print(f"[{campaign_id}] WARNING: Could not regenerate target CSV: {e_csv}")
-            # --- FIN NUEVO ---
-            
+            # La primera página se pide aquí: si Airtable falla no arrancamos el envío.
+            # El resto se consume en el productor mientras los workers ya están enviando.
+            first_page = next(airtable_pages, [])
+            has_contacts = bool(first_page)
+            contact_pages = itertools.chain([first_page], airtable_pages)
+            print(f"[{campaign_id}] First Airtable page received ({len(first_page)} contacts).")
+
         except Exception as e:
             print(f"[{campaign_id}] ERROR: Failed to get contacts from Airtable: {e}")
             config['status'] = 'Error - Airtable Fetch Failed' # Actualiza estado a error
@@ -314,6 +304,8 @@ def run_campaign_task(campaign_id: str):
                      print(f"[{campaign_id}] WARNING: Skipping row {index} due to invalid email format: '{email_val}'")
 
             print(f"[{campaign_id}] Processed {len(contact_data)} valid contacts from CSV.")
+            has_contacts = bool(contact_data)
+            contact_pages = [contact_data]
             # --- FIN DEL BLOQUE MODIFICADO ---
 
         except Exception as e:
@@ -338,7 +330,7 @@ def run_campaign_task(campaign_id: str):
         return
 
     # --- 3. Preparar Envío ---
-    if not contact_data:
+    if not has_contacts:
         print(f"[{campaign_id}] No contacts found or processed. Campaign finished.")
         config['status'] = 'Completed - No Contacts'
         try:
@@ -370,169 +362,245 @@ def run_campaign_task(campaign_id: str):
             sent_emails = []
 
     sent_emails_set = set(sent_emails)
-    
-    # Filter contacts to send
-    contacts_to_send = []
-    for contact in contact_data:
-        email = contact.get('Email')
-        if not email or not isinstance(email, str):
-            continue
-        if email.lower() not in sent_emails_set:
-            contacts_to_send.append(contact)
 
-    total_contacts_to_send = len(contacts_to_send)
-    print(f"[{campaign_id}] Emails pending in this run: {total_contacts_to_send}")
-    
-    if total_contacts_to_send == 0:
-        print(f"[{campaign_id}] No new contacts to send. Finishing.")
-    else:
-        # Check if we have services
-        if not gmail_services:
-             print(f"[{campaign_id}] ERROR: No gmail services available for sending.")
-             # Update status to error?
-             return
+    # Setup Concurrency: el spool lee todas las páginas de Airtable de inmediato (los
+    # iteradores de listado caducan si se leen al ritmo del envío) y el productor pasa
+    # los contactos a la cola acotada mientras los workers envían desde la primera página.
+    contact_spool = ContactSpool(contact_pages, name=campaign_id)
+    contacts_queue = queue.Queue(maxsize=CONTACTS_QUEUE_SIZE)
+    producer_done = threading.Event()
+
+    # Shared state for threads
+    log_lock = threading.Lock()
+    stop_event = threading.Event()
+
+    # Counters
+    sent_count_this_run = 0
+    sent_count_lock = threading.Lock()
+    failed_contacts = []
+    failed_contacts_lock = threading.Lock()
+
+    processed_count = 0
+    processed_count_lock = threading.Lock()
+
+    contact_totals = {'valid': 0, 'queued': 0} # 'valid': contactos con email (como la lista original)
+    # 'complete': se recorrió la lista entera; si no, contact_totals['valid'] es un conteo parcial
+    contact_stream = {'complete': False, 'stream_failed': False}
+
+    def contact_producer():
+        csv_file = None
+        csv_writer = None
+        # El CSV nuevo se escribe aparte y solo reemplaza al de targets si la lista llega completa
+        csv_tmp_path = f"{target_csv_path}.tmp"
+        try:
+            if source_type == 'airtable':
+                # Regenerar el archivo CSV de targets con los contactos frescos, página a página
+                try:
+                    csv_file = open(csv_tmp_path, 'w', newline='', encoding='utf-8')
+                    csv_writer = csv.writer(csv_file)
+                    csv_writer.writerow(['Email'])
+                except Exception as e_csv:
+                    print(f"[{campaign_id}] WARNING: Could not regenerate target CSV: {e_csv}")
+
+            for email, name in contact_spool:
+                contact_totals['valid'] += 1
+                if csv_writer:
+                    csv_writer.writerow([email])
+                if email.lower() in sent_emails_set:
+                    continue
+                # put con timeout para no quedar bloqueado si la campaña se cancela
+                while not stop_event.is_set():
+                    try:
+                        contacts_queue.put({'Email': email, 'Name': name}, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop_event.is_set():
+                    print(f"[{campaign_id}] Producer stopped: campaign no longer sending.")
+                    return
+                contact_totals['queued'] += 1
+
+            if not contact_spool.complete:
+                return
+            contact_stream['complete'] = True
+            print(f"[{campaign_id}] Found {contact_totals['valid']} contacts. Emails pending in this run: {contact_totals['queued']}")
+            if source_type == 'airtable':
+                # --- Actualizar target_count con el conteo real al momento de enviar ---
+                # Releemos el archivo para no pisar un cambio de estado (Paused/Cancelled) hecho mientras tanto
+                config['target_count'] = contact_totals['valid']
+                config['contacts_fetched_at'] = datetime.now().isoformat()
+                try:
+                    with open(campaign_file_path, 'r') as f:
+                        current_config = json.load(f)
+                    current_config['target_count'] = config['target_count']
+                    current_config['contacts_fetched_at'] = config['contacts_fetched_at']
+                    with open(campaign_file_path, 'w') as f:
+                        json.dump(current_config, f, indent=4)
+                    print(f"[{campaign_id}] Updated target_count to {contact_totals['valid']} (fresh from Airtable)")
+                except Exception as e_save:
+                    print(f"[{campaign_id}] WARNING: Could not save updated target_count: {e_save}")
+        except Exception as e_fetch:
+            contact_stream['stream_failed'] = True
+            print(f"[{campaign_id}] ERROR: Contact stream interrupted: {e_fetch}")
+            traceback.print_exc()
+        finally:
+            if csv_file:
+                csv_file.close()
+                try:
+                    if contact_stream['complete']:
+                        os.replace(csv_tmp_path, target_csv_path)
+                    else:
+                        os.remove(csv_tmp_path)
+                except OSError as e_csv:
+                    print(f"[{campaign_id}] WARNING: Could not finalize target CSV: {e_csv}")
+            producer_done.set()
 
-        # Setup Concurrency
-        contacts_queue = queue.Queue()
-        for contact in contacts_to_send:
-            contacts_queue.put(contact)
-            
-        # Shared state for threads
-        log_lock = threading.Lock()
-        stop_event = threading.Event()
+    try:
+        progress_db = get_email_sender_service()
+    except Exception:
+        progress_db = None
+
+    # Worker Function
+    def email_worker(service: GmailService, worker_id: int):
+        nonlocal sent_count_this_run, processed_count
         
-        # Counters
-        sent_count_this_run = 0
-        sent_count_lock = threading.Lock()
-        failed_contacts = []
-        failed_contacts_lock = threading.Lock()
+        credential_name = os.path.basename(service.credentials_path)
+        print(f"[{campaign_id}] Worker {worker_id} started using {credential_name}")
         
-        processed_count = 0
-        processed_count_lock = threading.Lock()
-
-        # Worker Function
-        def email_worker(service: GmailService, worker_id: int):
-            nonlocal sent_count_this_run, processed_count
-            
-            credential_name = os.path.basename(service.credentials_path)
-            print(f"[{campaign_id}] Worker {worker_id} started using {credential_name}")
-            
-            while not contacts_queue.empty() and not stop_event.is_set():
+        while not stop_event.is_set():
+            try:
+                # Retrieve contact (la cola puede estar vacía mientras llega la siguiente página)
                 try:
-                    # Retrieve contact
-                    try:
-                        contact = contacts_queue.get(timeout=1)
-                    except queue.Empty:
+                    contact = contacts_queue.get(timeout=1)
+                except queue.Empty:
+                    if producer_done.is_set() and contacts_queue.empty():
                         break
-                    
-                    # Status Check (Reading file)
-                    try:
+                    continue
+                
+                # Status Check (Reading file)
+                try:
+                     with open(campaign_file_path, 'r') as f_status:
+                        current_config = json.load(f_status)
+                     current_status = current_config.get('status', 'Unknown')
+
+                     # En pausa el worker conserva su contacto y espera (la cola es acotada)
+                     while current_status == "Paused" and not stop_event.is_set():
+                         time.sleep(5)
                          with open(campaign_file_path, 'r') as f_status:
-                            current_config = json.load(f_status)
-                         current_status = current_config.get('status', 'Unknown')
+                             current_status = json.load(f_status).get('status', 'Unknown')
+
+                     if current_status == "Cancelled":
+                         print(f"[{campaign_id}] CANCELLED detected by Worker {worker_id}.")
+                         stop_event.set()
+                         contacts_queue.task_done()
+                         break
                          
-                         if current_status == "Paused":
-                             contacts_queue.put(contact)
-                             contacts_queue.task_done()
-                             time.sleep(5) 
-                             continue
-                             
-                         elif current_status == "Cancelled":
-                             print(f"[{campaign_id}] CANCELLED detected by Worker {worker_id}.")
-                             stop_event.set()
-                             contacts_queue.task_done()
-                             break
-                             
-                         elif current_status != "Sending":
-                             print(f"[{campaign_id}] Unexpected status '{current_status}'. Stopping.")
-                             stop_event.set()
-                             contacts_queue.task_done()
-                             break
-                             
-                    except Exception:
-                        pass
-
-                    if stop_event.is_set():
-                        contacts_queue.task_done()
-                        break
+                     elif current_status != "Sending":
+                         print(f"[{campaign_id}] Unexpected status '{current_status}'. Stopping.")
+                         stop_event.set()
+                         contacts_queue.task_done()
+                         break
+                         
+                except Exception:
+                    pass
 
-                    # Processing
-                    email = contact.get('Email')
-                    name = contact.get('Name', 'Valued Supporter')
-                    
-                    with processed_count_lock:
-                        processed_count += 1
-                        current_processed = processed_count
+                if stop_event.is_set():
+                    contacts_queue.task_done()
+                    break
 
-                    print(f"[{campaign_id}] Worker {worker_id} processing {current_processed}/{total_contacts_to_send}: {email}")
-                    
-                    html_body_personalized = html_body_template.replace("{{name}}", name).replace("*|FNAME|*", name)
+                # Processing
+                email = contact.get('Email')
+                name = contact.get('Name', 'Valued Supporter')
+                
+                with processed_count_lock:
+                    processed_count += 1
+                    current_processed = processed_count
+
+                pending_label = contact_totals['queued'] if producer_done.is_set() else f"{contact_totals['queued']}+"
+                print(f"[{campaign_id}] Worker {worker_id} processing {current_processed}/{pending_label}: {email}")
+                
+                html_body_personalized = html_body_template.replace("{{name}}", name).replace("*|FNAME|*", name)
+                
+                success = False
+                try:
+                    success = service.send_email(
+                        to_email=email,
+                        subject=subject,
+                        html_body=html_body_personalized
+                    )
+                except Exception as e_send:
+                     print(f"[{campaign_id}] Worker {worker_id} Exception sending to {email}: {e_send}")
+
+                if success:
+                    print(f"  -> Worker {worker_id}: SUCCESS {email}")
                     
-                    success = False
-                    try:
-                        success = service.send_email(
-                            to_email=email,
-                            subject=subject,
-                            html_body=html_body_personalized
-                        )
-                    except Exception as e_send:
-                         print(f"[{campaign_id}] Worker {worker_id} Exception sending to {email}: {e_send}")
-
-                    if success:
-                        print(f"  -> Worker {worker_id}: SUCCESS {email}")
-                        
-                        with sent_count_lock:
-                            sent_count_this_run += 1
-                        
-                        with log_lock:
-                            sent_emails_set.add(email.lower())
-                            try:
-                                pd.DataFrame({'Email': [email]}).to_csv(
-                                    sent_log_path,
-                                    mode='a',
-                                    header=not os.path.exists(sent_log_path),
-                                    index=False,
-                                    encoding='utf-8-sig'
-                                )
-                            except Exception:
-                                pass
-                        
-                        # Short sleep per account to handle rate limits nicely
-                        # With 18+ accounts, we slow this down significantly to keep global rate safe
-                        # 12-25s sleep per account = ~2.5 - 5 emails/minute per account
-                        # Total system speed with 18 accounts: ~60 emails/minute (approx 1/sec global)
-                        time.sleep(random.uniform(12.0, 25.0)) 
-                    else:
-                        print(f"  -> Worker {worker_id}: FAILED {email}")
-                        with failed_contacts_lock:
-                            failed_contacts.append({"email": email, "reason": "Send failed", "account": credential_name})
-                        time.sleep(random.uniform(30.0, 60.0))
+                    with sent_count_lock:
+                        sent_count_this_run += 1
                     
-                    contacts_queue.task_done()
+                    with log_lock:
+                        sent_emails_set.add(email.lower())
+                        sent_so_far = len(sent_emails_set)
+                        try:
+                            pd.DataFrame({'Email': [email]}).to_csv(
+                                sent_log_path,
+                                mode='a',
+                                header=not os.path.exists(sent_log_path),
+                                index=False,
+                                encoding='utf-8-sig'
+                            )
+                        except Exception:
+                            pass
+
+                    # Progreso en Supabase: se agrupa y escribe una vez por intervalo, no por email
+                    if progress_db:
+                        progress_db.queue_campaign_update(campaign_id, {'sent_count_final': sent_so_far})
                     
-                except Exception as e_worker:
-                    print(f"[{campaign_id}] Worker {worker_id} crashed: {e_worker}")
-                    traceback.print_exc()
-        
-        # Launch Threads
-        threads = []
-        for i, service in enumerate(gmail_services):
-            t = threading.Thread(target=email_worker, args=(service, i+1))
-            t.daemon = True
-            t.start()
-            threads.append(t)
-            
-        print(f"[{campaign_id}] Launched {len(threads)} worker threads.")
+                    # Short sleep per account to handle rate limits nicely
+                    # With 18+ accounts, we slow this down significantly to keep global rate safe
+                    # 12-25s sleep per account = ~2.5 - 5 emails/minute per account
+                    # Total system speed with 18 accounts: ~60 emails/minute (approx 1/sec global)
+                    time.sleep(random.uniform(12.0, 25.0)) 
+                else:
+                    print(f"  -> Worker {worker_id}: FAILED {email}")
+                    with failed_contacts_lock:
+                        failed_contacts.append({"email": email, "reason": "Send failed", "account": credential_name})
+                    time.sleep(random.uniform(30.0, 60.0))
+                
+                contacts_queue.task_done()
+                
+            except Exception as e_worker:
+                print(f"[{campaign_id}] Worker {worker_id} crashed: {e_worker}")
+                traceback.print_exc()
+    
+    # Launch Threads
+    contact_spool.start()
+    producer = threading.Thread(target=contact_producer)
+    producer.daemon = True
+    producer.start()
+
+    threads = []
+    for i, service in enumerate(gmail_services):
+        t = threading.Thread(target=email_worker, args=(service, i+1))
+        t.daemon = True
+        t.start()
+        threads.append(t)
         
-        for t in threads:
-            t.join()
+    print(f"[{campaign_id}] Launched {len(threads)} worker threads.")
+    
+    for t in threads:
+        t.join()
+
+    # Si los workers pararon (cancelada), liberar al productor y dejar de leer Airtable
+    stop_event.set()
+    contact_spool.close()
+    producer.join()
 
     # --- INICIO: REEMPLAZO de Actualización Final de Estado ---
     print(f"[{campaign_id}] Campaña finalizada.")
     final_sent_count = len(sent_emails_set) # Conteo final desde el conjunto actualizado
     print(f"  - Emails enviados en esta ejecución: {sent_count_this_run}")
     print(f"  - Total emails enviados (incluyendo anteriores): {final_sent_count}")
-    print(f"  - Total contactos en lista original: {len(contact_data)}")
+    print(f"  - Total contactos en lista original: {contact_totals['valid']}{'' if contact_stream['complete'] else ' (parcial)'}")
     print(f"  - Fallos registrados en esta ejecución: {len(failed_contacts)}")
     # Opcional: Guardar los fallos en un archivo de log separado
     # if failed_contacts:
@@ -546,12 +614,15 @@ def run_campaign_task(campaign_id: str):
 
     # Determinar estado final con lógica mejorada
     final_status = 'Unknown' # Estado inicial por si acaso
-    if not contact_data:
+    if not has_contacts:
         final_status = 'Completed - No Contacts'
     else:
-        # Calcular total de contactos válidos (con email)
-        valid_contacts_count = len([c for c in contact_data if c.get('Email') and isinstance(c.get('Email'), str)])
-        if final_sent_count == valid_contacts_count:
+        # Total de contactos válidos (con email), contados por el productor
+        valid_contacts_count = contact_totals['valid']
+        if contact_stream['stream_failed']:
+            # La lista de Airtable se cortó a mitad: el conteo es parcial, nunca 'Completed'
+            final_status = 'Completed with Errors' if final_sent_count > 0 else 'Error - Airtable Fetch Failed'
+        elif contact_stream['complete'] and final_sent_count == valid_contacts_count:
             final_status = 'Completed'
         elif final_sent_count > 0: # Si se envió al menos uno, pero no todos
             final_status = 'Completed with Errors'
@@ -585,7 +656,7 @@ def run_campaign_task(campaign_id: str):
     # El comentario '# --- Fin función ---' sigue siendo válido después de este bloque.
     # --- 5. Finalizar y Actualizar Estado ---
     # (El estado ya se actualizó correctamente en el bloque anterior)
-    print(f"[{campaign_id}] Campaign finished. Sent {sent_count_this_run} emails in this run. Total sent (cumulative): {final_sent_count}/{len(contact_data)}")
+    print(f"[{campaign_id}] Campaign finished. Sent {sent_count_this_run} emails in this run. Total sent (cumulative): {final_sent_count}/{contact_totals['valid']}")
 
 
 # --- Fin función ---
@@ -1,9 +1,10 @@
 # backend/app/api/v1/endpoints/form_titles.py
 from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi_cache.decorator import cache
 from backend.app.services.data_service import DataService, get_data_service
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Literal, Optional, Any
 from backend.app.core.security import get_current_user
+from backend.app.services.donation_export import ExportBusyError, donation_export_response
+from backend.app.services.circuit_breaker import CircuitOpenError
 from pydantic import BaseModel, Field
 
 # 🔧 FIX: sin prefix aquí; el prefix ya lo aporta main.py: "/api/v1/form-titles"
@@ -25,10 +26,13 @@ class FormTitlesDonationsRequest(BaseModel):
     # PAGINACIÓN: Añadir parámetros opcionales al request POST
     page_size: Optional[int] = 50
     offset: Optional[int] = 0
+    cursor: Optional[str] = None  # next_cursor de la página anterior (ignora offset)
 
 class PaginatedDonationsResponse(BaseModel):
     donations: List[DonationDetail]
     total_count: int
+    total_count_estimated: bool = False  # True si total_count es una estimación del planner
+    next_cursor: Optional[str] = None  # pasar como 'cursor' para pedir la página siguiente
     # totalAmount y donationsCount ya no son necesarios aquí, total_count es el clave.
 
 class CustomReportData(BaseModel):
@@ -50,19 +54,21 @@ def get_donations_for_form_titles_post(
             start_date=payload.start_date,
             end_date=payload.end_date,
             page_size=payload.page_size,
-            offset=payload.offset
+            offset=payload.offset,
+            cursor=payload.cursor
         )
         # PAGINACIÓN: Devolver directamente el resultado del servicio
         # (ya contiene 'donations' y 'total_count')
         return result
     except HTTPException as http_exc:
         raise http_exc
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Devolver estructura de error si falla
         raise HTTPException(status_code=500, detail=f"Error al obtener donaciones (POST paginado): {e}")
 
 @router.get("", response_model=List[Dict])
-@cache(expire=600)  # 10 min
 def get_form_titles(
     campaign_id: Optional[str] = None,
     data_service: DataService = Depends(get_data_service),
@@ -81,6 +87,7 @@ def get_donations_by_form_title(
     # PAGINACIÓN: Añadir parámetros de query page_size y offset
     page_size: Optional[int] = Query(50, ge=1, le=100), # Valor por defecto 50, mínimo 1, máximo 100
     offset: Optional[int] = Query(0, ge=0),            # Valor por defecto 0, mínimo 0
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (paginación por cursor; ignora offset)"),
     data_service: DataService = Depends(get_data_service),
     current_user: str = Depends(get_current_user)
 ) -> Dict[str, Any]: # El tipo de retorno sigue siendo Dict para flexibilidad interna
@@ -92,11 +99,38 @@ def get_donations_by_form_title(
             start_date=start_date,
             end_date=end_date,
             page_size=page_size,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         # PAGINACIÓN: Devolver directamente el resultado del servicio
         return result
     except HTTPException as http_exc:
         raise http_exc
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener donaciones (GET paginado): {e}")
+
+@router.get("/donations/export")
+def export_donations_by_form_title(
+    form_title_id: List[str] = Query(..., alias="form_title_id"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    data_service: DataService = Depends(get_data_service),
+    current_user: str = Depends(get_current_user)
+):
+    """Todas las donaciones de los form titles (CSV o NDJSON), por lotes. Requiere Supabase."""
+    try:
+        batches = data_service.iter_donation_export_batches(
+            "form_titles", list(dict.fromkeys(form_title_id)), start_date, end_date
+        )
+    except CircuitOpenError:
+        raise  # 503 (handler en main.py)
+    except ExportBusyError:
+        raise  # 429 (handler en main.py)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar donaciones (form titles): {e}")
+    return donation_export_response(batches, format, "form_titles")
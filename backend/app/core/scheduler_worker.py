@@ -1,13 +1,24 @@
 """
 Email Scheduler Worker
 Uses APScheduler to check for pending scheduled campaigns and launch them automatically.
+
+Every uvicorn worker starts its own scheduler, so each job runs under a lock
+shared by all workers (cache_store.store_lock): only one worker launches
+campaigns or runs the data sync at a time; the others skip that tick.
 """
 import asyncio
+import os
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import traceback
 
+from backend.app.services.cache_store import store_lock
+
+# TTL de los locks: cubren una ejecución normal y se liberan solos si el worker muere con ellos
+CAMPAIGN_LAUNCH_LOCK_SECONDS = int(os.getenv("CAMPAIGN_LAUNCH_LOCK_SECONDS", "120"))
+DATA_SYNC_LOCK_SECONDS = int(os.getenv("DATA_SYNC_LOCK_SECONDS", "1800"))
+
 # Import will be done at runtime to avoid circular imports
 _scheduler: AsyncIOScheduler = None
 
@@ -23,6 +34,13 @@ async def check_and_launch_scheduled_campaigns():
     Check for campaigns with status='Scheduled' and scheduled_at <= now.
     Launch each one by calling the existing run_campaign_task.
     """
+    with store_lock("campaign_launcher", CAMPAIGN_LAUNCH_LOCK_SECONDS) as acquired:
+        if not acquired:
+            return  # otro worker está revisando las campañas programadas
+        await _launch_scheduled_campaigns()
+
+
+async def _launch_scheduled_campaigns():
     try:
         # Import here to avoid circular imports
         from backend.app.services.email_sender_service import get_email_sender_service
@@ -50,8 +68,10 @@ async def check_and_launch_scheduled_campaigns():
                 
                 print(f"[Scheduler Worker] Launching campaign: {campaign_id}")
                 
-                # Mark as launching first (prevents duplicate launches)
-                service.mark_campaign_launching(campaign_id)
+                # Claim it first: only one worker gets Scheduled -> Sending (prevents duplicate launches)
+                if service.mark_campaign_launching(campaign_id) is None:
+                    print(f"[Scheduler Worker] Campaign {campaign_id} already launched elsewhere, skipping")
+                    continue
                 
                 # Run the campaign task in a thread to not block
                 # Since run_campaign_task is synchronous, we run it in executor
@@ -74,6 +94,14 @@ async def run_data_sync():
     Run the Airtable -> Supabase synchronization.
     Runs in an executor because it's synchronous.
     """
+    with store_lock("data_sync", DATA_SYNC_LOCK_SECONDS) as acquired:
+        if not acquired:
+            print("[Scheduler Worker] Data Sync already running in another worker, skipping")
+            return
+        await _run_data_sync()
+
+
+async def _run_data_sync():
     print("[Scheduler Worker] 🔄 Starting Data Sync (Airtable -> Supabase)...")
     try:
         from backend.app.scripts.incremental_sync import run_sync
@@ -82,6 +110,11 @@ async def run_data_sync():
         await loop.run_in_executor(None, run_sync)
         
         print("[Scheduler Worker] ✅ Data Sync finished successfully")
+
+        # Widgets caros del dashboard: se revalidan ahora, no en la próxima petición
+        from backend.app.services.dashboard_metrics import costa_rica_today
+        from backend.app.services.data_service import get_data_service
+        await loop.run_in_executor(None, get_data_service().warm_dashboard_widgets, costa_rica_today())
     except Exception as e:
         print(f"[Scheduler Worker] ❌ Error in Data Sync: {e}")
         traceback.print_exc()
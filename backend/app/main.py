@@ -1,10 +1,12 @@
 # --- File: backend/app/main.py (Con Caching Activado) ---
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 # ✅ 1. IMPORTA las herramientas necesarias para el caché y el 'lifespan'
+import threading
 from contextlib import asynccontextmanager
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
+from starlette.concurrency import run_in_threadpool
 
 from backend.app.api.v1.endpoints import (
     auth_sqlite,
@@ -17,7 +19,8 @@ from backend.app.api.v1.endpoints import (
     websockets,
     scheduler,
     templates,  # Added for email templates
-    template_search  # Smart template search via n8n
+    template_search,  # Smart template search via n8n
+    admin  # Query metrics / slow query log
 )
 from backend.app.api.v1.endpoints import campaigns_fast
 from backend.app.api.v1.endpoints.search import router as search_router
@@ -25,6 +28,23 @@ from backend.app.api.v1.endpoints.analytics import router as analytics_router
 
 # ✅ Import email scheduler worker
 from backend.app.core.scheduler_worker import start_scheduler, stop_scheduler
+from backend.app.services.airtable_rate_limiter import get_airtable_governor
+from backend.app.services.cache_store import get_fastapi_cache_backend
+from backend.app.services.async_supabase_service import get_async_supabase_service
+from backend.app.services.circuit_breaker import CircuitOpenError, get_circuit_metrics
+from backend.app.services.data_service import get_data_service
+from backend.app.services.donation_export import ExportBusyError
+from backend.app.services.dashboard_metrics import costa_rica_today
+from backend.app.services.single_flight import get_single_flight
+from backend.app.services.result_cache import get_result_cache
+from backend.app.services.db_pool import get_supabase_pool
+from backend.app.services.email_sender_service import get_email_sender_service
+
+def _warm_dashboard_widgets():
+    try:
+        get_data_service().warm_dashboard_widgets(costa_rica_today())
+    except Exception as e:
+        print(f"WARNING: Could not warm dashboard widgets: {e}")
 
 # ✅ 2. DEFINE el 'lifespan' de la aplicación
 @asynccontextmanager
@@ -34,17 +54,46 @@ async def lifespan(app: FastAPI):
     El código antes del 'yield' se ejecuta al arrancar.
     El código después del 'yield' se ejecuta al apagar.
     """
-    # Inicializa el caché usando una memoria interna simple.
-    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    # Inicializa el caché: en memoria con un worker, compartido (sqlite/redis) entre workers (ver cache_store.py)
+    FastAPICache.init(get_fastapi_cache_backend(), prefix="fastapi-cache")
     print("Sistema de caché inicializado.")
     
     # ✅ Start email scheduler worker
     start_scheduler()
+
+    # ✅ Pool sync de Supabase pre-calentado: abrir conexiones (auth de pgbouncer) no lo paga la primera petición
+    supabase_pool = None
+    try:
+        supabase_pool = get_supabase_pool()
+        opened = await run_in_threadpool(supabase_pool.prewarm)
+        print(f"Supabase pool pre-warmed with {opened} connection(s).")
+    except Exception as e:
+        print(f"WARNING: Could not pre-warm Supabase pool at startup: {e}")
+
+    # ✅ Top donors / sources calientes antes de la primera petición (en segundo plano)
+    threading.Thread(target=_warm_dashboard_widgets, name="dashboard-warmup", daemon=True).start()
+
+    # ✅ Pool async de Supabase para las rutas async (None si psycopg 3 no está instalado)
+    async_supabase = get_async_supabase_service()
+    if async_supabase:
+        try:
+            await async_supabase.open()
+        except Exception as e:
+            print(f"WARNING: Could not open Supabase async pool at startup: {e}")
     
     yield
     
     # ✅ Stop email scheduler worker
     stop_scheduler()
+    if async_supabase:
+        await async_supabase.close()
+    if supabase_pool:
+        # Progreso de campañas aún en cola antes de cerrar el pool
+        try:
+            get_email_sender_service().flush_campaign_updates()
+        except Exception as e:
+            print(f"WARNING: Could not flush queued campaign updates: {e}")
+        supabase_pool.closeall()
     print("Sistema de caché detenido.")
 
 # ✅ 3. PASA el 'lifespan' a la instancia de FastAPI
@@ -83,6 +132,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Backend caído y sin fallback (circuito abierto): 503 en vez de 500, con Retry-After
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(ExportBusyError)
+async def export_busy_handler(request: Request, exc: ExportBusyError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
+
 # --- Registro de routers (sin cambios) ---
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboard"])
 app.include_router(contacts.router, prefix="/api/v1/contacts", tags=["contacts"])
@@ -98,9 +165,48 @@ app.include_router(scheduler.router, prefix="/api/v1")
 app.include_router(analytics_router, prefix="/api/v1/analytics", tags=["analytics"])
 app.include_router(templates.router, prefix="/api/v1", tags=["templates"])  # Email templates
 app.include_router(template_search.router, prefix="/api/v1", tags=["template-search"])  # Smart template search
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])  # Query metrics (admin only)
 
 # --- Health Check Endpoint (for Docker) ---
 @app.get("/health", tags=["health"])
 async def health_check():
     """Health check endpoint for Docker container monitoring."""
-    return {"status": "healthy", "version": "1.0.0"}
\ No newline at end of file
+    return {"status": "healthy", "version": "1.0.0"}
+
+
+@app.get("/health/airtable", tags=["health"])
+async def airtable_rate_metrics():
+    """Queue wait metrics of the shared Airtable rate governor, per priority class."""
+    return get_airtable_governor().get_metrics()
+
+
+@app.get("/health/circuits", tags=["health"])
+async def circuit_breaker_metrics():
+    """State of the Supabase/Airtable circuit breakers and the last-good result cache."""
+    metrics = get_circuit_metrics()
+    try:
+        metrics["stale_cache"] = get_data_service().stale_results.get_metrics()
+    except Exception as e:
+        metrics["stale_cache"] = {"error": str(e)}
+    return metrics
+
+
+@app.get("/health/single-flight", tags=["health"])
+async def single_flight_metrics():
+    """Identical DataService calls coalesced into one in-flight execution, per method."""
+    return get_single_flight().get_metrics()
+
+
+@app.get("/health/result-cache", tags=["health"])
+async def result_cache_metrics():
+    """Hits/misses of the sync-watermark result cache of DataService."""
+    return get_result_cache().get_metrics()
+
+
+@app.get("/health/db", tags=["health"])
+async def supabase_pool_metrics():
+    """Gauges of the shared Supabase connection pool (in use, waiters, wait times)."""
+    try:
+        return get_supabase_pool().get_metrics()
+    except ValueError as e:
+        return {"error": str(e)}
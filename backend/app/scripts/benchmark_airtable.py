@@ -0,0 +1,107 @@
+"""
+Benchmark of the Airtable code paths against the local FakeAirtable (no network).
+
+Examples:
+    python -m backend.app.scripts.benchmark_airtable --donors 5000 --latency 0.15
+    python -m backend.app.scripts.benchmark_airtable --base-file snapshot.json --rate 5
+    python -m backend.app.scripts.benchmark_airtable --record snapshot.json   # needs real credentials
+
+Each scenario reports wall time, Airtable requests and records served. The
+process-wide rate governor stays active, so timings include its queueing
+unless --rate 0 is passed.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Airtable fallback and sync paths offline.")
+    parser.add_argument("--donors", type=int, default=2000, help="Synthetic base size (donors)")
+    parser.add_argument("--campaigns", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-file", help="Replay a base recorded with --record instead of generating one")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per Airtable request")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests/second per base (0 = unlimited)")
+    parser.add_argument("--reject", action="store_true", help="Answer 429 instead of delaying over-limit requests")
+    parser.add_argument("--record", metavar="PATH", help="Record the real base (AIRTABLE_* env) to PATH and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+
+    if args.record:
+        from pyairtable import Api
+        from backend.app.scripts.fake_airtable import record_base
+        record_base(Api(os.environ["AIRTABLE_API_KEY"]), os.environ["AIRTABLE_BASE_ID"], args.record)
+        return
+
+    # El servicio y los scripts de sync exigen estas variables al importarse
+    os.environ.setdefault("AIRTABLE_API_KEY", "fake")
+    os.environ.setdefault("AIRTABLE_BASE_ID", "appFAKEBASE00000")
+    os.environ.setdefault("SUPABASE_DATABASE_URL", "postgresql://fake")
+    if args.rate <= 0:
+        os.environ["AIRTABLE_REQUESTS_PER_SECOND"] = "1000000"
+
+    from backend.app.scripts.fake_airtable import FakeAirtable, generate_base
+    from backend.app.services.airtable_service import AirtableService
+    from backend.app.scripts import incremental_sync
+
+    fake_options = dict(latency=args.latency, rate_limit=args.rate or None,
+                        on_rate_limit="reject" if args.reject else "delay")
+    if args.base_file:
+        fake = FakeAirtable.from_file(args.base_file, **fake_options)
+    else:
+        fake = FakeAirtable(generate_base(donors=args.donors, campaigns=args.campaigns, seed=args.seed), **fake_options)
+
+    service = AirtableService()
+    fake.install(service.api)
+    fake.install(incremental_sync.api)
+
+    campaigns = fake.tables["Campaigns"]
+    emails = fake.tables["Emails"]
+    sample_email = emails[0]["fields"]["Email"] if emails else "nobody@example.com"
+    campaign_id = campaigns[0]["id"] if campaigns else "recMissing"
+    source = campaigns[0]["fields"].get("Source", "Facebook") if campaigns else "Facebook"
+    today = datetime.now().date()
+    month_start = (today - timedelta(days=30)).isoformat()
+
+    scenarios = [
+        ("get_airtable_data_by_email", lambda: service.get_airtable_data_by_email(sample_email)),
+        ("get_campaign_stats (rollups)", lambda: service.get_campaign_stats(campaign_id)),
+        ("get_campaign_stats (30 days)", lambda: service.get_campaign_stats(campaign_id, month_start, today.isoformat())),
+        ("get_source_stats (30 days)", lambda: service.get_source_stats(source, month_start, today.isoformat())),
+        ("get_campaign_donations (page 1)", lambda: service.get_campaign_donations(campaign_id)),
+        ("get_monthly_source_breakdown", lambda: service.get_monthly_source_breakdown(today - timedelta(days=30), today)),
+        ("get_top_donors_stats", lambda: service.get_top_donors_stats(10)),
+        ("get_funnel_stats", lambda: service.get_funnel_stats()),
+        ("get_campaign_contacts (USA)", lambda: service.get_campaign_contacts("USA", False)),
+        ("autocomplete_email", lambda: service.autocomplete_email(sample_email[:4])),
+        ("sync: full fetch Donations", lambda: incremental_sync.fetch_modified_records(incremental_sync.TABLE_DONATIONS, None)),
+        ("sync: incremental fetch Donors", lambda: incremental_sync.fetch_modified_records(
+            incremental_sync.TABLE_DONORS, datetime.utcnow() - timedelta(days=1))),
+    ]
+
+    print(f"\n📊 Fake base: {', '.join(f'{name}={len(fake.tables[name])}' for name in ('Campaigns', 'Form Titles', 'Donors', 'Emails', 'Donations'))}")
+    print(f"   latency={args.latency}s rate={args.rate or 'unlimited'}/s\n")
+    print(f"{'scenario':<36}{'seconds':>10}{'requests':>10}{'records':>10}{'429/wait':>10}")
+    for name, run in scenarios:
+        fake.reset_stats()
+        started = time.perf_counter()
+        try:
+            run()
+            elapsed = f"{time.perf_counter() - started:.3f}"
+        except Exception as e:
+            elapsed = f"ERR {e.__class__.__name__}"
+        stats = fake.stats
+        print(f"{name:<36}{elapsed:>10}{stats['requests']:>10}{stats['records_served']:>10}{stats['rate_limited']:>10}")
+
+
+if __name__ == "__main__":
+    main()
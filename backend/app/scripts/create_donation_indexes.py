@@ -0,0 +1,73 @@
+"""
+Script to create the donations local-date columns and indexes in Supabase.
+
+- local_date / local_hour: donation_date in Costa Rica time, as STORED generated
+  columns. Postgres fills them on every INSERT/UPDATE, so the incremental sync and
+  migrate_to_supabase keep them current without code changes, and date filters
+  become index range scans instead of evaluating AT TIME ZONE on every row.
+- Keyset (cursor) pagination orders by (donation_date DESC, airtable_id DESC) within
+  a form title, so each page is an index range scan instead of OFFSET + discard.
+"""
+import psycopg2
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# timezone(text, timestamptz) es IMMUTABLE, así que puede usarse en columnas generadas
+DONATION_LOCAL_COLUMNS = [
+    ("local_date",
+     "date GENERATED ALWAYS AS ((donation_date AT TIME ZONE 'America/Costa_Rica')::date) STORED"),
+    ("local_hour",
+     "smallint GENERATED ALWAYS AS (EXTRACT(HOUR FROM donation_date AT TIME ZONE 'America/Costa_Rica')::smallint) STORED"),
+]
+
+DONATION_INDEXES = [
+    # Stats y listados por form title / campaña / fuente con rango de fechas
+    ("idx_donations_form_title_local_date",
+     "ON donations (form_title_id, local_date) INCLUDE (amount)"),
+    # Resumen por fuente, tendencia horaria (un día) sin filtro de form title
+    ("idx_donations_local_date",
+     "ON donations (local_date, local_hour) INCLUDE (amount)"),
+    # Listados por form title / campaña / fuente: seek dentro de cada form title
+    ("idx_donations_form_title_date_id",
+     "ON donations (form_title_id, donation_date DESC, airtable_id DESC)"),
+    # Orden global (seek sin filtro de form title)
+    ("idx_donations_date_id",
+     "ON donations (donation_date DESC, airtable_id DESC)"),
+]
+
+def create_donation_indexes():
+    """Add the local-date columns and create the donations indexes (CONCURRENTLY)"""
+    db_url = os.getenv("SUPABASE_DATABASE_URL")
+    if not db_url:
+        print("❌ SUPABASE_DATABASE_URL not found in .env")
+        return False
+
+    conn = psycopg2.connect(db_url)
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    try:
+        for name, definition in DONATION_LOCAL_COLUMNS:
+            # Añadir una columna STORED reescribe la tabla (lock exclusivo): correr fuera de horas pico
+            print(f"🛠️ Adding column donations.{name} (if missing)...")
+            cur.execute(f"ALTER TABLE donations ADD COLUMN IF NOT EXISTS {name} {definition}")
+
+        for name, definition in DONATION_INDEXES:
+            print(f"📊 Creating index {name}...")
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        cur.execute("ANALYZE donations")
+        print("✅ Donation columns and indexes created successfully!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    create_donation_indexes()
@@ -0,0 +1,53 @@
+"""
+Script to create the donor_emails lookup table in Supabase and backfill it
+from donors.emails. After this, incremental_sync keeps it current.
+"""
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from backend.app.services.donor_emails import (
+    CREATE_DONOR_EMAILS_QUERY,
+    CREATE_DONOR_EMAILS_INDEX_QUERY,
+    rebuild_donor_emails,
+)
+
+load_dotenv()
+
+def create_donor_emails_table():
+    """Create the donor_emails table and fill it from donors.emails"""
+    db_url = os.getenv("SUPABASE_DATABASE_URL")
+    if not db_url:
+        print("❌ SUPABASE_DATABASE_URL not found in .env")
+        return False
+
+    conn = psycopg2.connect(db_url)
+    cur = conn.cursor()
+
+    try:
+        print("🛠️ Creating 'donor_emails' table...")
+        cur.execute(CREATE_DONOR_EMAILS_QUERY)
+        cur.execute(CREATE_DONOR_EMAILS_INDEX_QUERY)
+        conn.commit()
+
+        print("📇 Backfilling donor_emails from donors.emails...")
+        rebuild_donor_emails(cur, conn)
+        cur.execute("ANALYZE donor_emails")
+        conn.commit()
+        print("✅ Table 'donor_emails' created and backfilled!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error creating donor_emails: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    create_donor_emails_table()
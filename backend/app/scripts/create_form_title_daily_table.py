@@ -0,0 +1,49 @@
+"""
+Script to create the form_title_daily rollup table in Supabase and backfill it.
+Requires the donations.local_date column (run create_donation_indexes.py first).
+After this, incremental_sync keeps the rollup current.
+"""
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from backend.app.services.form_title_daily import CREATE_FORM_TITLE_DAILY_QUERY, rebuild_form_title_daily
+
+load_dotenv()
+
+def create_form_title_daily_table():
+    """Create the form_title_daily table and fill it from donations"""
+    db_url = os.getenv("SUPABASE_DATABASE_URL")
+    if not db_url:
+        print("❌ SUPABASE_DATABASE_URL not found in .env")
+        return False
+
+    conn = psycopg2.connect(db_url)
+    cur = conn.cursor()
+
+    try:
+        print("🛠️ Creating 'form_title_daily' table...")
+        cur.execute(CREATE_FORM_TITLE_DAILY_QUERY)
+        conn.commit()
+
+        print("📊 Backfilling form_title_daily from donations...")
+        rebuild_form_title_daily(cur, conn)
+        cur.execute("ANALYZE form_title_daily")
+        conn.commit()
+        print("✅ Table 'form_title_daily' created and backfilled!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error creating form_title_daily: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    create_form_title_daily_table()
@@ -0,0 +1,526 @@
+"""
+Fake Airtable
+Local stand-in for the Airtable REST API, for benchmarking and load-testing the
+Airtable code paths (AirtableService fallbacks, incremental_sync,
+migrate_to_supabase) with no network.
+
+- generate_base(): synthetic base of configurable size with the tables and
+  fields this app uses (Campaigns, Form Titles, Donors, Emails, Donations).
+- record_base() / FakeAirtable.from_file(): record a real base to JSON once and
+  replay it offline.
+- FakeAirtable.install(api): mounts a requests transport adapter on a
+  pyairtable Api session. It serves list/get/create requests with pagination,
+  fields, sort, maxRecords and the filterByFormula subset the app uses, plus a
+  simulated per-request latency and a per-base rate limit.
+"""
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Mismos IDs de tabla que incremental_sync / migrate_to_supabase
+TABLE_IDS = {
+    "Campaigns": "tblkqsGw01v7E0LMh",
+    "Form Titles": "tblatGFOw5214wSw9",
+    "Donors": "tblU6V0pLJ1rS4aTX",
+    "Emails": "tbl709FbsHC58gvJc",
+    "Donations": "tblF77oj9JmHAoJ5M",
+}
+
+AIRTABLE_URL_PREFIX = "https://api.airtable.com/"
+MAX_PAGE_SIZE = 100
+
+
+# ==========================================
+# FORMULA EVALUATOR (subset used by the app)
+# ==========================================
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<field>\{[^}]*\})
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+      | (?P<op>!=|<=|>=|=|<|>|&|,|\(|\))
+    )""", re.VERBOSE)
+
+
+def _tokenize(formula: str) -> List[tuple]:
+    tokens, pos = [], 0
+    formula = formula.rstrip()
+    while pos < len(formula):
+        match = _TOKEN_RE.match(formula, pos)
+        if not match:
+            raise ValueError(f"Unsupported formula near: {formula[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "field":
+            value = value[1:-1]
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def _parse(tokens: List[tuple]):
+    """Recursive descent -> AST de tuplas: ('lit', v) | ('field', name) | ('call', fn, args) | ('op', op, a, b)."""
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take(expected=None):
+        nonlocal pos
+        token = peek()
+        if expected and token[1] != expected:
+            raise ValueError(f"Expected {expected!r}, got {token[1]!r}")
+        pos += 1
+        return token
+
+    def comparison():
+        left = concat()
+        while peek()[0] == "op" and peek()[1] in ("=", "!=", "<", ">", "<=", ">="):
+            op = take()[1]
+            left = ("op", op, left, concat())
+        return left
+
+    def concat():
+        left = primary()
+        while peek() == ("op", "&"):
+            take()
+            left = ("op", "&", left, primary())
+        return left
+
+    def primary():
+        kind, value = take()
+        if kind in ("string", "number"):
+            return ("lit", value)
+        if kind == "field":
+            return ("field", value)
+        if kind == "name":
+            take("(")
+            args = []
+            if peek() != ("op", ")"):
+                args.append(comparison())
+                while peek() == ("op", ","):
+                    take()
+                    args.append(comparison())
+            take(")")
+            return ("call", value.upper(), args)
+        if (kind, value) == ("op", "("):
+            inner = comparison()
+            take(")")
+            return inner
+        raise ValueError(f"Unexpected token {value!r}")
+
+    tree = comparison()
+    if pos != len(tokens):
+        raise ValueError("Trailing tokens in formula")
+    return tree
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    text = str(value).replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(text)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _cell(value: Any) -> Any:
+    """Valor de celda como lo ve una fórmula de Airtable."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return value
+
+
+def _equals(a: Any, b: Any) -> bool:
+    numeric = (int, float)
+    # Checkbox marcado = 1 (bool es int); vacío = ''
+    if isinstance(a, numeric) and isinstance(b, numeric):
+        return a == b
+    return str(a) == str(b)
+
+
+def _evaluate(node, record: Dict[str, Any]) -> Any:
+    kind = node[0]
+    if kind == "lit":
+        return node[1]
+    if kind == "field":
+        return _cell(record.get("fields", {}).get(node[1]))
+    if kind == "op":
+        _, op, left, right = node
+        a, b = _evaluate(left, record), _evaluate(right, record)
+        if op == "&":
+            return f"{a}{b}"
+        if op == "=":
+            return _equals(a, b)
+        if op == "!=":
+            return not _equals(a, b)
+        return {"<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+
+    _, fn, args = node
+    values = [_evaluate(arg, record) for arg in args]
+    if fn == "AND":
+        return all(values)
+    if fn == "OR":
+        return any(values)
+    if fn == "NOT":
+        return not values[0]
+    if fn == "RECORD_ID":
+        return record["id"]
+    if fn == "BLANK":
+        return ""
+    if fn in ("TRUE", "FALSE"):
+        return fn == "TRUE"
+    if fn == "LOWER":
+        return str(values[0]).lower()
+    if fn in ("SEARCH", "FIND"):
+        haystack = str(values[1])
+        return haystack.find(str(values[0])) + 1
+    if fn == "DATETIME_PARSE":
+        return _to_datetime(values[0])
+    if fn in ("IS_AFTER", "IS_BEFORE", "IS_SAME"):
+        a, b = _to_datetime(values[0]), _to_datetime(values[1])
+        if a is None or b is None:
+            return False
+        if fn == "IS_AFTER":
+            return a > b
+        if fn == "IS_BEFORE":
+            return a < b
+        unit = str(values[2]).lower() if len(values) > 2 else None
+        return a.date() == b.date() if unit == "day" else a == b
+    raise ValueError(f"Unsupported formula function: {fn}")
+
+
+def compile_formula(formula: str):
+    """Devuelve un predicado record -> bool para la fórmula."""
+    tree = _parse(_tokenize(formula))
+    return lambda record: bool(_evaluate(tree, record))
+
+
+# ==========================================
+# SYNTHETIC BASE GENERATOR
+# ==========================================
+
+FIRST_NAMES = ["Ana", "Luis", "Maria", "Jose", "Carla", "Pedro", "Sofia", "Diego", "Laura", "Pablo"]
+LAST_NAMES = ["Mora", "Rojas", "Vargas", "Jimenez", "Castro", "Solano", "Chaves", "Brenes"]
+SOURCES = ["Big Campaign", "Facebook", "Funnel", "Other"]
+DONOR_STAGES = ["Funnel", "Funnel", "Pending Approval", "Big Campaign", "Big Campaign", "Inactive"]
+DONOR_STATUSES = [None, None, "Active", "Unsubscribed", "Final Check", "Potential Duplicate"]
+REGIONS = ["USA", "USA", "EUR", ""]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def generate_base(
+    donors: int = 2000,
+    campaigns: int = 12,
+    form_titles_per_campaign: int = 4,
+    max_donations_per_donor: int = 6,
+    days: int = 365,
+    seed: int = 7,
+    now: Optional[datetime] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Base sintética con los campos que usan AirtableService y los scripts de sync,
+    incluidos links bidireccionales, rollups, lookups, createdTime y 'Last Modified'.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+
+    def record_id(prefix: str, n: int) -> str:
+        return f"rec{prefix}{n:013d}"
+
+    def moment_in_range() -> datetime:
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    def new_record(prefix: str, n: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+        created = moment_in_range()
+        fields["Last Modified"] = _iso(created + (now - created) * rng.random())
+        return {"id": record_id(prefix, n), "createdTime": _iso(created), "fields": fields}
+
+    campaign_records = [
+        new_record("C", i, {"Name": f"Campaign {i}", "Source": SOURCES[i % len(SOURCES)],
+                            "Total": 0.0, "Amount of donations": 0})
+        for i in range(campaigns)
+    ]
+    form_title_records = []
+    for campaign in campaign_records:
+        for _ in range(form_titles_per_campaign):
+            n = len(form_title_records)
+            form_title_records.append(new_record("F", n, {
+                "Name": f"{campaign['fields']['Name']} - Form {n}", "Campaign": [campaign["id"]],
+                "Donations": [], "Total": 0.0, "Amount of donations": 0,
+            }))
+
+    donor_records, email_records, donation_records = [], [], []
+    for i in range(donors):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        stage, status, region = rng.choice(DONOR_STAGES), rng.choice(DONOR_STATUSES), rng.choice(REGIONS)
+        donor = new_record("D", i, {
+            "Name": first, "Last Name": last, "Stage": stage, "Region": region,
+            "Emails": [], "Donations": [],
+        })
+        if status:
+            donor["fields"]["Status"] = status
+        if stage == "Funnel":
+            donor["fields"]["Funnel Stage"] = f"Nurture (Stage {rng.randint(1, 12)})"
+        donor_records.append(donor)
+
+        for _ in range(1 if rng.random() < 0.85 else 2):
+            n = len(email_records)
+            email = new_record("E", n, {
+                "Email": f"{first}.{last}{n}@example.com".lower(), "Donor": [donor["id"]],
+                "Name": [first], "Last Name": [last], "Region": [region], "Stage (from Donor)": [stage],
+            })
+            if rng.random() < 0.05:
+                email["fields"]["Bounced Account"] = True
+            if rng.random() < 0.03:
+                email["fields"]["Not Sending"] = True
+            if rng.random() < 0.05:
+                email["fields"]["Exclude From Current Campaign"] = True
+            email_records.append(email)
+            donor["fields"]["Emails"].append(email["id"])
+
+        for _ in range(rng.randint(0, max_donations_per_donor)):
+            form_title = rng.choice(form_title_records)
+            amount = float(rng.choice([5, 10, 20, 25, 50, 100, 250]))
+            donation = new_record("N", len(donation_records), {
+                "Amount": amount, "Date": _iso(moment_in_range()),
+                "Donor": [donor["id"]], "Form Title": [form_title["id"]],
+            })
+            donation_records.append(donation)
+            donor["fields"]["Donations"].append(donation["id"])
+            form_title["fields"]["Donations"].append(donation["id"])
+            form_title["fields"]["Total"] += amount
+            form_title["fields"]["Amount of donations"] += 1
+
+    campaigns_by_id = {c["id"]: c for c in campaign_records}
+    for form_title in form_title_records:
+        campaign = campaigns_by_id[form_title["fields"]["Campaign"][0]]
+        campaign["fields"]["Total"] += form_title["fields"]["Total"]
+        campaign["fields"]["Amount of donations"] += form_title["fields"]["Amount of donations"]
+
+    return {
+        "Campaigns": campaign_records,
+        "Form Titles": form_title_records,
+        "Donors": donor_records,
+        "Emails": email_records,
+        "Donations": donation_records,
+    }
+
+
+def record_base(api, base_id: str, path: str, table_names: Optional[List[str]] = None) -> None:
+    """Descarga las tablas indicadas de una base real a un JSON reproducible con FakeAirtable.from_file()."""
+    snapshot = {}
+    for name in table_names or list(TABLE_IDS):
+        snapshot[name] = api.table(base_id, name).all()
+        print(f"📥 Recorded {len(snapshot[name])} records from {name}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+# ==========================================
+# TRANSPORT ADAPTER
+# ==========================================
+
+class FakeAirtable:
+    """Tablas en memoria + latencia y rate limit simulados; se monta en la sesión de pyairtable."""
+
+    def __init__(
+        self,
+        tables: Dict[str, List[Dict[str, Any]]],
+        latency: float = 0.0,
+        rate_limit: Optional[float] = 5.0,
+        on_rate_limit: str = "delay",
+        table_ids: Optional[Dict[str, str]] = None,
+    ):
+        if on_rate_limit not in ("delay", "reject"):
+            raise ValueError("on_rate_limit must be 'delay' or 'reject'")
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        for name, records in tables.items():
+            self.tables[name] = records
+            table_id = (table_ids or TABLE_IDS).get(name)
+            if table_id:
+                self.tables[table_id] = records
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.on_rate_limit = on_rate_limit
+        self._tokens = rate_limit or 0.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._formula_cache: Dict[str, Any] = {}
+        self.stats = {"requests": 0, "records_served": 0, "rate_limited": 0}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "FakeAirtable":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def install(self, api):
+        """Monta el adaptador en la sesión del pyairtable.Api (y lo devuelve)."""
+        api.session.mount(AIRTABLE_URL_PREFIX, FakeAirtableAdapter(self))
+        return api
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {"requests": 0, "records_served": 0, "rate_limited": 0}
+
+    def _throttle(self) -> bool:
+        """Token bucket por base. Devuelve False si la petición debe recibir un 429."""
+        if not self.rate_limit:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._updated_at) * self.rate_limit)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                self.stats["rate_limited"] += 1
+                if self.on_rate_limit == "reject":
+                    return False
+                wait = (1 - self._tokens) / self.rate_limit
+            time.sleep(wait)
+
+    def _predicate(self, formula: Optional[str]):
+        if not formula:
+            return None
+        if formula not in self._formula_cache:
+            self._formula_cache[formula] = compile_formula(formula)
+        return self._formula_cache[formula]
+
+    def list_records(self, table: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        records = self.tables[table]
+        predicate = self._predicate(options.get("filterByFormula"))
+        if predicate:
+            records = [rec for rec in records if predicate(rec)]
+        for sort in reversed(options.get("sort") or []):
+            records = sorted(records, key=lambda rec: str(_cell(rec["fields"].get(sort["field"]))),
+                             reverse=sort.get("direction") == "desc")
+        if options.get("maxRecords"):
+            records = records[:int(options["maxRecords"])]
+
+        offset = int(options.get("offset") or 0)
+        page_size = min(int(options.get("pageSize") or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        page = records[offset:offset + page_size]
+        fields = options.get("fields")
+        payload: Dict[str, Any] = {"records": [self._project(rec, fields) for rec in page]}
+        if offset + page_size < len(records):
+            payload["offset"] = str(offset + page_size)
+        with self._lock:
+            self.stats["records_served"] += len(page)
+        return payload
+
+    @staticmethod
+    def _project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+        # Airtable omite los campos vacíos
+        values = {k: v for k, v in record["fields"].items()
+                  if (not fields or k in fields) and not (v is None or v is False or v == "" or v == [])}
+        return {"id": record["id"], "createdTime": record["createdTime"], "fields": values}
+
+    def handle(self, method: str, path_parts: List[str], query: Dict[str, Any], body: Optional[Dict[str, Any]]):
+        """Devuelve (status, payload) para /v0/{base}/{table}[/{record}|/listRecords]."""
+        if len(path_parts) < 3 or path_parts[0] != "v0":
+            return 404, {"error": "NOT_FOUND"}
+        table = path_parts[2]
+        if table not in self.tables:
+            return 404, {"error": {"type": "TABLE_NOT_FOUND"}}
+        extra = path_parts[3] if len(path_parts) > 3 else None
+
+        if method == "GET" and extra is None:
+            return 200, self.list_records(table, query)
+        if method == "POST" and extra == "listRecords":
+            return 200, self.list_records(table, body or {})
+        if method == "GET":
+            record = next((rec for rec in self.tables[table] if rec["id"] == extra), None)
+            if record is None:
+                return 404, {"error": "NOT_FOUND"}
+            return 200, self._project(record, None)
+        if method == "POST" and extra is None:
+            created = []
+            for item in (body or {}).get("records") or [body or {}]:
+                record = {
+                    "id": f"recZ{len(self.tables[table]):013d}",
+                    "createdTime": _iso(datetime.now(timezone.utc)),
+                    "fields": dict(item.get("fields", {})),
+                }
+                record["fields"]["Last Modified"] = record["createdTime"]
+                self.tables[table].append(record)
+                created.append(self._project(record, None))
+            return 200, {"records": created} if "records" in (body or {}) else created[0]
+        return 404, {"error": "NOT_FOUND"}
+
+
+def _query_to_options(query: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Convierte los query params de pyairtable (fields[], sort[0][field], ...) en opciones."""
+    options: Dict[str, Any] = {}
+    sort: Dict[int, Dict[str, str]] = {}
+    for key, values in query.items():
+        if key == "fields[]":
+            options["fields"] = values
+        elif key.startswith("sort["):
+            index, attr = re.findall(r"\[(\w+)\]", key)
+            sort.setdefault(int(index), {})[attr] = values[0]
+        else:
+            options[key] = values[0]
+    if sort:
+        options["sort"] = [sort[i] for i in sorted(sort)]
+    return options
+
+
+class FakeAirtableAdapter(BaseAdapter):
+    """Adaptador de requests que responde como la API REST de Airtable usando un FakeAirtable."""
+
+    def __init__(self, fake: FakeAirtable):
+        super().__init__()
+        self.fake = fake
+
+    def send(self, request, **kwargs):
+        fake = self.fake
+        with fake._lock:
+            fake.stats["requests"] += 1
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if not fake._throttle():
+            status, payload = 429, {"errors": [{"error": "RATE_LIMIT_REACHED"}]}
+        else:
+            parsed = urlparse(request.url)
+            path_parts = [unquote(part) for part in parsed.path.strip("/").split("/")]
+            body = json.loads(request.body) if request.body else None
+            try:
+                status, payload = fake.handle(request.method, path_parts,
+                                              _query_to_options(parse_qs(parsed.query)), body)
+            except ValueError as e:
+                status, payload = 422, {"error": {"type": "INVALID_FILTER_BY_FORMULA", "message": str(e)}}
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
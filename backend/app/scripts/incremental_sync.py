@@ -3,13 +3,20 @@ import os
 import sys
 import psycopg2
 from psycopg2.extras import execute_values
-from pyairtable import Api
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 import traceback
 
 # Adjust path to import from app
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from backend.app.services.airtable_rate_limiter import GovernedApi, PRIORITY_SYNC
+from backend.app.services.funnel_stats import get_funnel_stats_engine, classify_donor
+from backend.app.services.email_prefix_index import get_email_prefix_index
+from backend.app.services.sync_watermark import get_sync_watermark
+from backend.app.services.form_title_daily import donation_rollup_keys, refresh_donation_rollup, rollup_available
+from backend.app.services.donor_emails import donor_emails_available, refresh_donor_emails
 
 # Load environment variables
 load_dotenv()
@@ -30,7 +37,7 @@ api = None
 base = None
 
 if all([AIRTABLE_API_KEY, AIRTABLE_BASE_ID, SUPABASE_DB_URL]):
-    api = Api(AIRTABLE_API_KEY)
+    api = GovernedApi(AIRTABLE_API_KEY, priority=PRIORITY_SYNC)
     base = api.base(AIRTABLE_BASE_ID)
 else:
     print("❌ Error: Missing environment variables.")
@@ -102,6 +109,9 @@ def upsert_batch(cursor, conn, table_name, columns, data, conflict_col='airtable
         conn.rollback()
         print(f"❌ Error inserting into {table_name}: {e}")
         raise e
+    finally:
+        # Los lotes ya confirmados cambiaron la tabla: invalida los cachés derivados (conteos, etc.)
+        get_sync_watermark().bump(table_name)
 
 # --- Reusing logic from migrate_to_supabase.py for data mapping ---
 # We need to build ID maps dynamically, similar to the full migration but perhaps only for referenced items if possible.
@@ -189,6 +199,8 @@ def run_sync():
                     'bounced': fields.get('Bounced Account', False)
                 })
             upsert_batch(cursor, conn, 'emails', ['airtable_id', 'email', 'bounced'], pg_data)
+            # Refresh the in-memory autocomplete index with the changed addresses
+            get_email_prefix_index().apply_updates([(d['airtable_id'], d['email']) for d in pg_data])
         update_last_sync_time(cursor, conn, 'emails')
 
         # 4. Donors
@@ -243,7 +255,34 @@ def run_sync():
                     'status': status_val,
                     'funnel_stage': funnel_stage_val
                 })
-            upsert_batch(cursor, conn, 'donors', ['airtable_id', 'name', 'emails', 'region', 'stage', 'bounced', 'status', 'funnel_stage'], pg_data)
+            # Keep the in-memory funnel counters in step: diff old vs new bucket per donor
+            funnel_engine = get_funnel_stats_engine()
+            funnel_engine.begin_update()
+            try:
+                cursor.execute(
+                    "SELECT airtable_id, stage, status, region, funnel_stage FROM donors WHERE airtable_id = ANY(%s)",
+                    ([d['airtable_id'] for d in pg_data],)
+                )
+                old_buckets = {row[0]: classify_donor(row[1], row[2], row[3], row[4]) for row in cursor.fetchall()}
+
+                upsert_batch(cursor, conn, 'donors', ['airtable_id', 'name', 'emails', 'region', 'stage', 'bounced', 'status', 'funnel_stage'], pg_data)
+
+                funnel_engine.apply_changes(
+                    (old_buckets.get(d['airtable_id']), classify_donor(d['stage'], d['status'], d['region'], d['funnel_stage']))
+                    for d in pg_data
+                )
+            except Exception:
+                funnel_engine.invalidate()
+                raise
+            finally:
+                funnel_engine.end_update()
+
+            # Índice de búsqueda por email (si el upsert falló, el próximo sync vuelve a traer estos donantes)
+            if donor_emails_available(cursor):
+                refresh_donor_emails(cursor, conn, [d['airtable_id'] for d in pg_data])
+            else:
+                print("⚠️ Skipping donor_emails refresh: run scripts/create_donor_emails_table.py "
+                      "(email search scans donors.emails until then)")
         update_last_sync_time(cursor, conn, 'donors')
 
         # 5. Donations
@@ -278,7 +317,23 @@ def run_sync():
                     'donor_id': donor_uuid,
                     'form_title_id': form_uuid
                 })
-            upsert_batch(cursor, conn, 'donations', ['airtable_id', 'amount', 'donation_date', 'donor_id', 'form_title_id'], pg_data)
+            # Rollup form_title_daily: días que estas donaciones ocupaban antes y después del upsert
+            donation_ids = [d['airtable_id'] for d in pg_data]
+            rollup_ready = rollup_available(cursor)
+            if not rollup_ready:
+                print("⚠️ Skipping form_title_daily rollup: run scripts/create_donation_indexes.py and "
+                      "scripts/create_form_title_daily_table.py (campaign/source stats need it)")
+            touched = donation_rollup_keys(cursor, donation_ids, rollup_ready)
+            try:
+                upsert_batch(cursor, conn, 'donations', ['airtable_id', 'amount', 'donation_date', 'donor_id', 'form_title_id'], pg_data)
+            except Exception:
+                # Los lotes ya confirmados cambiaron esos días: se intenta igual, sin tapar el error del upsert
+                try:
+                    refresh_donation_rollup(cursor, conn, donation_ids, touched, rollup_ready)
+                except Exception as e_rollup:
+                    print(f"❌ Rollup refresh after failed donations upsert also failed: {e_rollup}")
+                raise
+            refresh_donation_rollup(cursor, conn, donation_ids, touched, rollup_ready)
         update_last_sync_time(cursor, conn, 'donations')
 
         print("✨ Incremental Sync Completed Successfully.")
@@ -2,13 +2,18 @@ import os
 import sys
 import psycopg2
 from psycopg2.extras import execute_values
-from pyairtable import Api
 from dotenv import load_dotenv
 from collections import defaultdict
 from datetime import datetime
 
 # Ajustar path para importar desde app si fuera necesario
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from backend.app.services.airtable_rate_limiter import GovernedApi, PRIORITY_SYNC
+from backend.app.services.form_title_daily import rebuild_form_title_daily
+from backend.app.services.donor_emails import donor_emails_available, rebuild_donor_emails
+from backend.app.services.result_cache import invalidate_all_results
 
 # Cargar variables de entorno
 load_dotenv()
@@ -29,7 +34,7 @@ api = None
 base = None
 
 if all([AIRTABLE_API_KEY, AIRTABLE_BASE_ID, SUPABASE_DB_URL]):
-    api = Api(AIRTABLE_API_KEY)
+    api = GovernedApi(AIRTABLE_API_KEY, priority=PRIORITY_SYNC)
     base = api.base(AIRTABLE_BASE_ID)
 else:
     print("❌ Error: Faltan variables de entorno.")
@@ -160,6 +165,8 @@ def run_migration():
         print("❌ Error: Faltan variables de entorno.")
         return
 
+    conn = None
+    cursor = None
     try:
         conn = psycopg2.connect(SUPABASE_DB_URL)
         cursor = conn.cursor()
@@ -338,11 +345,26 @@ def run_migration():
         # 4. Campaigns (Form Titles dependen de ellas)
         delete_obsolete_records(cursor, conn, 'campaigns', valid_campaign_ids)
 
+        # Rollup de stats e índice de emails: se recalculan completos tras cargar y limpiar
+        rebuild_form_title_daily(cursor, conn)
+        if donor_emails_available(cursor):
+            rebuild_donor_emails(cursor, conn)
+        else:
+            print("⚠️ Skipping donor_emails rebuild: run scripts/create_donor_emails_table.py")
+
         print("\n✨ Migración completada exitosamente.")
         
     except Exception as e:
         print(f"❌ Error durante la migración: {e}")
     finally:
+        # Se escribió sin pasar por el sync incremental: ningún resultado cacheado sigue
+        # valiendo (tampoco si la migración falló a mitad)
+        if cursor:
+            try:
+                conn.rollback()
+                invalidate_all_results(cursor)
+            except Exception as e_cache:
+                print(f"⚠️ Could not invalidate cached results: {e_cache}")
         if cursor: cursor.close()
         if conn: conn.close()
 
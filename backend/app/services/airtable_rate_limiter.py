@@ -0,0 +1,171 @@
+"""
+Airtable Rate Governor
+Token bucket shared by every Airtable client of the process (dashboard endpoints,
+incremental sync run by the scheduler, email campaigns).
+
+Airtable allows ~5 requests/second per base. Requests are served by priority
+class (interactive > campaign > sync) and the bulk classes cannot drain the
+bucket below a small reserve, so a dashboard request never queues behind a
+sync page.
+
+The bucket lives in the process: with N uvicorn workers (WEB_CONCURRENCY) each
+one gets AIRTABLE_REQUESTS_PER_SECOND / N, so together they stay under the
+per-base limit. migrate_to_supabase runs as its own process with its own bucket:
+run it off-peak or give it a lower AIRTABLE_REQUESTS_PER_SECOND.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pyairtable import Api
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_CAMPAIGN = "campaign"
+PRIORITY_SYNC = "sync"
+
+_PRIORITY_RANK = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_CAMPAIGN: 1,
+    PRIORITY_SYNC: 2,
+}
+
+# Límite de la base (todas las peticiones de todos los workers)
+AIRTABLE_REQUESTS_PER_SECOND = float(os.getenv("AIRTABLE_REQUESTS_PER_SECOND", "5"))
+# Workers de uvicorn que se reparten ese límite (como en cache_store.py)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1") or "1")
+# Tokens que solo pueden usar las peticiones interactivas
+AIRTABLE_INTERACTIVE_RESERVE = float(os.getenv("AIRTABLE_INTERACTIVE_RESERVE", "1"))
+
+
+def per_process_rate(base_rate: float = AIRTABLE_REQUESTS_PER_SECOND, workers: int = WEB_CONCURRENCY) -> float:
+    """Parte del límite de la base que le toca a cada worker."""
+    return base_rate / max(1, workers)
+
+
+AIRTABLE_PROCESS_REQUESTS_PER_SECOND = per_process_rate()
+
+
+class AirtableRateGovernor:
+    """Token bucket con cola de prioridad y métricas de espera por clase."""
+
+    def __init__(self, rate: float = AIRTABLE_PROCESS_REQUESTS_PER_SECOND, burst: Optional[float] = None,
+                 interactive_reserve: float = AIRTABLE_INTERACTIVE_RESERVE):
+        self.rate = rate
+        # Con muchos workers la tasa puede bajar de 1/s: el bucket admite al menos una petición
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.interactive_reserve = max(0.0, min(interactive_reserve, self.capacity - 1))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._waiters: list = []          # heap de (rank, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._metrics: Dict[str, Dict[str, float]] = {
+            name: {"requests": 0, "total_wait": 0.0, "max_wait": 0.0, "waiting": 0}
+            for name in _PRIORITY_RANK
+        }
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def acquire(self, priority: str = PRIORITY_INTERACTIVE) -> float:
+        """
+        Bloquea hasta obtener un token para una petición de la clase indicada.
+        Devuelve los segundos que se esperó en la cola.
+        """
+        if priority not in _PRIORITY_RANK:
+            raise ValueError(f"Unknown Airtable priority class: {priority}")
+
+        rank = _PRIORITY_RANK[priority]
+        # Las clases masivas deben dejar la reserva intacta tras consumir su token
+        needed = 1.0 if priority == PRIORITY_INTERACTIVE else 1.0 + self.interactive_reserve
+        ticket = (rank, next(self._seq))
+        started = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self._metrics[priority]["waiting"] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == ticket and self._tokens >= needed:
+                        self._tokens -= 1.0
+                        heapq.heappop(self._waiters)
+                        break
+                    missing = max(needed - self._tokens, 0.0)
+                    self._cond.wait(timeout=max(missing / self.rate, 0.005))
+            finally:
+                self._metrics[priority]["waiting"] -= 1
+                # Despertar al siguiente en la cola (puede haber tokens sobrantes)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            stats = self._metrics[priority]
+            stats["requests"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas de espera en cola por clase de prioridad (tiempos en ms)."""
+        with self._cond:
+            self._refill(time.monotonic())
+            classes = {}
+            for name, stats in self._metrics.items():
+                requests = int(stats["requests"])
+                classes[name] = {
+                    "requests": requests,
+                    "waiting": int(stats["waiting"]),
+                    "avg_wait_ms": round(stats["total_wait"] / requests * 1000, 2) if requests else 0.0,
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 2),
+                }
+            return {
+                "rate_per_second": self.rate,
+                "available_tokens": round(self._tokens, 2),
+                "classes": classes,
+            }
+
+
+class GovernedApi(Api):
+    """
+    pyairtable.Api que pide un token al governor antes de cada petición HTTP
+    (incluida cada página de table.all()).
+    """
+
+    def __init__(self, api_key: str, priority: str = PRIORITY_INTERACTIVE,
+                 governor: Optional[AirtableRateGovernor] = None, **kwargs: Any):
+        super().__init__(api_key, **kwargs)
+        self.priority = priority
+        self.governor = governor or get_airtable_governor()
+        self._local = threading.local()
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> Any:
+        # Api.request se llama a sí mismo al convertir un GET largo en POST: un solo token
+        if getattr(self._local, "holding", False):
+            return super().request(method, url, *args, **kwargs)
+        self.governor.acquire(self.priority)
+        self._local.holding = True
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            self._local.holding = False
+
+
+# Singleton instance
+_airtable_governor_instance = None
+_airtable_governor_lock = threading.Lock()
+
+def get_airtable_governor() -> AirtableRateGovernor:
+    """Get or create the process-wide AirtableRateGovernor"""
+    global _airtable_governor_instance
+    if _airtable_governor_instance is None:
+        with _airtable_governor_lock:
+            if _airtable_governor_instance is None:
+                _airtable_governor_instance = AirtableRateGovernor()
+    return _airtable_governor_instance
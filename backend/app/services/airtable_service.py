@@ -1,13 +1,24 @@
 import os
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from pyairtable import Api
-from typing import List, Dict, Optional, Any
-from datetime import datetime, time, timedelta, date
+from typing import List, Dict, Optional, Any, Iterator, Callable
+from datetime import datetime, time, timedelta, date, timezone
 from zoneinfo import ZoneInfo
 from collections import defaultdict
+from requests.exceptions import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import contextvars
+import heapq
+import threading
+import time as time_module
 import traceback
 
+from backend.app.services.airtable_rate_limiter import GovernedApi, PRIORITY_INTERACTIVE
+from backend.app.services.funnel_stats import (
+    build_funnel_stats, classify_donor, FUNNEL_STAGE, PENDING_APPROVAL_STAGE
+)
+
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
 load_dotenv(dotenv_path=os.path.abspath(dotenv_path))
 
@@ -55,17 +66,306 @@ DAILY_SUMMARIES_FIELDS = {
     "total_amount": "Total Amount Today",
     "count": "Donations Count Today"
 }
+# Campo de sistema "Last modified time" presente en todas las tablas (lo usa también incremental_sync)
+LAST_MODIFIED_FIELD = "Last Modified"
+
+# --- Lectura por lotes de RECORD_ID() ---
+# Cada lote cabe en una sola página de Airtable (máx. 100) y mantiene la fórmula corta.
+RECORD_ID_CHUNK_SIZE = int(os.getenv("AIRTABLE_RECORD_ID_CHUNK_SIZE", "50"))
+# Lotes en vuelo a la vez; Airtable admite ~5 peticiones/segundo por base.
+AIRTABLE_MAX_CONCURRENCY = int(os.getenv("AIRTABLE_MAX_CONCURRENCY", "4"))
+
+
+def record_id_formula(record_ids: List[str], extra_formula: Optional[str] = None) -> str:
+    """Fórmula OR(RECORD_ID()=...) para un lote de IDs, opcionalmente combinada con otra condición."""
+    id_formulas = [f"RECORD_ID() = '{rid}'" for rid in record_ids]
+    ids_formula = f"OR({', '.join(id_formulas)})"
+    return f"AND({ids_formula}, {extra_formula})" if extra_formula else ids_formula
+
+
+def batch_get_records(
+    table,
+    record_ids: List[str],
+    fields: Optional[List[str]] = None,
+    formula: Optional[str] = None,
+    chunk_size: int = RECORD_ID_CHUNK_SIZE,
+) -> List[Dict[str, Any]]:
+    """
+    Obtiene registros por ID dividiendo la lista en lotes acotados que se piden en paralelo.
+
+    Los IDs vacíos y duplicados se ignoran y el resultado respeta el orden de 'record_ids'.
+    'formula' permite filtrar además cada lote (p. ej. por fecha); los registros que no
+    la cumplen simplemente no aparecen.
+    """
+    unique_ids = list(dict.fromkeys(rid for rid in record_ids if rid))
+    if not unique_ids:
+        return []
+
+    chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+    options: Dict[str, Any] = {"fields": fields} if fields else {}
+
+    def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+        return table.all(formula=record_id_formula(chunk, formula), **options)
+
+    if len(chunks) == 1:
+        pages = [fetch_chunk(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(AIRTABLE_MAX_CONCURRENCY, len(chunks))) as executor:
+            pages = list(executor.map(fetch_chunk, chunks))
+
+    records_by_id = {rec["id"]: rec for page in pages for rec in page}
+    return [records_by_id[rid] for rid in unique_ids if rid in records_by_id]
+
+
+class EmailDonorIndex:
+    """
+    Índice en memoria email-record-id -> donor-record-id.
+
+    Se construye una sola vez descargando únicamente el link 'Emails' de los donantes
+    y luego se mantiene fresco pidiendo solo los donantes modificados desde la última
+    actualización (campo 'Last Modified'). Las escrituras llaman a invalidate() para
+    forzar el refresco incremental en la siguiente consulta.
+    """
+
+    # Margen para no perder registros modificados mientras corría el refresco anterior
+    REFRESH_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, donors_table, min_refresh_interval: int = 60):
+        self.donors_table = donors_table
+        self.min_refresh_interval = min_refresh_interval
+        self._email_to_donor: Dict[str, str] = {}
+        self._donor_to_emails: Dict[str, List[str]] = {}
+        self._synced_at: Optional[datetime] = None   # marca de agua (UTC) para el filtro Last Modified
+        self._checked_at: float = 0.0                # monotonic del último refresco
+        self._lock = threading.Lock()
+
+    def _apply(self, donor_id: str, email_ids: List[str]) -> None:
+        for old_email_id in self._donor_to_emails.pop(donor_id, []):
+            if self._email_to_donor.get(old_email_id) == donor_id:
+                del self._email_to_donor[old_email_id]
+        if email_ids:
+            self._donor_to_emails[donor_id] = list(email_ids)
+            for email_id in email_ids:
+                self._email_to_donor[email_id] = donor_id
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Construye el índice completo la primera vez y luego aplica solo los cambios.
+        Devuelve True si se consultó Airtable.
+        """
+        with self._lock:
+            if not force and self._synced_at and time_module.monotonic() - self._checked_at < self.min_refresh_interval:
+                return False
+
+            started_at = datetime.now(timezone.utc)
+            emails_field = DONORS_FIELDS["emails_link"]
+            if self._synced_at is None:
+                formula = f"NOT({{{emails_field}}} = '')"
+            else:
+                since = (self._synced_at - self.REFRESH_OVERLAP).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                formula = f"IS_AFTER({{{LAST_MODIFIED_FIELD}}}, '{since}')"
+
+            records = self.donors_table.all(formula=formula, fields=[emails_field])
+            for rec in records:
+                self._apply(rec["id"], rec.get("fields", {}).get(emails_field, []))
+
+            print(f"EmailDonorIndex: {'incremental' if self._synced_at else 'full'} refresh applied {len(records)} donors "
+                  f"({len(self._email_to_donor)} emails indexed).")
+            self._synced_at = started_at
+            self._checked_at = time_module.monotonic()
+            return True
+
+    def invalidate(self) -> None:
+        """Marca el índice como desactualizado; la próxima consulta hará un refresco incremental."""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def discard(self, email_id: str) -> None:
+        """Elimina una entrada que resultó apuntar a un donante inexistente."""
+        with self._lock:
+            donor_id = self._email_to_donor.pop(email_id, None)
+            if donor_id and email_id in self._donor_to_emails.get(donor_id, []):
+                self._donor_to_emails[donor_id].remove(email_id)
+
+    def get_donor_id(self, email_id: str) -> Optional[str]:
+        refreshed = self.refresh()
+        donor_id = self._email_to_donor.get(email_id)
+        if donor_id is None and not refreshed:
+            # Puede ser un email recién enlazado: un refresco incremental y reintento
+            self.refresh(force=True)
+            donor_id = self._email_to_donor.get(email_id)
+        return donor_id
+
+
+# --- Caché de dimensiones (Campaigns / Form Titles) ---
+# Recarga completa cada TTL (recoge borrados); entre medias solo se piden los registros modificados.
+DIMENSION_CACHE_TTL = int(os.getenv("AIRTABLE_DIMENSION_CACHE_TTL", "3600"))
+DIMENSION_REFRESH_INTERVAL = int(os.getenv("AIRTABLE_DIMENSION_REFRESH_INTERVAL", "60"))
+
+
+class AirtableDimensionCache:
+    """
+    Caché en memoria de las tablas Campaigns y Form Titles (cambian pocas veces al día).
+
+    Guarda nombre, fuente / campaña y createdTime de cada registro para que las
+    agregaciones de fallback resuelvan form title -> campaign -> source sin volver a
+    descargar ambas tablas. Se refresca de forma incremental con 'Last Modified'.
+    """
+
+    REFRESH_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, campaigns_table, form_titles_table,
+                 ttl: int = DIMENSION_CACHE_TTL, refresh_interval: int = DIMENSION_REFRESH_INTERVAL):
+        self.campaigns_table = campaigns_table
+        self.form_titles_table = form_titles_table
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._campaigns: Dict[str, Dict[str, Any]] = {}
+        self._form_titles: Dict[str, Dict[str, Any]] = {}
+        self._synced_at: Optional[datetime] = None   # marca de agua (UTC) para el filtro Last Modified
+        self._loaded_at: float = 0.0                 # monotonic de la última carga completa
+        self._checked_at: float = 0.0                # monotonic del último refresco
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _campaign_entry(rec: Dict[str, Any]) -> Dict[str, Any]:
+        fields = rec.get("fields", {})
+        return {
+            "id": rec["id"],
+            "name": fields.get(CAMPAIGNS_FIELDS["name"]),
+            "source": fields.get(CAMPAIGNS_FIELDS["source"]),
+            "createdTime": rec.get("createdTime"),
+        }
+
+    @staticmethod
+    def _form_title_entry(rec: Dict[str, Any]) -> Dict[str, Any]:
+        fields = rec.get("fields", {})
+        campaign_links = fields.get(FORM_TITLES_FIELDS["campaign_link"], [])
+        return {
+            "id": rec["id"],
+            "name": fields.get(FORM_TITLES_FIELDS["name"]),
+            "campaign_id": campaign_links[0] if campaign_links else None,
+            "createdTime": rec.get("createdTime"),
+        }
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Carga completa la primera vez (o al vencer el TTL) y luego solo los cambios.
+        Devuelve True si se consultó Airtable.
+        """
+        with self._lock:
+            now = time_module.monotonic()
+            full = self._synced_at is None or now - self._loaded_at >= self.ttl
+            if not full and not force and now - self._checked_at < self.refresh_interval:
+                return False
+
+            started_at = datetime.now(timezone.utc)
+            formula = None
+            if not full:
+                since = (self._synced_at - self.REFRESH_OVERLAP).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                formula = f"IS_AFTER({{{LAST_MODIFIED_FIELD}}}, '{since}')"
+
+            campaign_records = self.campaigns_table.all(
+                formula=formula, fields=[CAMPAIGNS_FIELDS["name"], CAMPAIGNS_FIELDS["source"]]
+            )
+            title_records = self.form_titles_table.all(
+                formula=formula, fields=[FORM_TITLES_FIELDS["name"], FORM_TITLES_FIELDS["campaign_link"]]
+            )
+
+            # En la carga completa se reemplaza todo (así desaparecen los registros borrados)
+            campaigns = {} if full else self._campaigns
+            form_titles = {} if full else self._form_titles
+            for rec in campaign_records:
+                campaigns[rec["id"]] = self._campaign_entry(rec)
+            for rec in title_records:
+                form_titles[rec["id"]] = self._form_title_entry(rec)
+            self._campaigns, self._form_titles = campaigns, form_titles
+
+            print(f"AirtableDimensionCache: {'full' if full else 'incremental'} refresh applied "
+                  f"{len(campaign_records)} campaigns / {len(title_records)} form titles.")
+            self._synced_at = started_at
+            self._checked_at = time_module.monotonic()
+            if full:
+                self._loaded_at = self._checked_at
+            return True
+
+    def invalidate(self) -> None:
+        """La próxima lectura hará un refresco incremental."""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def get_campaigns(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Campañas (id, name, source, createdTime), opcionalmente de una sola fuente."""
+        self.refresh()
+        with self._lock:
+            return [dict(c) for c in self._campaigns.values() if source is None or c["source"] == source]
+
+    def get_form_titles(self, campaign_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Form titles (id, name, campaign_id, createdTime), opcionalmente de ciertas campañas."""
+        self.refresh()
+        wanted = set(campaign_ids) if campaign_ids is not None else None
+        with self._lock:
+            return [dict(ft) for ft in self._form_titles.values() if wanted is None or ft["campaign_id"] in wanted]
+
+    def form_title_to_campaign(self) -> Dict[str, str]:
+        self.refresh()
+        with self._lock:
+            return {ft_id: ft["campaign_id"] for ft_id, ft in self._form_titles.items() if ft["campaign_id"]}
+
+    def campaign_to_source(self) -> Dict[str, str]:
+        self.refresh()
+        with self._lock:
+            return {cid: c["source"] for cid, c in self._campaigns.items() if c["source"]}
+
+
+def donation_date_range_formula(start_date: Optional[str] = None, end_date: Optional[str] = None) -> str:
+    """
+    Fórmula de Donations para un rango de fechas locales de Costa Rica (YYYY-MM-DD, ambos inclusive).
+    Excluye donaciones sin fecha.
+    """
+    date_field = f"{{{DONATIONS_FIELDS['date']}}}"
+    formula_parts = [f"NOT({date_field} = BLANK())"]
+    if start_date:
+        start_dt_local = datetime.combine(datetime.fromisoformat(start_date).date(), time.min, tzinfo=COSTA_RICA_TZ)
+        formula_parts.append(f"IS_AFTER({date_field}, DATETIME_PARSE('{start_dt_local.isoformat()}'))")
+    if end_date:
+        end_date_obj = datetime.fromisoformat(end_date).date() + timedelta(days=1)
+        end_dt_local = datetime.combine(end_date_obj, time.min, tzinfo=COSTA_RICA_TZ)
+        formula_parts.append(f"IS_BEFORE({date_field}, DATETIME_PARSE('{end_dt_local.isoformat()}'))")
+    return f"AND({', '.join(formula_parts)})"
+
+
+# --- Errores en modo fallback ---
+# Los métodos de lectura capturan sus errores y devuelven un valor vacío ([], {} o
+# {"error": ...}) para los endpoints que los llaman directamente. DataService los usa
+# como fallback de Supabase dentro de raise_airtable_errors(): ahí el error se propaga
+# para que cuente en el circuit breaker de Airtable y no se sirva un vacío como respuesta.
+_raise_errors = contextvars.ContextVar("airtable_raise_errors", default=False)
+
+
+@contextmanager
+def raise_airtable_errors():
+    token = _raise_errors.set(True)
+    try:
+        yield
+    finally:
+        _raise_errors.reset(token)
+
+
+def raising_errors() -> bool:
+    return _raise_errors.get()
 
 
 class AirtableService:
-    def __init__(self):
+    def __init__(self, priority: str = PRIORITY_INTERACTIVE):
         if not AIRTABLE_API_KEY or not AIRTABLE_BASE_ID:
             raise ValueError("AIRTABLE_API_KEY y AIRTABLE_BASE_ID deben estar definidos en el archivo .env")
 
         # Validar credenciales en la inicialización
         if not AIRTABLE_API_KEY or not AIRTABLE_BASE_ID:
             raise ValueError("AIRTABLE_API_KEY y AIRTABLE_BASE_ID deben estar definidos en el archivo .env")
-        self.api = Api(AIRTABLE_API_KEY)
+        # Todas las peticiones pasan por el governor de la base (priority: interactive/campaign/sync)
+        self.api = GovernedApi(AIRTABLE_API_KEY, priority=priority)
         self.base = self.api.base(AIRTABLE_BASE_ID)
         # inicializar tablas
         self.donations_table = self.base.table(DONATIONS_TABLE_NAME)
@@ -75,34 +375,43 @@ class AirtableService:
         self.emails_table = self.base.table(EMAILS_TABLE_NAME)
         # --- INICIALIZAR NUEVA TABLA ---
         self.daily_summaries_table = self.base.table(DAILY_SUMMARIES_TABLE_NAME)
+        # Índice email -> donante (se construye en la primera búsqueda por email)
+        self.email_donor_index = EmailDonorIndex(self.donors_table)
+        # Campaigns / Form Titles en memoria para las agregaciones de fallback
+        self.dimensions = AirtableDimensionCache(self.campaigns_table, self.form_titles_table)
 
         print("Servicio de Airtable inicializado correctamente.")
 
     def create_record(self, table_name: str, data: dict) -> dict:
-        return self.donors_table.create(data)
-
-    # Reemplaza el método get_airtable_data_by_email en airtable_service.py con este
+        record = self.donors_table.create(data)
+        self.email_donor_index.invalidate()
+        return record
 
     def get_airtable_data_by_email(self, email: str) -> Dict[str, Any]:
         """
-        VERSIÓN FINAL Y CORREGIDA
         Busca la información completa de un donante y sus donaciones a partir de su email.
+        El donante se resuelve con el índice email -> donante y una lectura puntual,
+        sin recorrer la tabla Donors.
         """
-        # Paso 1 y 2: Encontrar el donante (esto ya funciona)
+        # Paso 1: Encontrar el registro de email
         email_formula = f"{{{EMAILS_FIELDS['email']}}} = '{email}'"
-        email_records = self.emails_table.all(formula=email_formula, max_records=1)
+        email_records = self.emails_table.all(formula=email_formula, max_records=1, fields=[EMAILS_FIELDS['email']])
         if not email_records:
             return {"donor_info": None, "donations": []}
         email_id = email_records[0]['id']
 
-        all_donors = self.donors_table.all(formula=f"NOT({{{DONORS_FIELDS['emails_link']}}} = '')")
-        donor_record = None
-        for donor in all_donors:
-            if email_id in donor.get("fields", {}).get(DONORS_FIELDS["emails_link"], []):
-                donor_record = donor
-                break
-        if not donor_record:
+        # Paso 2: Resolver el donante con el índice y leerlo directamente
+        donor_id = self.email_donor_index.get_donor_id(email_id)
+        if not donor_id:
             return {"donor_info": None, "donations": []}
+        try:
+            donor_record = self.donors_table.get(donor_id)
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                # El donante fue eliminado: limpiar la entrada obsoleta
+                self.email_donor_index.discard(email_id)
+                return {"donor_info": None, "donations": []}
+            raise
 
         # --- INICIO DE LA CORRECCIÓN CLAVE ---
         # Paso 3: Obtener las donaciones usando el nombre de campo correcto.
@@ -112,11 +421,9 @@ class AirtableService:
         donation_ids = donor_record.get('fields', {}).get(DONORS_FIELDS['donations_link'])
 
         if donation_ids:
-            id_formulas = [f"RECORD_ID() = '{id}'" for id in donation_ids]
-            donations_formula = f"OR({', '.join(id_formulas)})"
-            
-            donation_records = self.donations_table.all(
-                formula=donations_formula,
+            donation_records = batch_get_records(
+                self.donations_table,
+                donation_ids,
                 fields=[
                     DONATIONS_FIELDS["amount"],
                     DONATIONS_FIELDS["date"],
@@ -136,11 +443,8 @@ class AirtableService:
         """
         if not email_ids:
             return []
-        
-        id_formulas = [f"RECORD_ID() = '{id}'" for id in email_ids]
-        formula = f"OR({', '.join(id_formulas)})"
-        
-        email_records = self.emails_table.all(formula=formula, fields=[EMAILS_FIELDS["email"]])
+
+        email_records = batch_get_records(self.emails_table, email_ids, fields=[EMAILS_FIELDS["email"]])
         
         return [rec.get("fields", {}).get(EMAILS_FIELDS["email"]) for rec in email_records if "fields" in rec]
 
@@ -150,6 +454,8 @@ class AirtableService:
             sources = set(rec.get("fields", {}).get(CAMPAIGNS_FIELDS["source"]) for rec in records)
             return sorted([s for s in sources if s])
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error getting campaign sources: {e}")
             return []
 
@@ -169,42 +475,22 @@ class AirtableService:
                 for rec in records
             ]
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error getting campaigns for source {source}: {e}")
             return []
 
     def get_form_titles(self, campaign_id: Optional[str] = None) -> List[Dict]:
         try:
-            # ✅ CAMBIO: Quitamos 'fields' para traer todos los datos, incluyendo 'createdTime'
-            all_records = self.form_titles_table.all()
-            
-            if not campaign_id:
-                # ✅ CAMBIO: Añadimos createdTime a la respuesta
-                return [
-                    {
-                        "id": rec["id"],
-                        "name": rec.get("fields", {}).get(FORM_TITLES_FIELDS["name"]),
-                        "createdTime": rec.get("createdTime")
-                    }
-                    for rec in all_records
-                ]
-            
-            filtered_records = []
-            for rec in all_records:
-                fields = rec.get("fields", {})
-                linked_campaign_ids = fields.get(FORM_TITLES_FIELDS['campaign_link'], [])
-                if linked_campaign_ids and campaign_id in linked_campaign_ids:
-                    filtered_records.append(rec)
-            
-            # ✅ CAMBIO: Añadimos createdTime también aquí
+            # Se sirven desde la caché de dimensiones (incluye createdTime)
+            form_titles = self.dimensions.get_form_titles([campaign_id] if campaign_id else None)
             return [
-                {
-                    "id": rec["id"],
-                    "name": rec.get("fields", {}).get(FORM_TITLES_FIELDS["name"]),
-                    "createdTime": rec.get("createdTime")
-                }
-                for rec in filtered_records
+                {"id": ft["id"], "name": ft["name"], "createdTime": ft["createdTime"]}
+                for ft in form_titles
             ]
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"¡ERROR en get_form_titles!: {e}")
             return []
 
@@ -229,9 +515,9 @@ class AirtableService:
                 return {"donations": [], "total_count": 0} # PAGINACIÓN: Devolver estructura esperada
 
             # --- 1. Obtener TODOS los IDs de donaciones relevantes ---
-            title_id_formulas = [f"RECORD_ID() = '{title_id}'" for title_id in form_title_ids]
-            form_titles_records = self.form_titles_table.all(
-                formula=f"OR({','.join(title_id_formulas)})",
+            form_titles_records = batch_get_records(
+                self.form_titles_table,
+                form_title_ids,
                 # Solo necesitamos el link a donaciones
                 fields=[FORM_TITLES_FIELDS["donations_link"]]
             )
@@ -249,28 +535,20 @@ class AirtableService:
                  return {"donations": [], "total_count": 0}
 
             # --- 2. Filtrar IDs por fecha (si aplica) y Ordenar ---
-            id_formulas = [f"RECORD_ID() = '{id}'" for id in all_relevant_donation_ids]
-            formula_parts = [f"OR({', '.join(id_formulas)})"]
-            date_field = f"{{{DONATIONS_FIELDS['date']}}}"
-
-            # Asegurar que el campo de fecha no esté vacío para el filtro y ordenamiento
-            formula_parts.append(f"NOT({date_field} = BLANK())")
-
-            if start_date:
-                start_dt_local = datetime.combine(datetime.fromisoformat(start_date).date(), time.min, tzinfo=COSTA_RICA_TZ)
-                formula_parts.append(f"IS_AFTER({date_field}, DATETIME_PARSE('{start_dt_local.isoformat()}'))")
-            if end_date:
-                end_date_obj = datetime.fromisoformat(end_date).date() + timedelta(days=1)
-                end_dt_local = datetime.combine(end_date_obj, time.min, tzinfo=COSTA_RICA_TZ)
-                formula_parts.append(f"IS_BEFORE({date_field}, DATETIME_PARSE('{end_dt_local.isoformat()}'))")
+            # La fórmula también descarta donaciones sin fecha (necesaria para ordenar)
+            date_formula = donation_date_range_formula(start_date, end_date)
 
-            final_formula = f"AND({', '.join(formula_parts)})"
-
-            # Obtener solo IDs y Fechas, ordenados por fecha descendente
-            donation_id_date_records = self.donations_table.all(
-                formula=final_formula,
+            # Obtener solo IDs y Fechas (por lotes), ordenados por fecha descendente
+            donation_id_date_records = batch_get_records(
+                self.donations_table,
+                list(all_relevant_donation_ids),
                 fields=[DONATIONS_FIELDS["date"]], # Solo necesitamos la fecha para ordenar
-                sort=[(f"-{DONATIONS_FIELDS['date']}")] # Ordenar descendente (más recientes primero)
+                formula=date_formula
+            )
+            # Las fechas vienen en ISO 8601 (UTC), así que el orden de texto es cronológico
+            donation_id_date_records.sort(
+                key=lambda rec: rec.get("fields", {}).get(DONATIONS_FIELDS["date"], ""),
+                reverse=True # Más recientes primero
             )
 
             # Extraer solo los IDs ordenados
@@ -287,18 +565,10 @@ class AirtableService:
                  return {"donations": [], "total_count": total_matching_donations}
 
             # --- 4. Obtener Detalles Completos SOLO para los IDs de la página ---
-            page_id_formulas = [f"RECORD_ID() = '{id}'" for id in ids_for_page]
-            page_formula = f"OR({', '.join(page_id_formulas)})"
             fields_to_get_details = [DONATIONS_FIELDS["date"], DONATIONS_FIELDS["amount"], DONATIONS_FIELDS["donor_link"]]
 
-            # Usamos get_all para asegurar el orden, aunque pyairtable debería respetarlo
-            # con la fórmula OR(RECORD_ID()...). Si no, reordenaríamos después.
-            page_donation_records = self.donations_table.all(formula=page_formula, fields=fields_to_get_details)
-
-            # Mapear por ID para reordenar si es necesario (y para el enriquecimiento)
-            page_donations_map = {rec['id']: rec for rec in page_donation_records}
-            # Reordenar según el orden original de ids_for_page
-            ordered_page_donation_records = [page_donations_map[id] for id in ids_for_page if id in page_donations_map]
+            # batch_get_records devuelve los registros en el orden de ids_for_page
+            ordered_page_donation_records = batch_get_records(self.donations_table, ids_for_page, fields=fields_to_get_details)
 
 
             if not ordered_page_donation_records:
@@ -312,8 +582,11 @@ class AirtableService:
             }
             # (El resto de la lógica de enriquecimiento con donor_info_map, email_map, etc., es igual)
             # ...
-            donor_id_formulas = [f"RECORD_ID() = '{id}'" for id in donor_ids if id]
-            donor_records = self.donors_table.all(formula=f"OR({', '.join(donor_id_formulas)})") if donor_id_formulas else []
+            donor_records = batch_get_records(
+                self.donors_table,
+                list(donor_ids),
+                fields=[DONORS_FIELDS['name'], DONORS_FIELDS['last_name'], DONORS_FIELDS['emails_link']]
+            )
 
             donor_info_map = {}
             all_email_ids = set()
@@ -325,8 +598,7 @@ class AirtableService:
                 if email_ids:
                     all_email_ids.add(email_ids[0])
 
-            email_id_formulas = [f"RECORD_ID() = '{id}'" for id in all_email_ids if id]
-            email_records = self.emails_table.all(formula=f"OR({', '.join(email_id_formulas)})") if email_id_formulas else []
+            email_records = batch_get_records(self.emails_table, list(all_email_ids), fields=[EMAILS_FIELDS["email"]])
             email_map = {rec["id"]: rec.get("fields", {}).get(EMAILS_FIELDS["email"], "N/A") for rec in email_records}
 
 
@@ -352,6 +624,8 @@ class AirtableService:
             }
 
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"¡ERROR GRAVE en get_donations_for_form_title (paginado)!: {e}")
             traceback.print_exc()
             # Devolver error con la estructura esperada si es posible
@@ -379,72 +653,154 @@ class AirtableService:
             print(f"Error en get_donations: {e}")
             return []  # fallback seguro
         
-    def get_donations_with_donor_info(self) -> List[Dict]:
+    def _resolve_donor_contacts(self, donor_ids: List[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Obtiene todas las donaciones y las enriquece con el nombre y email del donante.
-        Esta función es más completa que get_donations() y es ideal para reportes.
+        Resuelve nombre y primer email de los donantes indicados con lecturas por lotes
+        (solo los campos necesarios). Devuelve donor_id -> {"name", "email"}.
         """
-        try:
-            # 1. Obtener todas las donaciones con el enlace al donante
-            donation_records = self.donations_table.all(
-                fields=[DONATIONS_FIELDS["amount"], DONATIONS_FIELDS["donor_link"], DONATIONS_FIELDS["date"]]
-            )
-
-            if not donation_records:
-                return []
-
-            # 2. Mapear donaciones y recopilar IDs de donantes
-            donor_ids = {
-                rec["fields"][DONATIONS_FIELDS["donor_link"]][0]
-                for rec in donation_records
-                if DONATIONS_FIELDS["donor_link"] in rec.get("fields", {}) and rec["fields"][DONATIONS_FIELDS["donor_link"]]
-            }
-
-            if not donor_ids:
-                return [
-                    {**d.get("fields", {}), "name": "Anonymous", "email": None}
-                    for d in donation_records
-                ]
-
-            # 3. Obtener los donantes y sus emails en bloque para eficiencia
-            donor_map = {donor["id"]: donor["fields"] for donor in self.donors_table.all() if donor["id"] in donor_ids}
-            email_ids = {
-                email_id
-                for donor in donor_map.values()
-                for email_id in donor.get(DONORS_FIELDS["emails_link"], [])
+        donor_records = batch_get_records(
+            self.donors_table,
+            donor_ids,
+            fields=[DONORS_FIELDS["name"], DONORS_FIELDS["last_name"], DONORS_FIELDS["emails_link"]]
+        )
+        first_email_ids = {}
+        for rec in donor_records:
+            email_ids = rec.get("fields", {}).get(DONORS_FIELDS["emails_link"], [])
+            if email_ids:
+                first_email_ids[rec["id"]] = email_ids[0]
+
+        email_records = batch_get_records(self.emails_table, list(first_email_ids.values()), fields=[EMAILS_FIELDS["email"]])
+        email_map = {rec["id"]: rec.get("fields", {}).get(EMAILS_FIELDS["email"]) for rec in email_records}
+
+        contacts = {}
+        for rec in donor_records:
+            fields = rec.get("fields", {})
+            name = f"{fields.get(DONORS_FIELDS['name'], '')} {fields.get(DONORS_FIELDS['last_name'], '')}".strip() or "Anonymous"
+            contacts[rec["id"]] = {"name": name, "email": email_map.get(first_email_ids.get(rec["id"]))}
+        return contacts
+
+    def iter_donations_with_donor_info(self) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre las donaciones página a página y las enriquece con el nombre y email del donante.
+        Cada página resuelve solo los donantes que aún no se habían visto (lecturas por lotes),
+        en lugar de descargar las tablas Donors y Emails completas.
+        """
+        donor_link = DONATIONS_FIELDS["donor_link"]
+        contacts: Dict[str, Dict[str, Any]] = {}
+        for page in self.donations_table.iterate(
+            fields=[DONATIONS_FIELDS["amount"], donor_link, DONATIONS_FIELDS["date"]]
+        ):
+            new_donor_ids = {
+                rec["fields"][donor_link][0]
+                for rec in page
+                if rec.get("fields", {}).get(donor_link) and rec["fields"][donor_link][0] not in contacts
             }
-            email_map = {email["id"]: email["fields"] for email in self.emails_table.all() if email["id"] in email_ids}
+            if new_donor_ids:
+                contacts.update(self._resolve_donor_contacts(list(new_donor_ids)))
 
-            # 4. Unir toda la información
-            enriched_donations = []
-            for rec in donation_records:
+            for rec in page:
                 fields = rec.get("fields", {})
-                donor_id_list = fields.get(DONATIONS_FIELDS["donor_link"], [])
-                donor_id = donor_id_list[0] if donor_id_list else None
-                
-                donor_info = donor_map.get(donor_id, {})
-                name = f"{donor_info.get(DONORS_FIELDS['name'], '')} {donor_info.get(DONORS_FIELDS['last_name'], '')}".strip() or "Anonymous"
-                
-                email_id_list = donor_info.get(DONORS_FIELDS['emails_link'], [])
-                email_id = email_id_list[0] if email_id_list else None
-                email_info = email_map.get(email_id, {})
-                email = email_info.get(EMAILS_FIELDS['email'])
-
-                enriched_donations.append({
+                donor_id_list = fields.get(donor_link, [])
+                contact = contacts.get(donor_id_list[0], {}) if donor_id_list else {}
+                yield {
                     "amount": fields.get(DONATIONS_FIELDS["amount"], 0),
-                    "name": name,
-                    "email": email,
-                })
-            return enriched_donations
+                    "date": fields.get(DONATIONS_FIELDS["date"]),
+                    "name": contact.get("name", "Anonymous"),
+                    "email": contact.get("email"),
+                }
+
+    def get_donations_with_donor_info(self) -> List[Dict]:
+        """
+        Obtiene todas las donaciones y las enriquece con el nombre y email del donante.
+        Esta función es más completa que get_donations() y es ideal para reportes.
+        """
+        try:
+            return list(self.iter_donations_with_donor_info())
         except Exception as e:
             print(f"Error en get_donations_with_donor_info: {e}")
             return []
-        
 
+    def get_top_donors_stats(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Top donantes por monto total (mismo formato que SupabaseService.get_top_donors_stats).
 
-        # En backend/app/services/airtable_service.py
+        Recorre las donaciones por páginas acumulando totales por donante (solo monto, fecha
+        y link) y selecciona los mejores con un heap; únicamente esos donantes se resuelven
+        a nombre/email. Como en Supabase, se omiten los donantes sin email.
+        """
+        try:
+            donor_link = DONATIONS_FIELDS["donor_link"]
+            totals: Dict[str, list] = {}  # donor_id -> [total, count, first_date]
+            for page in self.donations_table.iterate(
+                fields=[DONATIONS_FIELDS["amount"], donor_link, DONATIONS_FIELDS["date"]]
+            ):
+                for rec in page:
+                    fields = rec.get("fields", {})
+                    donor_id_list = fields.get(donor_link)
+                    if not donor_id_list:
+                        continue
+                    stats = totals.setdefault(donor_id_list[0], [0.0, 0, None])
+                    stats[0] += fields.get(DONATIONS_FIELDS["amount"], 0)
+                    stats[1] += 1
+                    donation_date = fields.get(DONATIONS_FIELDS["date"])
+                    if donation_date and (stats[2] is None or donation_date < stats[2]):
+                        stats[2] = donation_date
+
+            # Max-heap por monto; se extraen candidatos en tandas de 'limit' hasta llenar el top
+            # (algunos donantes pueden no tener email)
+            heap = [(-stats[0], donor_id) for donor_id, stats in totals.items()]
+            heapq.heapify(heap)
+            top_donors = []
+            while heap and len(top_donors) < limit:
+                candidates = [heapq.heappop(heap)[1] for _ in range(min(limit, len(heap)))]
+                contacts = self._resolve_donor_contacts(candidates)
+                for donor_id in candidates:
+                    contact = contacts.get(donor_id)
+                    if not contact or not contact["email"]:
+                        continue
+                    total_amount, donations_count, first_date = totals[donor_id]
+                    top_donors.append({
+                        "email": contact["email"],
+                        "name": contact["name"],
+                        "totalAmount": float(total_amount),
+                        "donationsCount": donations_count,
+                        "firstDonationDate": first_date,
+                    })
+                    if len(top_donors) == limit:
+                        break
+            return top_donors
+        except Exception as e:
+            if raising_errors():
+                raise
+            print(f"Error en get_top_donors_stats: {e}")
+            traceback.print_exc()
+            return []
 
-    # En backend/app/services/airtable_service.py, reemplaza ÚNICAMENTE esta función:
+    def _donation_totals_in_range(self, start_date: Optional[str], end_date: Optional[str],
+                                  group_of: Callable[[str], Optional[str]]) -> Dict[str, tuple]:
+        """
+        Suma monto y cantidad de las donaciones del rango (hora de Costa Rica) por grupo:
+        'group_of' lleva el form title de cada donación a su grupo (el propio form title,
+        la campaña...) o a None si no interesa. Airtable no agrega en el servidor (no hay
+        GROUP BY como en SOURCE_STATS_QUERY): se recorre página a página con los campos
+        mínimos y solo se guardan los totales de los grupos pedidos, nunca las donaciones.
+        """
+        amount_field = DONATIONS_FIELDS["amount"]
+        ft_field = DONATIONS_FIELDS["form_title_link"]
+        totals: Dict[str, list] = defaultdict(lambda: [0.0, 0])
+        for page in self.donations_table.iterate(
+            formula=donation_date_range_formula(start_date, end_date),
+            fields=[amount_field, ft_field]
+        ):
+            for rec in page:
+                fields = rec.get("fields", {})
+                ft_links = fields.get(ft_field)
+                group = group_of(ft_links[0]) if ft_links else None
+                if group is None:
+                    continue
+                totals[group][0] += fields.get(amount_field, 0.0)
+                totals[group][1] += 1
+        return {group: (amount, count) for group, (amount, count) in totals.items()}
 
     def get_campaign_stats(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, form_title_ids: Optional[List[str]] = None) -> Dict[str, Any]:
         """
@@ -452,35 +808,15 @@ class AirtableService:
         Usa createdTime como start_date.
         """
         try:
-            # --- Obtener Form Titles vinculados a la campaña ---
-            # Pedimos campos básicos + rollups. createdTime viene por defecto.
-            fields_to_get_base = [
-                FORM_TITLES_FIELDS["name"],
-                FORM_TITLES_FIELDS["campaign_link"],
-            ]
-            # Si no hay filtro de fecha, pedimos rollups. Si hay, pedimos link a donaciones.
-            if not start_date and not end_date:
-                 fields_to_get = fields_to_get_base + [
-                     FORM_TITLES_FIELDS["total_amount_rollup"],
-                     FORM_TITLES_FIELDS["total_count_rollup"],
-                 ]
-            else:
-                 fields_to_get = fields_to_get_base + [FORM_TITLES_FIELDS["donations_link"]]
-
-            all_title_records_raw = self.form_titles_table.all(fields=fields_to_get)
-
-            # Filtrar por campaign_id
-            form_titles_in_campaign_raw = [
-                rec for rec in all_title_records_raw
-                if campaign_id in rec.get("fields", {}).get(FORM_TITLES_FIELDS["campaign_link"], [])
-            ]
+            # --- Form Titles de la campaña (desde la caché de dimensiones) ---
+            form_titles_in_campaign = {ft["id"]: ft for ft in self.dimensions.get_form_titles([campaign_id])}
 
             # Aplicar filtro opcional por form_title_ids
             if form_title_ids:
                 target_ids = set(form_title_ids)
-                form_titles_in_campaign_raw = [ft for ft in form_titles_in_campaign_raw if ft["id"] in target_ids]
+                form_titles_in_campaign = {ft_id: ft for ft_id, ft in form_titles_in_campaign.items() if ft_id in target_ids}
 
-            if not form_titles_in_campaign_raw:
+            if not form_titles_in_campaign:
                 return {"campaign_total_amount": 0, "campaign_total_count": 0, "stats_by_form_title": []}
 
             # --- Procesar según si hay filtro de fecha o no ---
@@ -490,80 +826,44 @@ class AirtableService:
 
             # OPTIMIZACIÓN: Rama SIN filtro de fecha (usa rollups y createdTime)
             if not start_date and not end_date:
-                for ft_record in form_titles_in_campaign_raw:
+                # Solo se leen los rollups de los form titles de esta campaña
+                ft_records = batch_get_records(
+                    self.form_titles_table,
+                    list(form_titles_in_campaign),
+                    fields=[FORM_TITLES_FIELDS["total_amount_rollup"], FORM_TITLES_FIELDS["total_count_rollup"]]
+                )
+                for ft_record in ft_records:
                     fields = ft_record.get("fields", {})
                     amount = fields.get(FORM_TITLES_FIELDS["total_amount_rollup"], 0.0)
                     count = fields.get(FORM_TITLES_FIELDS["total_count_rollup"], 0)
-                    creation_time = ft_record.get("createdTime") # Usar createdTime
+                    form_title = form_titles_in_campaign[ft_record["id"]]
 
                     if count > 0: # Incluir solo si hay donaciones según rollup
                         stats_breakdown.append({
                             "form_title_id": ft_record["id"],
-                            "form_title_name": fields.get(FORM_TITLES_FIELDS["name"], ""),
+                            "form_title_name": form_title["name"] or "",
                             "total_amount": float(amount),
                             "donation_count": count,
-                            "start_date": creation_time # Campo renombrado
+                            "start_date": form_title["createdTime"] # Campo renombrado
                         })
                         grand_total += float(amount)
                         grand_count += count
 
-            # Rama CON filtro de fecha (calcula desde donaciones, pero usa createdTime)
+            # Rama CON filtro de fecha: solo se descargan las donaciones del rango
             else:
-                all_donation_ids = {
-                    did
-                    for ft in form_titles_in_campaign_raw
-                    for did in ft.get("fields", {}).get(FORM_TITLES_FIELDS["donations_link"], [])
-                }
-                if not all_donation_ids: # Salir temprano si no hay donaciones vinculadas
-                     return {"campaign_total_amount": 0, "campaign_total_count": 0, "stats_by_form_title": []}
-
-
-                # Traer donaciones relevantes con fecha y monto
-                id_formulas = [f"RECORD_ID()='{did}'" for did in all_donation_ids]
-                donation_records = self.donations_table.all(
-                    formula=f"OR({','.join(id_formulas)})",
-                    fields=[DONATIONS_FIELDS["amount"], DONATIONS_FIELDS["date"]]
+                totals = self._donation_totals_in_range(
+                    start_date, end_date, lambda ft_id: ft_id if ft_id in form_titles_in_campaign else None
                 )
-                donations_map = {rec["id"]: rec["fields"] for rec in donation_records}
-
-                s_date_obj = date.fromisoformat(start_date) if start_date else None
-                e_date_obj = date.fromisoformat(end_date) if end_date else None
-
-                for ft_record in form_titles_in_campaign_raw:
-                    fields = ft_record.get("fields", {})
-                    creation_time = ft_record.get("createdTime") # Usar createdTime
-                    donation_ids_for_title = fields.get(FORM_TITLES_FIELDS["donations_link"], [])
-
-                    donations_in_range = []
-                    for did in donation_ids_for_title:
-                        donation = donations_map.get(did)
-                        if not donation: continue
-
-                        donation_date_str = donation.get(DONATIONS_FIELDS["date"])
-                        if not donation_date_str: continue
-
-                        try:
-                            donation_dt_aware = datetime.fromisoformat(donation_date_str.replace('Z', '+00:00'))
-                            donation_date_obj = donation_dt_aware.astimezone(COSTA_RICA_TZ).date()
-
-                            start_ok = not s_date_obj or donation_date_obj >= s_date_obj
-                            end_ok = not e_date_obj or donation_date_obj <= e_date_obj
-
-                            if start_ok and end_ok:
-                                donations_in_range.append(donation)
-                        except (ValueError, TypeError):
-                            continue # Saltar fecha inválida
-
-                    if donations_in_range: # Solo añadir si hay donaciones en el rango
-                        total_amount = sum(d.get(DONATIONS_FIELDS["amount"], 0.0) for d in donations_in_range)
-                        donation_count = len(donations_in_range)
 
+                for ft_id, form_title in form_titles_in_campaign.items():
+                    total_amount, donation_count = totals.get(ft_id, (0.0, 0))
+                    if donation_count > 0: # Solo añadir si hay donaciones en el rango
                         stats_breakdown.append({
-                            "form_title_id":   ft_record["id"],
-                            "form_title_name": fields.get(FORM_TITLES_FIELDS["name"], ""),
+                            "form_title_id":   ft_id,
+                            "form_title_name": form_title["name"] or "",
                             "total_amount":    float(total_amount),
                             "donation_count":  donation_count,
-                            "start_date":      creation_time # Campo renombrado
+                            "start_date":      form_title["createdTime"] # Campo renombrado
                         })
                         grand_total += float(total_amount)
                         grand_count += donation_count
@@ -592,21 +892,6 @@ class AirtableService:
         Usa createdTime como start_date.
         """
         try:
-            # --- Obtener Campañas de la fuente ---
-            campaign_formula = f"{{{CAMPAIGNS_FIELDS['source']}}} = '{source}'"
-            fields_to_get = [CAMPAIGNS_FIELDS["name"]] # Base
-            if not start_date and not end_date:
-                 fields_to_get.extend([
-                     CAMPAIGNS_FIELDS["total_amount_rollup"],
-                     CAMPAIGNS_FIELDS["total_count_rollup"]
-                 ])
-            # createdTime viene por defecto si no especificamos fields, o podemos añadirlo explícitamente si es necesario
-
-            campaign_records_raw = self.campaigns_table.all(formula=campaign_formula, fields=fields_to_get)
-
-            if not campaign_records_raw:
-                return {"source_total_amount": 0, "source_total_count": 0, "stats_by_campaign": []}
-
             # --- Procesar según si hay filtro de fecha o no ---
             stats_breakdown = []
             source_grand_total = 0.0
@@ -614,6 +899,15 @@ class AirtableService:
 
             # OPTIMIZACIÓN: Rama SIN filtro de fecha (usa rollups y createdTime)
             if not start_date and not end_date:
+                campaign_formula = f"{{{CAMPAIGNS_FIELDS['source']}}} = '{source}'"
+                campaign_records_raw = self.campaigns_table.all(
+                    formula=campaign_formula,
+                    fields=[
+                        CAMPAIGNS_FIELDS["name"],
+                        CAMPAIGNS_FIELDS["total_amount_rollup"],
+                        CAMPAIGNS_FIELDS["total_count_rollup"]
+                    ]
+                )
                 for camp_record in campaign_records_raw:
                     fields = camp_record.get("fields", {})
                     amount = fields.get(CAMPAIGNS_FIELDS["total_amount_rollup"], 0.0)
@@ -631,34 +925,28 @@ class AirtableService:
                         source_grand_total += float(amount)
                         source_grand_count += count
 
-            # Rama CON filtro de fecha (llama a get_campaign_stats, que ya usa createdTime)
+            # Rama CON filtro de fecha: una sola descarga de las donaciones del rango,
+            # agrupadas por campaña con la caché de dimensiones (sin N llamadas a get_campaign_stats)
             else:
-                 # Necesitamos los IDs para iterar, y AHORA TAMBIÉN EL NOMBRE para evitar N+1 calls
-                 campaign_records_ids = self.campaigns_table.all(
-                     formula=campaign_formula, 
-                     fields=[CAMPAIGNS_FIELDS["name"]] # <-- Traemos el nombre aquí
-                 )
-                 campaign_map = {rec['id']: rec for rec in campaign_records_ids} # Mapeo ID -> Record
-
-                 for campaign_id, camp_record in campaign_map.items():
-                    # Llamamos a la versión ya modificada de get_campaign_stats
-                    stats = self.get_campaign_stats(campaign_id, start_date, end_date)
-                    
-                    # YA NO hacemos una llamada extra por cada campaña. Usamos el dato que ya trajimos.
-                    campaign_name = camp_record.get('fields', {}).get(CAMPAIGNS_FIELDS['name'], 'Unknown Campaign')
+                campaigns = {c["id"]: c for c in self.dimensions.get_campaigns(source=source)}
+                if not campaigns:
+                    return {"source_total_amount": 0, "source_total_count": 0, "stats_by_campaign": []}
 
+                ft_to_campaign = {
+                    ft_id: campaign_id for ft_id, campaign_id in self.dimensions.form_title_to_campaign().items()
+                    if campaign_id in campaigns
+                }
+                campaign_totals = self._donation_totals_in_range(start_date, end_date, ft_to_campaign.get)
 
-                    total_amount = stats.get("campaign_total_amount", 0.0)
-                    donation_count = stats.get("campaign_total_count", 0)
-                    creation_time = camp_record.get("createdTime") # Usar createdTime del record
-
+                for campaign_id, (total_amount, donation_count) in campaign_totals.items():
+                    camp = campaigns[campaign_id]
                     if donation_count > 0: # Incluir solo si tiene donaciones en el rango
                         stats_breakdown.append({
                             "campaign_id": campaign_id,
-                            "campaign_name": campaign_name,
-                            "total_amount": float(total_amount),
+                            "campaign_name": camp["name"] or "Unknown Campaign",
+                            "total_amount": round(float(total_amount), 2),
                             "donation_count": donation_count,
-                            "start_date": creation_time # Campo renombrado
+                            "start_date": camp["createdTime"] # Campo renombrado
                         })
                         source_grand_total += float(total_amount)
                         source_grand_count += donation_count
@@ -744,14 +1032,8 @@ class AirtableService:
     ) -> Dict[str, Any]: # PAGINACIÓN: Cambiar tipo de retorno
         """Reúne los form_title_ids de la campaña y reutiliza get_donations_for_form_title (paginado)."""
         try:
-            # (Obtener form_title_ids como antes)
-            title_records = self.form_titles_table.all(
-                fields=[FORM_TITLES_FIELDS["campaign_link"]] # Solo necesitamos el link
-            )
-            form_title_ids: List[str] = [
-                 rec["id"] for rec in title_records
-                 if campaign_id in rec.get("fields", {}).get(FORM_TITLES_FIELDS["campaign_link"], [])
-             ]
+            # Form titles de la campaña desde la caché de dimensiones
+            form_title_ids: List[str] = [ft["id"] for ft in self.dimensions.get_form_titles([campaign_id])]
 
             if not form_title_ids:
                 return {"donations": [], "total_count": 0}
@@ -766,6 +1048,8 @@ class AirtableService:
                 offset=offset
             )
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error in get_campaign_donations (paginado): {e}")
             return {"donations": [], "total_count": 0, "error": str(e)}
     
@@ -779,23 +1063,13 @@ class AirtableService:
     ) -> Dict[str, Any]:
         """Get donations for all campaigns in a source (fallback to Airtable)."""
         try:
-            # Get all campaigns for this source
-            campaign_records = self.campaigns_table.all(fields=[CAMPAIGNS_FIELDS["source"]])
-            campaign_ids = [
-                rec["id"] for rec in campaign_records
-                if rec.get("fields", {}).get(CAMPAIGNS_FIELDS["source"]) == source_name
-            ]
+            # Campaigns and form titles come from the in-memory dimension cache
+            campaign_ids = [c["id"] for c in self.dimensions.get_campaigns(source=source_name)]
             
             if not campaign_ids:
                 return {"donations": [], "total_count": 0}
             
-            # Get all form_title_ids for these campaigns
-            title_records = self.form_titles_table.all(fields=[FORM_TITLES_FIELDS["campaign_link"]])
-            form_title_ids: List[str] = []
-            for rec in title_records:
-                campaign_links = rec.get("fields", {}).get(FORM_TITLES_FIELDS["campaign_link"], [])
-                if any(cid in campaign_links for cid in campaign_ids):
-                    form_title_ids.append(rec["id"])
+            form_title_ids: List[str] = [ft["id"] for ft in self.dimensions.get_form_titles(campaign_ids)]
             
             if not form_title_ids:
                 return {"donations": [], "total_count": 0}
@@ -809,6 +1083,8 @@ class AirtableService:
                 offset=offset
             )
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error in get_source_donations (Airtable fallback): {e}")
             return {"donations": [], "total_count": 0, "error": str(e)}
 
@@ -863,6 +1139,8 @@ class AirtableService:
             return results
 
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error en get_daily_summaries: {e}")
             traceback.print_exc()
             return [] # fallback seguro
@@ -879,72 +1157,37 @@ class AirtableService:
             segment: 'standard' (excluye marcados) o 'dnr' (solo marcados).
             
         Devuelve una lista de diccionarios con 'Email' y 'Name' del donante.
+        Para segmentos grandes usar iter_campaign_contacts (por páginas).
+        """
+        try:
+            contact_list = [contact for page in self.iter_campaign_contacts(region, is_bounced, segment) for contact in page]
+            print(f"Found {len(contact_list)} emails matching all criteria.")
+            return contact_list
+
+        except Exception as e:
+            print(f"Error getting campaign contacts from Airtable: {e}")
+            traceback.print_exc()
+            return []
+
+    def iter_campaign_contacts(self, region: str, is_bounced: bool, segment: str = "standard") -> Iterator[List[Dict[str, str]]]:
+        """
+        Igual que get_campaign_contacts pero entrega los contactos página a página
+        (máx. 100 por página de Airtable), para empezar a enviar tras la primera página
+        sin materializar el segmento completo. Los errores de Airtable se propagan.
         """
         # Nombres de campos en la tabla Emails
         email_field = EMAILS_FIELDS.get("email", "Email")
         # Usamos los campos Lookup que ya existen en la tabla Emails
         donor_first_name_field = EMAILS_FIELDS.get("donor_name", "Name") 
-        donor_last_name_field = EMAILS_FIELDS.get("donor_last_name", "Last Name")
-        
-        bounced_field = EMAILS_FIELDS.get("bounced_account", "Bounced Account")
-        not_sending_field = EMAILS_FIELDS.get("not_sending", "Not Sending")
-        region_field = EMAILS_FIELDS.get("region", "Region")
-        stage_field = EMAILS_FIELDS.get("stage_from_donor", "Stage (from Donor)")
-        exclude_field = EMAILS_FIELDS.get("exclude_from_campaign", "Exclude From Current Campaign")
-
-        try:
-            # --- Construir fórmula directamente para la tabla Emails ---
-            formula_parts = [
-                f"{{{region_field}}} = '{region}'",
-                f"{{{stage_field}}} = 'Big Campaign'",
-                f"NOT({{{not_sending_field}}} = 1)"  # Siempre excluir "Not Sending"
-            ]
 
-            # --- Excluir Tags Específicos ---
-            tag_field = EMAILS_FIELDS.get("utils_tags", "Tag (Mailchimp)")
-            donor_tag_field = "Tag (from Donor)"
-            
-            # Excluir 'Aol and other accounts', 'Apple_Accounts USA', 'Apple_Accounts EUR' de Mailchimp Tags
-            formula_parts.append(f"FIND('Aol and other accounts', {{{tag_field}}} & '') = 0")
-            formula_parts.append(f"FIND('Apple_Accounts USA', {{{tag_field}}} & '') = 0")
-            formula_parts.append(f"FIND('Apple_Accounts EUR', {{{tag_field}}} & '') = 0")
-            
-            # Excluir 'Tag #4 New ones', 'Tag #3 New ones' (que provienen del donante)
-            formula_parts.append(f"FIND('Tag #4 New ones', {{{donor_tag_field}}} & '') = 0")
-            formula_parts.append(f"FIND('Tag #3 New ones', {{{donor_tag_field}}} & '') = 0")
-            print("Excluyendo tags: Aol, Apple USA, Apple EUR, Tag #3 New ones, Tag #4 New ones")
-            
-            # Condición de Bounced Account
-            if is_bounced:
-                formula_parts.append(f"{{{bounced_field}}} = 1")
-                print("Buscando emails rebotados.")
-            else:
-                formula_parts.append(f"NOT({{{bounced_field}}} = 1)")
-                print("Excluyendo emails rebotados.")
-            
-            # Lógica de Segmento (Exclude From Current Campaign)
-            if segment == "dnr":
-                # DNR: Solo los que TIENEN el check marcado
-                formula_parts.append(f"{{{exclude_field}}} = 1")
-                print("Segmento DNR seleccionado: Buscando donantes excluidos.")
-            else:
-                # Standard (default): Solo los que NO tienen el check marcado
-                formula_parts.append(f"NOT({{{exclude_field}}} = 1)")
-                print("Segmento Standard seleccionado: Excluyendo donantes marcados.")
-
-            email_formula = f"AND({', '.join(formula_parts)})"
-            print(f"Airtable formula for Emails: {email_formula}")
-
-            # --- Consultar directamente la tabla Emails ---
-            # Pedimos Email y Name (Lookup) - Last Name ya no es necesario
-            email_records = self.emails_table.all(
-                formula=email_formula, 
-                fields=[email_field, donor_first_name_field]
-            )
+        email_formula = self._campaign_contacts_formula(region, is_bounced, segment)
+        print(f"Airtable formula for Emails: {email_formula}")
 
-            # --- Preparar la lista final ---
-            contact_list = []
-            for rec in email_records:
+        # --- Consultar directamente la tabla Emails, página a página ---
+        # Pedimos Email y Name (Lookup) - Last Name ya no es necesario
+        for page in self.emails_table.iterate(formula=email_formula, fields=[email_field, donor_first_name_field]):
+            contacts = []
+            for rec in page:
                 fields = rec.get('fields', {})
                 email_address = fields.get(email_field)
                 
@@ -958,29 +1201,67 @@ class AirtableService:
                         first_name = first_name_raw.strip()
                         
                     # Usar solo el First Name (o fallback)
-                    final_name = first_name or "Valued Supporter"
-                    
-                    contact_list.append({
+                    contacts.append({
                         "Email": email_address,
-                        "Name": final_name
+                        "Name": first_name or "Valued Supporter"
                     })
+            yield contacts
 
-            print(f"Found {len(contact_list)} emails matching all criteria.")
-            return contact_list
+    def _campaign_contacts_formula(self, region: str, is_bounced: bool, segment: str) -> str:
+        """Fórmula de la tabla Emails para el segmento de campaña."""
+        bounced_field = EMAILS_FIELDS.get("bounced_account", "Bounced Account")
+        not_sending_field = EMAILS_FIELDS.get("not_sending", "Not Sending")
+        region_field = EMAILS_FIELDS.get("region", "Region")
+        stage_field = EMAILS_FIELDS.get("stage_from_donor", "Stage (from Donor)")
+        exclude_field = EMAILS_FIELDS.get("exclude_from_campaign", "Exclude From Current Campaign")
+        # --- Construir fórmula directamente para la tabla Emails ---
+        formula_parts = [
+            f"{{{region_field}}} = '{region}'",
+            f"{{{stage_field}}} = 'Big Campaign'",
+            f"NOT({{{not_sending_field}}} = 1)"  # Siempre excluir "Not Sending"
+        ]
+
+        # --- Excluir Tags Específicos ---
+        tag_field = EMAILS_FIELDS.get("utils_tags", "Tag (Mailchimp)")
+        donor_tag_field = "Tag (from Donor)"
+        
+        # Excluir 'Aol and other accounts', 'Apple_Accounts USA', 'Apple_Accounts EUR' de Mailchimp Tags
+        formula_parts.append(f"FIND('Aol and other accounts', {{{tag_field}}} & '') = 0")
+        formula_parts.append(f"FIND('Apple_Accounts USA', {{{tag_field}}} & '') = 0")
+        formula_parts.append(f"FIND('Apple_Accounts EUR', {{{tag_field}}} & '') = 0")
+        
+        # Excluir 'Tag #4 New ones', 'Tag #3 New ones' (que provienen del donante)
+        formula_parts.append(f"FIND('Tag #4 New ones', {{{donor_tag_field}}} & '') = 0")
+        formula_parts.append(f"FIND('Tag #3 New ones', {{{donor_tag_field}}} & '') = 0")
+        print("Excluyendo tags: Aol, Apple USA, Apple EUR, Tag #3 New ones, Tag #4 New ones")
+        
+        # Condición de Bounced Account
+        if is_bounced:
+            formula_parts.append(f"{{{bounced_field}}} = 1")
+            print("Buscando emails rebotados.")
+        else:
+            formula_parts.append(f"NOT({{{bounced_field}}} = 1)")
+            print("Excluyendo emails rebotados.")
+        
+        # Lógica de Segmento (Exclude From Current Campaign)
+        if segment == "dnr":
+            # DNR: Solo los que TIENEN el check marcado
+            formula_parts.append(f"{{{exclude_field}}} = 1")
+            print("Segmento DNR seleccionado: Buscando donantes excluidos.")
+        else:
+            # Standard (default): Solo los que NO tienen el check marcado
+            formula_parts.append(f"NOT({{{exclude_field}}} = 1)")
+            print("Segmento Standard seleccionado: Excluyendo donantes marcados.")
+
+        return f"AND({', '.join(formula_parts)})"
 
-        except Exception as e:
-            print(f"Error getting campaign contacts from Airtable: {e}")
-            traceback.print_exc()
-            return []
-    
     def get_monthly_source_breakdown(self, start_date: date, end_date: date) -> Dict[str, Any]:
         """
         Calcula el desglose de donaciones por fuente para un rango de fechas.
         Estrategia eficiente:
         1. Obtener Donaciones en el rango (con link a Form Title).
-        2. Obtener TODOS los Form Titles (con link a Campaign).
-        3. Obtener TODAS las Campañas (con Source).
-        4. Mapear en memoria.
+        2. Resolver Form Title -> Campaign -> Source con la caché de dimensiones.
+        3. Agrupar en memoria.
         """
         try:
             # 1. Obtener Donaciones en el rango
@@ -1002,35 +1283,10 @@ class AirtableService:
             if not donations:
                 return {"total_amount": 0, "breakdown": []}
 
-            # 2. Obtener TODOS los Form Titles (son pocos, cacheable en teoría, pero rápido de traer)
-            form_titles = self.form_titles_table.all(
-                fields=[FORM_TITLES_FIELDS["campaign_link"]]
-            )
-            print(f"DEBUG: Found {len(form_titles)} form titles")
-            
-            # Mapa: FormTitle ID -> Campaign ID
-            ft_to_campaign = {}
-            for ft in form_titles:
-                campaign_links = ft.get("fields", {}).get(FORM_TITLES_FIELDS["campaign_link"], [])
-                if campaign_links:
-                    ft_to_campaign[ft["id"]] = campaign_links[0]
-
-            print(f"DEBUG: Mapped {len(ft_to_campaign)} form titles to campaigns")
-
-            # 3. Obtener TODAS las Campañas
-            campaigns = self.campaigns_table.all(
-                fields=[CAMPAIGNS_FIELDS["source"]]
-            )
-            print(f"DEBUG: Found {len(campaigns)} campaigns")
-            
-            # Mapa: Campaign ID -> Source
-            campaign_to_source = {}
-            for camp in campaigns:
-                source = camp.get("fields", {}).get(CAMPAIGNS_FIELDS["source"])
-                if source:
-                    campaign_to_source[camp["id"]] = source
-
-            print(f"DEBUG: Mapped {len(campaign_to_source)} campaigns to sources")
+            # 2-3. Mapas FormTitle -> Campaign -> Source desde la caché de dimensiones
+            ft_to_campaign = self.dimensions.form_title_to_campaign()
+            campaign_to_source = self.dimensions.campaign_to_source()
+            print(f"DEBUG: {len(ft_to_campaign)} form titles / {len(campaign_to_source)} campaigns mapped (cached)")
 
             # 4. Procesar donaciones y agrupar por fuente
             source_totals = defaultdict(float)
@@ -1082,6 +1338,8 @@ class AirtableService:
             }
 
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error en get_monthly_source_breakdown: {e}")
             traceback.print_exc()
             return {"total_amount": 0, "breakdown": []}
@@ -1091,77 +1349,38 @@ class AirtableService:
     def get_funnel_stats(self) -> Dict[str, Any]:
         """
         Calcula estadísticas del funnel y aprobaciones pendientes basado en filtros de Airtable.
+        Solo descarga los donantes en las etapas Funnel / Pending Approval y los 4 campos que
+        se evalúan; las reglas son las mismas que usa el motor de contadores de Supabase.
         """
         try:
-            records = self.donors_table.all()
-
-            total_funnel = 0
-            pending_approvals = 0
-            stage_breakdown = defaultdict(int)
+            stage_field = DONORS_FIELDS["stage"]
+            formula = f"OR({{{stage_field}}} = '{FUNNEL_STAGE}', {{{stage_field}}} = '{PENDING_APPROVAL_STAGE}')"
+            counts: Dict[tuple, int] = defaultdict(int)
 
-            for rec in records:
-                fields = rec.get("fields", {})
-                
-                stage = fields.get("Stage")
-                status = fields.get("Status")
-                region = fields.get("Region")
-                funnel_stage = fields.get("Funnel Stage")
-
-                # 1. PENDING APPROVAL FILTER
-                # Where Stage is Pending Approval AND Region is not empty 
-                # AND Status is not Final Check AND Status is not Potential Duplicate
-                if stage == "Pending Approval":
-                     if region: # Check if not empty/None
-                         if status != "Final Check" and status != "Potential Duplicate":
-                             pending_approvals += 1
-
-                # 2. FUNNEL FILTER
-                # Where Stage is Funnel AND Status is not Unsubscribed
-                if stage == "Funnel":
-                    if status != "Unsubscribed":
-                        # Add to total funnel count
-                        total_funnel += 1
-                        
-                        # Breakdown by Funnel Stage
-                        # If Funnel Stage is present, use it. Otherwise 'Unknown'.
-                        if funnel_stage:
-                            # Handle list if it comes as lookup (though usually string/list of strings)
-                            val = str(funnel_stage)
-                            if isinstance(funnel_stage, list) and len(funnel_stage) > 0:
-                                val = str(funnel_stage[0])
-                            
-                            stage_breakdown[val] += 1
-                        else:
-                            # Optional: Track those without funnel stage?
-                            # stage_breakdown["(No Funnel Stage)"] += 1
-                            pass
-
-            # Format Breakdown
-            breakdown_list = [
-                {"name": k, "count": v} for k, v in stage_breakdown.items()
-            ]
-            
-            # Ordenar numéricamente (Natural Sort) para que Stage 10 vaya después de Stage 9, no después de Stage 1.
-            def sort_stages(item):
-                name = item["name"]
-                import re
-                # Buscar patrón "(Stage X)"
-                match = re.search(r"\(Stage\s*(\d+)\)", name, re.IGNORECASE)
-                if match:
-                    # Retornar tupla: (orden numérico, nombre original)
-                    return (int(match.group(1)), name)
-                # Si no tiene patrón, ponlo al final ordenado alfabéticamente
-                return (9999, name)
-
-            breakdown_list.sort(key=sort_stages)
-
-            return {
-                "total_funnel": total_funnel,
-                "pending_approvals": pending_approvals,
-                "stage_breakdown": breakdown_list
-            }
+            for page in self.donors_table.iterate(
+                formula=formula,
+                fields=[stage_field, DONORS_FIELDS["status"], "Region", DONORS_FIELDS["funnel_stage"]]
+            ):
+                for rec in page:
+                    fields = rec.get("fields", {})
+                    status = fields.get(DONORS_FIELDS["status"])
+                    if isinstance(status, list):
+                        status = status[0] if status else None
+                    # Funnel Stage puede venir como lookup (lista)
+                    funnel_stage = fields.get(DONORS_FIELDS["funnel_stage"])
+                    if isinstance(funnel_stage, list):
+                        funnel_stage = funnel_stage[0] if funnel_stage else None
+
+                    bucket = classify_donor(fields.get(stage_field), status, fields.get("Region"),
+                                            str(funnel_stage) if funnel_stage else None)
+                    if bucket:
+                        counts[bucket] += 1
+
+            return build_funnel_stats(counts)
 
         except Exception as e:
+            if raising_errors():
+                raise
             print(f"Error en get_funnel_stats: {e}")
             traceback.print_exc()
             return {
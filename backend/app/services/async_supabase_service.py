@@ -0,0 +1,266 @@
+"""
+Async Supabase Service - psycopg 3 async pool for the async (analytics) routes.
+Same SQL and result format as SupabaseService (see supabase_queries.py), but
+queries await on the event loop instead of holding a threadpool slot.
+
+psycopg 3 is optional: if it is not installed (or the pool cannot be created),
+get_async_supabase_service() returns None and callers run the sync service in
+the threadpool, as before.
+"""
+import asyncio
+import os
+from typing import Optional, List, Dict, Any
+from dotenv import load_dotenv
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.json import Jsonb
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg[binary,pool] no instalado
+    psycopg = None
+
+from backend.app.services.donation_counts import get_donation_count_cache, parse_count_estimate
+from backend.app.services.query_metrics import timed_query, query_name_from_caller
+from backend.app.services.supabase_queries import (
+    build_donations_page_queries,
+    format_donations_page,
+    CAMPAIGN_STATS_QUERY,
+    SOURCE_STATS_QUERY,
+    format_campaign_stats,
+    format_source_stats,
+    CREATE_SHARED_VIEW_QUERY,
+    GET_SHARED_VIEW_QUERY,
+)
+
+load_dotenv()
+
+ASYNC_POOL_MIN_SIZE = int(os.getenv("SUPABASE_ASYNC_POOL_MIN", "2"))
+ASYNC_POOL_MAX_SIZE = int(os.getenv("SUPABASE_ASYNC_POOL_MAX", "20"))
+# Segundos máximos esperando una conexión libre antes de fallar (y caer a Airtable)
+ASYNC_POOL_TIMEOUT = float(os.getenv("SUPABASE_ASYNC_POOL_TIMEOUT", "10"))
+
+
+class AsyncSupabaseService:
+    def __init__(self):
+        if psycopg is None:
+            raise RuntimeError("psycopg 3 is not installed (pip install 'psycopg[binary,pool]')")
+        self.db_url = os.getenv("SUPABASE_DATABASE_URL")
+        if not self.db_url:
+            raise ValueError("SUPABASE_DATABASE_URL not found in environment variables")
+
+        # ClientCursor: interpolación en el cliente, igual que psycopg2, así el SQL compartido
+        # se comporta idéntico y funciona detrás del pooler de Supabase (sin prepared statements).
+        # check_connection descarta conexiones que Supabase cerró mientras estaban ociosas.
+        self._pool = AsyncConnectionPool(
+            self.db_url,
+            min_size=ASYNC_POOL_MIN_SIZE,
+            max_size=ASYNC_POOL_MAX_SIZE,
+            timeout=ASYNC_POOL_TIMEOUT,
+            open=False,
+            check=AsyncConnectionPool.check_connection,
+            kwargs={
+                "row_factory": dict_row,
+                "cursor_factory": psycopg.AsyncClientCursor,
+                "prepare_threshold": None,
+                "keepalives": 1,
+                "keepalives_idle": 30,
+                "keepalives_interval": 10,
+                "keepalives_count": 5,
+            },
+        )
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+
+    async def open(self):
+        """Abre el pool (idempotente). Se llama en el lifespan o en la primera consulta."""
+        if self._opened:
+            return
+        async with self._open_lock:
+            if not self._opened:
+                await self._pool.open()
+                self._opened = True
+                print(f"Supabase async pool opened (min={ASYNC_POOL_MIN_SIZE}, max={ASYNC_POOL_MAX_SIZE})")
+
+    async def close(self):
+        """Close the async pool"""
+        if self._opened:
+            await self._pool.close()
+            self._opened = False
+
+    async def _execute_query(self, query: str, params=None, name: Optional[str] = None) -> List[Dict]:
+        """Execute query and return results as list of dicts.
+        Retries once if the connection broke mid-query (OperationalError).
+        Timed under 'name' (default: the calling method) in query_metrics.
+        """
+        name = name or query_name_from_caller()
+        await self.open()
+        for attempt in range(2):
+            try:
+                # pool.connection() hace commit al salir, o rollback si hubo excepción
+                async with self._pool.connection() as conn:
+                    async with conn.cursor() as cursor:
+                        with timed_query(name, query, params) as timing:
+                            await cursor.execute(query, params or ())
+                            results = await cursor.fetchall() if cursor.description else []
+                            timing.rows = len(results)
+                        return results
+            except psycopg.OperationalError as e:
+                if attempt == 0:
+                    print(f"[DB async] Connection error, retrying with fresh connection. Error: {e}")
+                    continue
+                print(f"[DB async] ERROR executing query (attempt {attempt + 1}): {e}")
+                print(f"Query: {query}")
+                raise
+            except Exception as e:
+                print(f"[DB async] ERROR executing query: {e}")
+                print(f"Query: {query}")
+                raise
+        # Should never reach here
+        raise RuntimeError("_execute_query exhausted retries")
+
+    async def _execute_one(self, query: str, params=None, name: Optional[str] = None) -> Optional[Dict]:
+        """Execute query and return single result"""
+        results = await self._execute_query(query, params, name or query_name_from_caller())
+        return results[0] if results else None
+
+    # ==========================================
+    # DONATION LISTINGS
+    # ==========================================
+
+    async def _donations_page(self, scope: str, scope_value: Any, start_date, end_date, page_size, offset, cursor) -> Dict[str, Any]:
+        """Página de donaciones + total_count según la estrategia de conteo (donation_counts.py)."""
+        counts = get_donation_count_cache()
+        plan = counts.plan(scope, scope_value, start_date, end_date, cursor)
+        watermark = counts.current_watermark()
+        query, params, count_query, count_params = build_donations_page_queries(
+            scope, scope_value, start_date, end_date, page_size, offset, cursor, window_count=plan.use_window
+        )
+        if plan.total is not None or plan.use_window or counts.wants_estimate():
+            donations = [dict(d) for d in await self._execute_query(query, params, f"{scope}_donations_page")]
+            total = plan.total if plan.total is not None else counts.resolve_window(plan, donations)
+            count_result = None
+        else:
+            # Conteo exacto: página y conteo en paralelo (dos conexiones del pool)
+            rows, count_result = await asyncio.gather(
+                self._execute_query(query, params, f"{scope}_donations_page"),
+                self._execute_one(count_query, count_params, f"{scope}_donations_count"),
+            )
+            donations = [dict(d) for d in rows]
+            total = None
+
+        if plan.total is None:
+            estimated = False
+            if total is None and count_result is not None:
+                total = count_result['count']
+            if total is None and counts.wants_estimate():
+                estimate = parse_count_estimate(await self._execute_one(f"EXPLAIN (FORMAT JSON) {count_query}", count_params, f"{scope}_donations_count_estimate"))
+                if estimate is not None and estimate >= counts.estimate_threshold:
+                    total, estimated = estimate, True
+            if total is None:
+                count_result = await self._execute_one(count_query, count_params, f"{scope}_donations_count")
+                total = count_result['count'] if count_result else 0
+            counts.store(plan, total, estimated, watermark)
+
+        return format_donations_page(donations, plan.total, page_size, plan.estimated)
+
+    async def get_campaign_donations(
+        self,
+        campaign_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        page_size: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._donations_page("campaign", campaign_id, start_date, end_date, page_size, offset, cursor)
+
+    async def get_source_donations(
+        self,
+        source_name: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        page_size: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._donations_page("source", source_name, start_date, end_date, page_size, offset, cursor)
+
+    async def get_donations_for_form_title(
+        self,
+        form_title_ids: List[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        page_size: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._donations_page("form_titles", form_title_ids, start_date, end_date, page_size, offset, cursor)
+
+    # ==========================================
+    # CAMPAIGN / SOURCE STATS
+    # ==========================================
+
+    async def get_campaign_stats(
+        self,
+        campaign_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        form_title_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        breakdown = await self._execute_query(CAMPAIGN_STATS_QUERY, {
+            'campaign_id': campaign_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'form_title_ids': form_title_ids
+        })
+        return format_campaign_stats(breakdown)
+
+    async def get_source_stats(
+        self,
+        source: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Dict[str, Any]:
+        breakdown = await self._execute_query(SOURCE_STATS_QUERY, {
+            'source': source,
+            'start_date': start_date,
+            'end_date': end_date
+        })
+        return format_source_stats(breakdown)
+
+    # ==========================================
+    # SHARED VIEWS
+    # ==========================================
+
+    async def create_shared_view(self, configuration: Dict[str, Any], created_by: Optional[str] = None) -> str:
+        result = await self._execute_one(CREATE_SHARED_VIEW_QUERY, (Jsonb(configuration), created_by))
+        if result and 'token' in result:
+            return str(result['token'])
+        raise Exception("Failed to create shared view")
+
+    async def get_shared_view(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            result = await self._execute_one(GET_SHARED_VIEW_QUERY, (token,))
+            if result and result['is_active']:
+                return result['configuration']
+            return None
+        except Exception as e:
+            print(f"Error fetching shared view {token}: {e}")
+            return None
+
+
+# Singleton instance (None si psycopg 3 no está disponible)
+_async_supabase_service_instance = None
+_async_supabase_unavailable = False
+
+def get_async_supabase_service() -> Optional[AsyncSupabaseService]:
+    """Get or create AsyncSupabaseService singleton instance, or None if unavailable"""
+    global _async_supabase_service_instance, _async_supabase_unavailable
+    if _async_supabase_service_instance is None and not _async_supabase_unavailable:
+        try:
+            _async_supabase_service_instance = AsyncSupabaseService()
+        except Exception as e:
+            print(f"Async Supabase pool unavailable, async routes will use the threadpool: {e}")
+            _async_supabase_unavailable = True
+    return _async_supabase_service_instance
@@ -0,0 +1,515 @@
+"""
+Cache Store - backend de caché compartido entre los workers de uvicorn.
+
+Con InMemoryBackend cada worker (`uvicorn --workers N`) tiene su propio caché: N
+workers = N veces las mismas consultas a Supabase y números distintos según qué
+worker responda. Este módulo da un almacén clave -> bytes común a todos los procesos
+para el ResultCache de DataService, los contadores del SyncWatermark (un sync hecho
+por un worker invalida las entradas de todos) y FastAPICache:
+
+- "sqlite": un fichero local (CACHE_SQLITE_PATH) en modo WAL. Sin servicios externos;
+  sirve para varios workers en la misma máquina/contenedor. Por defecto vive en un
+  directorio privado de la app (~/.cache/animal-rescue-dashboard, 0700) y el fichero
+  se crea con permisos 0600, no en el /tmp compartido.
+- "redis": cualquier servidor con protocolo Redis (CACHE_REDIS_URL). Necesita el
+  paquete opcional 'redis'. Las entradas llevan TTL y los contadores no: con
+  maxmemory-policy volatile-lru Redis nunca expulsa un contador del watermark.
+- "memory": el comportamiento de siempre (todo en el proceso).
+- "auto" (defecto): redis si hay CACHE_REDIS_URL/REDIS_URL, sqlite si
+  WEB_CONCURRENCY > 1 (el número de workers de uvicorn), memory si no.
+
+Los valores se serializan en binario con pickle (protocolo más alto) y, a partir de
+CACHE_COMPRESS_MIN_BYTES, zlib. Quien pueda escribir en el almacén podría ejecutar
+código al deserializar, así que cada valor va firmado con HMAC-SHA256(SECRET_KEY) y
+loads() comprueba la firma antes de tocar pickle: un valor sin firma válida es un
+miss. FastAPICache guarda JSON (su coder por defecto), no pickle.
+"""
+import hashlib
+import hmac
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from abc import abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Protocol, Tuple
+
+from fastapi_cache.backends import Backend
+from starlette.concurrency import run_in_threadpool
+
+from backend.app.core.security import SECRET_KEY
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "auto").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "animal-rescue-dashboard", "cache.sqlite3"))
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "ard:")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1") or "1")
+
+BACKENDS = ("memory", "sqlite", "redis")
+
+# Cada valor serializado: firma HMAC (32 bytes) + 1 byte de formato + datos
+_RAW = b"p"
+_ZLIB = b"z"
+_SIGNATURE_BYTES = hashlib.sha256().digest_size
+_SIGNING_KEY = SECRET_KEY.encode()
+
+
+# ==========================================
+# SERIALIZATION
+# ==========================================
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_SIGNING_KEY, payload, hashlib.sha256).digest()
+
+
+def dumps(value: Any) -> bytes:
+    """pickle binario; zlib (nivel 1, rápido) si ocupa CACHE_COMPRESS_MIN_BYTES o más. Firmado."""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= CACHE_COMPRESS_MIN_BYTES:
+        payload = _ZLIB + zlib.compress(data, 1)
+    else:
+        payload = _RAW + data
+    return _sign(payload) + payload
+
+
+def loads(data: bytes) -> Any:
+    """ValueError si la firma no cuadra (valor manipulado o de otra SECRET_KEY): nunca se deserializa."""
+    signature, payload = data[:_SIGNATURE_BYTES], data[_SIGNATURE_BYTES:]
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("cache value signature mismatch")
+    if payload[:1] == _ZLIB:
+        return pickle.loads(zlib.decompress(payload[1:]))
+    return pickle.loads(payload[1:])
+
+
+# ==========================================
+# STORES
+# ==========================================
+
+class CacheStore(Protocol):
+    """
+    Clave -> bytes con TTL opcional, más contadores que solo crecen (watermarks).
+    Las implementaciones son thread-safe; los TTL van en segundos (None = sin TTL).
+    Los backends la heredan explícitamente: si falta un método, fallan al instanciarse.
+    """
+    name: str
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        """(segundos que le quedan, valor); -1 = sin TTL."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Guarda solo si la clave no existe (o expiró). True si la guardó (un lock entre procesos)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def clear(self, prefix: str = "") -> int:
+        """Borra las entradas (no los contadores) que empiezan por 'prefix'."""
+
+    @abstractmethod
+    def incr(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    def counters(self, *keys: str) -> Tuple[int, ...]: ...
+
+    @abstractmethod
+    def size(self) -> int: ...
+
+
+class MemoryStore(CacheStore):
+    """LRU en el proceso (un solo worker)."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()  # key -> (expires_at, value)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[Optional[float], bytes]]:
+        """Llamar con el lock tomado."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry else None
+
+    def ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return 0, None
+            return (-1 if entry[0] is None else max(0, int(entry[0] - time.time()))), entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._entries[key] = (time.time() + ttl if ttl else None, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str = "") -> int:
+        with self._lock:
+            keys = [k for k in self._entries if k.startswith(prefix)]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def incr(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def counters(self, *keys: str) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._counters.get(key, 0) for key in keys)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteStore(CacheStore):
+    """Fichero SQLite en WAL compartido por los procesos de la máquina (una conexión por hilo)."""
+    name = "sqlite"
+
+    # Cada cuántos set() se purgan expirados y se recorta a max_entries
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._create_private(path)
+        self._local = threading.local()
+        self._sets = 0
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_entries ("
+                     "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, stored_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_stored_at ON cache_entries (stored_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @staticmethod
+    def _create_private(path: str) -> None:
+        """Directorio 0700 (si lo creamos nosotros) y fichero 0600 antes de que sqlite lo abra."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        # Un fichero ya existente (p. ej. creado con otro umask) también queda privado;
+        # los -wal/-shm de sqlite heredan los permisos del fichero principal
+        os.chmod(path, 0o600)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: cada sentencia es su propia transacción; busy timeout para escrituras concurrentes
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.ttl(key)[1]
+
+    def ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return 0, None
+        return (-1 if row[1] is None else max(0, int(row[1] - now))), bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl if ttl else None, now),
+        )
+        with self._lock:
+            self._sets += 1
+            prune = self._sets % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO cache_entries (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "stored_at = excluded.stored_at WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at <= ?",
+            (key, value, now + ttl if ttl else None, now, now),
+        )
+        return cur.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self, prefix: str = "") -> int:
+        # substr en vez de LIKE: los '_' y '%' de las claves no son comodines
+        cur = self._conn().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return cur.rowcount
+
+    def prune(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache_entries WHERE key IN ("
+            "SELECT key FROM cache_entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def incr(self, *keys: str) -> None:
+        if not keys:
+            return
+        self._conn().executemany(
+            "INSERT INTO cache_counters (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = cache_counters.value + 1",
+            [(key,) for key in keys],
+        )
+
+    def counters(self, *keys: str) -> Tuple[int, ...]:
+        if not keys:
+            return ()
+        rows = self._conn().execute(
+            f"SELECT key, value FROM cache_counters WHERE key IN ({','.join('?' * len(keys))})", keys
+        ).fetchall()
+        values = dict(rows)
+        return tuple(values.get(key, 0) for key in keys)
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class RedisStore(CacheStore):
+    """Servidor con protocolo Redis (redis, valkey, dragonfly...). Claves con CACHE_KEY_PREFIX."""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = CACHE_KEY_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self._k(key))
+
+    def ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        pipe = self._redis.pipeline()
+        pipe.ttl(self._k(key))
+        pipe.get(self._k(key))
+        ttl, value = pipe.execute()
+        return (ttl if value is not None else 0), value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._redis.set(self._k(key), value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self._redis.set(self._k(key), value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(self._k(key))
+
+    def clear(self, prefix: str = "") -> int:
+        deleted = 0
+        batch = []
+        for key in self._redis.scan_iter(match=self._k(prefix) + "*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted += self._redis.delete(*batch)
+                batch = []
+        if batch:
+            deleted += self._redis.delete(*batch)
+        return deleted
+
+    def incr(self, *keys: str) -> None:
+        pipe = self._redis.pipeline()
+        for key in keys:
+            pipe.incr(self._k("counter:" + key))
+        pipe.execute()
+
+    def counters(self, *keys: str) -> Tuple[int, ...]:
+        if not keys:
+            return ()
+        values = self._redis.mget([self._k("counter:" + key) for key in keys])
+        return tuple(int(v) if v is not None else 0 for v in values)
+
+    def size(self) -> int:
+        return self._redis.dbsize()
+
+
+# ==========================================
+# FASTAPI-CACHE ADAPTER
+# ==========================================
+
+class StoreBackend(Backend):
+    """Backend de fastapi-cache sobre un CacheStore (las llamadas síncronas van al threadpool)."""
+
+    def __init__(self, store: CacheStore, prefix: str = "fc:"):
+        self.store = store
+        self.prefix = prefix
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        return await run_in_threadpool(self.store.ttl, self.prefix + key)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await run_in_threadpool(self.store.get, self.prefix + key)
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        await run_in_threadpool(self.store.set, self.prefix + key, value, expire)
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if namespace:
+            return await run_in_threadpool(self.store.clear, self.prefix + namespace)
+        if key:
+            await run_in_threadpool(self.store.delete, self.prefix + key)
+            return 1
+        return 0
+
+
+# ==========================================
+# SINGLETON
+# ==========================================
+
+def resolve_cache_backend() -> str:
+    if CACHE_BACKEND in BACKENDS:
+        return CACHE_BACKEND
+    if CACHE_BACKEND != "auto":
+        print(f"WARNING: Unknown CACHE_BACKEND '{CACHE_BACKEND}', using 'auto'")
+    if CACHE_REDIS_URL:
+        return "redis"
+    return "sqlite" if WEB_CONCURRENCY > 1 else "memory"
+
+
+_cache_store = None
+_cache_store_resolved = False
+_cache_store_lock = threading.Lock()
+
+def get_shared_cache_store() -> Optional[CacheStore]:
+    """
+    Get or create the store shared by all worker processes, or None with the
+    'memory' backend (each cache keeps its own in-process structures).
+    """
+    global _cache_store, _cache_store_resolved
+    if not _cache_store_resolved:
+        with _cache_store_lock:
+            if not _cache_store_resolved:
+                backend = resolve_cache_backend()
+                if backend == "redis":
+                    if not CACHE_REDIS_URL:
+                        raise RuntimeError("CACHE_BACKEND=redis requires CACHE_REDIS_URL")
+                    _cache_store = RedisStore(CACHE_REDIS_URL)
+                elif backend == "sqlite":
+                    _cache_store = SQLiteStore()
+                print(f"🗄️ Cache backend: {backend}")
+                _cache_store_resolved = True
+    return _cache_store
+
+
+_local_lock_store = None
+
+def get_lock_store() -> CacheStore:
+    """Almacén de los locks entre procesos: el compartido, o uno del proceso con el backend 'memory'."""
+    global _local_lock_store
+    store = get_shared_cache_store()
+    if store is not None:
+        return store
+    if _local_lock_store is None:
+        with _cache_store_lock:
+            if _local_lock_store is None:
+                _local_lock_store = MemoryStore()
+    return _local_lock_store
+
+
+@contextmanager
+def store_lock(name: str, ttl: float) -> Iterator[bool]:
+    """
+    Lock entre workers sobre el almacén (CacheStore.add con TTL): 'with store_lock(...) as acquired'.
+    El TTL lo libera si el proceso muere con él tomado; debe cubrir la duración del trabajo.
+    Si el almacén falla no se adquiere (mejor saltarse una ejecución que duplicarla).
+    """
+    store = get_lock_store()
+    key = "lock:" + name
+    token = uuid.uuid4().hex.encode("ascii")
+    try:
+        acquired = store.add(key, token, ttl)
+    except Exception as e:
+        print(f"⚠️ Could not take lock '{name}': {e}")
+        acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                # Solo se borra si sigue siendo nuestro (pudo expirar y tomarlo otro worker)
+                if store.get(key) == token:
+                    store.delete(key)
+            except Exception as e:
+                print(f"⚠️ Could not release lock '{name}': {e}")
+
+
+def get_fastapi_cache_backend() -> Backend:
+    """Backend de FastAPICache: el almacén compartido si lo hay, si no InMemoryBackend."""
+    store = get_shared_cache_store()
+    if store is None:
+        from fastapi_cache.backends.inmemory import InMemoryBackend
+        return InMemoryBackend()
+    return StoreBackend(store)
+
+
+def describe_store(store: Optional[CacheStore]) -> Dict[str, Any]:
+    if store is None:
+        return {"backend": "memory"}
+    info: Dict[str, Any] = {"backend": store.name}
+    if isinstance(store, SQLiteStore):
+        info["path"] = store.path
+    return info
@@ -0,0 +1,261 @@
+"""
+Circuit Breaker - uno por backend (supabase / airtable) para DataService.
+
+Sin breaker, cada petición durante una caída de Postgres espera el error de Supabase y
+luego repite la consulta en Airtable (5-30 s por scan), lo que agota el rate limit de
+Airtable en segundos. Cada breaker lleva una ventana deslizante de resultados
+(CIRCUIT_WINDOW_SECONDS):
+- CLOSED: pasan todas las llamadas. Con al menos CIRCUIT_MIN_CALLS resultados en la
+  ventana y una tasa de fallos >= CIRCUIT_FAILURE_RATE, pasa a OPEN.
+- OPEN: se rechazan las llamadas (sin tocar el backend) durante CIRCUIT_OPEN_SECONDS.
+- HALF_OPEN: pasado ese tiempo se dejan pasar CIRCUIT_HALF_OPEN_PROBES llamadas de
+  prueba; si una funciona se cierra, si falla vuelve a OPEN.
+
+Qué hace DataService mientras Supabase está abierto lo decide CIRCUIT_OPEN_MODE:
+- "fallback" (defecto): Airtable si la política lo permite, si no el último resultado
+  bueno (stale), si no CircuitOpenError.
+- "stale": primero el último resultado bueno, luego Airtable, luego CircuitOpenError.
+- "fail_fast": CircuitOpenError directamente.
+
+DATA_FALLBACK_DENY es la política de fallback: métodos de DataService separados por
+comas que nunca caen a Airtable (p. ej. los scans completos get_top_donors,
+get_funnel_stats o get_monthly_source_breakdown).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, FrozenSet, Hashable, Optional, Tuple
+
+from backend.app.services.query_metrics import describe_error
+
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+OPEN_MODE_FALLBACK = "fallback"
+OPEN_MODE_STALE = "stale"
+OPEN_MODE_FAIL_FAST = "fail_fast"
+CIRCUIT_OPEN_MODE = os.getenv("CIRCUIT_OPEN_MODE", OPEN_MODE_FALLBACK).lower()
+
+DATA_FALLBACK_DENY: FrozenSet[str] = frozenset(
+    m.strip() for m in os.getenv("DATA_FALLBACK_DENY", "").split(",") if m.strip()
+)
+
+# Últimos resultados buenos por llamada (para el modo stale)
+STALE_CACHE_SIZE = int(os.getenv("STALE_CACHE_SIZE", "256"))
+STALE_MAX_AGE_SECONDS = float(os.getenv("STALE_MAX_AGE_SECONDS", "3600"))
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """El backend está en OPEN y no hay fallback ni resultado stale para esta llamada."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def fallback_allowed(method: str) -> bool:
+    """Política: ¿puede este método de DataService caer a Airtable?"""
+    return method not in DATA_FALLBACK_DENY
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Los ValueError son de la petición (cursor inválido, fecha mal formada), no del backend."""
+    return not isinstance(error, ValueError)
+
+
+class CircuitBreaker:
+    """Breaker por tasa de fallos en ventana deslizante, con half-open (thread-safe)."""
+
+    def __init__(self, name: str, failure_rate: float = CIRCUIT_FAILURE_RATE, min_calls: int = CIRCUIT_MIN_CALLS,
+                 window_seconds: float = CIRCUIT_WINDOW_SECONDS, open_seconds: float = CIRCUIT_OPEN_SECONDS,
+                 half_open_probes: int = CIRCUIT_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        self._state = STATE_CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (monotonic, ok)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self._metrics = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._last_error: Optional[str] = None
+
+    # ==========================================
+    # STATE
+    # ==========================================
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self, now: float) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._outcomes.clear()
+        self._metrics["opened"] += 1
+        print(f"🔌 Circuit '{self.name}' OPEN for {self.open_seconds:.0f}s (last error: {self._last_error})")
+
+    def allow(self) -> bool:
+        """¿Puede pasar esta llamada? En HALF_OPEN reserva una de las llamadas de prueba."""
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == STATE_OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._metrics["rejected"] += 1
+                    return False
+                self._state = STATE_HALF_OPEN
+                self._probes_in_flight = 0
+            if self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self._metrics["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._metrics["successes"] += 1
+            if self._state != STATE_CLOSED:
+                self._state = STATE_CLOSED
+                self._outcomes.clear()
+                print(f"🔌 Circuit '{self.name}' CLOSED")
+                return
+            now = time.monotonic()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        if error is not None and not counts_as_failure(error):
+            self.release()
+            return
+        with self._lock:
+            self._metrics["failures"] += 1
+            if error is not None:
+                # Solo tipo/SQLSTATE: /health/circuits no lleva auth y el mensaje del driver
+                # incluye valores de parámetros y datos del host
+                self._last_error = describe_error(error)
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == STATE_OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            if len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for _, ok in self._outcomes if not ok)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open(now)
+
+    def release(self) -> None:
+        """La llamada no dice nada del backend (error de la petición): libera la prueba si la había."""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def retry_after(self) -> float:
+        """Segundos hasta la próxima llamada de prueba (0 si no está abierto)."""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._outcomes.clear()
+            self._probes_in_flight = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self._state,
+                "window_calls": calls,
+                "window_failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "open_for_s": round(max(0.0, self.open_seconds - (now - self._opened_at)), 1)
+                if self._state == STATE_OPEN else 0.0,
+                "last_error": self._last_error,
+                **self._metrics,
+            }
+
+
+class StaleResultCache:
+    """LRU acotado con el último resultado bueno de cada llamada (solo se lee con un breaker abierto)."""
+
+    def __init__(self, max_entries: int = STALE_CACHE_SIZE, max_age: float = STALE_MAX_AGE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0}
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(encontrado, valor); las entradas más viejas que max_age no se sirven."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.max_age:
+                self._metrics["misses"] += 1
+                return False, None
+            self._metrics["hits"] += 1
+            return True, entry[1]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), **self._metrics}
+
+
+# Singleton instances (one breaker per backend)
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create the process-wide breaker of a backend ('supabase', 'airtable')"""
+    breaker = _circuit_breakers.get(name)
+    if breaker is None:
+        with _circuit_breakers_lock:
+            breaker = _circuit_breakers.get(name)
+            if breaker is None:
+                breaker = _circuit_breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def get_circuit_metrics() -> Dict[str, Any]:
+    with _circuit_breakers_lock:
+        breakers = dict(_circuit_breakers)
+    return {
+        "open_mode": CIRCUIT_OPEN_MODE,
+        "fallback_deny": sorted(DATA_FALLBACK_DENY),
+        "breakers": {name: b.get_metrics() for name, b in sorted(breakers.items())},
+    }
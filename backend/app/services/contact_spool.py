@@ -0,0 +1,82 @@
+"""
+Contact Spool - lectura completa de la lista de contactos, independiente del envío.
+
+Airtable caduca los iteradores de listado que quedan inactivos unos minutos
+(LIST_RECORDS_ITERATOR_NOT_AVAILABLE). Si las páginas se piden al ritmo del envío
+(~1 email/s con las pausas por cuenta de Gmail), una campaña grande pierde el offset
+a mitad de lista. El spool lee todas las páginas en su propio hilo, tan rápido como
+deje el governor de Airtable, y guarda solo (email, nombre): unos pocos MB para
+decenas de miles de contactos. Quien envía lo recorre a su ritmo; la cola acotada
+hacia los workers de Gmail sigue siendo el único punto con backpressure.
+"""
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_NAME = "Valued Supporter"
+
+
+class ContactSpool:
+    """Lista (email, nombre) que se llena en segundo plano y se recorre mientras crece."""
+
+    def __init__(self, pages: Iterable[List[Dict[str, Any]]], name: str = "contacts"):
+        self._pages = pages
+        self._items: List[Tuple[str, str]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.done = False
+        self.complete = False  # se leyeron todas las páginas (sin error ni close())
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._fill, name=f"contact-spool-{name}", daemon=True)
+
+    def start(self) -> "ContactSpool":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Deja de leer páginas (campaña cancelada); la página en curso termina."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def _fill(self) -> None:
+        try:
+            for page in self._pages:
+                rows = [
+                    (contact["Email"], contact.get("Name") or DEFAULT_NAME)
+                    for contact in page
+                    if isinstance(contact.get("Email"), str) and contact["Email"]
+                ]
+                with self._cond:
+                    if self._closed:
+                        return
+                    self._items.extend(rows)
+                    self._cond.notify_all()
+            self.complete = True
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """
+        Contactos en orden; espera a la siguiente página si aún no llegó. Si la lectura
+        falló, el error se lanza después del último contacto leído.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._items) and not self.done and not self._closed:
+                    self._cond.wait()
+                batch = self._items[index:]
+                if not batch:
+                    if self.error is not None:
+                        raise self.error
+                    return
+            index += len(batch)
+            yield from batch
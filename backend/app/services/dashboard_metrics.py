@@ -0,0 +1,120 @@
+"""
+Dashboard Metrics - periodos y formato de /dashboard/metrics.
+
+Compartido por la consulta combinada de Supabase (un solo round trip, ver
+SupabaseService.get_dashboard_overview) y el camino de respaldo de Airtable,
+que sigue calculando las cifras a partir de los resúmenes diarios.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+COSTA_RICA_TZ = ZoneInfo("America/Costa_Rica")
+
+# Días de la tendencia del "glance"
+GLANCE_TREND_DAYS = 30
+
+# Parámetros por defecto de los widgets /dashboard/top-donors y /dashboard/sources
+TOP_DONORS_DEFAULT_LIMIT = 10
+
+
+def costa_rica_today() -> date:
+    return datetime.now(COSTA_RICA_TZ).date()
+
+
+def default_source_range(today: date) -> Tuple[date, date]:
+    """Rango por defecto del widget de sources: mes en curso hasta hoy."""
+    return today.replace(day=1), today
+
+
+def dashboard_periods(today: date) -> Dict[str, date]:
+    """Fechas límite del glance: mes actual, mes anterior hasta el mismo día y tendencia."""
+    start_current_month = today.replace(day=1)
+    last_day_prev_month = start_current_month - timedelta(days=1)
+    start_prev_month = last_day_prev_month.replace(day=1)
+    # "Mismo día" del mes anterior, sin pasarse de su último día (31 de marzo -> 28/29 de febrero)
+    prev_month_same_day = start_prev_month + timedelta(days=min(today.day, last_day_prev_month.day) - 1)
+    return {
+        "today": today,
+        "start_current_month": start_current_month,
+        "start_prev_month": start_prev_month,
+        "prev_month_same_day": prev_month_same_day,
+        "trend_start": max(start_prev_month, today - timedelta(days=GLANCE_TREND_DAYS)),
+    }
+
+
+def build_glance_metrics(amount_today: float, count_today: int, amount_this_month: float,
+                         count_this_month: int, amount_last_month_same_day: float,
+                         glance_trend: List[Dict[str, Any]]) -> Dict[str, Any]:
+    mom_growth = 0.0
+    if amount_last_month_same_day > 0:
+        mom_growth = ((amount_this_month - amount_last_month_same_day) / amount_last_month_same_day) * 100
+    elif amount_this_month > 0:
+        mom_growth = 100.0
+
+    return {
+        "amountToday": round(amount_today, 2),
+        "donationsCountToday": count_today,
+        "amountThisMonth": round(amount_this_month, 2),
+        "donationsCountThisMonth": count_this_month,
+        "glanceTrend": glance_trend,
+        "momGrowth": round(mom_growth, 1),
+        "amountLastMonthSameDay": round(amount_last_month_same_day, 2)
+    }
+
+
+def glance_from_daily_summaries(daily_summaries: List[Dict[str, Any]], today: date) -> Dict[str, Any]:
+    """Glance a partir de los resúmenes diarios (desde el inicio del mes anterior hasta hoy)."""
+    periods = dashboard_periods(today)
+    amount_today = 0
+    count_today = 0
+    amount_this_month = 0
+    count_this_month = 0
+    amount_last_month_same_day = 0
+    glance_trend = []
+
+    for summary in daily_summaries:
+        try:
+            summary_date = date.fromisoformat(summary["date"])
+        except ValueError:
+            continue
+
+        if periods["start_current_month"] <= summary_date <= today:
+            amount_this_month += summary.get("total", 0)
+            count_this_month += summary.get("count", 0)
+            if summary_date == today:
+                amount_today = summary.get("total", 0)
+                count_today = summary.get("count", 0)
+
+        if periods["start_prev_month"] <= summary_date <= periods["prev_month_same_day"]:
+            amount_last_month_same_day += summary.get("total", 0)
+
+        if summary_date >= periods["trend_start"]:
+            glance_trend.append(summary)
+
+    return build_glance_metrics(amount_today, count_today, amount_this_month, count_this_month,
+                                amount_last_month_same_day, glance_trend)
+
+
+def build_filtered_metrics(amount_in_range: float, count_in_range: int,
+                           daily_trend: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "amountInRange": round(amount_in_range, 2),
+        "donationsCount": count_in_range,
+        "dailyTrend": daily_trend,
+    }
+
+
+def fill_hourly_trend(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Tendencia por hora completa 00:00-23:00 (las horas sin donaciones en 0)."""
+    hourly_map = {row['hour']: row for row in rows}
+    final_results = []
+    for h in range(24):
+        hour_str = f"{h:02d}:00"
+        row: Optional[Dict[str, Any]] = hourly_map.get(hour_str)
+        final_results.append({
+            "date": hour_str,  # Using 'date' key to match frontend expectation
+            "total": float(row['total']) if row else 0.0,
+            "count": int(row['count']) if row else 0
+        })
+    return final_results
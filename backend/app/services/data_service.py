@@ -1,221 +1,399 @@
+import functools
 import os
-from typing import Dict, Any, List, Optional
+import threading
+import weakref
+from typing import Dict, Any, Callable, Hashable, Iterator, List, Optional
 from datetime import date
 from backend.app.services.supabase_service import get_supabase_service, SupabaseService
-from backend.app.services.airtable_service import get_airtable_service, AirtableService
+from backend.app.services.airtable_service import get_airtable_service, AirtableService, raise_airtable_errors
+from backend.app.services.async_supabase_service import get_async_supabase_service, AsyncSupabaseService
+from backend.app.services.supabase_queries import decode_donations_cursor
+from backend.app.services.dashboard_metrics import (
+    TOP_DONORS_DEFAULT_LIMIT,
+    default_source_range,
+    dashboard_periods,
+    glance_from_daily_summaries,
+    build_filtered_metrics,
+)
+from backend.app.services.circuit_breaker import (
+    CIRCUIT_OPEN_MODE,
+    OPEN_MODE_FAIL_FAST,
+    OPEN_MODE_STALE,
+    CircuitBreaker,
+    CircuitOpenError,
+    StaleResultCache,
+    fallback_allowed,
+    get_circuit_breaker,
+)
+from backend.app.services.single_flight import SingleFlight, get_single_flight
+from backend.app.services.donation_export import ExportBusyError, acquire_export_slot, release_export_slot
+from backend.app.services.result_cache import (
+    FRESH,
+    STALE,
+    ResultCache,
+    get_refresh_executor,
+    get_result_cache,
+    result_tags,
+    swr_max_stale,
+)
+from starlette.concurrency import run_in_threadpool
+
+def _ensure_offset_paging(cursor: Optional[str]) -> None:
+    """
+    Airtable no puede paginar por cursor (seek). Si la petición trae cursor y Supabase
+    falló, se propaga el error en vez de devolver la primera página por error.
+    """
+    if cursor:
+        decode_donations_cursor(cursor)  # ValueError si el cursor es inválido
+        raise RuntimeError("Cursor pagination is unavailable while Supabase is down; retry with offset paging")
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _call_key(method: str, args: tuple) -> Hashable:
+    """
+    Clave normalizada (hashable) de una llamada a DataService: listas -> tuplas y sin los
+    None finales (argumentos opcionales omitidos), para que la misma llamada desde el
+    DataService sync y el async comparta clave.
+    """
+    args = list(args)
+    while args and args[-1] is None:
+        args.pop()
+    return (method,) + tuple(_freeze(a) for a in args)
+
+
+def _chain_first(first: Optional[List[Dict[str, Any]]], rest: Iterator[List[Dict[str, Any]]],
+                 on_close: Optional[Callable[[], None]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Re-encadena un lote ya leído; cerrar este generador cierra también 'rest' (y su conexión)."""
+    try:
+        if first is not None:
+            yield first
+            yield from rest
+    finally:
+        try:
+            rest.close()
+        finally:
+            if on_close is not None:
+                on_close()
+
+
+def _run_once(fn: Callable[[], None]) -> Callable[[], None]:
+    lock = threading.Lock()
+    done = []
+
+    def wrapper():
+        with lock:
+            if done:
+                return
+            done.append(True)
+        fn()
+    return wrapper
+
 
 class DataService:
     def __init__(self):
         self.supabase: SupabaseService = get_supabase_service()
         self.airtable: AirtableService = get_airtable_service()
+        # Un breaker por backend (compartidos por el proceso) + últimos resultados buenos
+        self.supabase_breaker: CircuitBreaker = get_circuit_breaker("supabase")
+        self.airtable_breaker: CircuitBreaker = get_circuit_breaker("airtable")
+        self.stale_results = StaleResultCache()
+        # Llamadas idénticas en curso se ejecutan una sola vez (ver single_flight.py)
+        self.single_flight: SingleFlight = get_single_flight()
+        # Resultados de Supabase válidos hasta el próximo sync que toque sus tags (ver result_cache.py)
+        self.result_cache: ResultCache = get_result_cache()
 
-    def get_daily_summaries(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    # ==========================================
+    # SUPABASE -> AIRTABLE (circuit breakers, ver circuit_breaker.py)
+    # ==========================================
+
+    def _fetch(self, method: str, args: tuple, supabase_call: Callable[[], Any],
+               airtable_call: Optional[Callable[[], Any]] = None, cursor: Optional[str] = None) -> Any:
         """
-        Fetches daily summaries from Supabase, falling back to Airtable on error.
+        Supabase si su circuito lo permite; si falla o está abierto, _fallback.
+        Las llamadas idénticas concurrentes comparten una sola ejecución (single flight) y
+        los resultados se reutilizan mientras no cambie el watermark de sus tags.
         """
+        key = _call_key(method, args)
+        tags = result_tags(method, args)
+        if tags is not None:
+            state, value = self.result_cache.get(key, tags, swr_max_stale(method))
+            if state == FRESH:
+                return value
+            if state == STALE:
+                self._revalidate(method, key, tags, supabase_call)
+                return value
+        return self.single_flight.do(
+            key, lambda: self._fetch_uncoalesced(method, key, tags, supabase_call, airtable_call, cursor)
+        )
+
+    def _revalidate(self, method: str, key: Hashable, tags: tuple, supabase_call: Callable[[], Any]) -> None:
+        """Stale-while-revalidate: recalcula la entrada en segundo plano (uno por clave a la vez)."""
+        if not self.result_cache.begin_refresh(key):
+            return
+
+        def refresh():
+            try:
+                # Solo Supabase: un scan de Airtable en segundo plano no compensa; si falla, sigue la entrada stale
+                self.single_flight.do(key, lambda: self._fetch_uncoalesced(method, key, tags, supabase_call, None, None))
+            except Exception as e:
+                print(f"⚠️ Background refresh of {method} failed: {e}")
+            finally:
+                self.result_cache.end_refresh(key)
+
+        try:
+            get_refresh_executor().submit(refresh)
+        except RuntimeError:  # executor cerrado (apagado)
+            self.result_cache.end_refresh(key)
+
+    def _fetch_uncoalesced(self, method: str, key: Hashable, tags: Optional[tuple], supabase_call: Callable[[], Any],
+                           airtable_call: Optional[Callable[[], Any]], cursor: Optional[str]) -> Any:
+        if not self.supabase_breaker.allow():
+            print(f"🔌 Supabase circuit open, skipping Supabase ({method})")
+            return self._fallback(method, key, airtable_call, cursor, None)
+        # Watermark leído antes de la consulta: si un sync escribe mientras tanto, la entrada ya nace vieja
+        version = self.result_cache.version(tags) if tags is not None else None
         try:
-            print("Attempting to fetch daily summaries from Supabase...")
-            return self.supabase.get_daily_summaries(start_date, end_date)
+            print(f"Attempting to fetch {method} from Supabase...")
+            result = supabase_call()
         except Exception as e:
-            print(f"⚠️ Supabase Error (get_daily_summaries): {e}")
+            self.supabase_breaker.record_failure(e)
+            print(f"⚠️ Supabase Error ({method}): {e}")
+            return self._fallback(method, key, airtable_call, cursor, e)
+        self.supabase_breaker.record_success()
+        self.stale_results.put(key, result)
+        if tags is not None:
+            self.result_cache.put(key, tags, version, result)
+        return result
+
+    def _fallback(self, method: str, key: Hashable, airtable_call: Optional[Callable[[], Any]],
+                  cursor: Optional[str], error: Optional[Exception]) -> Any:
+        """
+        Respuesta sin Supabase ('error' None = no se intentó porque su circuito está abierto):
+        Airtable si la política y su propio circuito lo permiten, si no el último resultado
+        bueno, si no se propaga el error (o CircuitOpenError).
+        """
+        if error is None:
+            if CIRCUIT_OPEN_MODE == OPEN_MODE_FAIL_FAST:
+                raise CircuitOpenError(f"Supabase circuit is open ({method})", self.supabase_breaker.retry_after())
+            if CIRCUIT_OPEN_MODE == OPEN_MODE_STALE:
+                found, value = self.stale_results.get(key)
+                if found:
+                    print(f"Serving last good {method} result (Supabase circuit open)")
+                    return value
+
+        # Airtable no pagina por cursor (seek): nunca cae a Airtable una petición con cursor
+        if airtable_call is not None and not cursor and fallback_allowed(method) and self.airtable_breaker.allow():
             print("Falling back to Airtable...")
-            return self.airtable.get_daily_summaries(start_date, end_date)
+            try:
+                # Los métodos de Airtable devuelven vacío ante un error; aquí se propaga (breaker)
+                with raise_airtable_errors():
+                    result = airtable_call()
+            except Exception as e:
+                self.airtable_breaker.record_failure(e)
+                raise
+            self.airtable_breaker.record_success()
+            return result
+
+        found, value = self.stale_results.get(key)
+        if found:
+            print(f"Serving last good {method} result (no fallback available)")
+            return value
+        _ensure_offset_paging(cursor)
+        if error is not None:
+            raise error
+        raise CircuitOpenError(f"Supabase circuit is open and {method} has no fallback",
+                               self.supabase_breaker.retry_after())
+
+    # ==========================================
+    # DASHBOARD
+    # ==========================================
+
+    def get_daily_summaries(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """
+        Fetches daily summaries from Supabase, falling back to Airtable on error.
+        """
+        return self._fetch(
+            "get_daily_summaries", (start_date, end_date),
+            lambda: self.supabase.get_daily_summaries(start_date, end_date),
+            lambda: self.airtable.get_daily_summaries(start_date, end_date),
+        )
+
+    def get_dashboard_overview(self, today: date, start_date: Optional[date] = None,
+                               end_date: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Glance + filtered-range (+ funnel) numbers of /dashboard/metrics.
+        Supabase answers in one round trip; the Airtable fallback rebuilds them from
+        daily summaries (without funnel: /dashboard/funnel-stats still serves it).
+        """
+        return self._fetch(
+            "get_dashboard_overview", (today, start_date, end_date),
+            lambda: self.supabase.get_dashboard_overview(today, start_date, end_date),
+            lambda: self._airtable_dashboard_overview(today, start_date, end_date),
+        )
+
+    def _airtable_dashboard_overview(self, today: date, start_date: Optional[date],
+                                     end_date: Optional[date]) -> Dict[str, Any]:
+        periods = dashboard_periods(today)
+        glance = glance_from_daily_summaries(
+            self.airtable.get_daily_summaries(periods["start_prev_month"], today), today
+        )
+        filtered = {}
+        if start_date and end_date:
+            try:
+                summaries_in_range = self.airtable.get_daily_summaries(start_date, end_date)
+                # Sin Supabase no hay tendencia por hora: se usa la diaria
+                filtered = build_filtered_metrics(
+                    sum(s.get("total", 0) for s in summaries_in_range),
+                    sum(s.get("count", 0) for s in summaries_in_range),
+                    summaries_in_range,
+                )
+            except Exception as e_filter:
+                print(f"Error filtering metrics: {e_filter}")
+        return {"glance": glance, "filtered": filtered, "funnel": None}
 
     def get_top_donors(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Fetches top donors from Supabase, falling back to Airtable on error.
         """
-        try:
-            print("Attempting to fetch top donors from Supabase...")
-            return self.supabase.get_top_donors_stats(limit)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_top_donors): {e}")
-            print("Falling back to Airtable...")
-            # Airtable implementation requires fetching all donations and processing in Python
-            # The existing endpoint logic did this manually using airtable_service.get_donations_with_donor_info()
-            # We can replicate that logic here or call a method on airtable_service if we move it there.
-            # For now, let's assume we use the service method that returns raw data and process it, 
-            # OR better, we can move the processing logic into AirtableService to match the interface.
-            # However, looking at the existing code in dashboard.py, it calls `get_donations_with_donor_info` 
-            # and then processes it. 
-            # To keep DataService clean, we should probably implement `get_top_donors_stats` in AirtableService too 
-            # or handle the difference here.
-            
-            # Let's rely on the existing logic in dashboard.py which we are moving here?
-            # Actually, the plan was to have DataService provide a unified interface.
-            # So we should implement the aggregation logic for Airtable HERE or in AirtableService.
-            # Let's implement it here using the raw Airtable data to match the Supabase output.
-            
-            all_donations = self.airtable.get_donations_with_donor_info()
-            from collections import defaultdict
-            from datetime import datetime
-            
-            donor_stats = defaultdict(lambda: {"totalAmount": 0, "donationsCount": 0, "name": "", "firstDonationDate": None})
-
-            for donation in all_donations:
-                email = donation.get("email")
-                if not email: continue
-                
-                amount = donation.get("amount", 0)
-                donor_stats[email]["totalAmount"] += amount
-                donor_stats[email]["donationsCount"] += 1
-                if not donor_stats[email]["name"] or donor_stats[email]["name"] == "Anonymous":
-                     donor_stats[email]["name"] = donation.get("name", "Anonymous")
-                     
-                donation_date = donation.get("date")
-                if donation_date:
-                    # donation_date is typically a string "YYYY-MM-DD"
-                    if not donor_stats[email]["firstDonationDate"] or donation_date < donor_stats[email]["firstDonationDate"]:
-                        donor_stats[email]["firstDonationDate"] = donation_date
-
-            top_donors_list = [
-                {"email": email, **stats} for email, stats in donor_stats.items()
-            ]
-            sorted_donors = sorted(top_donors_list, key=lambda x: x["totalAmount"], reverse=True)
-            return sorted_donors[:limit]
+        return self._fetch(
+            "get_top_donors", (limit,),
+            lambda: self.supabase.get_top_donors_stats(limit),
+            # Streaming aggregation in AirtableService; only the top donors are resolved to name/email
+            lambda: self.airtable.get_top_donors_stats(limit),
+        )
 
     def get_monthly_source_breakdown(self, start_date: date, end_date: date) -> Dict[str, Any]:
         """
         Fetches source breakdown from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch source breakdown from Supabase...")
-            # We need to implement this in SupabaseService
-            return self.supabase.get_monthly_source_breakdown(start_date, end_date)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_monthly_source_breakdown): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_monthly_source_breakdown(start_date, end_date)
+        return self._fetch(
+            "get_monthly_source_breakdown", (start_date, end_date),
+            lambda: self.supabase.get_monthly_source_breakdown(start_date, end_date),
+            lambda: self.airtable.get_monthly_source_breakdown(start_date, end_date),
+        )
+
+    def warm_dashboard_widgets(self, today: date) -> None:
+        """
+        Calienta top donors y sources con sus parámetros por defecto (al arrancar y tras
+        cada sync): una entrada stale se revalida en segundo plano y una clave nueva (día o
+        mes nuevo) se calcula aquí, no en la petición de un usuario.
+        """
+        for method, call in (
+            ("get_top_donors", lambda: self.get_top_donors(TOP_DONORS_DEFAULT_LIMIT)),
+            ("get_monthly_source_breakdown", lambda: self.get_monthly_source_breakdown(*default_source_range(today))),
+        ):
+            try:
+                call()
+            except Exception as e:
+                print(f"⚠️ Could not warm {method}: {e}")
+
+    # ==========================================
+    # CAMPAIGNS / SOURCES / FORM TITLES
+    # ==========================================
 
     def get_source_stats(self, source_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
         """
         Fetches source stats from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch source stats from Supabase...")
-            return self.supabase.get_source_stats(source_name, start_date, end_date)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_source_stats): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_source_stats(source_name, start_date, end_date)
+        return self._fetch(
+            "get_source_stats", (source_name, start_date, end_date),
+            lambda: self.supabase.get_source_stats(source_name, start_date, end_date),
+            lambda: self.airtable.get_source_stats(source_name, start_date, end_date),
+        )
 
     def get_campaign_stats(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, form_title_ids: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Fetches campaign stats from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch campaign stats from Supabase...")
-            return self.supabase.get_campaign_stats(campaign_id, start_date, end_date, form_title_ids)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_campaign_stats): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_campaign_stats(campaign_id, start_date, end_date, form_title_ids)
+        return self._fetch(
+            "get_campaign_stats", (campaign_id, start_date, end_date, form_title_ids),
+            lambda: self.supabase.get_campaign_stats(campaign_id, start_date, end_date, form_title_ids),
+            lambda: self.airtable.get_campaign_stats(campaign_id, start_date, end_date, form_title_ids),
+        )
 
-    def get_campaign_donations(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0) -> Dict[str, Any]:
+    def get_campaign_donations(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
         """
         Fetches campaign donations from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch campaign donations from Supabase...")
-            return self.supabase.get_campaign_donations(campaign_id, start_date, end_date, page_size, offset)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_campaign_donations): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_campaign_donations(campaign_id, start_date, end_date, page_size, offset)
+        return self._fetch(
+            "get_campaign_donations", (campaign_id, start_date, end_date, page_size, offset, cursor),
+            lambda: self.supabase.get_campaign_donations(campaign_id, start_date, end_date, page_size, offset, cursor),
+            lambda: self.airtable.get_campaign_donations(campaign_id, start_date, end_date, page_size, offset),
+            cursor=cursor,
+        )
 
-    def get_source_donations(self, source_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0) -> Dict[str, Any]:
+    def get_source_donations(self, source_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
         """
         Fetches donations for all campaigns in a source from Supabase, falling back to Airtable.
         """
-        try:
-            print(f"Attempting to fetch source donations from Supabase for source: {source_name}...")
-            return self.supabase.get_source_donations(source_name, start_date, end_date, page_size, offset)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_source_donations): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_source_donations(source_name, start_date, end_date, page_size, offset)
-
+        return self._fetch(
+            "get_source_donations", (source_name, start_date, end_date, page_size, offset, cursor),
+            lambda: self.supabase.get_source_donations(source_name, start_date, end_date, page_size, offset, cursor),
+            lambda: self.airtable.get_source_donations(source_name, start_date, end_date, page_size, offset),
+            cursor=cursor,
+        )
 
     def get_campaigns_by_source(self, source: str) -> List[Dict[str, Any]]:
         """
-        Fetches campaigns by source from Supabase (not implemented yet in SupabaseService?), falling back to Airtable.
+        Fetches campaigns by source from Supabase, falling back to Airtable.
         """
-        # TODO: Implement get_campaigns in SupabaseService if needed. For now, fallback to Airtable or implement if easy.
-        # SupabaseService doesn't seem to have get_campaigns yet.
-        # Let's check SupabaseService again or just fallback for now.
-        # Actually, let's implement it in SupabaseService too for completeness, but for now let's just fallback if not present.
-        # But wait, DataService should try Supabase first.
-        # Let's assume we will add it to SupabaseService or just use Airtable for this one if it's low priority.
-        # Given the user's request "why is it using airtable", we should try to move EVERYTHING.
-        # I'll add get_campaigns to SupabaseService in the next step.
-        try:
-            print("Attempting to fetch campaigns from Supabase...")
-            # Assuming we will add this method to SupabaseService
-            return self.supabase.get_campaigns(source)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_campaigns): {e}")
-            print("Falling back to Airtable...")
-            print("Falling back to Airtable...")
-            return self.airtable.get_campaigns(source)
+        return self._fetch(
+            "get_campaigns_by_source", (source,),
+            lambda: self.supabase.get_campaigns(source),
+            lambda: self.airtable.get_campaigns(source),
+        )
 
     def get_hourly_trend(self, target_date: date) -> List[Dict[str, Any]]:
         """
-        Get hourly trend for a specific date from Supabase.
+        Get hourly trend for a specific date from Supabase (empty trend if it fails).
         """
-        try:
-            return self.supabase.get_hourly_trend(target_date)
-        except Exception as e:
-            print(f"Supabase get_hourly_trend failed: {e}")
-            return []
+        return self._fetch(
+            "get_hourly_trend", (target_date,),
+            lambda: self.supabase.get_hourly_trend(target_date),
+            lambda: [],
+        )
 
     def get_unique_campaign_sources(self) -> List[str]:
         """
         Fetches unique sources.
         """
-        try:
-            print("Attempting to fetch unique sources from Supabase...")
-            return self.supabase.get_unique_campaign_sources()
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_unique_campaign_sources): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_unique_campaign_sources()
-
-    def get_donations_for_form_title(self, form_title_ids: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0) -> Dict[str, Any]:
-        """
-        Fetches donations for specific form titles from Supabase, falling back to Airtable.
-        """
-        try:
-            print("Attempting to fetch donations for form titles from Supabase...")
-            # SupabaseService has get_donations_for_form_title
-            return self.supabase.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_donations_for_form_title): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset)
+        return self._fetch(
+            "get_unique_campaign_sources", (),
+            self.supabase.get_unique_campaign_sources,
+            self.airtable.get_unique_campaign_sources,
+        )
 
     def get_form_titles(self, campaign_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Fetches form titles from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch form titles from Supabase...")
-            return self.supabase.get_form_titles(campaign_id)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_form_titles): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_form_titles(campaign_id)
+        return self._fetch(
+            "get_form_titles", (campaign_id,),
+            lambda: self.supabase.get_form_titles(campaign_id),
+            lambda: self.airtable.get_form_titles(campaign_id),
+        )
 
-    def get_donations_for_form_title(self, form_title_ids: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0) -> Dict[str, Any]:
+    def get_donations_for_form_title(self, form_title_ids: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
         """
         Fetches donations for form title from Supabase, falling back to Airtable.
         """
-        try:
-            print("Attempting to fetch form title donations from Supabase...")
-            return self.supabase.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_donations_for_form_title): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset)
+        return self._fetch(
+            "get_donations_for_form_title", (form_title_ids, start_date, end_date, page_size, offset, cursor),
+            lambda: self.supabase.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset, cursor),
+            lambda: self.airtable.get_donations_for_form_title(form_title_ids, start_date, end_date, page_size, offset),
+            cursor=cursor,
+        )
+
+    # ==========================================
+    # DONORS
+    # ==========================================
 
     def get_donor_by_email(self, email: str) -> Dict[str, Any]:
         """
@@ -226,78 +404,109 @@ class DataService:
             "donations": [{"id": "...", "amount": 100, "date": "...", "form_title": "..."}]
         }
         """
-        try:
-            print(f"Attempting to fetch donor by email {email} from Supabase...")
-            return self.supabase.get_donor_by_email(email)
-        except Exception as e:
-            print(f"⚠️ Supabase Error (get_donor_by_email): {e}")
-            print("Falling back to Airtable...")
-            
-            # Fallback to Airtable and normalize
-            raw_result = self.airtable.get_airtable_data_by_email(email)
-            donor_record = raw_result.get("donor_info")
-            donation_records = raw_result.get("donations", [])
-            
-            if not donor_record:
-                return {"donor": None, "donations": []}
-                
-            fields = donor_record.get("fields", {})
-            
-            # Get all emails linked to this donor
-            # Airtable stores links to Emails table, so we need to fetch them or use what we have
-            # The raw result might not have the full list of emails strings, just IDs.
-            # We can try to fetch them if needed, or just use the one we searched for.
-            # For now, let's use the helper if available or just the current email.
-            email_ids = fields.get("Emails", []) # This is the link field name in AirtableService
-            # Wait, AirtableService.DONORS_FIELDS['emails_link'] is "Emails"
-            
-            all_emails = []
-            if email_ids:
-                try:
-                    all_emails = self.airtable.get_emails_from_ids(email_ids)
-                except:
-                    all_emails = [email]
+        return self._fetch(
+            "get_donor_by_email", (email,),
+            lambda: self.supabase.get_donor_by_email(email),
+            lambda: self._airtable_donor_by_email(email),
+        )
+
+    def _airtable_donor_by_email(self, email: str) -> Dict[str, Any]:
+        # Fallback to Airtable and normalize
+        raw_result = self.airtable.get_airtable_data_by_email(email)
+        donor_record = raw_result.get("donor_info")
+        donation_records = raw_result.get("donations", [])
+        
+        if not donor_record:
+            return {"donor": None, "donations": []}
             
-            normalized_donor = {
-                "id": donor_record.get("id"),
-                "name": f"{fields.get('Name', '')} {fields.get('Last Name', '')}".strip(),
-                "email": email,
-                "emails": all_emails,
-                "phone": fields.get("Phone")
-            }
+        fields = donor_record.get("fields", {})
+        
+        # Get all emails linked to this donor
+        # Airtable stores links to Emails table, so we need to fetch them or use what we have
+        # The raw result might not have the full list of emails strings, just IDs.
+        # We can try to fetch them if needed, or just use the one we searched for.
+        # For now, let's use the helper if available or just the current email.
+        email_ids = fields.get("Emails", []) # This is the link field name in AirtableService
+        # Wait, AirtableService.DONORS_FIELDS['emails_link'] is "Emails"
+        
+        all_emails = []
+        if email_ids:
+            try:
+                all_emails = self.airtable.get_emails_from_ids(email_ids)
+            except:
+                all_emails = [email]
+        
+        normalized_donor = {
+            "id": donor_record.get("id"),
+            "name": f"{fields.get('Name', '')} {fields.get('Last Name', '')}".strip(),
+            "email": email,
+            "emails": all_emails,
+            "phone": fields.get("Phone")
+        }
+        
+        normalized_donations = []
+        for d in donation_records:
+            d_fields = d.get("fields", {})
+            normalized_donations.append({
+                "id": d.get("id"),
+                "amount": d_fields.get("Amount", 0),
+                "date": d_fields.get("Date"),
+                # Form title might be a link, so we might not have the name directly here
+                # unless we fetched it. AirtableService.get_airtable_data_by_email 
+                # fetches 'Form Title' (link) but maybe not the name.
+                # Let's check AirtableService again. 
+                # It fetches fields=[DONATIONS_FIELDS["amount"], DONATIONS_FIELDS["date"], DONATIONS_FIELDS["form_title_link"]]
+                # So we don't have the name. We'll leave it empty or ID for now.
+                "form_title": str(d_fields.get("Form Title", ["Unknown"])[0]) if isinstance(d_fields.get("Form Title"), list) else "Unknown"
+            })
             
-            normalized_donations = []
-            for d in donation_records:
-                d_fields = d.get("fields", {})
-                normalized_donations.append({
-                    "id": d.get("id"),
-                    "amount": d_fields.get("Amount", 0),
-                    "date": d_fields.get("Date"),
-                    # Form title might be a link, so we might not have the name directly here
-                    # unless we fetched it. AirtableService.get_airtable_data_by_email 
-                    # fetches 'Form Title' (link) but maybe not the name.
-                    # Let's check AirtableService again. 
-                    # It fetches fields=[DONATIONS_FIELDS["amount"], DONATIONS_FIELDS["date"], DONATIONS_FIELDS["form_title_link"]]
-                    # So we don't have the name. We'll leave it empty or ID for now.
-                    "form_title": str(d_fields.get("Form Title", ["Unknown"])[0]) if isinstance(d_fields.get("Form Title"), list) else "Unknown"
-                })
-                
-            return {
-                "donor": normalized_donor,
-                "donations": normalized_donations
-            }
+        return {
+            "donor": normalized_donor,
+            "donations": normalized_donations
+        }
 
 
-    def get_funnel_stats(self) -> Dict[str, Any]:
+    def iter_donation_export_batches(self, scope: str, scope_value: Any, start_date: Optional[str] = None,
+                                     end_date: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
         """
-        Fetches funnel stats from Supabase, falling back to Airtable.
+        Lotes de donaciones para exportar (ver donation_export.py). Solo Supabase: Airtable
+        no tiene cursores en el servidor y paginarlo entero no es una exportación viable.
+        El primer lote se lee aquí, para que un fallo de Supabase se devuelva como error
+        HTTP y no como una respuesta cortada a medias. Cada exportación ocupa un hueco de
+        EXPORT_MAX_CONCURRENT hasta que el generador se agota o se cierra (ExportBusyError si no
+        queda ninguno).
         """
+        if not self.supabase_breaker.allow():
+            raise CircuitOpenError("Supabase circuit is open (donation export)", self.supabase_breaker.retry_after())
         try:
-            return self.supabase.get_funnel_stats()
+            acquire_export_slot()
+        except ExportBusyError:
+            self.supabase_breaker.release()
+            raise
+        batches = self.supabase.iter_donation_export_batches(scope, scope_value, start_date, end_date)
+        try:
+            first = next(batches, None)
         except Exception as e:
-            print(f"⚠️ Supabase Error (get_funnel_stats): {e}")
-            print("Falling back to Airtable...")
-            return self.airtable.get_funnel_stats()
+            release_export_slot()
+            self.supabase_breaker.record_failure(e)
+            print(f"⚠️ Supabase Error (iter_donation_export_batches): {e}")
+            raise
+        self.supabase_breaker.record_success()
+        release = _run_once(release_export_slot)
+        chained = _chain_first(first, batches, on_close=release)
+        # Si la respuesta nunca llega a iterarlo (cliente desconectado antes), el hueco se libera al recolectarlo
+        weakref.finalize(chained, release)
+        return chained
+
+    def get_funnel_stats(self) -> Dict[str, Any]:
+        """
+        Fetches funnel stats from Supabase, falling back to Airtable.
+        """
+        return self._fetch(
+            "get_funnel_stats", (),
+            self.supabase.get_funnel_stats,
+            self.airtable.get_funnel_stats,
+        )
 
 # Singleton
 _data_service_instance = None
@@ -307,3 +516,91 @@ def get_data_service() -> DataService:
     if _data_service_instance is None:
         _data_service_instance = DataService()
     return _data_service_instance
+
+
+class AsyncDataService:
+    """
+    Async version of DataService for async routes (analytics).
+    Supabase is queried on the async pool without taking a threadpool slot;
+    only the Airtable fallback (sync pyairtable) runs in the threadpool.
+    If psycopg 3 is not available, every call goes through the sync DataService.
+    """
+    def __init__(self, sync_service: DataService):
+        self.sync = sync_service
+        self.supabase: Optional[AsyncSupabaseService] = get_async_supabase_service()
+
+    async def _fetch(self, method: str, *args, cursor: Optional[str] = None) -> Any:
+        # 'cursor' solo lo entiende Supabase (paginación seek); Airtable pagina por offset
+        cursor_kwargs = {"cursor": cursor} if cursor else {}
+        if self.supabase is None:
+            return await run_in_threadpool(getattr(self.sync, method), *args, **cursor_kwargs)
+        key = _call_key(method, args + (cursor,))
+        tags = result_tags(method, args)
+        if tags is not None:
+            state, value = self.sync.result_cache.get(key, tags, swr_max_stale(method))
+            if state == FRESH:
+                return value
+            if state == STALE:
+                self.sync._revalidate(method, key, tags,
+                                      functools.partial(getattr(self.sync.supabase, method), *args, **cursor_kwargs))
+                return value
+        return await self.sync.single_flight.do_async(
+            key, lambda: self._fetch_uncoalesced(method, key, tags, args, cursor, cursor_kwargs)
+        )
+
+    async def _fetch_uncoalesced(self, method: str, key: Hashable, tags: Optional[tuple], args: tuple,
+                                 cursor: Optional[str], cursor_kwargs: Dict[str, Any]) -> Any:
+        # Mismos breakers, política de fallback, resultados stale y result cache que el DataService sync
+        sync = self.sync
+        airtable_call = functools.partial(getattr(sync.airtable, method), *args)
+        if not sync.supabase_breaker.allow():
+            print(f"🔌 Supabase circuit open, skipping Supabase ({method})")
+            return await run_in_threadpool(sync._fallback, method, key, airtable_call, cursor, None)
+        version = sync.result_cache.version(tags) if tags is not None else None
+        try:
+            print(f"Attempting to fetch {method} from Supabase (async)...")
+            result = await getattr(self.supabase, method)(*args, **cursor_kwargs)
+        except Exception as e:
+            sync.supabase_breaker.record_failure(e)
+            print(f"⚠️ Supabase Error ({method}): {e}")
+            return await run_in_threadpool(sync._fallback, method, key, airtable_call, cursor, e)
+        sync.supabase_breaker.record_success()
+        sync.stale_results.put(key, result)
+        if tags is not None:
+            sync.result_cache.put(key, tags, version, result)
+        return result
+
+    async def get_source_stats(self, source_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        return await self._fetch("get_source_stats", source_name, start_date, end_date)
+
+    async def get_campaign_stats(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, form_title_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._fetch("get_campaign_stats", campaign_id, start_date, end_date, form_title_ids)
+
+    async def get_campaign_donations(self, campaign_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+        return await self._fetch("get_campaign_donations", campaign_id, start_date, end_date, page_size, offset, cursor=cursor)
+
+    async def get_source_donations(self, source_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+        return await self._fetch("get_source_donations", source_name, start_date, end_date, page_size, offset, cursor=cursor)
+
+    async def get_donations_for_form_title(self, form_title_ids: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 50, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+        return await self._fetch("get_donations_for_form_title", form_title_ids, start_date, end_date, page_size, offset, cursor=cursor)
+
+    # Shared views only live in Supabase (no Airtable fallback)
+    async def create_shared_view(self, configuration: Dict[str, Any], created_by: Optional[str] = None) -> str:
+        if self.supabase is None:
+            return await run_in_threadpool(self.sync.supabase.create_shared_view, configuration, created_by)
+        return await self.supabase.create_shared_view(configuration, created_by)
+
+    async def get_shared_view(self, token: str) -> Optional[Dict[str, Any]]:
+        if self.supabase is None:
+            return await run_in_threadpool(self.sync.supabase.get_shared_view, token)
+        return await self.supabase.get_shared_view(token)
+
+
+_async_data_service_instance = None
+
+def get_async_data_service() -> AsyncDataService:
+    global _async_data_service_instance
+    if _async_data_service_instance is None:
+        _async_data_service_instance = AsyncDataService(get_data_service())
+    return _async_data_service_instance
@@ -0,0 +1,306 @@
+"""
+Supabase Connection Pool - thread-safe psycopg2 pool shared by the sync services.
+
+psycopg2's SimpleConnectionPool is not thread-safe and raises as soon as maxconn
+connections are out, while the sync FastAPI routes hit it concurrently from the
+threadpool. This pool:
+- blocks on checkout until a connection is free, up to SUPABASE_POOL_TIMEOUT seconds
+  (then raises PoolTimeout, a psycopg2 PoolError);
+- pre-warms SUPABASE_POOL_MIN connections at startup: opening one through the
+  Supabase pooler costs ~0.5 s (pgbouncer auth), so requests should not pay it;
+- checks idle connections in a background thread (SELECT 1) every
+  SUPABASE_POOL_HEALTH_INTERVAL seconds, discarding the ones Supabase closed and
+  topping the pool back up to its min size;
+- exposes gauges (size, idle, in use, waiters, wait times) via get_metrics().
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions, pool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_POOL_MIN_SIZE = int(os.getenv("SUPABASE_POOL_MIN", "2"))
+SUPABASE_POOL_MAX_SIZE = int(os.getenv("SUPABASE_POOL_MAX", "10"))
+# Segundos máximos esperando una conexión libre
+SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "10"))
+SUPABASE_POOL_HEALTH_INTERVAL = float(os.getenv("SUPABASE_POOL_HEALTH_INTERVAL", "30"))
+
+# keepalives evitan que Supabase cierre en silencio las conexiones ociosas
+CONNECT_KWARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+
+class PoolTimeout(pool.PoolError):
+    """No connection became free within the checkout timeout."""
+
+
+class SupabaseConnectionPool:
+    """Pool de conexiones psycopg2 thread-safe, con checkout bloqueante e instrumentado."""
+
+    def __init__(self, dsn: str, min_size: int = SUPABASE_POOL_MIN_SIZE, max_size: int = SUPABASE_POOL_MAX_SIZE,
+                 timeout: float = SUPABASE_POOL_TIMEOUT, health_interval: float = SUPABASE_POOL_HEALTH_INTERVAL,
+                 **connect_kwargs: Any):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.connect_kwargs = connect_kwargs or dict(CONNECT_KWARGS)
+
+        # LIFO: la conexión usada más recientemente es la que menos probablemente esté muerta
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0  # conexiones abiertas o abriéndose (ociosas + en uso + en chequeo)
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self._metrics = {
+            "checkouts": 0, "timeouts": 0, "waiting": 0, "total_wait": 0.0, "max_wait": 0.0,
+            "opened": 0, "discarded": 0, "health_checks": 0,
+        }
+
+    # ==========================================
+    # CHECKOUT / CHECKIN
+    # ==========================================
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        with self._cond:
+            self._metrics["opened"] += 1
+        return conn
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Conexión del pool; espera hasta 'timeout' segundos si están todas en uso."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            conn = None
+            with self._cond:
+                if self._closed:
+                    raise pool.PoolError("connection pool is closed")
+                self._metrics["waiting"] += 1
+                try:
+                    while not self._idle and self._size >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._metrics["timeouts"] += 1
+                            raise PoolTimeout(f"no Supabase connection free after {timeout:.1f}s "
+                                              f"({self._in_use}/{self.max_size} in use)")
+                        self._cond.wait(remaining)
+                        if self._closed:
+                            raise pool.PoolError("connection pool is closed")
+                finally:
+                    self._metrics["waiting"] -= 1
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                else:
+                    self._size += 1  # reserva el hueco; se conecta fuera del lock
+                self._in_use += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif conn.closed:
+                # Murió estando ociosa (entre health checks): descartar y pedir otra
+                self._release_slot(discarded=True)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._metrics["checkouts"] += 1
+                self._metrics["total_wait"] += waited
+                self._metrics["max_wait"] = max(self._metrics["max_wait"], waited)
+            return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Devuelve la conexión al pool, o la cierra si 'close' o si está rota."""
+        if conn is None:
+            return
+        if not close and not conn.closed:
+            # Nunca devolver una conexión con una transacción abierta
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+        if close or conn.closed or self._closed:
+            self._close_quietly(conn)
+            self._release_slot(discarded=not self._closed)
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _release_slot(self, discarded: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            if discarded:
+                self._metrics["discarded"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ==========================================
+    # PREWARM / HEALTH CHECKS
+    # ==========================================
+
+    def prewarm(self) -> int:
+        """Abre conexiones hasta min_size. Devuelve cuántas abrió."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                print(f"[DB pool] Could not pre-warm connection: {e}")
+                return opened
+            with self._cond:
+                if self._closed:
+                    self._size -= 1
+                    self._close_quietly(conn)
+                    return opened
+                self._idle.appendleft((conn, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+
+    def check_idle(self) -> int:
+        """SELECT 1 en las conexiones ociosas desde hace un intervalo; descarta las rotas. Devuelve cuántas."""
+        now = time.monotonic()
+        with self._cond:
+            to_check = [(c, t) for c, t in self._idle if now - t >= self.health_interval]
+            if not to_check:
+                return 0
+            checking = {id(c) for c, _ in to_check}
+            # Fuera de _idle mientras se chequean: ningún checkout las toma a medias
+            self._idle = deque((c, t) for c, t in self._idle if id(c) not in checking)
+
+        broken = 0
+        healthy = []
+        for conn, _ in to_check:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+                healthy.append(conn)
+            except Exception:
+                self._close_quietly(conn)
+                broken += 1
+
+        with self._cond:
+            self._metrics["health_checks"] += 1
+            self._metrics["discarded"] += broken
+            self._size -= broken
+            if self._closed:
+                # closeall() corrió durante el chequeo: no devolverlas al pool
+                self._size -= len(healthy)
+                for conn in healthy:
+                    self._close_quietly(conn)
+                healthy = []
+            checked_at = time.monotonic()
+            for conn in healthy:
+                # Al fondo del LIFO: las recién chequeadas no son las "más calientes"
+                self._idle.appendleft((conn, checked_at))
+            self._cond.notify_all()
+        if broken:
+            print(f"[DB pool] Discarded {broken} broken idle connection(s)")
+        return broken
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_idle()
+                self.prewarm()
+            except Exception as e:
+                print(f"[DB pool] Health check error: {e}")
+
+    def start_health_checks(self):
+        """Arranca el hilo de health checks (idempotente)."""
+        with self._cond:
+            if self._health_thread is not None or self._closed or self.health_interval <= 0:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="supabase-pool-health", daemon=True)
+        self._health_thread.start()
+
+    def closeall(self):
+        """Cierra las conexiones ociosas y el pool; las que están en uso se cierran al devolverse."""
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            idle = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    # ==========================================
+    # METRICS
+    # ==========================================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Gauges del pool (tiempos en ms)."""
+        with self._cond:
+            m = self._metrics
+            checkouts = m["checkouts"]
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": m["waiting"],
+                "checkouts": checkouts,
+                "timeouts": m["timeouts"],
+                "avg_wait_ms": round(m["total_wait"] / checkouts * 1000, 2) if checkouts else 0.0,
+                "max_wait_ms": round(m["max_wait"] * 1000, 2),
+                "opened": m["opened"],
+                "discarded": m["discarded"],
+                "health_checks": m["health_checks"],
+            }
+
+
+# Singleton instance
+_supabase_pool = None
+_supabase_pool_lock = threading.Lock()
+
+def get_supabase_pool() -> SupabaseConnectionPool:
+    """Get or create the process-wide Supabase connection pool (health checks started)"""
+    global _supabase_pool
+    if _supabase_pool is None:
+        with _supabase_pool_lock:
+            if _supabase_pool is None:
+                db_url = os.getenv("SUPABASE_DATABASE_URL")
+                if not db_url:
+                    raise ValueError("SUPABASE_DATABASE_URL not found in environment variables")
+                _supabase_pool = SupabaseConnectionPool(db_url)
+                _supabase_pool.start_health_checks()
+                print(f"Supabase connection pool created (min={_supabase_pool.min_size}, max={_supabase_pool.max_size})")
+    return _supabase_pool
@@ -0,0 +1,144 @@
+"""
+Donation Counts - count strategy for the paginated donation listings.
+
+Strategies (env DONATION_COUNT_STRATEGY):
+- "cached"   (default): exact COUNT(*) once per filter signature, reused until the
+             next sync writes donations/form_titles/campaigns (or the TTL expires).
+- "window":  the first page computes COUNT(*) OVER() in the same query (one round
+             trip instead of two); the result is cached like "cached".
+- "estimate": planner row estimate (EXPLAIN) when it is above
+             DONATION_COUNT_ESTIMATE_THRESHOLD, exact count below it. Estimated
+             totals are flagged with 'total_count_estimated' in the response.
+
+Page flips inside the same filter never re-count while the data is unchanged.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.app.services.sync_watermark import get_sync_watermark
+
+COUNT_STRATEGIES = ("cached", "window", "estimate")
+DONATION_COUNT_STRATEGY = os.getenv("DONATION_COUNT_STRATEGY", "cached").lower()
+if DONATION_COUNT_STRATEGY not in COUNT_STRATEGIES:
+    print(f"WARNING: Unknown DONATION_COUNT_STRATEGY '{DONATION_COUNT_STRATEGY}', using 'cached'")
+    DONATION_COUNT_STRATEGY = "cached"
+
+# Red de seguridad si otro proceso (p. ej. migrate_to_supabase) escribe sin pasar por el watermark
+DONATION_COUNT_CACHE_TTL = int(os.getenv("DONATION_COUNT_CACHE_TTL", "900"))
+DONATION_COUNT_ESTIMATE_THRESHOLD = int(os.getenv("DONATION_COUNT_ESTIMATE_THRESHOLD", "100000"))
+DONATION_COUNT_CACHE_SIZE = 5000
+
+# Tablas cuyo cambio invalida un conteo (el scope de campaña/fuente pasa por form_titles y campaigns)
+COUNT_TABLES = ("donations", "form_titles", "campaigns")
+
+# Columna extra del modo "window" (se quita de las filas antes de devolverlas)
+WINDOW_COUNT_COLUMN = "_total_count"
+
+
+def count_signature(scope: str, scope_value: Any, start_date: Optional[str], end_date: Optional[str]) -> Tuple:
+    """Clave del conteo: el filtro, sin la paginación."""
+    if isinstance(scope_value, (list, tuple)):
+        scope_value = tuple(sorted(scope_value))
+    return (scope, scope_value, start_date or None, end_date or None)
+
+
+class CountPlan:
+    """Lo que hay que hacer para obtener total_count de una página."""
+    __slots__ = ("signature", "total", "estimated", "use_window")
+
+    def __init__(self, signature: Tuple, total: Optional[int], estimated: bool, use_window: bool):
+        self.signature = signature
+        self.total = total            # conteo cacheado, o None si hay que calcularlo
+        self.estimated = estimated
+        self.use_window = use_window  # pedir COUNT(*) OVER() en la consulta de la página
+
+
+class DonationCountCache:
+    """Conteos por firma de filtro, válidos mientras no cambie el watermark de COUNT_TABLES."""
+
+    def __init__(self, strategy: str = DONATION_COUNT_STRATEGY, ttl: int = DONATION_COUNT_CACHE_TTL,
+                 estimate_threshold: int = DONATION_COUNT_ESTIMATE_THRESHOLD,
+                 max_entries: int = DONATION_COUNT_CACHE_SIZE):
+        self.strategy = strategy
+        self.ttl = ttl
+        self.estimate_threshold = estimate_threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple[int, ...], float, int, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watermark = get_sync_watermark()
+
+    def plan(self, scope: str, scope_value: Any, start_date: Optional[str], end_date: Optional[str],
+             cursor: Optional[str] = None) -> CountPlan:
+        signature = count_signature(scope, scope_value, start_date, end_date)
+        watermark = self._watermark.get(*COUNT_TABLES)
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry and entry[0] == watermark and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(signature)
+                return CountPlan(signature, entry[2], entry[3], False)
+        # Con cursor el OVER() solo contaría las filas tras el cursor: se usa el conteo exacto
+        return CountPlan(signature, None, False, self.strategy == "window" and not cursor)
+
+    def resolve_window(self, plan: CountPlan, rows: List[Dict]) -> Optional[int]:
+        """Saca el COUNT(*) OVER() de las filas (y lo quita de ellas). None si no hubo filas."""
+        if not plan.use_window:
+            return None
+        total = None
+        for row in rows:
+            total = row.pop(WINDOW_COUNT_COLUMN, total)
+        return int(total) if total is not None else None
+
+    def wants_estimate(self) -> bool:
+        return self.strategy == "estimate"
+
+    def store(self, plan: CountPlan, total: int, estimated: bool = False,
+              watermark: Optional[Tuple[int, ...]] = None) -> None:
+        """
+        Guarda el conteo. 'watermark' debe leerse ANTES de la consulta: si un sync
+        escribió mientras tanto, la entrada queda ya vieja y no se reutiliza.
+        """
+        plan.total, plan.estimated = total, estimated
+        with self._lock:
+            self._entries[plan.signature] = (
+                watermark if watermark is not None else self._watermark.get(*COUNT_TABLES),
+                time.monotonic(), total, estimated,
+            )
+            self._entries.move_to_end(plan.signature)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def current_watermark(self) -> Tuple[int, ...]:
+        return self._watermark.get(*COUNT_TABLES)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def parse_count_estimate(explain_row: Optional[Dict]) -> Optional[int]:
+    """Filas estimadas por el planner a partir de EXPLAIN (FORMAT JSON) de la consulta COUNT(*)."""
+    if not explain_row:
+        return None
+    plan_json = next(iter(explain_row.values()))
+    plan = plan_json[0]["Plan"]
+    # El COUNT(*) es un Aggregate de 1 fila: la estimación útil es la de su entrada
+    while plan.get("Node Type") == "Aggregate" and plan.get("Plans"):
+        plan = plan["Plans"][0]
+    return int(plan.get("Plan Rows", 0))
+
+
+# Singleton instance
+_donation_count_cache = None
+_donation_count_cache_lock = threading.Lock()
+
+def get_donation_count_cache() -> DonationCountCache:
+    """Get or create the process-wide DonationCountCache"""
+    global _donation_count_cache
+    if _donation_count_cache is None:
+        with _donation_count_cache_lock:
+            if _donation_count_cache is None:
+                _donation_count_cache = DonationCountCache()
+    return _donation_count_cache
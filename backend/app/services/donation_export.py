@@ -0,0 +1,115 @@
+"""
+Donation Export - serializa en CSV o NDJSON las donaciones de un scope
+(campaign / source / form_titles) para los endpoints .../donations/export.
+
+Las filas llegan en lotes desde SupabaseService.iter_donation_export_batches (cursor con
+nombre en el servidor, EXPORT_FETCH_SIZE filas por viaje): cada lote se codifica en un
+chunk y se envía antes de pedir el siguiente, así que la memoria no depende del tamaño
+de la exportación. Solo Supabase: Airtable no tiene cursores del lado del servidor.
+
+Cada exportación en curso tiene tomada una conexión del pool compartido durante toda la
+descarga (que va al ritmo del cliente). EXPORT_MAX_CONCURRENT acota cuántas a la vez por
+proceso; con el cupo lleno se responde 429 en vez de dejar al dashboard sin conexiones.
+"""
+import csv
+import io
+import json
+import os
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List
+
+from starlette.responses import StreamingResponse
+
+# Filas por FETCH del cursor con nombre (y por chunk de la respuesta)
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_RETRY_AFTER_SECONDS = int(os.getenv("EXPORT_RETRY_AFTER_SECONDS", "30"))
+
+EXPORT_COLUMNS = ("id", "date", "amount", "donorName", "donorEmail", "formTitle", "campaign")
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportBusyError(RuntimeError):
+    """Ya hay EXPORT_MAX_CONCURRENT exportaciones en curso (429)."""
+
+    def __init__(self, retry_after: float = EXPORT_RETRY_AFTER_SECONDS):
+        super().__init__(f"Too many donation exports in progress (max {EXPORT_MAX_CONCURRENT}), try again later")
+        self.retry_after = retry_after
+
+
+_export_slots = threading.BoundedSemaphore(max(1, EXPORT_MAX_CONCURRENT))
+
+
+def acquire_export_slot() -> None:
+    """Reserva un hueco de exportación sin esperar; ExportBusyError si no queda ninguno."""
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusyError()
+
+
+def release_export_slot() -> None:
+    _export_slots.release()
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _csv_chunk(rows: List[Dict[str, Any]], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_export_value(row.get(col)) for col in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows: List[Dict[str, Any]]) -> str:
+    return "".join(
+        json.dumps({col: _export_value(row.get(col)) for col in EXPORT_COLUMNS}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def encode_donation_export(batches: Iterable[List[Dict[str, Any]]], fmt: str) -> Iterator[bytes]:
+    """Un chunk (bytes) por lote de filas. En CSV la cabecera va siempre, aun sin filas."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación no soportado: {fmt}")
+    try:
+        if fmt == "csv":
+            yield _csv_chunk([], header=True).encode("utf-8")
+        for rows in batches:
+            if not rows:
+                continue
+            chunk = _csv_chunk(rows, header=False) if fmt == "csv" else _ndjson_chunk(rows)
+            yield chunk.encode("utf-8")
+    finally:
+        # Cliente desconectado a medias: liberar ya el cursor y la conexión del pool
+        close = getattr(batches, "close", None)
+        if close is not None:
+            close()
+
+
+def export_filename(prefix: str, fmt: str) -> str:
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in prefix)[:80] or "donations"
+    return f"{safe}_donations.{fmt}"
+
+
+def donation_export_response(batches: Iterable[List[Dict[str, Any]]], fmt: str, filename_prefix: str) -> StreamingResponse:
+    """StreamingResponse con los chunks (Starlette itera el generador en el threadpool)."""
+    return StreamingResponse(
+        encode_donation_export(batches, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(filename_prefix, fmt)}"'},
+    )
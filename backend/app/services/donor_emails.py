@@ -0,0 +1,182 @@
+"""
+Donor Emails - tabla normalizada donor_emails(email_lower, donor_id).
+
+donors.emails es un text[]: buscar con '%s = ANY(emails)' no puede usar un índice
+btree y recorre toda la tabla en cada búsqueda unificada. donor_emails tiene una fila
+por dirección (en minúsculas) y donante, con PK (email_lower, donor_id): resolver un
+donante por cualquiera de sus direcciones es un solo probe al índice.
+
+Mantenimiento:
+- incremental_sync: tras el upsert de donantes, recalcula las filas de esos donantes
+  a partir de donors.emails.
+- migrate_to_supabase y scripts/create_donor_emails_table.py: rebuild completo.
+
+Si el código se despliega antes de crear la tabla, el sync se salta el refresco (con
+un aviso) y la búsqueda usa '%s = ANY(emails)' hasta que la tabla exista.
+"""
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from backend.app.services.sync_watermark import get_sync_watermark
+
+DONOR_EMAILS_TABLE = "donor_emails"
+# Mientras la tabla no exista, cada cuánto (s) vuelve a comprobarlo la búsqueda
+DONOR_EMAILS_RECHECK_SECONDS = float(os.getenv("DONOR_EMAILS_RECHECK_SECONDS", "300"))
+
+DONOR_EMAILS_READY_QUERY = "SELECT to_regclass('public.donor_emails') IS NOT NULL AS ready"
+
+CREATE_DONOR_EMAILS_QUERY = """
+    CREATE TABLE IF NOT EXISTS donor_emails (
+        email_lower TEXT NOT NULL,
+        donor_id UUID NOT NULL REFERENCES donors(id) ON DELETE CASCADE,
+        PRIMARY KEY (email_lower, donor_id)
+    )
+"""
+
+# Para el DELETE por donante del refresco (y el ON DELETE CASCADE)
+CREATE_DONOR_EMAILS_INDEX_QUERY = """
+    CREATE INDEX IF NOT EXISTS idx_donor_emails_donor_id ON donor_emails (donor_id)
+"""
+
+DELETE_DONOR_EMAILS_QUERY = """
+    DELETE FROM donor_emails de
+    USING donors d
+    WHERE de.donor_id = d.id AND d.airtable_id = ANY(%s)
+"""
+
+INSERT_DONOR_EMAILS_QUERY = """
+    INSERT INTO donor_emails (email_lower, donor_id)
+    SELECT DISTINCT lower(btrim(e.email)), d.id
+    FROM donors d
+    CROSS JOIN LATERAL unnest(d.emails) AS e(email)
+    WHERE d.airtable_id = ANY(%s) AND btrim(e.email) <> ''
+    ON CONFLICT DO NOTHING
+"""
+
+REBUILD_DONOR_EMAILS_QUERY = """
+    INSERT INTO donor_emails (email_lower, donor_id)
+    SELECT DISTINCT lower(btrim(e.email)), d.id
+    FROM donors d
+    CROSS JOIN LATERAL unnest(d.emails) AS e(email)
+    WHERE btrim(e.email) <> ''
+    ON CONFLICT DO NOTHING
+"""
+
+# Donante por cualquiera de sus direcciones: un probe a la PK de donor_emails
+DONOR_BY_EMAIL_QUERY = """
+    SELECT
+        d.id,
+        d.airtable_id,
+        d.name,
+        d.emails
+    FROM donor_emails de
+    JOIN donors d ON d.id = de.donor_id
+    WHERE de.email_lower = lower(btrim(%s))
+    ORDER BY d.airtable_id
+    LIMIT 1
+"""
+
+# Sin donor_emails: recorre donors.emails (la búsqueda de antes, exacta y sin índice)
+DONOR_BY_EMAIL_ARRAY_QUERY = """
+    SELECT
+        id,
+        airtable_id,
+        name,
+        emails
+    FROM donors
+    WHERE %s = ANY(emails)
+    LIMIT 1
+"""
+
+
+def donor_emails_available(cursor) -> bool:
+    """¿Existe la tabla donor_emails? (scripts/create_donor_emails_table.py)"""
+    cursor.execute(DONOR_EMAILS_READY_QUERY)
+    return bool(cursor.fetchone()[0])
+
+
+class DonorEmailLookup:
+    """
+    Elige la consulta de búsqueda por email: DONOR_BY_EMAIL_QUERY si donor_emails existe,
+    DONOR_BY_EMAIL_ARRAY_QUERY si no. Una vez vista, la tabla se da por buena; mientras
+    falte se vuelve a comprobar como mucho cada 'recheck_seconds'.
+    """
+
+    def __init__(self, recheck_seconds: float = DONOR_EMAILS_RECHECK_SECONDS):
+        self.recheck_seconds = recheck_seconds
+        self._ready = False
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def query(self, is_ready: Callable[[], bool]) -> str:
+        with self._lock:
+            due = not self._ready and (
+                self._checked_at is None or time.monotonic() - self._checked_at >= self.recheck_seconds
+            )
+            if due:
+                self._checked_at = time.monotonic()
+        if due:
+            try:
+                ready = bool(is_ready())
+            except Exception as e:
+                print(f"⚠️ Could not check {DONOR_EMAILS_TABLE}: {e}")
+                ready = False
+            if ready:
+                with self._lock:
+                    self._ready = True
+            else:
+                print(f"⚠️ {DONOR_EMAILS_TABLE} missing: email search scans donors.emails "
+                      "(run scripts/create_donor_emails_table.py)")
+        return DONOR_BY_EMAIL_QUERY if self._ready else DONOR_BY_EMAIL_ARRAY_QUERY
+
+
+# ==========================================
+# SINGLETON
+# ==========================================
+
+_donor_email_lookup: Optional[DonorEmailLookup] = None
+_donor_email_lookup_lock = threading.Lock()
+
+
+def get_donor_email_lookup() -> DonorEmailLookup:
+    global _donor_email_lookup
+    if _donor_email_lookup is None:
+        with _donor_email_lookup_lock:
+            if _donor_email_lookup is None:
+                _donor_email_lookup = DonorEmailLookup()
+    return _donor_email_lookup
+
+
+def refresh_donor_emails(cursor, conn, donor_airtable_ids: List[str]) -> None:
+    """Recalcula las filas de donor_emails de estos donantes desde donors.emails."""
+    if not donor_airtable_ids:
+        return
+    ids = list(donor_airtable_ids)
+    try:
+        cursor.execute(DELETE_DONOR_EMAILS_QUERY, (ids,))
+        cursor.execute(INSERT_DONOR_EMAILS_QUERY, (ids,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error refreshing {DONOR_EMAILS_TABLE}: {e}")
+        raise
+    finally:
+        get_sync_watermark().bump(DONOR_EMAILS_TABLE)
+    print(f"📇 Refreshed {DONOR_EMAILS_TABLE} for {len(ids)} donors")
+
+
+def rebuild_donor_emails(cursor, conn) -> None:
+    """Reconstruye donor_emails completo (tras una migración completa o al crearla)."""
+    try:
+        cursor.execute(f"DELETE FROM {DONOR_EMAILS_TABLE}")
+        cursor.execute(REBUILD_DONOR_EMAILS_QUERY)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error rebuilding {DONOR_EMAILS_TABLE}: {e}")
+        raise
+    finally:
+        get_sync_watermark().bump(DONOR_EMAILS_TABLE)
+    print(f"📇 Rebuilt {DONOR_EMAILS_TABLE}")
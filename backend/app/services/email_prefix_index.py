@@ -0,0 +1,162 @@
+"""
+Email Prefix Index
+In-memory sorted array of every email address, used by /contacts/autocomplete.
+
+Built from the synced Supabase 'emails' table and kept up to date by the
+incremental sync, so a lookup is a binary search with no external calls.
+
+The index remembers the "emails" sync watermark it was built at. Writes the
+local deltas don't cover (another worker's sync, the incremental_sync.py CLI)
+move the watermark and the next search rebuilds it; EMAIL_INDEX_MAX_AGE also
+rebuilds it periodically so deleted addresses drop out.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.app.services.sync_watermark import SyncWatermark, get_sync_watermark
+
+AUTOCOMPLETE_LIMIT = 10
+EMAIL_INDEX_MAX_AGE = int(os.getenv("EMAIL_INDEX_MAX_AGE", "900"))
+EMAIL_INDEX_WATERMARK_TABLE = "emails"
+# Por encima de este número de cambios es más barato reordenar todo que insertar uno a uno
+REBUILD_THRESHOLD = 1000
+
+
+def _load_from_supabase() -> List[Tuple[str, str]]:
+    from backend.app.services.supabase_service import get_supabase_service
+    rows = get_supabase_service().get_email_addresses()
+    return [(row['airtable_id'], row['email']) for row in rows]
+
+
+class EmailPrefixIndex:
+    """Array ordenado de (email en minúsculas, email) con búsqueda por prefijo; thread-safe."""
+
+    def __init__(self, loader: Optional[Callable[[], Iterable[Tuple[str, str]]]] = None,
+                 max_age: float = EMAIL_INDEX_MAX_AGE, watermark: Optional[SyncWatermark] = None):
+        self._loader = loader or _load_from_supabase
+        self.max_age = max_age
+        self._watermark = watermark or get_sync_watermark()
+        self._loaded_watermark: Tuple[int, ...] = ()   # watermark de 'emails' que refleja el índice
+        self._loaded_at = 0.0
+        self._entries: List[Tuple[str, str]] = []     # ordenado por email en minúsculas
+        self._by_airtable_id: Dict[str, str] = {}     # airtable_id -> email (para actualizar)
+        self._loaded = False
+        self._pending: Optional[List[Tuple[str, Optional[str]]]] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()          # una sola carga inicial aunque lleguen varias búsquedas
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def _is_stale(self) -> bool:
+        if not self._loaded:
+            return True
+        if time.monotonic() - self._loaded_at >= self.max_age:
+            return True
+        return self._watermark.get(EMAIL_INDEX_WATERMARK_TABLE) != self._loaded_watermark
+
+    def _rebuild(self) -> None:
+        self._entries = sorted((email.lower(), email) for email in self._by_airtable_id.values())
+
+    def load(self) -> None:
+        """Construye el índice completo desde el loader (tabla 'emails' de Supabase)."""
+        # Watermark leído antes de la consulta: si alguien escribe mientras tanto, el índice nace viejo
+        watermark = self._watermark.get(EMAIL_INDEX_WATERMARK_TABLE)
+        with self._lock:
+            self._pending = []   # cambios del sync que lleguen mientras corre la consulta
+        try:
+            rows = list(self._loader())
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            self._by_airtable_id = {airtable_id: email for airtable_id, email in rows if email}
+            self._rebuild()
+            # Reaplicar lo que el sync escribió durante la carga (idempotente)
+            self._apply_changes(self._pending)
+            self._pending = None
+            self._loaded = True
+            self._loaded_watermark = watermark
+            self._loaded_at = time.monotonic()
+        print(f"EmailPrefixIndex: loaded {len(self._entries)} emails.")
+
+    def apply_updates(self, rows: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """
+        Aplica los emails insertados/actualizados por el sync (airtable_id, email).
+        Si el índice aún no se construyó no hace nada: la primera búsqueda lo cargará completo.
+        """
+        watermark = self._watermark.get(EMAIL_INDEX_WATERMARK_TABLE)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(rows)
+            elif self._loaded:
+                self._apply_changes(rows)
+                # El upsert de este sync sube el watermark una vez; otro salto es una escritura
+                # ajena que estos cambios no cubren y deja el índice para recargar
+                if self._loaded_watermark and watermark[0] - self._loaded_watermark[0] in (0, 1):
+                    self._loaded_watermark = watermark
+
+    def _apply_changes(self, rows: Iterable[Tuple[str, Optional[str]]]) -> None:
+        changes = [(airtable_id, email) for airtable_id, email in rows
+                   if self._by_airtable_id.get(airtable_id) != (email or None)]
+        if len(changes) > REBUILD_THRESHOLD:
+            for airtable_id, email in changes:
+                if email:
+                    self._by_airtable_id[airtable_id] = email
+                else:
+                    self._by_airtable_id.pop(airtable_id, None)
+            self._rebuild()
+            return
+
+        for airtable_id, email in changes:
+            old_email = self._by_airtable_id.pop(airtable_id, None)
+            if old_email:
+                pos = bisect.bisect_left(self._entries, (old_email.lower(), old_email))
+                if pos < len(self._entries) and self._entries[pos] == (old_email.lower(), old_email):
+                    del self._entries[pos]
+            if email:
+                self._by_airtable_id[airtable_id] = email
+                bisect.insort(self._entries, (email.lower(), email))
+
+    def search(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[str]:
+        """Emails que empiezan por 'prefix' (sin distinguir mayúsculas), en orden alfabético."""
+        prefix = (prefix or "").strip().lower()
+        if not prefix:
+            return []
+        if self._is_stale():
+            with self._load_lock:
+                if self._is_stale():
+                    self.load()
+
+        results: List[str] = []
+        seen = set()
+        with self._lock:
+            pos = bisect.bisect_left(self._entries, (prefix,))
+            while pos < len(self._entries) and len(results) < limit:
+                key, email = self._entries[pos]
+                if not key.startswith(prefix):
+                    break
+                if key not in seen:
+                    seen.add(key)
+                    results.append(email)
+                pos += 1
+        return results
+
+
+# Singleton instance
+_email_prefix_index = None
+_email_prefix_index_lock = threading.Lock()
+
+def get_email_prefix_index() -> EmailPrefixIndex:
+    """Get or create the process-wide EmailPrefixIndex"""
+    global _email_prefix_index
+    if _email_prefix_index is None:
+        with _email_prefix_index_lock:
+            if _email_prefix_index is None:
+                _email_prefix_index = EmailPrefixIndex()
+    return _email_prefix_index
@@ -4,14 +4,119 @@ Provides database operations for email campaigns using Supabase
 """
 import os
 import json
-import psycopg2
+import threading
+import time
+from contextlib import contextmanager
 from psycopg2.extras import RealDictCursor
 from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 from dotenv import load_dotenv
 
+from backend.app.services.db_pool import get_supabase_pool
+
 load_dotenv()
 
+# Segundos entre escrituras del progreso de campañas (una UPDATE por campaña e intervalo)
+EMAIL_STATUS_FLUSH_INTERVAL = float(os.getenv("EMAIL_STATUS_FLUSH_INTERVAL", "5"))
+
+# Columnas que update_campaign puede escribir (clave en 'updates' -> columna)
+CAMPAIGN_UPDATE_FIELDS = {
+    'status': 'status',
+    'csv_filename': 'csv_filename',
+    'mapping': 'mapping',
+    'target_count': 'target_count',
+    'sent_count_final': 'sent_count_final',
+    'completed_at': 'completed_at',
+    'last_updated': 'last_updated',
+    'scheduled_at': 'scheduled_at'
+}
+
+
+def _build_campaign_update(campaign_id: str, updates: Dict[str, Any]):
+    """(query, params) del UPDATE ... RETURNING *, o None si no hay columnas que escribir."""
+    set_parts = []
+    values = []
+    for key, db_field in CAMPAIGN_UPDATE_FIELDS.items():
+        if key in updates:
+            value = updates[key]
+            # Serialize dicts/lists to JSON
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            set_parts.append(f"{db_field} = %s")
+            values.append(value)
+
+    if not set_parts:
+        return None
+
+    # Always update last_updated
+    set_parts.append("last_updated = NOW()")
+
+    values.append(campaign_id)
+    query = f"UPDATE email_sender_campaigns SET {', '.join(set_parts)} WHERE id = %s RETURNING *"
+    return query, tuple(values)
+
+
+class CampaignStatusWriter:
+    """
+    Agrupa las actualizaciones frecuentes (progreso de los workers de envío) y las
+    escribe en un hilo cada EMAIL_STATUS_FLUSH_INTERVAL segundos: una UPDATE por
+    campaña con los últimos valores, todas en una sola transacción.
+    """
+
+    def __init__(self, service: "EmailSenderService", interval: float = EMAIL_STATUS_FLUSH_INTERVAL):
+        self.service = service
+        self.interval = interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Serializa los flush con las escrituras directas: un valor encolado nunca se
+        # escribe después (y por encima) de un update_campaign posterior
+        self.write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def queue_update(self, campaign_id: str, updates: Dict[str, Any]) -> None:
+        """Encola 'updates' (los valores más recientes por columna ganan)."""
+        with self._lock:
+            self._pending.setdefault(campaign_id, {}).update(updates)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="campaign-status-writer", daemon=True)
+                self._thread.start()
+
+    def take_pending(self, campaign_id: str) -> Dict[str, Any]:
+        """Saca lo encolado de una campaña (llamar con write_lock tomado)."""
+        with self._lock:
+            return self._pending.pop(campaign_id, {})
+
+    def flush(self) -> int:
+        """Escribe todo lo encolado. Devuelve cuántas campañas escribió."""
+        with self.write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                with self.service._connection() as conn:
+                    with conn.cursor() as cur:
+                        for campaign_id, updates in pending.items():
+                            built = _build_campaign_update(campaign_id, updates)
+                            if built:
+                                cur.execute(*built)
+                    conn.commit()
+            except Exception as e:
+                # Re-encolar sin pisar valores más nuevos que llegaron mientras tanto
+                with self._lock:
+                    for campaign_id, updates in pending.items():
+                        merged = dict(updates)
+                        merged.update(self._pending.get(campaign_id, {}))
+                        self._pending[campaign_id] = merged
+                print(f"⚠️ Could not flush campaign progress ({len(pending)} campaigns): {e}")
+                return 0
+            return len(pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
 
 class EmailSenderService:
     """Service for email campaign database operations"""
@@ -20,21 +125,26 @@ class EmailSenderService:
         self.db_url = os.getenv("SUPABASE_DATABASE_URL")
         if not self.db_url:
             raise ValueError("SUPABASE_DATABASE_URL not found in environment variables")
+        # Pool compartido con SupabaseService (db_pool.py): sin TLS + auth de pgbouncer por consulta
+        self._pool = get_supabase_pool()
+        self.status_writer = CampaignStatusWriter(self)
     
-    def _get_connection(self):
-        """Get a database connection"""
-        return psycopg2.connect(self.db_url)
+    @contextmanager
+    def _connection(self):
+        """Conexión del pool; se devuelve al salir (con rollback si quedó una transacción abierta)"""
+        conn = self._pool.getconn()
+        try:
+            yield conn
+        finally:
+            self._pool.putconn(conn, close=bool(conn.closed))
     
     def _execute_query(self, query: str, params: tuple = None) -> List[Dict]:
         """Execute query and return results as list of dicts"""
-        conn = self._get_connection()
-        try:
+        with self._connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(query, params)
                 results = cur.fetchall()
                 return [dict(row) for row in results]
-        finally:
-            conn.close()
     
     def _execute_one(self, query: str, params: tuple = None) -> Optional[Dict]:
         """Execute query and return single result"""
@@ -43,20 +153,16 @@ class EmailSenderService:
     
     def _execute_modify(self, query: str, params: tuple = None) -> None:
         """Execute insert/update/delete query"""
-        conn = self._get_connection()
-        try:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, params)
             conn.commit()
-        finally:
-            conn.close()
     
     # ==================== CRUD Operations ====================
     
     def create_campaign(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new campaign in the database"""
-        conn = self._get_connection()
-        try:
+        with self._connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # Convert sender_config to JSON string if it's a list
                 sender_config = campaign_data.get('sender_config', 'all')
@@ -93,8 +199,6 @@ class EmailSenderService:
                 result = cur.fetchone()
             conn.commit()
             return dict(result) if result else None
-        finally:
-            conn.close()
     
     def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
         """Get a campaign by ID"""
@@ -136,61 +240,41 @@ class EmailSenderService:
         return results
     
     def update_campaign(self, campaign_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update a campaign"""
-        conn = self._get_connection()
-        try:
-            # Build SET clause dynamically
-            set_parts = []
-            values = []
-            
-            field_mapping = {
-                'status': 'status',
-                'csv_filename': 'csv_filename',
-                'mapping': 'mapping',
-                'target_count': 'target_count',
-                'sent_count_final': 'sent_count_final',
-                'completed_at': 'completed_at',
-                'last_updated': 'last_updated',
-                'scheduled_at': 'scheduled_at'
-            }
-            
-            for key, db_field in field_mapping.items():
-                if key in updates:
-                    value = updates[key]
-                    # Serialize dicts/lists to JSON
-                    if isinstance(value, (dict, list)):
-                        value = json.dumps(value)
-                    set_parts.append(f"{db_field} = %s")
-                    values.append(value)
-            
-            if not set_parts:
+        """Update a campaign (immediately; also writes any progress queued for it)"""
+        with self.status_writer.write_lock:
+            # Lo encolado para esta campaña va en la misma UPDATE, debajo de 'updates'
+            merged = self.status_writer.take_pending(campaign_id)
+            merged.update(updates)
+            built = _build_campaign_update(campaign_id, merged)
+            if not built:
                 return self.get_campaign(campaign_id)
-            
-            # Always update last_updated
-            set_parts.append("last_updated = NOW()")
-            
-            values.append(campaign_id)
-            query = f"UPDATE email_sender_campaigns SET {', '.join(set_parts)} WHERE id = %s RETURNING *"
-            
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, tuple(values))
-                result = cur.fetchone()
-            conn.commit()
-            return dict(result) if result else None
-        finally:
-            conn.close()
+
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(*built)
+                    result = cur.fetchone()
+                conn.commit()
+                return dict(result) if result else None
+    
+    def queue_campaign_update(self, campaign_id: str, updates: Dict[str, Any]) -> None:
+        """Update a campaign in the next batched write (progress from the sender workers)"""
+        self.status_writer.queue_update(campaign_id, updates)
+    
+    def flush_campaign_updates(self) -> int:
+        """Write all queued campaign updates now"""
+        return self.status_writer.flush()
     
     def delete_campaign(self, campaign_id: str) -> bool:
         """Delete a campaign by ID"""
-        conn = self._get_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM email_sender_campaigns WHERE id = %s", (campaign_id,))
-                deleted = cur.rowcount > 0
-            conn.commit()
-            return deleted
-        finally:
-            conn.close()
+        with self.status_writer.write_lock:
+            # Nada encolado debe escribirse sobre una campaña borrada
+            self.status_writer.take_pending(campaign_id)
+            with self._connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM email_sender_campaigns WHERE id = %s", (campaign_id,))
+                    deleted = cur.rowcount > 0
+                conn.commit()
+                return deleted
     
     # ==================== Scheduling Operations ====================
     
@@ -205,8 +289,21 @@ class EmailSenderService:
         """)
     
     def mark_campaign_launching(self, campaign_id: str) -> Optional[Dict[str, Any]]:
-        """Mark a campaign as launching (prevents duplicate launches)"""
-        return self.update_campaign(campaign_id, {'status': 'Sending'})
+        """
+        Claim a scheduled campaign for launch: atomic 'Scheduled' -> 'Sending'.
+        Returns None if it is no longer 'Scheduled' (another worker already launched it).
+        """
+        with self.status_writer.write_lock:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        UPDATE email_sender_campaigns SET status = 'Sending', last_updated = NOW()
+                        WHERE id = %s AND status = 'Scheduled'
+                        RETURNING *
+                    """, (campaign_id,))
+                    result = cur.fetchone()
+                conn.commit()
+                return dict(result) if result else None
 
 
 # Singleton instance
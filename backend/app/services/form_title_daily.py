@@ -0,0 +1,174 @@
+"""
+Form Title Daily - rollup de donaciones por (form_title_id, local_date).
+
+Cada fila guarda la suma, el número de donaciones y la primera donation_date de un
+form title en un día (hora de Costa Rica). Las estadísticas de campaña y de fuente
+(CAMPAIGN_STATS_QUERY / SOURCE_STATS_QUERY) suman estas filas: un año de datos son
+cientos de filas en lugar de cientos de miles de donaciones.
+
+Mantenimiento:
+- incremental_sync: antes del upsert de donaciones lee las claves (form title, día)
+  actuales de las donaciones modificadas, y después las nuevas; recalcula ambas
+  desde donations (así una donación que cambia de día o de form title sale de su
+  fila vieja). Sin la tabla o sin donations.local_date el rollup se salta con un
+  aviso y solo se invalidan los scopes del result cache.
+- migrate_to_supabase y scripts/create_form_title_daily_table.py: rebuild completo.
+
+Se recalculan filas completas desde donations (no se suman deltas), así que
+refrescar una clave dos veces es inofensivo.
+"""
+from typing import Iterable, List, Set, Tuple
+
+from backend.app.services.result_cache import invalidate_donation_scopes
+from backend.app.services.sync_watermark import get_sync_watermark
+
+ROLLUP_TABLE = "form_title_daily"
+
+# Claves por lote de recálculo (cada lote es una transacción)
+REFRESH_BATCH_SIZE = 1000
+
+CREATE_FORM_TITLE_DAILY_QUERY = """
+    CREATE TABLE IF NOT EXISTS form_title_daily (
+        form_title_id UUID NOT NULL REFERENCES form_titles(id) ON DELETE CASCADE,
+        local_date DATE,
+        total_amount NUMERIC NOT NULL DEFAULT 0,
+        donation_count INTEGER NOT NULL DEFAULT 0,
+        first_donation_at TIMESTAMP WITH TIME ZONE,
+        -- local_date NULL = donaciones sin fecha (solo cuentan en stats sin filtro de fechas).
+        -- Su índice (form_title_id, local_date) es el range scan de las stats por form title.
+        CONSTRAINT form_title_daily_key UNIQUE NULLS NOT DISTINCT (form_title_id, local_date)
+    )
+"""
+
+ROLLUP_KEYS_QUERY = """
+    SELECT DISTINCT form_title_id, local_date
+    FROM donations
+    WHERE airtable_id = ANY(%s) AND form_title_id IS NOT NULL
+"""
+
+_KEYS_CTE = """
+    WITH keys AS (
+        SELECT DISTINCT k.form_title_id, k.local_date
+        FROM unnest(%s::uuid[], %s::date[]) AS k(form_title_id, local_date)
+    )
+"""
+
+DELETE_ROLLUP_KEYS_QUERY = _KEYS_CTE + """
+    DELETE FROM form_title_daily r
+    USING keys k
+    WHERE r.form_title_id = k.form_title_id
+        AND r.local_date IS NOT DISTINCT FROM k.local_date
+"""
+
+INSERT_ROLLUP_KEYS_QUERY = _KEYS_CTE + """
+    INSERT INTO form_title_daily (form_title_id, local_date, total_amount, donation_count, first_donation_at)
+    SELECT d.form_title_id, d.local_date, COALESCE(SUM(d.amount), 0), COUNT(*), MIN(d.donation_date)
+    FROM donations d
+    JOIN keys k ON d.form_title_id = k.form_title_id
+        AND d.local_date IS NOT DISTINCT FROM k.local_date
+    GROUP BY d.form_title_id, d.local_date
+"""
+
+REBUILD_ROLLUP_QUERY = """
+    INSERT INTO form_title_daily (form_title_id, local_date, total_amount, donation_count, first_donation_at)
+    SELECT form_title_id, local_date, COALESCE(SUM(amount), 0), COUNT(*), MIN(donation_date)
+    FROM donations
+    WHERE form_title_id IS NOT NULL
+    GROUP BY form_title_id, local_date
+"""
+
+
+# El rollup necesita su tabla (create_form_title_daily_table.py) y donations.local_date (create_donation_indexes.py)
+ROLLUP_READY_QUERY = """
+    SELECT
+        to_regclass('public.form_title_daily') IS NOT NULL,
+        EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'donations' AND column_name = 'local_date'
+        )
+"""
+
+DONATION_FORM_TITLES_QUERY = """
+    SELECT DISTINCT form_title_id
+    FROM donations
+    WHERE airtable_id = ANY(%s) AND form_title_id IS NOT NULL
+"""
+
+
+def rollup_available(cursor) -> bool:
+    """¿Existen la tabla del rollup y la columna donations.local_date?"""
+    cursor.execute(ROLLUP_READY_QUERY)
+    has_table, has_local_date = cursor.fetchone()
+    return bool(has_table and has_local_date)
+
+
+def fetch_donation_form_titles(cursor, donation_airtable_ids: List[str]) -> Set[str]:
+    """form_title_id (UUID) que tocan hoy estas donaciones (sin depender del rollup)."""
+    if not donation_airtable_ids:
+        return set()
+    cursor.execute(DONATION_FORM_TITLES_QUERY, (list(donation_airtable_ids),))
+    return {str(row[0]) for row in cursor.fetchall()}
+
+
+def fetch_rollup_keys(cursor, donation_airtable_ids: List[str]) -> Set[Tuple]:
+    """Claves (form_title_id, local_date) que tocan hoy estas donaciones."""
+    if not donation_airtable_ids:
+        return set()
+    cursor.execute(ROLLUP_KEYS_QUERY, (list(donation_airtable_ids),))
+    return {(str(row[0]), row[1]) for row in cursor.fetchall()}
+
+
+def refresh_form_title_daily(cursor, conn, keys: Iterable[Tuple]) -> int:
+    """Recalcula desde donations las filas del rollup de estas claves. Devuelve cuántas claves."""
+    keys = sorted(set(keys), key=lambda k: (k[0], k[1] is None, k[1]))
+    if not keys:
+        return 0
+    try:
+        for i in range(0, len(keys), REFRESH_BATCH_SIZE):
+            chunk = keys[i:i + REFRESH_BATCH_SIZE]
+            params = ([k[0] for k in chunk], [k[1] for k in chunk])
+            # Borrar + insertar en la misma transacción: los lectores nunca ven el día a medias
+            cursor.execute(DELETE_ROLLUP_KEYS_QUERY, params)
+            cursor.execute(INSERT_ROLLUP_KEYS_QUERY, params)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error refreshing {ROLLUP_TABLE}: {e}")
+        raise
+    finally:
+        get_sync_watermark().bump(ROLLUP_TABLE)
+    print(f"📊 Refreshed {len(keys)} {ROLLUP_TABLE} rows")
+    return len(keys)
+
+
+def donation_rollup_keys(cursor, donation_ids: List[str], rollup_ready: bool) -> Set[Tuple]:
+    """Claves (form_title_id, local_date) de estas donaciones; sin rollup, (form_title_id, None)."""
+    if rollup_ready:
+        return fetch_rollup_keys(cursor, donation_ids)
+    return {(ft, None) for ft in fetch_donation_form_titles(cursor, donation_ids)}
+
+
+def refresh_donation_rollup(cursor, conn, donation_ids: List[str], keys_before: Set[Tuple], rollup_ready: bool) -> None:
+    """Recalcula el rollup de las claves de antes y después del upsert e invalida sus scopes."""
+    keys = keys_before | donation_rollup_keys(cursor, donation_ids, rollup_ready)
+    try:
+        if rollup_ready:
+            refresh_form_title_daily(cursor, conn, keys)
+    finally:
+        # Result cache: solo las campañas/sources/form titles de estas donaciones
+        invalidate_donation_scopes(cursor, {ft for ft, _ in keys})
+
+
+def rebuild_form_title_daily(cursor, conn) -> None:
+    """Reconstruye el rollup completo (tras una migración completa o al crearlo)."""
+    try:
+        cursor.execute(f"DELETE FROM {ROLLUP_TABLE}")
+        cursor.execute(REBUILD_ROLLUP_QUERY)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error rebuilding {ROLLUP_TABLE}: {e}")
+        raise
+    finally:
+        get_sync_watermark().bump(ROLLUP_TABLE)
+    print(f"📊 Rebuilt {ROLLUP_TABLE}")
@@ -0,0 +1,167 @@
+"""
+Funnel Stats Engine
+In-memory funnel counters (Funnel by funnel stage, Unsubscribed, Pending Approval).
+
+The incremental sync applies a delta for every donor it upserts (old bucket -1,
+new bucket +1), so /dashboard/funnel-stats is a dictionary read. When the
+counters are cold (API start, failed sync) they are seeded from a single
+aggregated query.
+
+The counters remember the "donors" sync watermark they reflect. Donor writes
+from anywhere else (another worker's sync, the incremental_sync.py CLI,
+migrate_to_supabase) move the watermark and the next read reseeds them;
+FUNNEL_STATS_MAX_AGE bounds their age for writers that bypass the watermark.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from backend.app.services.sync_watermark import SyncWatermark, get_sync_watermark
+
+FUNNEL_STATS_MAX_AGE = int(os.getenv("FUNNEL_STATS_MAX_AGE", "900"))
+FUNNEL_WATERMARK_TABLE = "donors"
+
+FUNNEL_STAGE = "Funnel"
+PENDING_APPROVAL_STAGE = "Pending Approval"
+UNSUBSCRIBED_STATUS = "Unsubscribed"
+PENDING_EXCLUDED_STATUSES = ("Final Check", "Potential Duplicate")
+UNKNOWN_FUNNEL_STAGE = "Unknown"
+
+# Buckets: ("funnel", <funnel stage>), ("unsubscribed",), ("pending",)
+Bucket = Tuple[str, ...]
+
+
+def classify_donor(stage: Optional[str], status: Optional[str], region: Any,
+                   funnel_stage: Optional[str]) -> Optional[Bucket]:
+    """
+    Bucket de un donante según los filtros del funnel (mismas reglas que las vistas de Airtable).
+    Devuelve None si el donante no cuenta para ninguna métrica.
+    """
+    if stage == FUNNEL_STAGE:
+        if status == UNSUBSCRIBED_STATUS:
+            return ("unsubscribed",)
+        return ("funnel", funnel_stage or UNKNOWN_FUNNEL_STAGE)
+    if stage == PENDING_APPROVAL_STAGE and region and status not in PENDING_EXCLUDED_STATUSES:
+        return ("pending",)
+    return None
+
+
+def _stage_order(stage_name: str):
+    # Orden natural por "(Stage X)" para que Stage 10 vaya después de Stage 9
+    match = re.search(r"\(Stage\s*(\d+)\)", stage_name, re.IGNORECASE)
+    return (int(match.group(1)), stage_name) if match else (9999, stage_name)
+
+
+def build_funnel_stats(counts: Dict[Bucket, int]) -> Dict[str, Any]:
+    """Formato de respuesta de /dashboard/funnel-stats a partir de los contadores."""
+    stage_breakdown = sorted(
+        ({"name": bucket[1], "count": count} for bucket, count in counts.items()
+         if bucket[0] == "funnel" and count > 0),
+        key=lambda item: _stage_order(item["name"])
+    )
+    return {
+        "total_funnel": sum(item["count"] for item in stage_breakdown),
+        "pending_approvals": counts.get(("pending",), 0),
+        "total_unsubscribed": counts.get(("unsubscribed",), 0),
+        "stage_breakdown": stage_breakdown,
+    }
+
+
+class FunnelStatsEngine:
+    """Contadores del funnel mantenidos por el sync; thread-safe."""
+
+    def __init__(self, max_age: float = FUNNEL_STATS_MAX_AGE, watermark: Optional[SyncWatermark] = None):
+        self.max_age = max_age
+        self._watermark = watermark or get_sync_watermark()
+        self._lock = threading.Lock()
+        self._counts: Optional[Counter] = None   # None = frío
+        self._counts_watermark: Tuple[int, ...] = ()  # watermark de donors que reflejan los contadores
+        self._loaded_at = 0.0
+        self._version = 0                         # cambia con cada actualización / invalidación
+        self._updates_in_flight = 0
+
+    @property
+    def is_warm(self) -> bool:
+        return self._counts is not None
+
+    def get_stats(self, loader: Callable[[], Dict[Bucket, int]]) -> Dict[str, Any]:
+        """
+        Lectura de las métricas. Si los contadores están fríos (o son de otro watermark de
+        donors, o más viejos que max_age) se usa 'loader' (consulta agregada) y su resultado
+        los siembra, salvo que el sync haya escrito mientras tanto.
+        """
+        # Watermark leído antes de la consulta: si alguien escribe mientras tanto, la siembra nace vieja
+        watermark = self._watermark.get(FUNNEL_WATERMARK_TABLE)
+        with self._lock:
+            if self._counts is not None:
+                if self._counts_watermark == watermark and time.monotonic() - self._loaded_at < self.max_age:
+                    return build_funnel_stats(self._counts)
+                self._counts = None
+                self._version += 1
+            version = self._version
+            clean = self._updates_in_flight == 0
+
+        counts = Counter(loader())
+
+        with self._lock:
+            if clean and self._updates_in_flight == 0 and self._version == version and self._counts is None:
+                self._counts = counts
+                self._counts_watermark = watermark
+                self._loaded_at = time.monotonic()
+        return build_funnel_stats(counts)
+
+    def begin_update(self) -> None:
+        """El sync va a escribir donantes: ninguna siembra concurrente es fiable."""
+        with self._lock:
+            self._updates_in_flight += 1
+            self._version += 1
+
+    def end_update(self) -> None:
+        with self._lock:
+            self._updates_in_flight = max(self._updates_in_flight - 1, 0)
+            self._version += 1
+
+    def apply_changes(self, changes: Iterable[Tuple[Optional[Bucket], Optional[Bucket]]]) -> None:
+        """Aplica pares (bucket anterior, bucket nuevo) de los donantes insertados/actualizados."""
+        watermark = self._watermark.get(FUNNEL_WATERMARK_TABLE)
+        with self._lock:
+            if self._counts is None:
+                return  # frío: la próxima lectura hará la consulta agregada
+            # El upsert de este sync sube el watermark de donors una vez; cualquier otro salto es
+            # una escritura ajena (otro worker, un script) que los deltas no cubren: a recargar
+            if not self._counts_watermark or watermark[0] - self._counts_watermark[0] not in (0, 1):
+                self._counts = None
+                self._version += 1
+                return
+            self._counts_watermark = watermark
+            for old_bucket, new_bucket in changes:
+                if old_bucket == new_bucket:
+                    continue
+                if old_bucket is not None:
+                    self._counts[old_bucket] -= 1
+                if new_bucket is not None:
+                    self._counts[new_bucket] += 1
+            self._version += 1
+
+    def invalidate(self) -> None:
+        """Descarta los contadores (p. ej. si el sync falló a mitad de escritura)."""
+        with self._lock:
+            self._counts = None
+            self._version += 1
+
+
+# Singleton instance
+_funnel_stats_engine = None
+_funnel_stats_engine_lock = threading.Lock()
+
+def get_funnel_stats_engine() -> FunnelStatsEngine:
+    """Get or create the process-wide FunnelStatsEngine"""
+    global _funnel_stats_engine
+    if _funnel_stats_engine is None:
+        with _funnel_stats_engine_lock:
+            if _funnel_stats_engine is None:
+                _funnel_stats_engine = FunnelStatsEngine()
+    return _funnel_stats_engine
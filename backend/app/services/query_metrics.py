@@ -0,0 +1,281 @@
+"""
+Query Metrics - timing of the Supabase queries run by SupabaseService and
+AsyncSupabaseService.
+
+Per named query: latency histogram, count, errors and rows returned. Queries slower
+than QUERY_SLOW_MS go to a ring buffer (QUERY_SLOW_LOG_SIZE entries) with their
+parameters redacted to types. With QUERY_EXPLAIN_SLOW=true (or toggled from the
+admin endpoint) a slow read-only query is re-run once under
+EXPLAIN (ANALYZE, BUFFERS) in a background thread, at most once per query name every
+QUERY_EXPLAIN_COOLDOWN seconds, and the plan is attached to its slow-log entry.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", "500"))
+QUERY_SLOW_LOG_SIZE = int(os.getenv("QUERY_SLOW_LOG_SIZE", "100"))
+QUERY_EXPLAIN_SLOW = os.getenv("QUERY_EXPLAIN_SLOW", "false").lower() in ("1", "true", "yes")
+QUERY_EXPLAIN_COOLDOWN = float(os.getenv("QUERY_EXPLAIN_COOLDOWN", "300"))
+
+# Límites superiores (ms) de los buckets del histograma; el último bucket es "+Inf"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Solo se re-ejecutan con EXPLAIN ANALYZE consultas de lectura
+_READ_ONLY_RE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITE_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|ALTER|CREATE|DROP)\b", re.IGNORECASE)
+
+
+def redact_params(params: Any) -> Any:
+    """Parámetros sin valores: solo su tipo (y tamaño de las listas)."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _redact_value(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_redact_value(p) for p in params]
+    return _redact_value(params)
+
+
+def _redact_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (list, tuple)):
+        return f"<{type(value).__name__}[{len(value)}]>"
+    return f"<{type(value).__name__}>"
+
+
+_EXECUTE_HELPERS = frozenset(("_execute_query", "_execute_one", "_donations_page"))
+
+
+def query_name_from_caller(depth: int = 2) -> str:
+    """Nombre por defecto de una consulta: el método del servicio que la lanzó."""
+    frame = sys._getframe(depth)
+    while frame is not None and frame.f_code.co_name in _EXECUTE_HELPERS:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "unknown"
+
+
+def _compact_sql(query: str) -> str:
+    return " ".join(query.split())
+
+
+class QueryStats:
+    """Contadores de una consulta con nombre."""
+    __slots__ = ("count", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms: float, rows: int, error: bool) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile_ms(self, pct: float) -> Optional[float]:
+        """Percentil aproximado: límite superior del bucket donde cae."""
+        if not self.count:
+            return None
+        target = self.count * pct
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        histogram = {f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram["le_inf"] = self.buckets[-1]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows_total": self.rows,
+            "avg_rows": round(self.rows / self.count, 1) if self.count else 0.0,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "max_ms": round(self.max_ms, 2),
+            "histogram_ms": histogram,
+        }
+
+
+class QueryMetrics:
+    """Registro de tiempos por consulta + slow log (thread-safe)."""
+
+    def __init__(self, slow_ms: float = QUERY_SLOW_MS, slow_log_size: int = QUERY_SLOW_LOG_SIZE,
+                 explain_slow: bool = QUERY_EXPLAIN_SLOW, explain_cooldown: float = QUERY_EXPLAIN_COOLDOWN):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.explain_cooldown = explain_cooldown
+        self._stats: Dict[str, QueryStats] = {}
+        self._slow_log: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._last_explain: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # (query, params) -> plan JSON; por defecto usa el pool sync de Supabase
+        self.explain_runner: Callable[[str, Any], Any] = _explain_with_supabase_pool
+
+    def record(self, name: str, query: str, params: Any, elapsed_ms: float, rows: int = 0,
+               error: Optional[BaseException] = None) -> None:
+        entry = None
+        explain = False
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = QueryStats()
+            stats.observe(elapsed_ms, rows, error is not None)
+
+            if elapsed_ms >= self.slow_ms:
+                entry = {
+                    "name": name,
+                    "at": datetime.now(timezone.utc).isoformat(),
+                    "duration_ms": round(elapsed_ms, 2),
+                    "rows": rows,
+                    "error": describe_error(error) if error is not None else None,
+                    "query": _compact_sql(query),
+                    "params": redact_params(params),
+                    "plan": None,
+                }
+                self._slow_log.append(entry)
+                explain = self._should_explain(name, query, error)
+
+        if explain:
+            threading.Thread(target=self._capture_plan, args=(entry, query, params),
+                             name="query-explain", daemon=True).start()
+
+    def _should_explain(self, name: str, query: str, error: Optional[BaseException]) -> bool:
+        """Llamar con el lock tomado."""
+        if not self.explain_slow or error is not None:
+            return False
+        if not _READ_ONLY_RE.match(query) or _WRITE_RE.search(query):
+            return False
+        now = time.monotonic()
+        last = self._last_explain.get(name)
+        if last is not None and now - last < self.explain_cooldown:
+            return False
+        self._last_explain[name] = now
+        return True
+
+    def _capture_plan(self, entry: Dict[str, Any], query: str, params: Any) -> None:
+        try:
+            plan = self.explain_runner(query, params)
+        except Exception as e:
+            plan = {"error": describe_error(e)}
+        with self._lock:
+            entry["plan"] = plan
+
+    def configure(self, explain_slow: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+        with self._lock:
+            if explain_slow is not None:
+                self.explain_slow = explain_slow
+            if slow_ms is not None:
+                self.slow_ms = slow_ms
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self._last_explain.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slow_ms": self.slow_ms,
+                "explain_slow": self.explain_slow,
+                "queries": {name: stats.to_dict() for name, stats in sorted(self._stats.items())},
+            }
+
+    def get_slow_queries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Slow log, el más reciente primero."""
+        with self._lock:
+            entries = [dict(e) for e in reversed(self._slow_log)]
+        return entries[:limit] if limit else entries
+
+
+def describe_error(error: BaseException) -> str:
+    """
+    Tipo de la excepción y su SQLSTATE, sin el mensaje: el texto de Postgres repite
+    valores de los parámetros (p. ej. 'Key (email)=(...)') y saltaría la redacción.
+    """
+    sqlstate = getattr(error, "pgcode", None) or getattr(error, "sqlstate", None)
+    return f"{type(error).__name__} (SQLSTATE {sqlstate})" if sqlstate else type(error).__name__
+
+
+def _explain_with_supabase_pool(query: str, params: Any) -> Any:
+    """EXPLAIN (ANALYZE, BUFFERS) de la consulta, en una transacción que siempre se revierte."""
+    from backend.app.services.db_pool import get_supabase_pool
+
+    pool = get_supabase_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params or ())
+            plan = cursor.fetchone()[0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True  # conexión rota: se cierra al devolverla, el pool no pierde el hueco
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+class timed_query:
+    """
+    Context manager que mide una consulta y la registra:
+
+        with timed_query(name, query, params) as timing:
+            rows = cursor.fetchall()
+            timing.rows = len(rows)
+    """
+    __slots__ = ("name", "query", "params", "rows", "_start", "_metrics")
+
+    def __init__(self, name: str, query: str, params: Any, metrics: Optional[QueryMetrics] = None):
+        self.name = name
+        self.query = query
+        self.params = params
+        self.rows = 0
+        self._metrics = metrics
+
+    def __enter__(self) -> "timed_query":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        (self._metrics or get_query_metrics()).record(self.name, self.query, self.params, elapsed_ms, self.rows, exc)
+        return False
+
+
+# Singleton instance
+_query_metrics = None
+_query_metrics_lock = threading.Lock()
+
+def get_query_metrics() -> QueryMetrics:
+    """Get or create the process-wide QueryMetrics"""
+    global _query_metrics
+    if _query_metrics is None:
+        with _query_metrics_lock:
+            if _query_metrics is None:
+                _query_metrics = QueryMetrics()
+    return _query_metrics
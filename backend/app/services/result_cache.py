@@ -0,0 +1,327 @@
+"""
+Result Cache - resultados de DataService válidos mientras no cambie el sync watermark
+de sus tags.
+
+Cada método cacheado declara de qué tags depende (RESULT_CACHE_TAGS): tablas completas
+("donations", "campaigns", ...) o scopes de donaciones ("campaign:<airtable_id>",
+"source:<name>", "form_title:<airtable_id>"). Una entrada guarda el watermark de sus
+tags leído ANTES de la consulta y se sirve mientras siga igual, sin TTL: los datos que
+no cambian no se recalculan nunca, y las donaciones nuevas se ven justo después del
+sync que las trajo.
+
+incremental_sync.run_sync sube el watermark de cada tabla que escribe y, para las
+donaciones, solo los tags de scope afectados (invalidate_donation_scopes): un sync con
+donaciones de la campaña X no invalida los listados ni las stats de la campaña Y.
+
+Por eso las rutas de dashboard, campaigns y form-titles no llevan @cache(expire=...):
+un TTL fijo en la ruta seguiría sirviendo datos de antes del sync.
+
+migrate_to_supabase reescribe todo: al terminar sube el watermark de todas las tablas
+y de todos los scopes (invalidate_all_results). Con el backend "memory" ese bump se
+queda en el proceso de la migración, así que RESULT_CACHE_MAX_AGE (segundos, 900 por
+defecto como DONATION_COUNT_CACHE_TTL; 0 = sin límite) acota igualmente la vida de
+una entrada ante cualquier escritura que no pase por el watermark.
+
+Solo se cachean respuestas de Supabase (nunca el fallback de Airtable ni un resultado
+stale).
+
+Stale-while-revalidate (SWR_METHODS, por defecto los widgets caros del dashboard:
+top donors y sources): una entrada invalidada por el watermark (o por max age) que
+tenga menos de SWR_MAX_STALE_SECONDS se sirve en el acto mientras un hilo de fondo la
+recalcula; como mucho un refresco en curso por clave. Más vieja que eso, se recalcula
+en la petición.
+
+Las entradas viven en un CacheStore (cache_store.py): con un backend compartido
+(sqlite/redis) todos los workers de uvicorn leen y escriben las mismas entradas, y la
+reserva del refresco SWR también es entre procesos. Ahí caducan a los
+RESULT_CACHE_TTL segundos para acotar el almacén (en memoria las acota el LRU).
+Si el almacén falla, la consulta va a Supabase como en un miss.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from backend.app.services.cache_store import CacheStore, MemoryStore, describe_store, dumps, get_shared_cache_store, loads
+from backend.app.services.sync_watermark import SyncWatermark, get_sync_watermark
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_MAX_AGE = float(os.getenv("RESULT_CACHE_MAX_AGE", "900"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+
+SWR_METHODS = frozenset(
+    m.strip() for m in os.getenv("SWR_METHODS", "get_top_donors,get_monthly_source_breakdown").split(",") if m.strip()
+)
+SWR_MAX_STALE_SECONDS = float(os.getenv("SWR_MAX_STALE_SECONDS", "3600"))
+SWR_REFRESH_WORKERS = int(os.getenv("SWR_REFRESH_WORKERS", "2"))
+# La reserva de un refresco caduca sola si el worker que la tenía muere a mitad
+SWR_REFRESH_LOCK_SECONDS = float(os.getenv("SWR_REFRESH_LOCK_SECONDS", "300"))
+
+
+def campaign_tag(campaign_id: str) -> str:
+    return f"campaign:{campaign_id}"
+
+
+def source_tag(source: str) -> str:
+    return f"source:{source}"
+
+
+def form_title_tag(form_title_id: str) -> str:
+    return f"form_title:{form_title_id}"
+
+
+# Tablas de las que dependen los listados/stats por scope (además de su tag de scope)
+_SCOPE_TABLES = ("campaigns", "form_titles")
+
+# método de DataService -> tags de los que depende su resultado (a partir de sus argumentos)
+RESULT_CACHE_TAGS: Dict[str, Callable[..., Tuple[str, ...]]] = {
+    "get_daily_summaries": lambda *a: ("donations",),
+    "get_hourly_trend": lambda *a: ("donations",),
+    "get_dashboard_overview": lambda *a: ("donations", "donors"),
+    "get_top_donors": lambda *a: ("donations", "donors"),
+    "get_monthly_source_breakdown": lambda *a: ("donations",) + _SCOPE_TABLES,
+    "get_funnel_stats": lambda *a: ("donors",),
+    "get_source_stats": lambda source, *a: _SCOPE_TABLES + (source_tag(source),),
+    "get_campaign_stats": lambda campaign_id, *a: _SCOPE_TABLES + (campaign_tag(campaign_id),),
+    "get_campaign_donations": lambda campaign_id, *a: _SCOPE_TABLES + ("donors", campaign_tag(campaign_id)),
+    "get_source_donations": lambda source, *a: _SCOPE_TABLES + ("donors", source_tag(source)),
+    "get_donations_for_form_title": lambda form_title_ids, *a: _SCOPE_TABLES + ("donors",) + tuple(
+        form_title_tag(ft) for ft in sorted(set(form_title_ids or ()))
+    ),
+    "get_campaigns_by_source": lambda *a: ("campaigns",),
+    "get_unique_campaign_sources": lambda *a: ("campaigns",),
+    "get_form_titles": lambda *a: _SCOPE_TABLES,
+}
+
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def swr_max_stale(method: str) -> float:
+    """Segundos de staleness que se sirven mientras se revalida (0 = método sin SWR)."""
+    return SWR_MAX_STALE_SECONDS if method in SWR_METHODS else 0.0
+
+
+def result_tags(method: str, args: tuple) -> Optional[Tuple[str, ...]]:
+    """Tags de una llamada, o None si el método no se cachea."""
+    tags_for = RESULT_CACHE_TAGS.get(method)
+    return tags_for(*args) if tags_for is not None else None
+
+
+def store_key(key: Hashable) -> str:
+    """Clave del almacén: estable entre procesos (las claves de _call_key son tuplas de primitivos)."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Resultados validados por watermark de tags sobre un CacheStore (thread-safe)."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, max_age: float = RESULT_CACHE_MAX_AGE,
+                 enabled: bool = RESULT_CACHE_ENABLED, watermark: Optional[SyncWatermark] = None,
+                 store: Optional[CacheStore] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.enabled = enabled
+        self.ttl = ttl or None
+        self._watermark = watermark or get_sync_watermark()
+        # Sin almacén compartido: LRU en el proceso. Entradas serializadas: (watermark de los tags, stored_at, valor)
+        self._store = store if store is not None else MemoryStore(max_entries)
+        self._refreshing: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "stale_hits": 0, "misses": 0, "invalidated": 0, "stores": 0, "refreshes": 0,
+                         "store_errors": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._metrics[field] += 1
+
+    def version(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Watermark actual de los tags; leerlo ANTES de la consulta y pasarlo a put()."""
+        return self._watermark.get(*tags)
+
+    def get(self, key: Hashable, tags: Tuple[str, ...], max_stale: float = 0.0) -> Tuple[str, Any]:
+        """
+        (estado, copia del valor): FRESH si la entrada sigue vigente para el watermark actual,
+        STALE si ya no lo está pero se guardó hace menos de 'max_stale' segundos, MISS si no.
+        Las entradas invalidadas se quedan (para SWR) hasta que se reescriben o salen del almacén.
+        """
+        if not self.enabled:
+            return MISS, None
+        current = self.version(tags)
+        try:
+            data = self._store.get("result:" + store_key(key))
+            entry = loads(data) if data is not None else None
+        except Exception as e:
+            print(f"⚠️ Result cache read failed: {e}")
+            self._count("store_errors")
+            entry = None
+        if entry is None:
+            self._count("misses")
+            return MISS, None
+        stored_version, stored_at, value = entry
+        age = time.time() - stored_at
+        if stored_version == current and not (self.max_age and age > self.max_age):
+            self._count("hits")
+            return FRESH, value
+        if age <= max_stale:
+            self._count("stale_hits")
+            return STALE, value
+        with self._lock:
+            self._metrics["invalidated"] += 1
+            self._metrics["misses"] += 1
+        return MISS, None
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Reserva el refresco en segundo plano de 'key' (en todos los workers); False si ya hay uno en curso."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        try:
+            reserved = self._store.add("refresh:" + store_key(key), b"1", SWR_REFRESH_LOCK_SECONDS)
+        except Exception as e:
+            print(f"⚠️ Result cache refresh lock failed: {e}")
+            self._count("store_errors")
+            reserved = False
+        with self._lock:
+            if not reserved:
+                self._refreshing.discard(key)
+                return False
+            self._metrics["refreshes"] += 1
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        try:
+            self._store.delete("refresh:" + store_key(key))
+        except Exception as e:
+            print(f"⚠️ Result cache refresh unlock failed: {e}")
+            self._count("store_errors")
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def put(self, key: Hashable, tags: Tuple[str, ...], version: Tuple[int, ...], value: Any) -> None:
+        if not self.enabled or self.max_entries <= 0:
+            return
+        try:
+            # Serializado: el almacén no comparte objetos mutables con ninguna petición
+            self._store.set("result:" + store_key(key), dumps((version, time.time(), value)), self.ttl)
+        except Exception as e:
+            print(f"⚠️ Result cache write failed: {e}")
+            self._count("store_errors")
+            return
+        self._count("stores")
+
+    def clear(self) -> None:
+        self._store.clear("result:")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        try:
+            entries = self._store.size()
+        except Exception:
+            entries = None
+        with self._lock:
+            served = self._metrics["hits"] + self._metrics["stale_hits"]
+            lookups = served + self._metrics["misses"]
+            return {
+                "enabled": self.enabled,
+                **describe_store(self._store),
+                "entries": entries,
+                "max_entries": getattr(self._store, "max_entries", None),
+                "hit_ratio": round(served / lookups, 3) if lookups else 0.0,
+                "refreshing": len(self._refreshing),
+                "swr_methods": sorted(SWR_METHODS),
+                **self._metrics,
+            }
+
+
+# Tags de scope de las donaciones que cambiaron (form_title_id UUIDs de antes y después del upsert)
+DONATION_SCOPE_TAGS_QUERY = """
+    SELECT ft.airtable_id, c.airtable_id, c.source
+    FROM form_titles ft
+    LEFT JOIN campaigns c ON ft.campaign_id = c.id
+    WHERE ft.id = ANY(%s::uuid[])
+"""
+
+# Todos los scopes (también campañas sin form titles)
+ALL_SCOPE_TAGS_QUERY = """
+    SELECT ft.airtable_id, c.airtable_id, c.source
+    FROM campaigns c
+    FULL JOIN form_titles ft ON ft.campaign_id = c.id
+"""
+
+# Tablas que escribe la migración completa (y de las que dependen los métodos cacheados)
+SYNCED_TABLES = ("campaigns", "form_titles", "donors", "donations", "emails")
+
+
+def _scope_tags(rows) -> Set[str]:
+    tags = set()
+    for form_title_airtable_id, campaign_airtable_id, source in rows:
+        if form_title_airtable_id:
+            tags.add(form_title_tag(form_title_airtable_id))
+        if campaign_airtable_id:
+            tags.add(campaign_tag(campaign_airtable_id))
+        if source:
+            tags.add(source_tag(source))
+    return tags
+
+
+def invalidate_donation_scopes(cursor, form_title_ids: Iterable[Any]) -> int:
+    """
+    Sube el watermark de los tags campaign/source/form_title de estos form titles.
+    Devuelve cuántos tags invalidó.
+    """
+    ids = sorted({str(ft) for ft in form_title_ids if ft is not None})
+    if not ids:
+        return 0
+    cursor.execute(DONATION_SCOPE_TAGS_QUERY, (ids,))
+    tags = _scope_tags(cursor.fetchall())
+    get_sync_watermark().bump(*sorted(tags))
+    print(f"🏷️ Invalidated {len(tags)} donation scope tags")
+    return len(tags)
+
+
+def invalidate_all_results(cursor) -> int:
+    """
+    Tras una escritura completa (migrate_to_supabase): sube el watermark de todas las
+    tablas y de todos los scopes. Las tablas van primero, así que aunque falle la
+    lectura de scopes ninguna entrada sigue vigente. Devuelve cuántos tags invalidó.
+    """
+    get_sync_watermark().bump(*SYNCED_TABLES)
+    cursor.execute(ALL_SCOPE_TAGS_QUERY)
+    tags = _scope_tags(cursor.fetchall())
+    if tags:
+        get_sync_watermark().bump(*sorted(tags))
+    print(f"🏷️ Invalidated all cached results ({len(SYNCED_TABLES)} tables, {len(tags)} scope tags)")
+    return len(SYNCED_TABLES) + len(tags)
+
+
+# Singleton instance
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Get or create the process-wide ResultCache used by DataService (on the shared cache store, if any)"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                store = get_shared_cache_store()
+                _result_cache = ResultCache(store=store, ttl=RESULT_CACHE_TTL if store is not None else None)
+    return _result_cache
+
+
+_refresh_executor = None
+
+def get_refresh_executor() -> ThreadPoolExecutor:
+    """Hilos de fondo de los refrescos stale-while-revalidate"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _result_cache_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(max_workers=SWR_REFRESH_WORKERS, thread_name_prefix="swr-refresh")
+    return _refresh_executor
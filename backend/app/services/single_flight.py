@@ -0,0 +1,158 @@
+"""
+Single Flight - coalescencia de llamadas idénticas en curso de DataService.
+
+Al cargar el dashboard (y sobre todo al expirar el caché de los endpoints) varios
+usuarios y widgets piden a la vez la misma llamada con los mismos parámetros. La
+primera ("leader") la ejecuta; las que llegan mientras sigue en curso ("followers")
+esperan su resultado en vez de lanzar su propia consulta. Si el leader falla, los
+followers reciben una copia de su excepción (cada hilo con su propio traceback). Cada
+follower recibe una copia del resultado, así nadie comparte objetos mutables con otra
+petición.
+
+En el event loop la llamada corre en una tarea aparte: si la petición del leader se
+cancela (el cliente se desconecta), la llamada sigue para los followers que esperan.
+
+La clave es la de DataService._call_key (método + argumentos normalizados).
+SINGLE_FLIGHT_ENABLED=false lo desactiva.
+"""
+import asyncio
+import copy
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def _follower_error(error: BaseException) -> BaseException:
+    """Copia de la excepción del leader (mismo tipo y atributos, sin su traceback)."""
+    try:
+        return copy.copy(error)
+    except Exception:
+        return error
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalescencia por clave para hilos (do) y para el event loop (do_async), con métricas por método."""
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, "asyncio.Task"] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: Hashable, field: str) -> None:
+        """Llamar con el lock tomado. La clave empieza por el nombre del método."""
+        method = key[0] if isinstance(key, tuple) and key else str(key)
+        stats = self._metrics.get(method)
+        if stats is None:
+            stats = self._metrics[method] = {"calls": 0, "executed": 0, "deduplicated": 0}
+        stats["calls"] += 1
+        stats[field] += 1
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn() una sola vez por clave mientras esté en curso; los demás hilos esperan su resultado."""
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._count(key, "executed")
+            else:
+                self._count(key, "deduplicated")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise _follower_error(call.error) from call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Igual que do() para corrutinas (un solo event loop)."""
+        if not self.enabled:
+            return await fn()
+        with self._lock:
+            task = self._async_calls.get(key)
+            leader = task is None
+            if leader:
+                # Tarea aparte: cancelar la petición del leader no cancela la llamada compartida
+                task = self._async_calls[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda done: self._finish_async(key, done))
+                self._count(key, "executed")
+            else:
+                self._count(key, "deduplicated")
+
+        try:
+            # shield: cancelar a quien espera (leader o follower) no cancela la tarea
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            if leader:
+                raise
+            raise _follower_error(e) from e
+        return result if leader else copy.deepcopy(result)
+
+    def _finish_async(self, key: Hashable, task: "asyncio.Task") -> None:
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+        # Si todos los que esperaban se cancelaron, nadie lee la excepción: evitar el aviso de asyncio
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            methods = {name: dict(stats) for name, stats in sorted(self._metrics.items())}
+            in_flight = len(self._calls) + len(self._async_calls)
+        calls = sum(s["calls"] for s in methods.values())
+        deduplicated = sum(s["deduplicated"] for s in methods.values())
+        return {
+            "enabled": self.enabled,
+            "in_flight": in_flight,
+            "calls": calls,
+            "deduplicated": deduplicated,
+            "dedup_ratio": round(deduplicated / calls, 3) if calls else 0.0,
+            "methods": methods,
+        }
+
+
+# Singleton instance
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the process-wide SingleFlight used by DataService"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,285 @@
+"""
+Supabase Queries - SQL compartido entre SupabaseService (psycopg2, sync)
+y AsyncSupabaseService (psycopg 3, async).
+Ambos drivers usan placeholders %s / %(name)s, así que el texto SQL es el mismo;
+aquí viven la construcción de las consultas y el formateo de sus resultados.
+"""
+import base64
+import binascii
+import json
+from typing import Optional, List, Dict, Any, Tuple
+
+# Fecha de la donación en hora de Costa Rica (todas las comparaciones de fechas la usan).
+# Columna generada y almacenada (ver scripts/create_donation_indexes.py), indexada con
+# (form_title_id, local_date): los filtros por fecha son range scans, no seq scans.
+CR_DONATION_DATE = "d.local_date"
+
+# ==========================================
+# DONATION LISTINGS (paginados)
+# ==========================================
+
+# scope -> (JOIN extra, condición del scope); todas parten de donations d JOIN form_titles ft
+DONATION_SCOPES = {
+    "campaign": ("JOIN campaigns c ON ft.campaign_id = c.id", "c.airtable_id = %s"),
+    "source": ("JOIN campaigns c ON ft.campaign_id = c.id", "c.source = %s"),
+    "form_titles": ("", "ft.airtable_id = ANY(%s)"),
+}
+
+
+def encode_donations_cursor(donation_date: Any, donation_id: str) -> str:
+    """Cursor opaco (base64 url-safe) con la clave de orden (donation_date, airtable_id) de la última fila."""
+    if donation_date is not None and hasattr(donation_date, 'isoformat'):
+        donation_date = donation_date.isoformat()
+    raw = json.dumps({"d": donation_date, "i": donation_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_donations_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    """Inverso de encode_donations_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        donation_date, donation_id = payload["d"], payload["i"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(donation_id, str) or not (donation_date is None or isinstance(donation_date, str)):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return donation_date, donation_id
+
+
+def _donations_filter(scope: str, scope_value: Any, start_date: Optional[str],
+                      end_date: Optional[str]) -> Tuple[str, List[str], List[Any]]:
+    """(JOIN extra, condiciones WHERE, params) del scope y el rango de fechas (hora de Costa Rica)."""
+    scope_join, scope_clause = DONATION_SCOPES[scope]
+    where_clauses = [scope_clause]
+    params = [scope_value]
+
+    if start_date:
+        where_clauses.append(f"{CR_DONATION_DATE} >= %s")
+        params.append(start_date)
+
+    if end_date:
+        where_clauses.append(f"{CR_DONATION_DATE} <= %s")
+        params.append(end_date)
+
+    return scope_join, where_clauses, params
+
+
+def build_donations_page_queries(
+    scope: str,
+    scope_value: Any,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page_size: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    window_count: bool = False
+) -> Tuple[str, tuple, str, tuple]:
+    """
+    Devuelve (query, params, count_query, count_params) del listado de donaciones
+    de una campaña, una fuente o un conjunto de form titles.
+
+    Orden estable por (donation_date, airtable_id) DESC. Con 'cursor' se pagina por
+    seek (WHERE (fecha, id) < cursor, sin OFFSET): cualquier página cuesta lo mismo
+    que la primera. Sin cursor se mantiene LIMIT/OFFSET.
+    Con 'window_count' cada fila trae además el total del filtro (COUNT(*) OVER()),
+    para no lanzar count_query (ver donation_counts.py).
+    """
+    scope_join, where_clauses, params = _donations_filter(scope, scope_value, start_date, end_date)
+    where_sql = " AND ".join(where_clauses)
+
+    # Seek: en orden DESC Postgres pone los NULL primero, así que tras una fila con
+    # fecha solo quedan filas con fecha menor (la comparación con NULL las excluye)
+    page_where = list(where_clauses)
+    page_params = list(params)
+    if cursor:
+        cursor_date, cursor_id = decode_donations_cursor(cursor)
+        if cursor_date is None:
+            page_where.append("((d.donation_date IS NULL AND d.airtable_id < %s) OR d.donation_date IS NOT NULL)")
+            page_params.append(cursor_id)
+        else:
+            page_where.append("(d.donation_date, d.airtable_id) < (%s::timestamptz, %s)")
+            page_params.extend([cursor_date, cursor_id])
+        limit_sql = "LIMIT %s"
+        page_params.append(page_size)
+    else:
+        limit_sql = "LIMIT %s OFFSET %s"
+        page_params.extend([page_size, offset])
+
+    window_sql = ",\n            COUNT(*) OVER() as _total_count" if window_count else ""
+
+    # Query for donations with donor info
+    query = f"""
+        SELECT
+            d.airtable_id as id,
+            d.amount,
+            d.donation_date as date,
+            COALESCE(don.name, 'Unknown') as "donorName",
+            COALESCE(don.emails[1], 'N/A') as "donorEmail"{window_sql}
+        FROM donations d
+        JOIN form_titles ft ON d.form_title_id = ft.id
+        {scope_join}
+        LEFT JOIN donors don ON d.donor_id = don.id
+        WHERE {" AND ".join(page_where)}
+        ORDER BY d.donation_date DESC, d.airtable_id DESC
+        {limit_sql}
+    """
+
+    # Get total count
+    count_query = f"""
+        SELECT COUNT(*) as count
+        FROM donations d
+        JOIN form_titles ft ON d.form_title_id = ft.id
+        {scope_join}
+        WHERE {where_sql}
+    """
+
+    return query, tuple(page_params), count_query, tuple(params)
+
+
+def build_donations_export_query(
+    scope: str,
+    scope_value: Any,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Tuple[str, tuple]:
+    """
+    Todas las donaciones del filtro (sin LIMIT ni COUNT), en el mismo orden que los
+    listados, con form title y campaña. Pensada para un cursor con nombre (server-side).
+    """
+    scope_join, where_clauses, params = _donations_filter(scope, scope_value, start_date, end_date)
+    if "campaigns c" not in scope_join:
+        scope_join = "LEFT JOIN campaigns c ON ft.campaign_id = c.id"
+    query = f"""
+        SELECT
+            d.airtable_id as id,
+            d.amount,
+            d.donation_date as date,
+            COALESCE(don.name, 'Unknown') as "donorName",
+            COALESCE(don.emails[1], 'N/A') as "donorEmail",
+            ft.name as "formTitle",
+            c.name as "campaign"
+        FROM donations d
+        JOIN form_titles ft ON d.form_title_id = ft.id
+        {scope_join}
+        LEFT JOIN donors don ON d.donor_id = don.id
+        WHERE {" AND ".join(where_clauses)}
+        ORDER BY d.donation_date DESC, d.airtable_id DESC
+    """
+    return query, tuple(params)
+
+
+def format_donations_page(donations: List[Dict], total_count: int, page_size: Optional[int] = None,
+                          estimated: bool = False) -> Dict[str, Any]:
+    # Página llena -> puede haber más: cursor hacia la siguiente página
+    next_cursor = None
+    if page_size and len(donations) == page_size:
+        last = donations[-1]
+        next_cursor = encode_donations_cursor(last['date'], last['id'])
+    return {
+        "donations": [dict(d) for d in donations],
+        "total_count": total_count,
+        "total_count_estimated": estimated,
+        "next_cursor": next_cursor
+    }
+
+# ==========================================
+# CAMPAIGN / SOURCE STATS
+# ==========================================
+
+# Las stats suman filas del rollup form_title_daily (ver services/form_title_daily.py):
+# un año son ~365 filas por form title en lugar de todas sus donaciones.
+# Sin filtro de fechas también entra la fila local_date NULL (donaciones sin fecha).
+CAMPAIGN_STATS_QUERY = """
+    SELECT
+        ft.airtable_id as form_title_id,
+        ft.name as form_title_name,
+        COALESCE(SUM(r.total_amount), 0) as total_amount,
+        COALESCE(SUM(r.donation_count), 0) as donation_count,
+        MIN(r.first_donation_at) as start_date
+    FROM campaigns c
+    JOIN form_titles ft ON ft.campaign_id = c.id
+    JOIN form_title_daily r ON r.form_title_id = ft.id
+        AND (%(start_date)s IS NULL OR r.local_date >= %(start_date)s::date)
+        AND (%(end_date)s IS NULL OR r.local_date <= %(end_date)s::date)
+    WHERE c.airtable_id = %(campaign_id)s
+        AND (%(form_title_ids)s IS NULL OR ft.airtable_id = ANY(%(form_title_ids)s))
+    GROUP BY ft.id, ft.airtable_id, ft.name
+    HAVING SUM(r.donation_count) > 0
+    ORDER BY MIN(r.first_donation_at) ASC
+"""
+
+SOURCE_STATS_QUERY = """
+    SELECT
+        c.airtable_id as campaign_id,
+        c.name as campaign_name,
+        COALESCE(SUM(r.total_amount), 0) as total_amount,
+        COALESCE(SUM(r.donation_count), 0) as donation_count,
+        MIN(r.first_donation_at) as start_date
+    FROM campaigns c
+    JOIN form_titles ft ON ft.campaign_id = c.id
+    JOIN form_title_daily r ON r.form_title_id = ft.id
+        AND (%(start_date)s IS NULL OR r.local_date >= %(start_date)s::date)
+        AND (%(end_date)s IS NULL OR r.local_date <= %(end_date)s::date)
+    WHERE c.source = %(source)s
+    GROUP BY c.id, c.airtable_id, c.name
+    HAVING SUM(r.donation_count) > 0
+    ORDER BY MIN(r.first_donation_at) ASC
+"""
+
+
+def format_campaign_stats(breakdown: List[Dict]) -> Dict[str, Any]:
+    # Calculate totals
+    campaign_total_amount = sum(float(row['total_amount']) for row in breakdown)
+    campaign_total_count = sum(int(row['donation_count']) for row in breakdown)
+
+    return {
+        "campaign_total_amount": round(campaign_total_amount, 2),
+        "campaign_total_count": campaign_total_count,
+        "stats_by_form_title": [
+            {
+                "form_title_id": row['form_title_id'],
+                "form_title_name": row['form_title_name'],
+                "total_amount": float(row['total_amount']),
+                "donation_count": int(row['donation_count']),
+                "start_date": row['start_date'].isoformat() if row['start_date'] else None
+            }
+            for row in breakdown
+        ]
+    }
+
+
+def format_source_stats(breakdown: List[Dict]) -> Dict[str, Any]:
+    source_total_amount = sum(float(row['total_amount']) for row in breakdown)
+    source_total_count = sum(int(row['donation_count']) for row in breakdown)
+
+    return {
+        "source_total_amount": round(source_total_amount, 2),
+        "source_total_count": source_total_count,
+        "stats_by_campaign": [
+            {
+                "campaign_id": row['campaign_id'],
+                "campaign_name": row['campaign_name'],
+                "total_amount": float(row['total_amount']),
+                "donation_count": int(row['donation_count']),
+                "start_date": row['start_date'].isoformat() if row['start_date'] else None
+            }
+            for row in breakdown
+        ]
+    }
+
+# ==========================================
+# SHARED VIEWS
+# ==========================================
+
+CREATE_SHARED_VIEW_QUERY = """
+    INSERT INTO analytics_shared_views (configuration, created_by)
+    VALUES (%s, %s)
+    RETURNING token
+"""
+
+GET_SHARED_VIEW_QUERY = """
+    SELECT configuration, is_active
+    FROM analytics_shared_views
+    WHERE token = %s
+"""
@@ -4,43 +4,156 @@ Replaces slow Airtable queries with fast PostgreSQL queries.
 Performance: 20-50ms vs 2-5s with Airtable
 """
 import os
+import uuid
 import psycopg2
-from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from datetime import datetime, date
 from dotenv import load_dotenv
 
+from backend.app.services.funnel_stats import (
+    get_funnel_stats_engine,
+    FUNNEL_STAGE,
+    PENDING_APPROVAL_STAGE,
+    UNSUBSCRIBED_STATUS,
+    PENDING_EXCLUDED_STATUSES,
+    UNKNOWN_FUNNEL_STAGE,
+)
+from backend.app.services.db_pool import get_supabase_pool
+from backend.app.services.query_metrics import timed_query, query_name_from_caller
+from backend.app.services.dashboard_metrics import (
+    dashboard_periods,
+    build_glance_metrics,
+    build_filtered_metrics,
+    fill_hourly_trend,
+)
+from backend.app.services.donor_emails import DONOR_EMAILS_READY_QUERY, get_donor_email_lookup
+from backend.app.services.donation_counts import get_donation_count_cache, parse_count_estimate
+from backend.app.services.donation_export import EXPORT_FETCH_SIZE
+from backend.app.services.supabase_queries import (
+    build_donations_page_queries,
+    build_donations_export_query,
+    format_donations_page,
+    CAMPAIGN_STATS_QUERY,
+    SOURCE_STATS_QUERY,
+    format_campaign_stats,
+    format_source_stats,
+    CREATE_SHARED_VIEW_QUERY,
+    GET_SHARED_VIEW_QUERY,
+)
+
 load_dotenv()
 
+# Contadores del funnel por funnel stage (FILTER aggregates); ver funnel_stats.classify_donor
+# (NULL y '' van a 'Unknown', igual que 'funnel_stage or UNKNOWN_FUNNEL_STAGE')
+FUNNEL_COUNTS_SQL = """
+    SELECT
+        COALESCE(NULLIF(funnel_stage, ''), %(unknown_stage)s) AS funnel_stage,
+        COUNT(*) FILTER (
+            WHERE stage = %(funnel)s AND (status IS NULL OR status != %(unsubscribed)s)
+        ) AS active,
+        COUNT(*) FILTER (
+            WHERE stage = %(funnel)s AND status = %(unsubscribed)s
+        ) AS unsubscribed,
+        COUNT(*) FILTER (
+            WHERE stage = %(pending_stage)s AND region IS NOT NULL AND region != ''
+              AND (status IS NULL OR status NOT IN %(pending_excluded)s)
+        ) AS pending
+    FROM donors
+    WHERE stage IN (%(funnel)s, %(pending_stage)s)
+    GROUP BY COALESCE(NULLIF(funnel_stage, ''), %(unknown_stage)s)
+"""
+
+FUNNEL_COUNTS_PARAMS = {
+    "unknown_stage": UNKNOWN_FUNNEL_STAGE,
+    "funnel": FUNNEL_STAGE,
+    "unsubscribed": UNSUBSCRIBED_STATUS,
+    "pending_stage": PENDING_APPROVAL_STAGE,
+    "pending_excluded": PENDING_EXCLUDED_STATUSES,
+}
+
+
+def _funnel_counts_from_rows(rows: List[Dict]) -> Dict[tuple, int]:
+    counts: Dict[tuple, int] = {("unsubscribed",): 0, ("pending",): 0}
+    for row in rows:
+        if row['active']:
+            counts[("funnel", row['funnel_stage'])] = int(row['active'])
+        counts[("unsubscribed",)] += int(row['unsubscribed'])
+        counts[("pending",)] += int(row['pending'])
+    return counts
+
+
+def _dashboard_overview_query(include_funnel: bool) -> str:
+    """
+    Una fila con todas las cifras de /dashboard/metrics:
+    - days: días de daily_metrics del glance (mes anterior -> hoy) y del rango filtrado;
+      cada cifra es un SUM/COUNT ... FILTER sobre su periodo.
+    - hours: tendencia por hora del rango cuando es de un solo día.
+    - funnel: contadores del funnel (solo si los de memoria están fríos).
+    """
+    funnel_cte = f",\n        funnel AS ({FUNNEL_COUNTS_SQL})" if include_funnel else ""
+    funnel_col = (",\n            (SELECT COALESCE(json_agg(f), '[]'::json) FROM funnel f) AS funnel_rows"
+                  if include_funnel else "")
+    return f"""
+        WITH days AS (
+            SELECT date, total_amount, donation_count
+            FROM daily_metrics
+            WHERE (date >= %(start_prev_month)s AND date <= %(today)s)
+               OR (date >= %(range_start)s AND date <= %(range_end)s)
+        ),
+        hours AS (
+            SELECT
+                lpad(d.local_hour::text, 2, '0') || ':00' as hour,
+                COALESCE(SUM(d.amount), 0) as total,
+                COUNT(d.id) as count
+            FROM donations d
+            WHERE d.local_date = %(hourly_date)s
+            GROUP BY hour
+        ){funnel_cte}
+        SELECT
+            COALESCE(SUM(total_amount) FILTER (WHERE date = %(today)s), 0) AS amount_today,
+            COALESCE(SUM(donation_count) FILTER (WHERE date = %(today)s), 0) AS count_today,
+            COALESCE(SUM(total_amount) FILTER (
+                WHERE date >= %(start_current_month)s AND date <= %(today)s), 0) AS amount_this_month,
+            COALESCE(SUM(donation_count) FILTER (
+                WHERE date >= %(start_current_month)s AND date <= %(today)s), 0) AS count_this_month,
+            COALESCE(SUM(total_amount) FILTER (
+                WHERE date >= %(start_prev_month)s AND date <= %(prev_month_same_day)s), 0) AS amount_last_month_same_day,
+            json_agg(json_build_object('date', date::text, 'total', total_amount, 'count', donation_count) ORDER BY date)
+                FILTER (WHERE date >= %(trend_start)s AND date <= %(today)s) AS glance_trend,
+            COALESCE(SUM(total_amount) FILTER (
+                WHERE date >= %(range_start)s AND date <= %(range_end)s), 0) AS amount_in_range,
+            COALESCE(SUM(donation_count) FILTER (
+                WHERE date >= %(range_start)s AND date <= %(range_end)s), 0) AS count_in_range,
+            json_agg(json_build_object('date', date::text, 'total', total_amount, 'count', donation_count) ORDER BY date)
+                FILTER (WHERE date >= %(range_start)s AND date <= %(range_end)s) AS range_trend,
+            (SELECT COALESCE(json_agg(h), '[]'::json) FROM hours h) AS hourly_trend{funnel_col}
+        FROM days
+    """
+
+
+def _daily_points(points: Optional[List[Dict]]) -> List[Dict[str, Any]]:
+    """Puntos {date, total, count} del json_agg, con el mismo formato que get_daily_summaries."""
+    return [
+        {"date": p['date'], "total": float(p['total'] or 0), "count": int(p['count'] or 0)}
+        for p in (points or [])
+    ]
+
+
 class SupabaseService:
     def __init__(self):
         self.db_url = os.getenv("SUPABASE_DATABASE_URL")
         if not self.db_url:
             raise ValueError("SUPABASE_DATABASE_URL not found in environment variables")
         
-        # Create connection pool instead of single connection
-        # keepalives prevent Supabase from closing idle connections silently
-        try:
-            self._pool = psycopg2.pool.SimpleConnectionPool(
-                1,   # minconn
-                10,  # maxconn
-                self.db_url,
-                keepalives=1,
-                keepalives_idle=30,
-                keepalives_interval=10,
-                keepalives_count=5,
-            )
-            print("Supabase connection pool created successfully")
-        except Exception as e:
-            print(f"Failed to create connection pool: {e}")
-            raise
+        # Pool compartido y thread-safe (ver db_pool.py): checkout bloqueante con timeout,
+        # pre-calentado al arrancar y con health checks en segundo plano
+        self._pool = get_supabase_pool()
     
     def _get_connection(self):
-        """Get connection from pool"""
+        """Get connection from pool (blocks up to SUPABASE_POOL_TIMEOUT seconds)"""
         try:
-            conn = self._pool.getconn()
-            return conn
+            return self._pool.getconn()
         except Exception as e:
             print(f"❌ Error getting connection from pool: {e}")
             raise
@@ -48,70 +161,120 @@ class SupabaseService:
     def _return_connection(self, conn, close_it: bool = False):
         """Return connection to pool, or close it if it's stale/broken."""
         if conn:
-            if close_it:
-                # Don't return stale/broken connections to the pool — discard them
-                try:
-                    self._pool.putconn(conn, close=True)
-                except Exception:
-                    try:
-                        conn.close()
-                    except Exception:
-                        pass
-            else:
-                self._pool.putconn(conn)
-
-    def _is_connection_error(self, e: Exception) -> bool:
-        """Check if an exception is a stale/broken connection error."""
-        stale_keywords = [
-            "connection timed out",
-            "could not send data",
-            "could not receive data",
-            "connection reset",
-            "broken pipe",
-            "server closed the connection",
-            "ssl connection has been closed",
-            "terminating connection",
-        ]
-        msg = str(e).lower()
-        return any(kw in msg for kw in stale_keywords)
+            self._pool.putconn(conn, close=close_it)
 
-    def _execute_query(self, query: str, params: tuple = None) -> List[Dict]:
+    def _execute_query(self, query: str, params: tuple = None, name: Optional[str] = None) -> List[Dict]:
         """Execute query and return results as list of dicts.
-        Retries once with a fresh connection if a stale connection is detected.
+        Retries once with a fresh connection if the connection died mid-query
+        (closed by the server between health checks).
+        Timed under 'name' (default: the calling method) in query_metrics.
         """
+        name = name or query_name_from_caller()
         for attempt in range(2):  # attempt 0 = normal, attempt 1 = retry with fresh conn
             conn = None
-            stale = False
+            broken = False
             try:
                 conn = self._get_connection()
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(query, params or ())
-                    results = cursor.fetchall()
+                    with timed_query(name, query, params) as timing:
+                        cursor.execute(query, params or ())
+                        results = cursor.fetchall()
+                        timing.rows = len(results)
                 conn.commit()
                 return results
             except Exception as e:
-                stale = self._is_connection_error(e)
-                if conn:
+                # psycopg2 marca conn.closed cuando se pierde la conexión (no depende del mensaje)
+                broken = bool(conn and conn.closed) or isinstance(e, psycopg2.InterfaceError)
+                if conn and not broken:
                     try:
                         conn.rollback()
                     except Exception:
-                        stale = True  # rollback failed too — definitely stale
-                if attempt == 0 and stale:
-                    print(f"[DB] Stale connection detected, retrying with fresh connection. Error: {e}")
+                        broken = True  # rollback failed too — definitely broken
+                if attempt == 0 and broken:
+                    print(f"[DB] Broken connection detected, retrying with fresh connection. Error: {e}")
                 else:
                     print(f"[DB] ERROR executing query (attempt {attempt + 1}): {e}")
                     print(f"Query: {query}")
                     raise
             finally:
-                self._return_connection(conn, close_it=stale)
+                self._return_connection(conn, close_it=broken)
         # Should never reach here
         raise RuntimeError("_execute_query exhausted retries")
 
-    def _execute_one(self, query: str, params: tuple = None) -> Optional[Dict]:
+    def _execute_one(self, query: str, params: tuple = None, name: Optional[str] = None) -> Optional[Dict]:
         """Execute query and return single result"""
-        results = self._execute_query(query, params)
+        results = self._execute_query(query, params, name or query_name_from_caller())
         return results[0] if results else None
     
+    # ==========================================
+    # DONATION LISTINGS (shared by campaign / source / form title)
+    # ==========================================
+
+    def _donations_page(self, scope: str, scope_value, start_date, end_date, page_size, offset, cursor) -> Dict[str, Any]:
+        """Página de donaciones + total_count según la estrategia de conteo (donation_counts.py)."""
+        counts = get_donation_count_cache()
+        plan = counts.plan(scope, scope_value, start_date, end_date, cursor)
+        watermark = counts.current_watermark()
+        query, params, count_query, count_params = build_donations_page_queries(
+            scope, scope_value, start_date, end_date, page_size, offset, cursor, window_count=plan.use_window
+        )
+        donations = [dict(d) for d in self._execute_query(query, params, f"{scope}_donations_page")]
+
+        if plan.total is None:
+            total = counts.resolve_window(plan, donations)
+            estimated = False
+            if total is None and counts.wants_estimate():
+                estimate = parse_count_estimate(self._execute_one(f"EXPLAIN (FORMAT JSON) {count_query}", count_params, f"{scope}_donations_count_estimate"))
+                if estimate is not None and estimate >= counts.estimate_threshold:
+                    total, estimated = estimate, True
+            if total is None:
+                count_result = self._execute_one(count_query, count_params, f"{scope}_donations_count")
+                total = count_result['count'] if count_result else 0
+            counts.store(plan, total, estimated, watermark)
+
+        return format_donations_page(donations, plan.total, page_size, plan.estimated)
+
+    def iter_donation_export_batches(self, scope: str, scope_value, start_date: Optional[str] = None,
+                                     end_date: Optional[str] = None,
+                                     fetch_size: int = EXPORT_FETCH_SIZE) -> Iterator[List[Dict]]:
+        """
+        Todas las donaciones del scope en lotes de 'fetch_size' filas, leídas con un cursor
+        con nombre (DECLARE/FETCH en el servidor): nunca hay más de un lote en memoria.
+        La conexión queda tomada del pool hasta agotar o cerrar el generador.
+        Se mide como '{scope}_donations_export' (DECLARE + primer FETCH).
+        """
+        query, params = build_donations_export_query(scope, scope_value, start_date, end_date)
+        conn = self._get_connection()
+        broken = False
+        cursor = None
+        try:
+            cursor = conn.cursor(name=f"donation_export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+            cursor.itersize = fetch_size
+            with timed_query(f"{scope}_donations_export", query, params) as timing:
+                cursor.execute(query, params)
+                rows = cursor.fetchmany(fetch_size)
+                timing.rows = len(rows)
+            while rows:
+                yield [dict(r) for r in rows]
+                rows = cursor.fetchmany(fetch_size)
+        except Exception as e:
+            broken = bool(conn.closed) or isinstance(e, psycopg2.InterfaceError)
+            print(f"[DB] ERROR streaming {scope} donations export: {e}")
+            raise
+        finally:
+            if cursor is not None and not conn.closed:
+                try:
+                    cursor.close()
+                except Exception:
+                    broken = True
+            # Solo lectura: la transacción del cursor se revierte (putconn también lo haría)
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self._return_connection(conn, close_it=broken)
+
     # ==========================================
     # CAMPAIGN DONATIONS (Optimized)
     # ==========================================
@@ -122,64 +285,17 @@ class SupabaseService:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         page_size: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Get paginated donations for a campaign with optional date filters.
         Uses Costa Rica timezone (America/Costa_Rica) for date comparisons.
+        Pass the returned 'next_cursor' as 'cursor' for keyset paging (offset is then ignored).
         
         Performance: ~20-50ms (vs 2-5s with Airtable)
         """
-        # Build WHERE clause with Costa Rica timezone
-        where_clauses = ["c.airtable_id = %s"]
-        params = [campaign_id]
-        
-        if start_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %s")
-            params.append(start_date)
-        
-        if end_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %s")
-            params.append(end_date)
-        
-        where_sql = " AND ".join(where_clauses)
-        
-        # Query for donations with donor info
-        query = f"""
-            SELECT 
-                d.airtable_id as id,
-                d.amount,
-                d.donation_date as date,
-                COALESCE(don.name, 'Unknown') as "donorName",
-                COALESCE(don.emails[1], 'N/A') as "donorEmail"
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            JOIN campaigns c ON ft.campaign_id = c.id
-            LEFT JOIN donors don ON d.donor_id = don.id
-            WHERE {where_sql}
-            ORDER BY d.donation_date DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        params.extend([page_size, offset])
-        donations = self._execute_query(query, tuple(params))
-        
-        # Get total count
-        count_query = f"""
-            SELECT COUNT(*) as count
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            JOIN campaigns c ON ft.campaign_id = c.id
-            WHERE {where_sql}
-        """
-        
-        count_result = self._execute_one(count_query, tuple(params[:len(params)-2]))
-        total_count = count_result['count'] if count_result else 0
-        
-        return {
-            "donations": [dict(d) for d in donations],
-            "total_count": total_count
-        }
+        return self._donations_page("campaign", campaign_id, start_date, end_date, page_size, offset, cursor)
     
     def get_source_donations(
         self,
@@ -187,62 +303,14 @@ class SupabaseService:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         page_size: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Get paginated donations for all campaigns in a source with optional date filters.
         Uses Costa Rica timezone (America/Costa_Rica) for date comparisons.
         """
-        # Build WHERE clause with Costa Rica timezone
-        where_clauses = ["c.source = %s"]
-        params = [source_name]
-        
-        if start_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %s")
-            params.append(start_date)
-        
-        if end_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %s")
-            params.append(end_date)
-        
-        where_sql = " AND ".join(where_clauses)
-        
-        # Query for donations with donor info
-        query = f"""
-            SELECT 
-                d.airtable_id as id,
-                d.amount,
-                d.donation_date as date,
-                COALESCE(don.name, 'Unknown') as "donorName",
-                COALESCE(don.emails[1], 'N/A') as "donorEmail"
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            JOIN campaigns c ON ft.campaign_id = c.id
-            LEFT JOIN donors don ON d.donor_id = don.id
-            WHERE {where_sql}
-            ORDER BY d.donation_date DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        params.extend([page_size, offset])
-        donations = self._execute_query(query, params)
-        
-        # Get total count
-        count_query = f"""
-            SELECT COUNT(*) as count
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            JOIN campaigns c ON ft.campaign_id = c.id
-            WHERE {where_sql}
-        """
-        
-        count_result = self._execute_one(count_query, tuple(params[:len(params)-2]))
-        total_count = count_result['count'] if count_result else 0
-        
-        return {
-            "donations": [dict(d) for d in donations],
-            "total_count": total_count
-        }
+        return self._donations_page("source", source_name, start_date, end_date, page_size, offset, cursor)
 
     
     # ==========================================
@@ -263,52 +331,13 @@ class SupabaseService:
         Performance: ~10-30ms (vs 3-8s with Airtable)
         """
         # Query for breakdown by form title
-        query = """
-            SELECT 
-                ft.airtable_id as form_title_id,
-                ft.name as form_title_name,
-                COALESCE(SUM(d.amount), 0) as total_amount,
-                COUNT(d.id) as donation_count,
-                MIN(d.donation_date) as start_date
-            FROM campaigns c
-            LEFT JOIN form_titles ft ON ft.campaign_id = c.id
-            LEFT JOIN donations d ON d.form_title_id = ft.id
-                AND (%(start_date)s IS NULL OR (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %(start_date)s::date)
-                AND (%(end_date)s IS NULL OR (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %(end_date)s::date)
-            WHERE c.airtable_id = %(campaign_id)s
-                AND (%(form_title_ids)s IS NULL OR ft.airtable_id = ANY(%(form_title_ids)s))
-            GROUP BY ft.id, ft.airtable_id, ft.name
-            HAVING COUNT(d.id) > 0
-            ORDER BY MIN(d.donation_date) ASC
-        """
-        
-        query_params = {
+        breakdown = self._execute_query(CAMPAIGN_STATS_QUERY, {
             'campaign_id': campaign_id,
             'start_date': start_date,
             'end_date': end_date,
             'form_title_ids': form_title_ids
-        }
-        
-        breakdown = self._execute_query(query, query_params)
-        
-        # Calculate totals
-        campaign_total_amount = sum(float(row['total_amount']) for row in breakdown)
-        campaign_total_count = sum(int(row['donation_count']) for row in breakdown)
-        
-        return {
-            "campaign_total_amount": round(campaign_total_amount, 2),
-            "campaign_total_count": campaign_total_count,
-            "stats_by_form_title": [
-                {
-                    "form_title_id": row['form_title_id'],
-                    "form_title_name": row['form_title_name'],
-                    "total_amount": float(row['total_amount']),
-                    "donation_count": int(row['donation_count']),
-                    "start_date": row['start_date'].isoformat() if row['start_date'] else None
-                }
-                for row in breakdown
-            ]
-        }
+        })
+        return format_campaign_stats(breakdown)
     
     # ==========================================
     # SOURCE STATS (Optimized)
@@ -326,47 +355,12 @@ class SupabaseService:
         
         Performance: ~15-40ms (vs 5-10s with Airtable)
         """
-        query = """
-            SELECT 
-                c.airtable_id as campaign_id,
-                c.name as campaign_name,
-                COALESCE(SUM(d.amount), 0) as total_amount,
-                COUNT(d.id) as donation_count,
-                MIN(d.donation_date) as start_date
-            FROM campaigns c
-            LEFT JOIN form_titles ft ON ft.campaign_id = c.id
-            LEFT JOIN donations d ON d.form_title_id = ft.id
-                AND (%(start_date)s IS NULL OR (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %(start_date)s::date)
-                AND (%(end_date)s IS NULL OR (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %(end_date)s::date)
-            WHERE c.source = %(source)s
-            GROUP BY c.id, c.airtable_id, c.name
-            HAVING COUNT(d.id) > 0
-            ORDER BY MIN(d.donation_date) ASC
-        """
-        
-        breakdown = self._execute_query(query, {
+        breakdown = self._execute_query(SOURCE_STATS_QUERY, {
             'source': source,
             'start_date': start_date,
             'end_date': end_date
         })
-        
-        source_total_amount = sum(float(row['total_amount']) for row in breakdown)
-        source_total_count = sum(int(row['donation_count']) for row in breakdown)
-        
-        return {
-            "source_total_amount": round(source_total_amount, 2),
-            "source_total_count": source_total_count,
-            "stats_by_campaign": [
-                {
-                    "campaign_id": row['campaign_id'],
-                    "campaign_name": row['campaign_name'],
-                    "total_amount": float(row['total_amount']),
-                    "donation_count": int(row['donation_count']),
-                    "start_date": row['start_date'].isoformat() if row['start_date'] else None
-                }
-                for row in breakdown
-            ]
-        }
+        return format_source_stats(breakdown)
     
     # ==========================================
     # FORM TITLE DONATIONS (Optimized)
@@ -378,59 +372,14 @@ class SupabaseService:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         page_size: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Get donations for specific form titles.
         Uses Costa Rica timezone for date comparisons.
         """
-        # Build WHERE clause with Costa Rica timezone
-        where_clauses = ["ft.airtable_id = ANY(%s)"]
-        params = [form_title_ids]
-        
-        if start_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %s")
-            params.append(start_date)
-        
-        if end_date:
-            where_clauses.append("(d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %s")
-            params.append(end_date)
-        
-        where_sql = " AND ".join(where_clauses)
-        
-        query = f"""
-            SELECT 
-                d.airtable_id as id,
-                d.amount,
-                d.donation_date as date,
-                COALESCE(don.name, 'Unknown') as "donorName",
-                COALESCE(don.emails[1], 'N/A') as "donorEmail"
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            LEFT JOIN donors don ON d.donor_id = don.id
-            WHERE {where_sql}
-            ORDER BY d.donation_date DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        params.extend([page_size, offset])
-        donations = self._execute_query(query, tuple(params))
-        
-        # Get total count
-        count_query = f"""
-            SELECT COUNT(*) as count
-            FROM donations d
-            JOIN form_titles ft ON d.form_title_id = ft.id
-            WHERE {where_sql}
-        """
-        
-        count_result = self._execute_one(count_query, tuple(params[:len(params)-2]))
-        total_count = count_result['count'] if count_result else 0
-        
-        return {
-            "donations": [dict(d) for d in donations],
-            "total_count": total_count
-        }
+        return self._donations_page("form_titles", form_title_ids, start_date, end_date, page_size, offset, cursor)
     
     
     # ==========================================
@@ -469,11 +418,11 @@ class SupabaseService:
         """
         query = """
             SELECT 
-                to_char(d.donation_date AT TIME ZONE 'America/Costa_Rica', 'HH24:00') as hour,
+                lpad(d.local_hour::text, 2, '0') || ':00' as hour,
                 COALESCE(SUM(d.amount), 0) as total,
                 COUNT(d.id) as count
             FROM donations d
-            WHERE (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date = %s
+            WHERE d.local_date = %s
             GROUP BY hour
             ORDER BY hour ASC
         """
@@ -481,26 +430,7 @@ class SupabaseService:
         results = self._execute_query(query, (target_date,))
         
         # Fill in missing hours for a complete 00-23 timeline
-        hourly_map = {row['hour']: row for row in results}
-        final_results = []
-        
-        for h in range(24):
-            hour_str = f"{h:02d}:00"
-            if hour_str in hourly_map:
-                row = hourly_map[hour_str]
-                final_results.append({
-                    "date": hour_str, # Using 'date' key to match frontend expectation
-                    "total": float(row['total']),
-                    "count": int(row['count'])
-                })
-            else:
-                final_results.append({
-                    "date": hour_str,
-                    "total": 0.0,
-                    "count": 0
-                })
-                
-        return final_results
+        return fill_hourly_trend(results)
 
     # ==========================================
     # TOP DONORS (Optimized)
@@ -554,8 +484,8 @@ class SupabaseService:
             FROM campaigns c
             JOIN form_titles ft ON ft.campaign_id = c.id
             JOIN donations d ON d.form_title_id = ft.id
-            WHERE (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date >= %s
-              AND (d.donation_date AT TIME ZONE 'America/Costa_Rica')::date <= %s
+            WHERE d.local_date >= %s
+              AND d.local_date <= %s
             GROUP BY c.source
         """
         
@@ -684,19 +614,11 @@ class SupabaseService:
         Search for a donor by email and return their info and donations.
         Returns a normalized structure.
         """
-        # 1. Find donor by email (checking the emails array)
-        # Note: We assume the 'emails' column is a text array (text[])
-        donor_query = """
-            SELECT 
-                id,
-                airtable_id,
-                name,
-                emails
-            FROM donors
-            WHERE %s = ANY(emails)
-            LIMIT 1
-        """
-        
+        # 1. Find donor by any of their addresses (case-insensitive, indexed probe on donor_emails;
+        #    '= ANY(emails)' until that table has been created)
+        donor_query = get_donor_email_lookup().query(
+            lambda: self._execute_one(DONOR_EMAILS_READY_QUERY, name="donor_emails_ready")["ready"]
+        )
         donor = self._execute_one(donor_query, (email,))
         
         if not donor:
@@ -758,59 +680,27 @@ class SupabaseService:
         """
         return []
 
+    def get_email_addresses(self) -> List[Dict[str, Any]]:
+        """
+        All synced email addresses (airtable_id, email) from the local 'emails' table.
+        Used to build the in-memory autocomplete index.
+        """
+        return self._execute_query(
+            "SELECT airtable_id, email FROM emails WHERE email IS NOT NULL AND email != ''"
+        )
+
     # ==========================================
     # FUNNEL STATS (Optimized)
     # ==========================================
 
     def get_funnel_stats(self) -> Dict[str, Any]:
         """
-        Get funnel statistics directly from Supabase.
+        Get funnel statistics.
+        Served from the in-memory counters kept up to date by the incremental sync;
+        when they are cold, a single aggregated query seeds them.
         """
         try:
-            # 1. Total Funnel (Active)
-            funnel_data = self._execute_one(
-                "SELECT COUNT(*) as count FROM donors WHERE stage = 'Funnel' AND (status IS NULL OR status != 'Unsubscribed')"
-            )
-            funnel_count = funnel_data['count'] if funnel_data else 0
-            
-            # 2. Pending Approvals
-            pending_data = self._execute_one(
-                "SELECT COUNT(*) as count FROM donors WHERE stage = 'Pending Approval' AND region IS NOT NULL AND region != '' AND (status IS NULL OR status NOT IN ('Final Check', 'Potential Duplicate'))"
-            )
-            pending_count = pending_data['count'] if pending_data else 0
-
-            # 3. Unsubscribed (Funnel only)
-            unsub_data = self._execute_one(
-                "SELECT COUNT(*) as count FROM donors WHERE stage = 'Funnel' AND status = 'Unsubscribed'"
-            )
-            unsubscribed_count = unsub_data['count'] if unsub_data else 0
-            
-            # 4. Breakdown
-            breakdown_rows = self._execute_query(
-                "SELECT COALESCE(funnel_stage, 'Unknown') as stage, COUNT(*) as count FROM donors WHERE stage = 'Funnel' AND (status IS NULL OR status != 'Unsubscribed') GROUP BY funnel_stage"
-            )
-            
-            # Helper to extract stage number
-            import re
-            def get_stage_order(stage_name):
-                # Extract number from "(Stage X)"
-                match = re.search(r'\(Stage (\d+)\)', stage_name)
-                if match:
-                    return int(match.group(1))
-                return 9999 # Push to end if no number
-            
-            # Construct dictionary first
-            raw_breakdown = [{"name": row['stage'], "count": int(row['count'])} for row in breakdown_rows]
-            
-            # Sort by stage number ASC
-            stage_breakdown = sorted(raw_breakdown, key=lambda x: get_stage_order(x['name']))
-
-            return {
-                "total_funnel": int(funnel_count),
-                "pending_approvals": int(pending_count),
-                "total_unsubscribed": int(unsubscribed_count),
-                "stage_breakdown": stage_breakdown
-            }
+            return get_funnel_stats_engine().get_stats(self._load_funnel_counts)
         except Exception as e:
             print(f"❌ Error in Supabase get_funnel_stats: {e}")
             return {
@@ -820,6 +710,64 @@ class SupabaseService:
                 "stage_breakdown": {}
             }
 
+    def _load_funnel_counts(self) -> Dict[tuple, int]:
+        """All funnel counters in one round trip (FILTER aggregates per funnel stage)."""
+        return _funnel_counts_from_rows(self._execute_query(FUNNEL_COUNTS_SQL, FUNNEL_COUNTS_PARAMS))
+
+    # ==========================================
+    # DASHBOARD OVERVIEW (single round trip)
+    # ==========================================
+
+    def get_dashboard_overview(self, today: date, start_date: Optional[date] = None,
+                               end_date: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Glance, filtered-range and funnel numbers of /dashboard/metrics in one statement.
+        Funnel counters come from memory when warm; when cold, the funnel CTE rides
+        along in the same statement and seeds them.
+        """
+        periods = dashboard_periods(today)
+        has_range = bool(start_date and end_date)
+        params = {
+            **FUNNEL_COUNTS_PARAMS,
+            **periods,
+            "range_start": start_date if has_range else None,
+            "range_end": end_date if has_range else None,
+            # Rango de un solo día: tendencia por hora en vez de por día
+            "hourly_date": start_date if has_range and start_date == end_date else None,
+        }
+
+        overview_row: Dict[str, Any] = {}
+
+        def load_with_overview() -> Dict[tuple, int]:
+            overview_row.update(self._execute_one(_dashboard_overview_query(include_funnel=True), params, "dashboard_overview") or {})
+            return _funnel_counts_from_rows(overview_row.get('funnel_rows') or [])
+
+        funnel = get_funnel_stats_engine().get_stats(load_with_overview)
+        if not overview_row:
+            overview_row.update(self._execute_one(_dashboard_overview_query(include_funnel=False), params, "dashboard_overview") or {})
+        row = overview_row
+
+        glance = build_glance_metrics(
+            float(row.get('amount_today') or 0),
+            int(row.get('count_today') or 0),
+            float(row.get('amount_this_month') or 0),
+            int(row.get('count_this_month') or 0),
+            float(row.get('amount_last_month_same_day') or 0),
+            _daily_points(row.get('glance_trend')),
+        )
+
+        filtered = {}
+        if has_range:
+            daily_trend = (fill_hourly_trend(row.get('hourly_trend') or []) if params["hourly_date"]
+                           else _daily_points(row.get('range_trend')))
+            filtered = build_filtered_metrics(
+                float(row.get('amount_in_range') or 0),
+                int(row.get('count_in_range') or 0),
+                daily_trend,
+            )
+
+        return {"glance": glance, "filtered": filtered, "funnel": funnel}
+
     # ==========================================
     # SHARED VIEWS
     # ==========================================
@@ -828,14 +776,8 @@ class SupabaseService:
         """
         Create a new shared view configuration and return the token.
         """
-        query = """
-            INSERT INTO analytics_shared_views (configuration, created_by)
-            VALUES (%s, %s)
-            RETURNING token
-        """
-        
         # Ensure configuration is JSON serializable (psycopg2 handles dict as jsonb automatically)
-        result = self._execute_one(query, (psycopg2.extras.Json(configuration), created_by))
+        result = self._execute_one(CREATE_SHARED_VIEW_QUERY, (psycopg2.extras.Json(configuration), created_by))
         
         if result and 'token' in result:
             return str(result['token'])
@@ -845,17 +787,11 @@ class SupabaseService:
         """
         Get a shared view configuration by token.
         """
-        query = """
-            SELECT configuration, is_active
-            FROM analytics_shared_views
-            WHERE token = %s
-        """
-        
         # We need to cast token to UUID in the query if it's passed as string, 
         # but psycopg2 usually handles it if the column is UUID.
         # However, to be safe against invalid UUID strings, we should try/catch or validate.
         try:
-            result = self._execute_one(query, (token,))
+            result = self._execute_one(GET_SHARED_VIEW_QUERY, (token,))
             
             if result and result['is_active']:
                 return result['configuration']
@@ -865,7 +801,7 @@ class SupabaseService:
             return None
 
     def close(self):
-        """Close database connection"""
+        """Close the shared connection pool"""
         if self._pool:
             self._pool.closeall()
 
@@ -0,0 +1,62 @@
+"""
+Sync Watermark
+Per-table data version bumped by the incremental sync after it writes rows.
+Caches that derive from Supabase data key their entries on the watermark of
+the tables they read, so a cached value lives exactly until the next sync
+that touched those tables.
+
+With a shared cache backend (cache_store.py) the counters live in the shared
+store, so a sync run by any worker invalidates the entries of every worker.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from backend.app.services.cache_store import CacheStore, get_shared_cache_store
+
+WATERMARK_PREFIX = "watermark:"
+
+
+class SyncWatermark:
+    """Contador de versión por tabla (thread-safe). Solo crece."""
+
+    def __init__(self, store: Optional[CacheStore] = None):
+        self._store = store
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *tables: str) -> None:
+        if self._store is not None:
+            try:
+                self._store.incr(*(WATERMARK_PREFIX + t for t in tables))
+            except Exception as e:
+                # Sin el bump los demás workers no ven el cambio hasta RESULT_CACHE_TTL: que se note en el log
+                print(f"❌ Could not bump shared watermark of {tables}: {e}")
+            return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, *tables: str) -> Tuple[int, ...]:
+        if self._store is not None:
+            try:
+                return self._store.counters(*(WATERMARK_PREFIX + t for t in tables))
+            except Exception as e:
+                # -1 nunca coincide con una versión guardada: los cachés fallan (miss) en vez de servir datos viejos
+                print(f"⚠️ Could not read shared watermark: {e}")
+                return (-1,) * len(tables)
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+
+# Singleton instance
+_sync_watermark = None
+_sync_watermark_lock = threading.Lock()
+
+def get_sync_watermark() -> SyncWatermark:
+    """Get or create the process-wide SyncWatermark (on the shared cache store, if any)"""
+    global _sync_watermark
+    if _sync_watermark is None:
+        with _sync_watermark_lock:
+            if _sync_watermark is None:
+                _sync_watermark = SyncWatermark(get_shared_cache_store())
+    return _sync_watermark
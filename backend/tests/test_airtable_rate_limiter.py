@@ -0,0 +1,43 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import threading
+import time
+
+from backend.app.services.airtable_rate_limiter import (
+    AirtableRateGovernor, PRIORITY_INTERACTIVE, PRIORITY_SYNC, per_process_rate
+)
+
+
+def test_interactive_is_served_before_queued_sync():
+    governor = AirtableRateGovernor(rate=20, burst=2, interactive_reserve=1)
+    # Vaciar el bucket
+    governor.acquire(PRIORITY_INTERACTIVE)
+    governor.acquire(PRIORITY_INTERACTIVE)
+
+    order = []
+    sync_thread = threading.Thread(target=lambda: (governor.acquire(PRIORITY_SYNC), order.append("sync")))
+    sync_thread.start()
+    time.sleep(0.01)  # el sync ya está en la cola
+    governor.acquire(PRIORITY_INTERACTIVE)
+    order.append("interactive")
+    sync_thread.join(timeout=2)
+
+    assert order == ["interactive", "sync"]
+    metrics = governor.get_metrics()
+    assert metrics["classes"][PRIORITY_INTERACTIVE]["requests"] == 3
+    assert metrics["classes"][PRIORITY_SYNC]["requests"] == 1
+    assert metrics["classes"][PRIORITY_SYNC]["max_wait_ms"] > 0
+
+
+
+def test_workers_split_the_base_limit_and_still_get_a_token():
+    assert per_process_rate(5, 1) == 5
+    assert per_process_rate(5, 4) == 1.25
+    assert per_process_rate(5, 0) == 5
+
+    # 8 workers: 0.625 req/s cada uno; el bucket guarda al menos un token entero
+    governor = AirtableRateGovernor(rate=per_process_rate(5, 8))
+    assert governor.capacity == 1.0 and governor.interactive_reserve == 0.0
+    assert governor.acquire(PRIORITY_SYNC) < 0.1
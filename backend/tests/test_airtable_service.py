@@ -0,0 +1,220 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault("AIRTABLE_API_KEY", "test")
+os.environ.setdefault("AIRTABLE_BASE_ID", "test")
+
+import re
+
+from backend.app.services.airtable_service import AirtableDimensionCache, EmailDonorIndex, batch_get_records
+
+
+class FakeDonorsTable:
+    """Tabla Donors mínima: devuelve los registros y guarda las fórmulas usadas."""
+    def __init__(self, records):
+        self.records = records
+        self.formulas = []
+
+    def all(self, formula=None, fields=None, **kwargs):
+        self.formulas.append(formula)
+        return list(self.records)
+
+
+def test_email_donor_index_full_then_incremental():
+    table = FakeDonorsTable([
+        {"id": "recD1", "fields": {"Emails": ["recE1", "recE2"]}},
+        {"id": "recD2", "fields": {"Emails": ["recE3"]}},
+    ])
+    index = EmailDonorIndex(table)
+
+    assert index.get_donor_id("recE2") == "recD1"
+    assert index.get_donor_id("recE3") == "recD2"
+    # La segunda búsqueda reutiliza el índice (una sola llamada)
+    assert len(table.formulas) == 1
+    assert "NOT(" in table.formulas[0]
+
+    # recD1 pierde recE2 y se lo enlaza a recD2: el refresco incremental lo refleja
+    table.records = [
+        {"id": "recD1", "fields": {"Emails": ["recE1"]}},
+        {"id": "recD2", "fields": {"Emails": ["recE3", "recE2"]}},
+    ]
+    index.invalidate()
+    assert index.get_donor_id("recE2") == "recD2"
+    assert "IS_AFTER({Last Modified}" in table.formulas[-1]
+
+
+def test_email_donor_index_miss_forces_single_refresh():
+    table = FakeDonorsTable([{"id": "recD1", "fields": {"Emails": ["recE1"]}}])
+    index = EmailDonorIndex(table)
+    index.refresh()
+
+    table.records = [{"id": "recD9", "fields": {"Emails": ["recE9"]}}]
+    assert index.get_donor_id("recE9") == "recD9"
+    assert len(table.formulas) == 2
+
+    index.discard("recE9")
+    table.records = []
+    assert index.get_donor_id("recE9") is None
+
+
+class FakeRecordsTable:
+    """Resuelve fórmulas OR(RECORD_ID() = ...) devolviendo los registros en orden inverso."""
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.calls = []
+
+    def all(self, formula=None, **kwargs):
+        requested = re.findall(r"RECORD_ID\(\) = '(\w+)'", formula)
+        self.calls.append(requested)
+        return [{"id": rid, "fields": {}} for rid in reversed(requested) if rid in self.ids]
+
+
+def test_batch_get_records_chunks_and_preserves_order():
+    ids = [f"rec{i:03d}" for i in range(23)]
+    table = FakeRecordsTable(ids[:-1])  # el último no existe
+
+    records = batch_get_records(table, ids + [ids[0], None], chunk_size=5)
+
+    assert [rec["id"] for rec in records] == ids[:-1]
+    assert len(table.calls) == 5
+    assert all(len(chunk) <= 5 for chunk in table.calls)
+    assert batch_get_records(table, []) == []
+
+
+class FakeDimensionTable:
+    def __init__(self, records):
+        self.records = records
+        self.formulas = []
+
+    def all(self, formula=None, fields=None, **kwargs):
+        self.formulas.append(formula)
+        return list(self.records)
+
+
+def test_dimension_cache_full_load_then_incremental():
+    campaigns = FakeDimensionTable([
+        {"id": "recC1", "createdTime": "2025-01-01T00:00:00.000Z", "fields": {"Name": "Spring", "Source": "Facebook"}},
+        {"id": "recC2", "createdTime": "2025-02-01T00:00:00.000Z", "fields": {"Name": "Gala", "Source": "Big Campaign"}},
+    ])
+    form_titles = FakeDimensionTable([
+        {"id": "recF1", "createdTime": "2025-01-02T00:00:00.000Z", "fields": {"Name": "FB 1", "Campaign": ["recC1"]}},
+        {"id": "recF2", "createdTime": "2025-02-02T00:00:00.000Z", "fields": {"Name": "Gala 1", "Campaign": ["recC2"]}},
+    ])
+    cache = AirtableDimensionCache(campaigns, form_titles, ttl=3600, refresh_interval=60)
+
+    assert cache.form_title_to_campaign() == {"recF1": "recC1", "recF2": "recC2"}
+    assert cache.campaign_to_source() == {"recC1": "Facebook", "recC2": "Big Campaign"}
+    assert [ft["id"] for ft in cache.get_form_titles(["recC2"])] == ["recF2"]
+    # Varias lecturas dentro del intervalo: una sola carga completa
+    assert campaigns.formulas == [None] and form_titles.formulas == [None]
+
+    # recF1 se mueve a la campaña recC2: el refresco incremental solo trae lo modificado
+    form_titles.records = [
+        {"id": "recF1", "createdTime": "2025-01-02T00:00:00.000Z", "fields": {"Name": "FB 1", "Campaign": ["recC2"]}},
+    ]
+    campaigns.records = []
+    cache.invalidate()
+    assert cache.form_title_to_campaign() == {"recF1": "recC2", "recF2": "recC2"}
+    assert "IS_AFTER({Last Modified}" in form_titles.formulas[-1]
+    assert [c["name"] for c in cache.get_campaigns(source="Facebook")] == ["Spring"]
+
+
+class FakePagedTable(FakeRecordsTable):
+    """Donations paginadas (iterate) + resolución por RECORD_ID() para Donors/Emails."""
+    def __init__(self, records, page_size=2):
+        super().__init__([rec["id"] for rec in records])
+        self.by_id = {rec["id"]: rec for rec in records}
+        self.page_size = page_size
+
+    def iterate(self, **kwargs):
+        records = list(self.by_id.values())
+        for i in range(0, len(records), self.page_size):
+            yield records[i:i + self.page_size]
+
+    def all(self, formula=None, **kwargs):
+        return [self.by_id[rec["id"]] for rec in super().all(formula=formula)]
+
+
+def test_top_donors_stats_resolves_only_top_donors():
+    from backend.app.services.airtable_service import AirtableService
+
+    service = AirtableService()
+    service.donations_table = FakePagedTable([
+        {"id": "recN1", "fields": {"Amount": 50, "Donor": ["recD1"], "Date": "2025-03-01"}},
+        {"id": "recN2", "fields": {"Amount": 10, "Donor": ["recD2"], "Date": "2025-01-01"}},
+        {"id": "recN3", "fields": {"Amount": 70, "Donor": ["recD2"], "Date": "2025-02-01"}},
+        {"id": "recN4", "fields": {"Amount": 5, "Donor": ["recD3"], "Date": "2025-01-05"}},
+        {"id": "recN5", "fields": {"Amount": 40, "Donor": ["recD4"], "Date": "2025-01-07"}},
+    ])
+    service.donors_table = FakePagedTable([
+        {"id": "recD1", "fields": {"Name": "Ana", "Emails": ["recE1"]}},
+        {"id": "recD2", "fields": {"Name": "Luis", "Last Name": "Mora", "Emails": ["recE2"]}},
+        {"id": "recD3", "fields": {"Name": "Sin", "Emails": ["recE3"]}},
+        {"id": "recD4", "fields": {"Name": "Nadie"}},
+    ])
+    service.emails_table = FakePagedTable([
+        {"id": "recE1", "fields": {"Email": "ana@example.com"}},
+        {"id": "recE2", "fields": {"Email": "luis@example.com"}},
+        {"id": "recE3", "fields": {"Email": "sin@example.com"}},
+    ])
+
+    top = service.get_top_donors_stats(limit=2)
+
+    assert [(d["email"], d["totalAmount"], d["donationsCount"]) for d in top] == [
+        ("luis@example.com", 80.0, 2),
+        ("ana@example.com", 50.0, 1),
+    ]
+    assert top[0]["name"] == "Luis Mora"
+    assert top[0]["firstDonationDate"] == "2025-01-01"
+    # Solo se leyeron los donantes del top, nunca recD3/recD4
+    assert sorted(rid for call in service.donors_table.calls for rid in call) == ["recD1", "recD2"]
+
+
+def test_campaign_contacts_are_yielded_per_page():
+    from backend.app.services.airtable_service import AirtableService
+
+    service = AirtableService()
+    service.emails_table = FakePagedTable([
+        {"id": "recE1", "fields": {"Email": "ana@example.com", "Name": ["Ana "]}},
+        {"id": "recE2", "fields": {"Name": ["Sin email"]}},
+        {"id": "recE3", "fields": {"Email": "luis@example.com"}},
+    ])
+
+    pages = service.iter_campaign_contacts("USA", is_bounced=False)
+    assert next(pages) == [{"Email": "ana@example.com", "Name": "Ana"}]
+    assert next(pages) == [{"Email": "luis@example.com", "Name": "Valued Supporter"}]
+    assert service.get_campaign_contacts("USA", is_bounced=False) == [
+        {"Email": "ana@example.com", "Name": "Ana"},
+        {"Email": "luis@example.com", "Name": "Valued Supporter"},
+    ]
+
+
+class FakeDimensions:
+    def get_campaigns(self, source=None):
+        return [{"id": "recC1", "name": "Navidad", "createdTime": "2025-01-01"},
+                {"id": "recC2", "name": "Verano", "createdTime": "2025-02-01"}]
+
+    def form_title_to_campaign(self):
+        return {"recF1": "recC1", "recF2": "recC1", "recF3": "recC2", "recF9": "recOtra"}
+
+
+def test_dated_source_stats_sum_per_campaign_while_paging():
+    from backend.app.services.airtable_service import AirtableService
+
+    service = AirtableService()
+    service.dimensions = FakeDimensions()
+    service.donations_table = FakePagedTable([
+        {"id": "recN1", "fields": {"Amount": 10, "Form Title": ["recF1"]}},
+        {"id": "recN2", "fields": {"Amount": 5.5, "Form Title": ["recF2"]}},
+        {"id": "recN3", "fields": {"Amount": 20, "Form Title": ["recF3"]}},
+        {"id": "recN4", "fields": {"Amount": 99, "Form Title": ["recF9"]}},  # campaña de otra fuente
+        {"id": "recN5", "fields": {"Amount": 7}},
+    ])
+
+    stats = service.get_source_stats("Web", "2025-01-01", "2025-03-31")
+
+    assert [(c["campaign_id"], c["total_amount"], c["donation_count"]) for c in stats["stats_by_campaign"]] == [
+        ("recC1", 15.5, 2),
+        ("recC2", 20.0, 1),
+    ]
+    assert (stats["source_total_amount"], stats["source_total_count"]) == (35.5, 3)
@@ -0,0 +1,128 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import asyncio
+import pickle
+import stat
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from backend.app.services import cache_store
+from backend.app.services.cache_store import CacheStore, MemoryStore, SQLiteStore, StoreBackend, dumps, loads, store_lock
+from backend.app.services.circuit_breaker import CircuitBreaker, StaleResultCache
+from backend.app.services.data_service import DataService
+from backend.app.services.result_cache import ResultCache, store_key
+from backend.app.services.single_flight import SingleFlight
+from backend.app.services.sync_watermark import SyncWatermark
+
+
+class CountingSupabase:
+    def __init__(self):
+        self.calls = 0
+
+    def get_source_stats(self, source_name, start_date=None, end_date=None):
+        self.calls += 1
+        return {"source": source_name, "total": Decimal("12.50"), "since": date(2025, 1, 1)}
+
+
+def _worker(path):
+    """Un worker de uvicorn: sus propias instancias, el mismo fichero de caché."""
+    store = SQLiteStore(path)
+    service = DataService.__new__(DataService)
+    service.supabase = CountingSupabase()
+    service.airtable = None
+    service.supabase_breaker = CircuitBreaker("supabase")
+    service.airtable_breaker = CircuitBreaker("airtable")
+    service.stale_results = StaleResultCache()
+    service.single_flight = SingleFlight()
+    service.result_cache = ResultCache(watermark=SyncWatermark(store), store=store, ttl=60)
+    return service
+
+
+def test_serialization_is_binary_and_compresses_large_values():
+    small = {"total": Decimal("1.5"), "day": date(2025, 3, 1)}
+    assert loads(dumps(small)) == small
+    rows = [{"donor": "Ana", "amount": 10}] * 500
+    data = dumps(rows)
+    assert data[32:33] == b"z" and len(data) < 1000
+    assert loads(data) == rows
+
+
+def test_tampered_values_are_rejected_and_sqlite_file_is_private(tmp_path):
+    data = dumps({"total": 1})
+    forged = data[:32] + b"p" + pickle.dumps({"total": 999})
+    for bad in (forged, data[:-1] + b"x", data[32:]):
+        with pytest.raises(ValueError):
+            loads(bad)
+
+    store = SQLiteStore(str(tmp_path / "private" / "cache.sqlite3"))
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(tmp_path / "private").st_mode) == 0o700
+
+    # Una entrada escrita por otro en el almacén es un miss, no se deserializa
+    cache = ResultCache(watermark=SyncWatermark(store), store=store, ttl=60)
+    store.set("result:" + store_key(("k",)), forged, 60)
+    assert cache.get(("k",), ("campaigns",))[0] == "miss"
+
+
+def test_workers_share_results_and_sync_invalidation(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a, worker_b = _worker(path), _worker(path)
+
+    first = worker_a.get_source_stats("Web")
+    assert worker_b.get_source_stats("Web") == first
+    assert (worker_a.supabase.calls, worker_b.supabase.calls) == (1, 0)
+
+    # Un sync en el worker A invalida la entrada también para B
+    worker_a.result_cache._watermark.bump("campaigns")
+    worker_b.get_source_stats("Web")
+    assert worker_b.supabase.calls == 1
+    assert worker_b.result_cache.get_metrics()["hit_ratio"] == 0.5
+
+
+def test_refresh_reservation_is_shared_and_expires(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"))
+    assert store.add("refresh:k", b"1", 60)
+    assert not SQLiteStore(store.path).add("refresh:k", b"1", 60)
+    store.set("refresh:old", b"1", -1)  # ya expirada
+    assert store.add("refresh:old", b"1", 60)
+
+
+def test_fastapi_cache_backend_on_store(tmp_path):
+    backend = StoreBackend(SQLiteStore(str(tmp_path / "cache.sqlite3")))
+
+    async def scenario():
+        await backend.set("fastapi-cache:contacts:1", b"{}", expire=120)
+        ttl, value = await backend.get_with_ttl("fastapi-cache:contacts:1")
+        assert value == b"{}" and 0 < ttl <= 120
+        assert await backend.clear(namespace="fastapi-cache") == 1
+        assert await backend.get("fastapi-cache:contacts:1") is None
+
+    asyncio.run(scenario())
+
+
+def test_store_lock_lets_one_worker_run_a_job(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(cache_store, "get_shared_cache_store", lambda: store)
+
+    with store_lock("data_sync", 60) as first:
+        with store_lock("data_sync", 60) as second:
+            assert first and not second
+    # Liberado al salir: el siguiente tick puede tomarlo
+    with store_lock("data_sync", 60) as again:
+        assert again
+
+
+def test_incomplete_backend_fails_when_created(tmp_path):
+    class HalfStore(CacheStore):
+        name = "half"
+
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        HalfStore()
+    assert MemoryStore().name == "memory" and SQLiteStore(str(tmp_path / "c.sqlite3")).name == "sqlite"
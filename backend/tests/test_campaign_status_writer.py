@@ -0,0 +1,64 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from contextlib import contextmanager
+
+from backend.app.services.email_sender_service import CampaignStatusWriter
+
+
+class RecordingCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+
+class RecordingConn:
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self.executed)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeService:
+    def __init__(self):
+        self.conn = RecordingConn()
+
+    @contextmanager
+    def _connection(self):
+        yield self.conn
+
+
+def test_progress_updates_are_coalesced_into_one_write_per_campaign():
+    service = FakeService()
+    writer = CampaignStatusWriter(service, interval=3600)
+    for sent in range(1, 51):
+        writer.queue_update("camp-1", {"sent_count_final": sent})
+    writer.queue_update("camp-2", {"sent_count_final": 7})
+
+    assert writer.flush() == 2
+    # 51 llamadas -> 2 UPDATE en una sola transacción, con el último valor
+    assert service.conn.commits == 1
+    params = sorted(p for _, p in service.conn.executed)
+    assert params == [(7, "camp-2"), (50, "camp-1")]
+    assert all("last_updated = NOW()" in q for q, _ in service.conn.executed)
+    assert writer.flush() == 0
+
+    # Una escritura directa se lleva lo encolado: el flush no la pisa después
+    writer.queue_update("camp-1", {"sent_count_final": 60})
+    with writer.write_lock:
+        assert writer.take_pending("camp-1") == {"sent_count_final": 60}
+    assert writer.flush() == 0
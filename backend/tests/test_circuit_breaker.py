@@ -0,0 +1,156 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import pytest
+
+from backend.app.services import circuit_breaker, data_service as data_service_module
+from backend.app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, StaleResultCache
+from backend.app.services.data_service import DataService
+from backend.app.services.result_cache import ResultCache
+from backend.app.services.single_flight import SingleFlight
+
+
+class FlakySupabase:
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def get_source_stats(self, source_name, start_date=None, end_date=None):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("server closed the connection unexpectedly")
+        return {"source": source_name, "total": 100}
+
+
+class CountingAirtable:
+    def __init__(self):
+        self.calls = 0
+
+    def get_source_stats(self, source_name, start_date=None, end_date=None):
+        self.calls += 1
+        return {"source": source_name, "total": 90, "from": "airtable"}
+
+
+def _service():
+    service = DataService.__new__(DataService)
+    service.supabase = FlakySupabase()
+    service.airtable = CountingAirtable()
+    service.supabase_breaker = CircuitBreaker("supabase", failure_rate=0.5, min_calls=2, open_seconds=60)
+    service.airtable_breaker = CircuitBreaker("airtable", min_calls=2, open_seconds=60)
+    service.stale_results = StaleResultCache()
+    service.single_flight = SingleFlight()
+    service.result_cache = ResultCache(enabled=False)
+    return service
+
+
+def test_breaker_opens_on_failure_rate_and_half_open_probe_closes_it():
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, open_seconds=0)
+    for ok in (True, False, True):
+        breaker.record_success() if ok else breaker.record_failure(RuntimeError("x"))
+    assert breaker.state == "closed"
+    breaker.record_failure(RuntimeError("x"))  # 2/4 fallos
+    assert breaker.state == "open"
+
+    # open_seconds=0: la siguiente llamada es la prueba; solo una a la vez
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+    # Errores de la petición (ValueError) no cuentan como fallos del backend
+    for _ in range(10):
+        breaker.record_failure(ValueError("invalid cursor"))
+    assert breaker.state == "closed"
+
+
+def test_open_supabase_circuit_skips_supabase_and_falls_back():
+    service = _service()
+    assert service.get_source_stats("Web")["total"] == 100
+
+    service.supabase.down = True
+    service.get_source_stats("Web")
+    service.get_source_stats("Web")
+    assert service.supabase_breaker.state == "open"
+
+    calls = service.supabase.calls
+    result = service.get_source_stats("Web")
+    assert result["from"] == "airtable"
+    assert service.supabase.calls == calls  # sin esperar otro error de Supabase
+
+
+def test_denied_fallback_serves_last_good_result_or_503(monkeypatch):
+    monkeypatch.setattr(data_service_module, "fallback_allowed", lambda method: method != "get_source_stats")
+    service = _service()
+    service.get_source_stats("Web")
+    service.supabase.down = True
+
+    # Supabase falla y el método no puede caer a Airtable: último resultado bueno
+    assert service.get_source_stats("Web") == {"source": "Web", "total": 100}
+    assert service.airtable.calls == 0
+
+    service.get_source_stats("Web")
+    assert service.supabase_breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as exc:
+        service.get_source_stats("Mail")  # sin resultado previo
+    assert exc.value.retry_after > 0
+
+
+def test_fail_fast_mode_raises_while_open(monkeypatch):
+    monkeypatch.setattr(data_service_module, "CIRCUIT_OPEN_MODE", circuit_breaker.OPEN_MODE_FAIL_FAST)
+    service = _service()
+    service.supabase_breaker.record_failure(RuntimeError("down"))
+    service.supabase_breaker.record_failure(RuntimeError("down"))
+    with pytest.raises(CircuitOpenError):
+        service.get_source_stats("Web")
+    assert service.supabase.calls == 0 and service.airtable.calls == 0
+
+
+class RateLimitedTable:
+    def __init__(self):
+        self.calls = 0
+
+    def iterate(self, **kwargs):
+        self.calls += 1
+        raise RuntimeError("429 Client Error: Too Many Requests")
+
+
+class DownSupabase:
+    def get_top_donors_stats(self, limit):
+        raise ConnectionError("server closed the connection unexpectedly")
+
+
+def test_swallowed_airtable_errors_open_the_airtable_breaker():
+    os.environ.setdefault("AIRTABLE_API_KEY", "test")
+    os.environ.setdefault("AIRTABLE_BASE_ID", "test")
+    from backend.app.services.airtable_service import AirtableService
+
+    airtable = AirtableService()
+    airtable.donations_table = RateLimitedTable()
+    # Llamado directamente (endpoints), el método sigue devolviendo vacío
+    assert airtable.get_top_donors_stats(5) == []
+
+    service = _service()
+    service.supabase = DownSupabase()
+    service.airtable = airtable
+    for _ in range(2):
+        # Como fallback el error se propaga: no se sirve un top vacío como respuesta real
+        with pytest.raises(RuntimeError):
+            service.get_top_donors(5)
+    assert service.airtable_breaker.state == "open"
+
+    calls = airtable.donations_table.calls
+    with pytest.raises(CircuitOpenError):
+        service.get_top_donors(5)
+    assert airtable.donations_table.calls == calls  # Airtable ya no se consulta
+
+
+def test_last_error_keeps_only_type_and_sqlstate():
+    class UniqueViolation(Exception):
+        pgcode = "23505"
+
+    breaker = CircuitBreaker("supabase")
+    breaker.record_failure(UniqueViolation('duplicate key value violates unique constraint\nDETAIL: Key (email)=(ana@example.org) already exists.'))
+    assert breaker.get_metrics()["last_error"] == "UniqueViolation (SQLSTATE 23505)"
+    breaker.record_failure(ConnectionError('could not connect to server at "db.internal" (10.0.0.5), port 5432'))
+    assert breaker.get_metrics()["last_error"] == "ConnectionError"
@@ -0,0 +1,59 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import threading
+import time
+
+import pytest
+
+from backend.app.services.contact_spool import ContactSpool
+
+
+def _pages(count, per_page=100, fail_after=None):
+    for p in range(count):
+        if fail_after is not None and p == fail_after:
+            raise RuntimeError("LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+        yield [{"Email": f"c{p}-{i}@example.com", "Name": "" if i % 2 else f"N{i}"} for i in range(per_page)]
+        # Sin email: no entra en el spool
+        yield [{"Name": "Sin email"}]
+
+
+def test_slow_consumer_gets_full_list_read_upfront():
+    spool = ContactSpool(_pages(500)).start()
+    iterator = iter(spool)
+    first = next(iterator)
+    assert first == ("c0-0@example.com", "N0")
+
+    # El consumidor no avanza y aun así se leen todas las páginas (Airtable no espera al envío)
+    deadline = time.time() + 5
+    while not spool.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert spool.complete and len(spool) == 50000
+
+    rest = []
+    for contact in iterator:
+        rest.append(contact)
+        if len(rest) % 10000 == 0:
+            time.sleep(0.05)  # envío lento
+    assert len(rest) == 49999
+    assert rest[0] == ("c0-1@example.com", "Valued Supporter")
+
+
+def test_consumer_waits_for_pages_and_sees_fetch_errors_after_last_contact():
+    release = threading.Event()
+
+    def gated():
+        yield [{"Email": "a@example.com"}]
+        release.wait(5)
+        yield [{"Email": "b@example.com"}]
+        raise RuntimeError("boom")
+
+    spool = ContactSpool(gated()).start()
+    seen = []
+    with pytest.raises(RuntimeError):
+        for email, _ in spool:
+            seen.append(email)
+            release.set()
+    assert seen == ["a@example.com", "b@example.com"]
+    assert spool.done and not spool.complete
@@ -0,0 +1,58 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from datetime import date
+
+from backend.app.services import supabase_service
+from backend.app.services.dashboard_metrics import dashboard_periods, glance_from_daily_summaries
+from backend.app.services.funnel_stats import FunnelStatsEngine
+from backend.app.services.supabase_service import SupabaseService
+
+
+def test_periods_clamp_same_day_of_previous_month():
+    periods = dashboard_periods(date(2025, 3, 31))
+    assert periods["start_prev_month"] == date(2025, 2, 1)
+    assert periods["prev_month_same_day"] == date(2025, 2, 28)
+    assert periods["trend_start"] == date(2025, 3, 1)
+
+    glance = glance_from_daily_summaries([
+        {"date": "2025-02-28", "total": 50.0, "count": 1},
+        {"date": "2025-03-30", "total": 25.0, "count": 1},
+        {"date": "2025-03-31", "total": 75.0, "count": 3},
+    ], date(2025, 3, 31))
+    assert glance["amountToday"] == 75.0 and glance["donationsCountThisMonth"] == 4
+    assert glance["amountLastMonthSameDay"] == 50.0 and glance["momGrowth"] == 100.0
+    assert [p["date"] for p in glance["glanceTrend"]] == ["2025-03-30", "2025-03-31"]
+
+
+def test_dashboard_overview_is_one_statement(monkeypatch):
+    engine = FunnelStatsEngine()
+    monkeypatch.setattr(supabase_service, "get_funnel_stats_engine", lambda: engine)
+    service = SupabaseService.__new__(SupabaseService)
+    calls = []
+
+    def fake_execute_one(query, params=None, name=None):
+        calls.append((query, params))
+        return {
+            "amount_today": 10, "count_today": 1, "amount_this_month": 30, "count_this_month": 3,
+            "amount_last_month_same_day": 20, "glance_trend": [{"date": "2025-03-31", "total": 10, "count": 1}],
+            "amount_in_range": 10, "count_in_range": 1, "range_trend": None,
+            "hourly_trend": [{"hour": "09:00", "total": 10, "count": 1}],
+            "funnel_rows": [{"funnel_stage": "Stage A", "active": 4, "unsubscribed": 1, "pending": 2}],
+        }
+
+    service._execute_one = fake_execute_one
+    overview = service.get_dashboard_overview(date(2025, 3, 31), date(2025, 3, 31), date(2025, 3, 31))
+
+    # Funnel frío: viaja en la misma sentencia y siembra los contadores en memoria
+    assert len(calls) == 1 and "funnel AS" in calls[0][0]
+    assert calls[0][1]["hourly_date"] == date(2025, 3, 31)
+    assert overview["funnel"]["total_funnel"] == 4 and engine.is_warm
+    assert overview["glance"]["momGrowth"] == 50.0
+    hourly = overview["filtered"]["dailyTrend"]
+    assert len(hourly) == 24 and hourly[9] == {"date": "09:00", "total": 10.0, "count": 1}
+
+    # Funnel caliente: la sentencia ya no lleva el CTE del funnel
+    service.get_dashboard_overview(date(2025, 3, 31))
+    assert len(calls) == 2 and "funnel AS" not in calls[1][0]
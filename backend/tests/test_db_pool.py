@@ -0,0 +1,79 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions
+
+from backend.app.services.db_pool import PoolTimeout, SupabaseConnectionPool
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool(SupabaseConnectionPool):
+    def _connect(self):
+        with self._cond:
+            self._metrics["opened"] += 1
+        return FakeConn()
+
+
+def test_checkout_blocks_until_a_connection_is_returned():
+    pool = FakePool("fake", min_size=1, max_size=1, timeout=2, health_interval=0)
+    assert pool.prewarm() == 1
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    assert pool.get_metrics()["waiting"] == 1
+
+    pool.putconn(conn)
+    waiter.join(1)
+    # La misma conexión, devuelta sin la transacción abierta
+    assert got == [conn] and conn.rollbacks == 1
+    metrics = pool.get_metrics()
+    assert metrics["in_use"] == 1 and metrics["opened"] == 1 and metrics["max_wait_ms"] > 0
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.01)
+    assert pool.get_metrics()["timeouts"] == 1
+
+
+def test_broken_connections_are_discarded_and_replaced():
+    pool = FakePool("fake", min_size=2, max_size=2, timeout=1, health_interval=0)
+    pool.prewarm()
+    first = pool.getconn()
+    pool.putconn(first, close=True)
+    assert pool.get_metrics()["size"] == 1
+
+    # Una ociosa que murió (Supabase la cerró) se descarta al sacarla y el checkout abre otra
+    idle = pool.getconn()
+    pool.putconn(idle)
+    idle.closed = 2
+    conn = pool.getconn()
+    assert conn is not idle and not conn.closed
+    assert pool.get_metrics()["discarded"] == 2
+
+    pool.putconn(conn)
+    assert pool.prewarm() == 1
+    assert pool.get_metrics()["size"] == 2
@@ -0,0 +1,38 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.app.services.donation_counts import DonationCountCache, parse_count_estimate
+from backend.app.services.sync_watermark import get_sync_watermark
+
+
+def test_count_is_reused_across_pages_until_sync_writes():
+    counts = DonationCountCache(strategy="cached", ttl=3600)
+    plan = counts.plan("form_titles", ["recF2", "recF1"], "2025-01-01", None)
+    assert plan.total is None and not plan.use_window
+    counts.store(plan, 42, watermark=counts.current_watermark())
+
+    # Misma firma (el orden de los ids no importa), otra página
+    again = counts.plan("form_titles", ["recF1", "recF2"], "2025-01-01", None, cursor="abc")
+    assert again.total == 42
+    assert counts.plan("form_titles", ["recF1"], "2025-01-01", None).total is None
+
+    get_sync_watermark().bump("donations")
+    assert counts.plan("form_titles", ["recF1", "recF2"], "2025-01-01", None).total is None
+
+
+def test_window_mode_and_estimate_parsing():
+    counts = DonationCountCache(strategy="window")
+    assert counts.plan("source", "Facebook", None, None).use_window
+    # Con cursor el OVER() contaría solo lo que queda: conteo exacto
+    assert not counts.plan("source", "Facebook", None, None, cursor="abc").use_window
+
+    plan = counts.plan("source", "Facebook", None, None)
+    rows = [{"id": "recN1", "_total_count": 7}, {"id": "recN2", "_total_count": 7}]
+    assert counts.resolve_window(plan, rows) == 7
+    assert rows == [{"id": "recN1"}, {"id": "recN2"}]
+    assert counts.resolve_window(plan, []) is None
+
+    explain = {"QUERY PLAN": [{"Plan": {"Node Type": "Aggregate", "Plan Rows": 1,
+                                         "Plans": [{"Node Type": "Hash Join", "Plan Rows": 250000}]}}]}
+    assert parse_count_estimate(explain) == 250000
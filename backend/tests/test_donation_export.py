@@ -0,0 +1,136 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import gc
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from backend.app.services.circuit_breaker import CircuitBreaker
+from backend.app.services.data_service import DataService
+import pytest
+
+from backend.app.services import donation_export
+from backend.app.services.donation_export import ExportBusyError, encode_donation_export
+from backend.app.services import query_metrics
+from backend.app.services.query_metrics import QueryMetrics
+from backend.app.services.supabase_service import SupabaseService
+
+ROWS = [
+    {"id": "rec2", "amount": Decimal("25.50"), "date": datetime(2025, 3, 2, 10, 0), "donorName": "Ana, B",
+     "donorEmail": "ana@example.com", "formTitle": "Gatos", "campaign": "Marzo"},
+    {"id": "rec1", "amount": Decimal("10"), "date": datetime(2025, 3, 1, 9, 30), "donorName": "Luis",
+     "donorEmail": "N/A", "formTitle": "Perros", "campaign": None},
+]
+
+
+class FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = None
+        self.closed = False
+
+    def execute(self, query, params):
+        self.executed = (query, params)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConn:
+    closed = 0
+
+    def __init__(self, rows):
+        self.cursor_obj = FakeNamedCursor(rows)
+        self.cursor_name = None
+
+    def cursor(self, name=None, cursor_factory=None):
+        self.cursor_name = name
+        return self.cursor_obj
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.returned = []
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+
+
+def _service(monkeypatch, rows):
+    monkeypatch.setattr(query_metrics, "_query_metrics", QueryMetrics())
+    service = SupabaseService.__new__(SupabaseService)
+    service._pool = FakePool(FakeConn(rows))
+    return service
+
+
+def test_encode_csv_and_ndjson():
+    csv_body = b"".join(encode_donation_export([ROWS], "csv")).decode("utf-8")
+    lines = csv_body.splitlines()
+    assert lines[0] == "id,date,amount,donorName,donorEmail,formTitle,campaign"
+    assert lines[1] == 'rec2,2025-03-02T10:00:00,25.5,"Ana, B",ana@example.com,Gatos,Marzo'
+
+    ndjson = [json.loads(line) for line in b"".join(encode_donation_export([ROWS[:1], ROWS[1:]], "ndjson")).splitlines()]
+    assert [r["id"] for r in ndjson] == ["rec2", "rec1"]
+    assert ndjson[1]["amount"] == 10.0 and ndjson[1]["campaign"] is None
+
+    # Sin filas: CSV solo con la cabecera, NDJSON vacío
+    assert b"".join(encode_donation_export([], "csv")).count(b"\n") == 1
+    assert b"".join(encode_donation_export([], "ndjson")) == b""
+
+
+def test_export_streams_named_cursor_batches_and_returns_connection(monkeypatch):
+    service = _service(monkeypatch, ROWS * 3)
+    batches = service.iter_donation_export_batches("campaign", "recCamp", "2025-03-01", None, fetch_size=4)
+
+    assert [len(b) for b in batches] == [4, 2]
+    assert query_metrics.get_query_metrics().get_metrics()["queries"]["campaign_donations_export"]["rows_total"] == 4
+    conn = service._pool.conn
+    assert conn.cursor_name.startswith("donation_export_")
+    query, params = conn.cursor_obj.executed
+    assert "LIMIT" not in query and "c.airtable_id = %s" in query
+    assert params == ("recCamp", "2025-03-01")
+    assert conn.cursor_obj.closed and service._pool.returned == [(conn, False)]
+
+
+def test_closing_export_early_releases_connection(monkeypatch):
+    service = _service(monkeypatch, ROWS * 3)
+    data_service = DataService.__new__(DataService)
+    data_service.supabase = service
+    data_service.supabase_breaker = CircuitBreaker("supabase")
+
+    # El primer lote se lee antes de responder; cerrar el stream libera la conexión
+    body = encode_donation_export(data_service.iter_donation_export_batches("source", "Web"), "ndjson")
+    next(body)
+    assert service._pool.returned == []
+    body.close()
+    assert service._pool.returned == [(service._pool.conn, False)]
+
+
+def test_concurrent_exports_are_capped_and_slots_released(monkeypatch):
+    monkeypatch.setattr(donation_export, "_export_slots", donation_export.threading.BoundedSemaphore(1))
+    data_service = DataService.__new__(DataService)
+    data_service.supabase = _service(monkeypatch, ROWS)
+    data_service.supabase_breaker = CircuitBreaker("supabase")
+
+    first = encode_donation_export(data_service.iter_donation_export_batches("source", "Web"), "csv")
+    with pytest.raises(ExportBusyError):
+        data_service.iter_donation_export_batches("source", "Web")
+    assert b"".join(first).count(b"\n") == 3  # al terminar se libera el hueco
+
+    # Una respuesta que nunca empezó a iterar también lo libera al recolectarse
+    data_service.iter_donation_export_batches("source", "Web")
+    gc.collect()
+    data_service.iter_donation_export_batches("source", "Web").close()
@@ -0,0 +1,95 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.app.services import donor_emails
+from backend.app.services.donor_emails import (
+    DELETE_DONOR_EMAILS_QUERY,
+    DONOR_EMAILS_READY_QUERY,
+    INSERT_DONOR_EMAILS_QUERY,
+    DonorEmailLookup,
+    donor_emails_available,
+    refresh_donor_emails,
+)
+from backend.app.services.supabase_service import SupabaseService
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, params=None):
+        self.calls.append((query, params))
+
+
+class RecordingConn:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_refresh_replaces_rows_of_the_synced_donors():
+    cursor, conn = RecordingCursor(), RecordingConn()
+    refresh_donor_emails(cursor, conn, ["recD1", "recD2"])
+    assert cursor.calls == [
+        (DELETE_DONOR_EMAILS_QUERY, (["recD1", "recD2"],)),
+        (INSERT_DONOR_EMAILS_QUERY, (["recD1", "recD2"],)),
+    ]
+    assert conn.commits == 1
+
+    refresh_donor_emails(cursor, conn, [])
+    assert len(cursor.calls) == 2
+
+
+def _lookup_service(table_exists):
+    service = SupabaseService.__new__(SupabaseService)
+    queries = []
+
+    def fake_execute_one(query, params=None, name=None):
+        queries.append((query, params))
+        if query == DONOR_EMAILS_READY_QUERY:
+            return {"ready": table_exists[0]}
+        return None
+
+    service._execute_one = fake_execute_one
+    return service, queries
+
+
+def test_donor_lookup_probes_donor_emails(monkeypatch):
+    monkeypatch.setattr(donor_emails, "_donor_email_lookup", DonorEmailLookup())
+    service, queries = _lookup_service([True])
+    assert service.get_donor_by_email("Ana@Example.org") == {"donor": None, "donations": []}
+    query, params = queries[-1]
+    assert "FROM donor_emails de" in query and "de.email_lower = lower(btrim(%s))" in query
+    assert "ANY(emails)" not in query and params == ("Ana@Example.org",)
+
+    # La tabla ya existe: no se vuelve a comprobar
+    service.get_donor_by_email("ana@example.org")
+    assert [q for q, _ in queries].count(DONOR_EMAILS_READY_QUERY) == 1
+
+
+def test_missing_donor_emails_table_falls_back_to_array_search(monkeypatch):
+    monkeypatch.setattr(donor_emails, "_donor_email_lookup", DonorEmailLookup(recheck_seconds=0))
+    table_exists = [False]
+    service, queries = _lookup_service(table_exists)
+    service.get_donor_by_email("ana@example.org")
+    assert "%s = ANY(emails)" in queries[-1][0]
+
+    table_exists[0] = True  # se creó la tabla: la siguiente búsqueda ya usa el índice
+    service.get_donor_by_email("ana@example.org")
+    assert "FROM donor_emails de" in queries[-1][0]
+
+
+def test_sync_checks_that_donor_emails_exists():
+    class OneRowCursor(RecordingCursor):
+        def fetchone(self):
+            return (False,)
+
+    cursor = OneRowCursor()
+    assert donor_emails_available(cursor) is False
+    assert cursor.calls == [(DONOR_EMAILS_READY_QUERY, None)]
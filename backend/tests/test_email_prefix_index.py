@@ -0,0 +1,71 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.app.services.email_prefix_index import EmailPrefixIndex
+from backend.app.services.sync_watermark import SyncWatermark
+
+
+def test_prefix_search_and_sync_updates():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return [
+            ("recE1", "Ana@Example.com"),
+            ("recE2", "andres@example.com"),
+            ("recE3", "bob@example.com"),
+            ("recE4", "ana@example.com"),   # mismo email con otra capitalización
+            ("recE5", None),
+        ]
+
+    index = EmailPrefixIndex(loader=loader, watermark=SyncWatermark())
+    assert index.search("AN") == ["Ana@Example.com", "andres@example.com"]
+    assert index.search("z") == []
+    assert index.search("  ") == []
+    assert index.search("a", limit=1) == ["Ana@Example.com"]
+
+    # El sync cambia un email y añade uno nuevo
+    index.apply_updates([("recE2", "andrea@example.com"), ("recE9", "anibal@example.com")])
+    assert index.search("and") == ["andrea@example.com"]
+    assert index.search("ani") == ["anibal@example.com"]
+    assert len(loads) == 1
+
+
+def test_updates_during_initial_load_are_replayed():
+    index = EmailPrefixIndex(loader=lambda: [], watermark=SyncWatermark())
+
+    def loader():
+        # El sync escribe mientras la consulta inicial está en curso
+        index.apply_updates([("recE1", "carla@example.com")])
+        return []
+
+    index._loader = loader
+    assert index.search("car") == ["carla@example.com"]
+
+
+def test_index_reloads_after_writes_elsewhere_or_max_age():
+    watermark = SyncWatermark()
+    rows = [("recE1", "dora@example.com"), ("recE2", "diego@example.com")]
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return list(rows)
+
+    index = EmailPrefixIndex(loader=loader, watermark=watermark)
+    assert index.search("d") == ["diego@example.com", "dora@example.com"]
+
+    # Sync de este proceso: un bump de 'emails' + sus cambios, sin recargar
+    watermark.bump("emails")
+    index.apply_updates([("recE3", "dani@example.com")])
+    assert index.search("da") == ["dani@example.com"] and len(loads) == 1
+
+    # Otro worker borró un email: el salto del watermark fuerza la recarga
+    rows.pop()
+    watermark.bump("emails")
+    assert index.search("d") == ["dora@example.com"] and len(loads) == 2
+
+    index.max_age = 0
+    index.search("d")
+    assert len(loads) == 3
@@ -0,0 +1,52 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault("AIRTABLE_API_KEY", "test")
+os.environ.setdefault("AIRTABLE_BASE_ID", "test")
+
+from backend.app.scripts.fake_airtable import FakeAirtable, compile_formula, generate_base
+from backend.app.services.airtable_rate_limiter import AirtableRateGovernor
+from backend.app.services.airtable_service import AirtableService
+
+
+def test_formula_subset():
+    record = {"id": "recA", "fields": {
+        "Email": "Ana@Example.com", "Region": ["USA"], "Bounced Account": True,
+        "Date": "2025-03-01T10:00:00.000Z", "Tag (Mailchimp)": ["Apple_Accounts USA"],
+    }}
+    assert compile_formula("SEARCH(LOWER('an'), LOWER({Email})) = 1")(record)
+    assert compile_formula("AND({Region} = 'USA', {Bounced Account} = 1, NOT({Not Sending} = 1))")(record)
+    assert not compile_formula("FIND('Apple_Accounts USA', {Tag (Mailchimp)} & '') = 0")(record)
+    assert compile_formula("OR(RECORD_ID() = 'recX', RECORD_ID() = 'recA')")(record)
+    assert compile_formula(
+        "AND(NOT({Date} = BLANK()), IS_AFTER({Date}, DATETIME_PARSE('2025-03-01T00:00:00-06:00')))"
+    )(record)
+    assert not compile_formula("IS_BEFORE({Date}, DATETIME_PARSE('2025-03-01', 'YYYY-MM-DD'))")(record)
+
+
+def test_airtable_service_against_fake_base():
+    base = generate_base(donors=120, campaigns=4, form_titles_per_campaign=2, seed=3)
+    fake = FakeAirtable(base, rate_limit=None)
+    service = AirtableService()
+    service.api.governor = AirtableRateGovernor(rate=1000, burst=1000)
+    fake.install(service.api)
+
+    # Coincide con el cálculo directo sobre la base sintética
+    funnel = service.get_funnel_stats()
+    expected_funnel = sum(
+        1 for d in base["Donors"]
+        if d["fields"]["Stage"] == "Funnel" and d["fields"].get("Status") != "Unsubscribed"
+    )
+    assert funnel["total_funnel"] == expected_funnel
+
+    campaign = base["Campaigns"][0]
+    stats = service.get_campaign_stats(campaign["id"])
+    assert stats["campaign_total_count"] == campaign["fields"]["Amount of donations"]
+
+    email = base["Emails"][0]["fields"]["Email"]
+    assert email in service.autocomplete_email(email[:6])
+    assert service.get_airtable_data_by_email(email)["donor_info"]["id"] == base["Emails"][0]["fields"]["Donor"][0]
+
+    # Paginación real: más de 100 donaciones -> varias páginas
+    assert len(service.get_donations()) == len(base["Donations"])
+    assert fake.stats["requests"] > 0
@@ -0,0 +1,73 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from datetime import date
+
+from backend.app.services import form_title_daily
+from backend.app.services.form_title_daily import refresh_form_title_daily
+from backend.app.services.sync_watermark import get_sync_watermark
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, params=None):
+        self.calls.append((query, params))
+
+
+class RecordingConn:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_refresh_recomputes_old_and_new_days_in_batches(monkeypatch):
+    monkeypatch.setattr(form_title_daily, "REFRESH_BATCH_SIZE", 2)
+    cursor, conn = RecordingCursor(), RecordingConn()
+    before = get_sync_watermark().get("form_title_daily")
+
+    # Donación movida del 1 al 2 de marzo + una sin fecha; la clave repetida se recalcula una vez
+    keys = {("ft-1", date(2025, 3, 1)), ("ft-1", date(2025, 3, 2)), ("ft-2", None)}
+    assert refresh_form_title_daily(cursor, conn, keys | {("ft-1", date(2025, 3, 1))}) == 3
+
+    # 2 lotes: DELETE + INSERT por lote, un commit por lote
+    assert [q for q, _ in cursor.calls].count(form_title_daily.DELETE_ROLLUP_KEYS_QUERY) == 2
+    assert conn.commits == 2
+    assert cursor.calls[0][1] == (["ft-1", "ft-1"], [date(2025, 3, 1), date(2025, 3, 2)])
+    assert cursor.calls[2][1] == (["ft-2"], [None])
+    assert get_sync_watermark().get("form_title_daily")[0] == before[0] + 1
+
+    assert refresh_form_title_daily(cursor, conn, []) == 0
+
+
+class ScriptedCursor(RecordingCursor):
+    def __init__(self, results):
+        super().__init__()
+        self.results = list(results)
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+def test_sync_without_rollup_schema_only_invalidates_scopes(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(form_title_daily, "invalidate_donation_scopes", lambda cursor, ids: invalidated.append(ids))
+    # Sin donations.local_date: no hay rollup, solo los form titles de antes/después del upsert
+    cursor = ScriptedCursor([(True, False), [("ft-1",)], [("ft-2",)]])
+    assert not form_title_daily.rollup_available(cursor)
+
+    before = form_title_daily.donation_rollup_keys(cursor, ["recD1"], False)
+    form_title_daily.refresh_donation_rollup(cursor, RecordingConn(), ["recD1"], before, False)
+
+    assert invalidated == [{"ft-1", "ft-2"}]
+    assert form_title_daily.DELETE_ROLLUP_KEYS_QUERY not in [q for q, _ in cursor.calls]
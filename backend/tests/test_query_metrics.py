@@ -0,0 +1,62 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import time
+
+import pytest
+
+from backend.app.services.query_metrics import QueryMetrics, timed_query
+
+
+def test_histogram_and_redacted_slow_log():
+    metrics = QueryMetrics(slow_ms=100, explain_slow=False)
+    metrics.record("get_campaign_stats", "SELECT 1", {"campaign_id": "recSecret"}, 3, rows=2)
+    metrics.record("get_campaign_stats", "SELECT 1", {"campaign_id": "recSecret"}, 40, rows=4)
+    with pytest.raises(RuntimeError):
+        with timed_query("get_top_donors_stats", "SELECT\n  2", ("x@y.com", ["a", "b"]), metrics):
+            raise RuntimeError("boom")
+    metrics.record("get_source_stats", "SELECT   3", ("Facebook", None), 1200, rows=1)
+
+    stats = metrics.get_metrics()["queries"]
+    assert stats["get_campaign_stats"]["count"] == 2 and stats["get_campaign_stats"]["rows_total"] == 6
+    assert stats["get_campaign_stats"]["histogram_ms"]["le_5"] == 1
+    assert stats["get_campaign_stats"]["histogram_ms"]["le_50"] == 1
+    assert stats["get_top_donors_stats"]["errors"] == 1
+
+    slow = metrics.get_slow_queries()
+    assert [e["name"] for e in slow] == ["get_source_stats"]
+    assert slow[0]["params"] == ["<str>", "NULL"] and slow[0]["query"] == "SELECT 3"
+    assert "Facebook" not in str(slow)
+
+
+def test_explain_only_for_slow_reads_with_cooldown():
+    metrics = QueryMetrics(slow_ms=10, explain_slow=True, explain_cooldown=60)
+    explained = []
+    metrics.explain_runner = lambda query, params: explained.append(query) or [{"Plan": {}}]
+
+    metrics.record("get_source_stats", "SELECT * FROM campaigns", None, 50)
+    metrics.record("get_source_stats", "SELECT * FROM campaigns", None, 50)  # cooldown
+    metrics.record("create_shared_view", "INSERT INTO analytics_shared_views VALUES (1)", None, 50)
+    deadline = time.monotonic() + 2
+    while not explained and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+    assert explained == ["SELECT * FROM campaigns"]
+    plans = [e["plan"] for e in metrics.get_slow_queries()]
+    assert plans.count([{"Plan": {}}]) == 1
+
+
+class UniqueViolation(Exception):
+    pgcode = "23505"
+
+
+def test_slow_log_error_keeps_only_type_and_sqlstate():
+    metrics = QueryMetrics(slow_ms=0, explain_slow=False)
+    metrics.record("upsert_donor", "INSERT 1", ("ana@example.com",), 5,
+                   error=UniqueViolation("Key (email)=(ana@example.com) already exists"))
+    metrics.record("get_source_stats", "SELECT 1", None, 5, error=RuntimeError("value 'secret'"))
+
+    errors = [e["error"] for e in metrics.get_slow_queries()]
+    assert errors == ["RuntimeError", "UniqueViolation (SQLSTATE 23505)"]
@@ -0,0 +1,140 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import threading
+import time
+
+from backend.app.services import data_service as data_service_module, result_cache
+from backend.app.services.circuit_breaker import CircuitBreaker, StaleResultCache
+from backend.app.services.data_service import DataService
+from backend.app.services.result_cache import ResultCache, campaign_tag, invalidate_all_results, invalidate_donation_scopes
+from backend.app.services.single_flight import SingleFlight
+from backend.app.services.sync_watermark import SyncWatermark
+
+
+class CountingSupabase:
+    def __init__(self):
+        self.calls = []
+
+    def get_campaign_stats(self, campaign_id, start_date=None, end_date=None, form_title_ids=None):
+        self.calls.append(campaign_id)
+        return {"campaign": campaign_id, "version": len(self.calls)}
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = None
+
+    def execute(self, query, params=None):
+        self.executed = params
+
+    def fetchall(self):
+        return self.rows
+
+
+def _service(watermark):
+    service = DataService.__new__(DataService)
+    service.supabase = CountingSupabase()
+    service.airtable = None
+    service.supabase_breaker = CircuitBreaker("supabase")
+    service.airtable_breaker = CircuitBreaker("airtable")
+    service.stale_results = StaleResultCache()
+    service.single_flight = SingleFlight()
+    service.result_cache = ResultCache(watermark=watermark)
+    return service
+
+
+def test_results_live_until_their_tags_change():
+    watermark = SyncWatermark()
+    service = _service(watermark)
+
+    first = service.get_campaign_stats("recA")
+    first["mutated"] = True  # el caché guarda su propia copia
+    assert service.get_campaign_stats("recA") == {"campaign": "recA", "version": 1}
+    service.get_campaign_stats("recB")
+    assert service.supabase.calls == ["recA", "recB"]
+
+    # Un sync con donaciones de la campaña B no invalida A
+    watermark.bump("donations", campaign_tag("recB"))
+    service.get_campaign_stats("recA")
+    service.get_campaign_stats("recB")
+    assert service.supabase.calls == ["recA", "recB", "recB"]
+
+    # Cambios en form_titles afectan a todas las stats por scope
+    watermark.bump("form_titles")
+    service.get_campaign_stats("recA")
+    assert service.supabase.calls[-1] == "recA"
+    assert service.result_cache.get_metrics()["hits"] == 2
+
+
+def test_sync_invalidates_only_touched_donation_scopes(monkeypatch):
+    watermark = SyncWatermark()
+    monkeypatch.setattr(result_cache, "get_sync_watermark", lambda: watermark)
+    cursor = FakeCursor([("recFT1", "recA", "Web"), ("recFT2", None, None)])
+
+    assert invalidate_donation_scopes(cursor, {"uuid-1", "uuid-2"}) == 4
+    assert cursor.executed == (["uuid-1", "uuid-2"],)
+    assert watermark.get("campaign:recA", "source:Web", "form_title:recFT2", "campaign:recB") == (1, 1, 1, 0)
+
+
+
+def test_full_migration_invalidates_every_cached_result(monkeypatch):
+    watermark = SyncWatermark()
+    monkeypatch.setattr(result_cache, "get_sync_watermark", lambda: watermark)
+    service = _service(watermark)
+    service.get_campaign_stats("recA")
+    service.get_campaign_stats("recEmpty")
+
+    cursor = FakeCursor([("recFT1", "recA", "Web"), (None, "recEmpty", "Mail")])
+    assert invalidate_all_results(cursor) == 5 + 5
+    assert watermark.get("donors", "emails", "source:Mail", "form_title:recFT1") == (1, 1, 1, 1)
+
+    service.get_campaign_stats("recA")
+    service.get_campaign_stats("recEmpty")
+    assert service.supabase.calls == ["recA", "recEmpty", "recA", "recEmpty"]
+
+class SlowTopDonors:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_top_donors_stats(self, limit=10):
+        self.calls += 1
+        if self.calls > 1:
+            self.release.wait(5)
+        return [{"donor": "Ana", "version": self.calls}]
+
+
+def test_stale_while_revalidate_serves_old_entry_and_refreshes_once():
+    watermark = SyncWatermark()
+    service = _service(watermark)
+    service.supabase = SlowTopDonors()
+
+    assert service.get_top_donors(10) == [{"donor": "Ana", "version": 1}]
+    watermark.bump("donations")
+
+    # Entrada invalidada por el sync: se sirve en el acto; un solo refresco en segundo plano
+    assert service.get_top_donors(10) == [{"donor": "Ana", "version": 1}]
+    assert service.get_top_donors(10) == [{"donor": "Ana", "version": 1}]
+    service.supabase.release.set()
+    deadline = time.monotonic() + 5
+    while service.result_cache.get_metrics()["refreshing"] and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    assert service.supabase.calls == 2
+    assert service.get_top_donors(10) == [{"donor": "Ana", "version": 2}]
+    assert service.result_cache.get_metrics()["refreshes"] == 1
+
+
+def test_entries_older_than_max_stale_are_recomputed_inline(monkeypatch):
+    monkeypatch.setattr(data_service_module, "swr_max_stale", lambda method: 0.0)
+    watermark = SyncWatermark()
+    service = _service(watermark)
+    service.supabase = SlowTopDonors()
+    service.supabase.release.set()
+
+    service.get_top_donors(10)
+    watermark.bump("donations")
+    assert service.get_top_donors(10) == [{"donor": "Ana", "version": 2}]
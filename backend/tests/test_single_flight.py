@@ -0,0 +1,148 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.app.services.circuit_breaker import CircuitBreaker, StaleResultCache
+from backend.app.services.data_service import DataService
+from backend.app.services.result_cache import ResultCache
+from backend.app.services.single_flight import SingleFlight
+
+
+class SlowSupabase:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_campaign_stats(self, campaign_id, start_date=None, end_date=None, form_title_ids=None):
+        self.calls += 1
+        self.release.wait(5)
+        return {"campaign": campaign_id, "form_titles": list(form_title_ids or [])}
+
+
+def _service():
+    service = DataService.__new__(DataService)
+    service.supabase = SlowSupabase()
+    service.airtable = None
+    service.supabase_breaker = CircuitBreaker("supabase")
+    service.airtable_breaker = CircuitBreaker("airtable")
+    service.stale_results = StaleResultCache()
+    service.single_flight = SingleFlight()
+    service.result_cache = ResultCache(enabled=False)
+    return service
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_identical_concurrent_calls_run_once():
+    service = _service()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(service.get_campaign_stats, "recC", "2025-01-01", None, ["ft1", "ft2"]) for _ in range(4)]
+        # Distinta clave: se ejecuta aparte
+        other = pool.submit(service.get_campaign_stats, "recC", "2025-02-01")
+        _wait_until(lambda: service.single_flight.get_metrics()["calls"] == 5)
+        service.supabase.release.set()
+        results = [f.result() for f in futures]
+
+    assert other.result()["campaign"] == "recC"
+    assert service.supabase.calls == 2
+    assert all(r == results[0] for r in results)
+    # Cada follower tiene su propia copia
+    assert len({id(r) for r in results}) == 4
+
+    metrics = service.single_flight.get_metrics()["methods"]["get_campaign_stats"]
+    assert metrics == {"calls": 5, "executed": 2, "deduplicated": 3}
+
+
+def test_followers_get_the_leader_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, ("m",), failing)
+        started.wait(5)
+        follower = pool.submit(flight.do, ("m",), failing)
+        _wait_until(lambda: flight.get_metrics()["deduplicated"] == 1)
+        release.set()
+        for f in (leader, follower):
+            with pytest.raises(RuntimeError, match="boom"):
+                f.result()
+    assert flight.in_flight() == 0
+
+
+def test_async_calls_coalesce():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"total": 1}
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async(("get_source_stats", "Web"), fetch) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert calls == 1 and results == [{"total": 1}] * 3
+    assert flight.get_metrics()["deduplicated"] == 2
+
+
+def test_cancelled_async_leader_does_not_fail_followers():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return {"total": 1}
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async(("m",), fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async(("m",), fetch))
+        await asyncio.sleep(0)
+        leader.cancel()  # el cliente del leader se desconecta
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == {"total": 1}
+    assert calls == 1 and flight.in_flight() == 0
+
+
+def test_thread_followers_get_their_own_exception():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise KeyError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, ("m",), failing)
+        started.wait(5)
+        follower = pool.submit(flight.do, ("m",), failing)
+        _wait_until(lambda: flight.get_metrics()["deduplicated"] == 1)
+        release.set()
+        errors = [f.exception() for f in (leader, follower)]
+    assert all(isinstance(e, KeyError) for e in errors)
+    assert errors[0] is not errors[1] and errors[1].__cause__ is errors[0]
@@ -0,0 +1,49 @@
+import sys, os
+# Asegurar que 'backend' se resuelva (los servicios importan 'backend.app...')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.app.services.supabase_queries import (
+    build_donations_page_queries,
+    decode_donations_cursor,
+    format_donations_page,
+)
+
+
+def test_donations_page_queries_per_scope():
+    query, params, count_query, count_params = build_donations_page_queries(
+        "campaign", "recC1", start_date="2025-01-01", end_date=None, page_size=20, offset=40
+    )
+    assert "c.airtable_id = %s" in query and "JOIN campaigns c" in count_query
+    assert params == ("recC1", "2025-01-01", 20, 40)
+    assert count_params == ("recC1", "2025-01-01")
+
+    query, params, count_query, count_params = build_donations_page_queries("form_titles", ["recF1"])
+    assert "JOIN campaigns" not in query and "ft.airtable_id = ANY(%s)" in count_query
+    assert params == (["recF1"], 50, 0)
+    assert count_params == (["recF1"],)
+
+
+def test_cursor_round_trip_and_seek_query():
+    rows = [
+        {"id": "recN2", "amount": 5, "date": datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)},
+        {"id": "recN1", "amount": 7, "date": datetime(2025, 2, 1, tzinfo=timezone.utc)},
+    ]
+    page = format_donations_page(rows, 10, page_size=2)
+    assert decode_donations_cursor(page["next_cursor"]) == ("2025-02-01T00:00:00+00:00", "recN1")
+    # Página incompleta: no hay siguiente
+    assert format_donations_page(rows[:1], 1, page_size=2)["next_cursor"] is None
+
+    query, params, _, count_params = build_donations_page_queries(
+        "source", "Facebook", page_size=2, offset=999, cursor=page["next_cursor"]
+    )
+    assert "(d.donation_date, d.airtable_id) < (%s::timestamptz, %s)" in query
+    assert "OFFSET" not in query
+    assert params == ("Facebook", "2025-02-01T00:00:00+00:00", "recN1", 2)
+    assert count_params == ("Facebook",)
+
+    with pytest.raises(ValueError):
+        decode_donations_cursor("not-a-cursor")